@@ -27,6 +27,23 @@ API_SERVICE_OPTS = [
                default=1000,
                help='The maximum number of items returned in a single '
                     'response from a collection resource.'),
+    cfg.IntOpt('max_changes_timeout',
+               default=60,
+               help='The maximum time (in seconds) a request for node '
+                    'changes waits for a node to change before returning '
+                    'an empty list.'),
+    cfg.IntOpt('max_changes_waiters',
+               default=20,
+               help='The maximum number of requests for node changes '
+                    'waiting at once. Further requests return right away '
+                    'when no node changed. 0 disables waiting.'),
+    cfg.IntOpt('changes_settle_time',
+               default=2,
+               help='The time (in seconds) after which node changes are '
+                    'returned by /v1/nodes/changes. Node changes are '
+                    'numbered with the clock of the host making them, so '
+                    'it must exceed the clock offset between the API and '
+                    'conductor hosts, plus the duration of a node update.'),
     ]
 
 CONF = cfg.CONF
@@ -61,7 +61,12 @@ MIN_VER_STR = '1.1'
 # v1.4: Add MANAGEABLE state
 # v1.5: Add logical node names
 # v1.6: Add INSPECT* states
-MAX_VER_STR = '1.6'
+# v1.7: Add provision_state, driver, power_state and conductor filters, and
+#       markers embedding the sort key, to node lists
+# v1.8: Add /v1/nodes/changes
+# v1.9: Add /v1/nodes/power
+# v1.10: Add /v1/nodes/bulk and /v1/ports/bulk
+MAX_VER_STR = '1.10'
 
 
 MIN_VER = base.Version({base.Version.string: MIN_VER_STR},
@@ -151,6 +151,12 @@ class ChassisController(rest.RestController):
                                 expand=False, resource_url=None):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
+        version = pecan.request.dbapi.get_chassis_list_version()
+        not_modified = api_utils.check_etag(
+            api_utils.make_etag(objects.Chassis.VERSION, *version),
+            weak=True)
+        if not_modified:
+            return not_modified
         marker_obj = None
         if marker:
             marker_obj = objects.Chassis.get_by_uuid(pecan.request.context,
@@ -204,6 +210,11 @@ class ChassisController(rest.RestController):
         """
         rpc_chassis = objects.Chassis.get_by_uuid(pecan.request.context,
                                                   chassis_uuid)
+        not_modified = api_utils.check_etag(api_utils.make_etag(
+            objects.Chassis.VERSION, rpc_chassis.uuid, rpc_chassis.created_at,
+            rpc_chassis.updated_at), weak=True)
+        if not_modified:
+            return not_modified
         return Chassis.convert_with_links(rpc_chassis)
 
     @expose.expose(Chassis, body=Chassis, status_code=201)
@@ -22,6 +22,7 @@ from ironic.api.controllers import base
 from ironic.api.controllers import link
 from ironic.api import expose
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common.i18n import _
 
 
@@ -173,23 +174,18 @@ class DriversController(rest.RestController):
         #              will break from a single-line doc string.
         #              This is a result of a bug in sphinxcontrib-pecanwsme
         # https://github.com/dreamhost/sphinxcontrib-pecanwsme/issues/8
-        driver_list = pecan.request.dbapi.get_active_driver_dict()
+        driver_list = hash_ring.HashRingManager(use_slave=True).driver_hosts
         return DriverList.convert_with_links(driver_list)
 
     @expose.expose(Driver, wtypes.text)
     def get_one(self, driver_name):
         """Retrieve a single driver."""
-        # NOTE(russell_h): There is no way to make this more efficient than
-        # retrieving a list of drivers using the current sqlalchemy schema, but
-        # this path must be exposed for Pecan to route any paths we might
-        # choose to expose below it.
+        driver_hosts = hash_ring.HashRingManager(use_slave=True).driver_hosts
+        hosts = driver_hosts.get(driver_name)
+        if hosts is None:
+            raise exception.DriverNotFound(driver_name=driver_name)
 
-        driver_dict = pecan.request.dbapi.get_active_driver_dict()
-        for name, hosts in driver_dict.iteritems():
-            if name == driver_name:
-                return Driver.convert_with_links(name, list(hosts))
-
-        raise exception.DriverNotFound(driver_name=driver_name)
+        return Driver.convert_with_links(driver_name, list(hosts))
 
     @expose.expose(wtypes.text, wtypes.text)
     def properties(self, driver_name):
@@ -15,7 +15,10 @@
 
 import ast
 import datetime
+import threading
+import time
 
+from eventlet import greenpool
 from oslo_config import cfg
 from oslo_utils import strutils
 from oslo_utils import uuidutils
@@ -33,6 +36,7 @@ from ironic.api.controllers.v1 import utils as api_utils
 from ironic.api import expose
 from ironic.common import exception
 from ironic.common.i18n import _
+from ironic.common.i18n import _LW
 from ironic.common import states as ir_states
 from ironic import objects
 from ironic.openstack.common import log
@@ -44,6 +48,17 @@ CONF.import_opt('heartbeat_timeout', 'ironic.conductor.manager',
 
 LOG = log.getLogger(__name__)
 
+# Interval (in seconds) between checks for node changes while waiting
+_CHANGES_POLL_INTERVAL = 1
+
+# Time (in seconds) a conductor may take to lock a node and start its power
+# action, used to size the batches of the bulk power requests.
+_POWER_START_TIME = 0.2
+
+# Number of requests currently waiting for node changes
+_changes_waiters = 0
+_changes_waiters_lock = threading.Lock()
+
 # Vendor information for node's driver:
 #   key = driver name;
 #   value = dictionary of node vendor methods of that driver:
@@ -87,6 +102,43 @@ def check_allow_management_verbs(verb):
                 raise exception.NotAcceptable()
 
 
+def check_allow_node_list_filters(*filters):
+    # v1.7 added the provision_state, driver, power_state and conductor
+    # filters to node lists
+    if (pecan.request.version.minor < 7 and
+            any(f is not None for f in filters)):
+        raise exception.NotAcceptable()
+
+
+def _no_conductor_error(node):
+    return exception.NoValidHost(
+        reason=_('No conductor service registered which supports '
+                 'driver %s.') % node.driver)
+
+
+def _power_batch_size():
+    """Return the number of nodes of one change_nodes_power_state call.
+
+    Batches are sized so that each call returns within half of
+    [DEFAULT]rpc_response_timeout, even if the conductor starts the power
+    actions one at a time.
+    """
+    return max(1, int(CONF.rpc_response_timeout / 2.0 / _POWER_START_TIME))
+
+
+def _changes_horizon():
+    """Return the change sequence up to which node changes are returned."""
+    return int((time.time() - CONF.api.changes_settle_time) * 1000000)
+
+
+def _node_etag(rpc_node):
+    # NOTE: change_seq changes on every update, even within the same
+    # second, but not when the node is reserved or released.
+    return api_utils.make_etag(objects.Node.VERSION, rpc_node.uuid,
+                               rpc_node.change_seq, rpc_node.updated_at,
+                               rpc_node.reservation)
+
+
 class NodePatchType(types.JsonPatchType):
 
     @staticmethod
@@ -292,6 +344,22 @@ class NodeStates(base.APIBase):
         return sample
 
 
+class NodesPowerRequest(base.APIBase):
+    """API representation of a power state change of several nodes."""
+
+    nodes = wsme.wsattr([types.uuid_or_name], mandatory=True)
+    """The UUIDs or logical names of the nodes"""
+
+    target = wsme.wsattr(wtypes.text, mandatory=True)
+    """The desired power state of the nodes"""
+
+    @classmethod
+    def sample(cls):
+        sample = cls(nodes=['1be26c0b-03f2-4d2e-ae87-c02d7f33c123'],
+                     target=ir_states.POWER_ON)
+        return sample
+
+
 class NodeStatesController(rest.RestController):
 
     _custom_actions = {
@@ -312,6 +380,9 @@ class NodeStatesController(rest.RestController):
         # DB. Ironic counts with a periodic task that verify the current
         # power states of the nodes and update the DB accordingly.
         rpc_node = api_utils.get_rpc_node(node_ident)
+        not_modified = api_utils.check_etag(_node_etag(rpc_node))
+        if not_modified:
+            return not_modified
         return NodeStates.convert(rpc_node)
 
     @expose.expose(None, types.uuid_or_name, wtypes.text,
@@ -658,6 +729,77 @@ class NodeCollection(collection.Collection):
         return sample
 
 
+class NodeDeletion(base.APIBase):
+    """API representation of the deletion of a node."""
+
+    uuid = types.uuid
+    """Unique UUID of the deleted node"""
+
+    change_seq = int
+    """The change sequence of the deletion"""
+
+    @classmethod
+    def sample(cls):
+        return cls(uuid='1be26c0b-03f2-4d2e-ae87-c02d7f33c123',
+                   change_seq=41)
+
+
+class NodeChangeCollection(collection.Collection):
+    """API representation of the nodes changed since a change sequence."""
+
+    nodes = [Node]
+    """A list containing the changed nodes, in the order of their changes"""
+
+    deleted_nodes = [NodeDeletion]
+    """A list containing the deleted nodes, in the order of their deletion"""
+
+    change_seq = int
+    """The change sequence to wait for the next changes from"""
+
+    def __init__(self, **kwargs):
+        self._type = 'nodes'
+
+    @staticmethod
+    def convert_with_links(nodes, deletions, limit, until):
+        collection = NodeChangeCollection()
+        collection.nodes = [Node.convert_with_links(n, expand=True)
+                            for n in nodes]
+        collection.deleted_nodes = [NodeDeletion(**d) for d in deletions]
+        seqs = ([n.change_seq for n in nodes] +
+                [d['change_seq'] for d in deletions])
+        # NOTE: all the changes up to until are returned, unless the
+        # page is full.
+        collection.change_seq = until
+        if limit and len(seqs) >= limit:
+            collection.change_seq = max(seqs)
+            next_args = '?since=%(since)d&limit=%(limit)d' % {
+                'since': collection.change_seq, 'limit': limit}
+            collection.next = link.Link.make_link(
+                'next', pecan.request.host_url, 'nodes/changes',
+                next_args).href
+        return collection
+
+    @classmethod
+    def sample(cls):
+        sample = cls()
+        sample.nodes = [Node.sample(expand=True)]
+        sample.deleted_nodes = [NodeDeletion.sample()]
+        sample.change_seq = 42
+        return sample
+
+
+class NodeBulkCreateRequest(base.APIBase):
+    """API representation of the creation of several nodes."""
+
+    nodes = wsme.wsattr([Node], mandatory=True)
+    """The nodes to create"""
+
+    @classmethod
+    def sample(cls):
+        sample = cls(nodes=[Node.sample(expand=True)])
+        return sample
+
+
 class NodeVendorPassthruController(rest.RestController):
     """REST controller for VendorPassthru.
 
@@ -784,33 +926,52 @@ class NodesController(rest.RestController):
     _custom_actions = {
         'detail': ['GET'],
         'validate': ['GET'],
+        'changes': ['GET'],
+        'power': ['PUT'],
+        'bulk': ['POST'],
     }
 
     def _get_nodes_collection(self, chassis_uuid, instance_uuid, associated,
                               maintenance, marker, limit, sort_key, sort_dir,
-                              expand=False, resource_url=None):
+                              expand=False, resource_url=None,
+                              provision_state=None, driver=None,
+                              power_state=None, conductor=None):
         if self.from_chassis and not chassis_uuid:
             raise exception.MissingParameterValue(_(
                   "Chassis id not specified."))
 
+        check_allow_node_list_filters(provision_state, driver, power_state,
+                                      conductor)
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
+        filters = {}
+        if not instance_uuid:
+            if chassis_uuid:
+                filters['chassis_uuid'] = chassis_uuid
+            for key, value in (('associated', associated),
+                               ('maintenance', maintenance),
+                               ('provision_state', provision_state),
+                               ('driver', driver),
+                               ('power_state', power_state),
+                               ('conductor', conductor)):
+                if value is not None:
+                    filters[key] = value
+            # NOTE: the version of the matching nodes is checked first, so
+            # that unchanged lists are not loaded from the database.
+            version = pecan.request.dbapi.get_node_list_version(filters)
+            not_modified = api_utils.check_etag(
+                api_utils.make_etag(objects.Node.VERSION, *version))
+            if not_modified:
+                return not_modified
+
         marker_obj = None
         if marker:
-            marker_obj = objects.Node.get_by_uuid(pecan.request.context,
-                                                  marker)
+            marker_obj = api_utils.get_marker_object(objects.Node, marker,
+                                                     sort_key)
         if instance_uuid:
             nodes = self._get_nodes_by_instance(instance_uuid)
         else:
-            filters = {}
-            if chassis_uuid:
-                filters['chassis_uuid'] = chassis_uuid
-            if associated is not None:
-                filters['associated'] = associated
-            if maintenance is not None:
-                filters['maintenance'] = maintenance
-
             nodes = objects.Node.list(pecan.request.context, limit, marker_obj,
                                       sort_key=sort_key, sort_dir=sort_dir,
                                       filters=filters)
@@ -820,6 +981,15 @@ class NodesController(rest.RestController):
             parameters['associated'] = associated
         if maintenance:
             parameters['maintenance'] = maintenance
+        for key, value in (('provision_state', provision_state),
+                           ('driver', driver),
+                           ('power_state', power_state),
+                           ('conductor', conductor)):
+            if value is not None:
+                parameters[key] = value
+        if nodes and pecan.request.version.minor >= 7:
+            parameters['marker'] = api_utils.encode_marker(nodes[-1],
+                                                           sort_key)
         return NodeCollection.convert_with_links(nodes, limit,
                                                  url=resource_url,
                                                  expand=expand,
@@ -838,11 +1008,13 @@ class NodesController(rest.RestController):
             return []
 
     @expose.expose(NodeCollection, types.uuid, types.uuid,
-               types.boolean, types.boolean, types.uuid, int, wtypes.text,
+               types.boolean, types.boolean, wtypes.text, int, wtypes.text,
+               wtypes.text, wtypes.text, wtypes.text, wtypes.text,
                wtypes.text)
     def get_all(self, chassis_uuid=None, instance_uuid=None, associated=None,
                 maintenance=None, marker=None, limit=None, sort_key='id',
-                sort_dir='asc'):
+                sort_dir='asc', provision_state=None, driver=None,
+                power_state=None, conductor=None):
         """Retrieve a list of nodes.
 
         :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
@@ -859,17 +1031,32 @@ class NodesController(rest.RestController):
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param provision_state: Optional provision state, to get only nodes
+                                in that state.
+        :param driver: Optional driver name, to get only nodes using that
+                       driver.
+        :param power_state: Optional power state, to get only nodes in that
+                            state.
+        :param conductor: Optional conductor hostname, to get only nodes
+                          whose local state was last prepared by that
+                          conductor.
         """
         return self._get_nodes_collection(chassis_uuid, instance_uuid,
                                           associated, maintenance, marker,
-                                          limit, sort_key, sort_dir)
+                                          limit, sort_key, sort_dir,
+                                          provision_state=provision_state,
+                                          driver=driver,
+                                          power_state=power_state,
+                                          conductor=conductor)
 
     @expose.expose(NodeCollection, types.uuid, types.uuid,
-            types.boolean, types.boolean, types.uuid, int, wtypes.text,
+            types.boolean, types.boolean, wtypes.text, int, wtypes.text,
+            wtypes.text, wtypes.text, wtypes.text, wtypes.text,
             wtypes.text)
     def detail(self, chassis_uuid=None, instance_uuid=None, associated=None,
                maintenance=None, marker=None, limit=None, sort_key='id',
-               sort_dir='asc'):
+               sort_dir='asc', provision_state=None, driver=None,
+               power_state=None, conductor=None):
         """Retrieve a list of nodes with detail.
 
         :param chassis_uuid: Optional UUID of a chassis, to get only nodes for
@@ -886,6 +1073,15 @@ class NodesController(rest.RestController):
         :param limit: maximum number of resources to return in a single result.
         :param sort_key: column to sort results by. Default: id.
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
+        :param provision_state: Optional provision state, to get only nodes
+                                in that state.
+        :param driver: Optional driver name, to get only nodes using that
+                       driver.
+        :param power_state: Optional power state, to get only nodes in that
+                            state.
+        :param conductor: Optional conductor hostname, to get only nodes
+                          whose local state was last prepared by that
+                          conductor.
         """
         # /detail should only work against collections
         parent = pecan.request.path.split('/')[:-1][-1]
@@ -897,7 +1093,215 @@ class NodesController(rest.RestController):
         return self._get_nodes_collection(chassis_uuid, instance_uuid,
                                           associated, maintenance, marker,
                                           limit, sort_key, sort_dir, expand,
-                                          resource_url)
+                                          resource_url,
+                                          provision_state=provision_state,
+                                          driver=driver,
+                                          power_state=power_state,
+                                          conductor=conductor)
+
+    @expose.expose(NodeChangeCollection, int, int, int)
+    def changes(self, since=0, limit=None, timeout=0):
+        """Retrieve the nodes changed or deleted after a change sequence.
+
+        Each node creation, update or deletion gets a change sequence, the
+        time of the change in microseconds. Changes are returned
+        [api]changes_settle_time seconds after they are made. Clients can
+        watch the nodes by passing the change_seq of the previous response
+        as the since parameter.
+
+        :param since: change sequence after which to look for changes.
+                      Default: 0, i.e. all the nodes.
+        :param limit: maximum number of resources to return in a single result.
+        :param timeout: when no node changed, the time (in seconds) to wait
+                        for a change before returning an empty list. It is
+                        capped by the [api]max_changes_timeout option.
+                        Default: 0, i.e. do not wait.
+        """
+        if pecan.request.version.minor < 8:
+            raise exception.HTTPNotFound
+        # /changes should only work against collections
+        parent = pecan.request.path.split('/')[:-1][-1]
+        if parent != "nodes" or self.from_chassis:
+            raise exception.HTTPNotFound
+
+        if since < 0 or timeout < 0:
+            raise wsme.exc.ClientSideError(
+                _("The since and timeout parameters must not be negative."))
+        limit = api_utils.validate_limit(limit)
+        deadline = time.time() + min(timeout, CONF.api.max_changes_timeout)
+
+        until = _changes_horizon()
+        nodes, deletions = objects.Node.list_changes(
+            pecan.request.context, since, until=until, limit=limit)
+        if not (nodes or deletions) and time.time() < deadline:
+            nodes, deletions, until = self._wait_for_changes(
+                since, until, limit, deadline)
+        return NodeChangeCollection.convert_with_links(
+            nodes, deletions, limit, max(since, until))
+
+    def _wait_for_changes(self, since, until, limit, deadline):
+        global _changes_waiters
+        with _changes_waiters_lock:
+            if _changes_waiters >= CONF.api.max_changes_waiters:
+                LOG.debug('Too many requests waiting for node changes, '
+                          'returning right away.')
+                return [], [], until
+            _changes_waiters += 1
+
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return [], [], until
+                time.sleep(min(_CHANGES_POLL_INTERVAL, remaining))
+                until = _changes_horizon()
+                nodes, deletions = objects.Node.list_changes(
+                    pecan.request.context, since, until=until, limit=limit)
+                if nodes or deletions:
+                    return nodes, deletions, until
+        finally:
+            with _changes_waiters_lock:
+                _changes_waiters -= 1
+
+    @expose.expose(wtypes.text, body=NodesPowerRequest, status_code=202)
+    def power(self, request):
+        """Set the power state of several nodes.
+
+        The nodes are grouped by the conductor they are mapped to, and RPC
+        calls are made to each conductor to start the power actions of a
+        batch of its nodes at a time. The conductors are called in
+        parallel.
+
+        :param request: a NodesPowerRequest with the UUIDs or logical names
+                        of the nodes and their desired power state.
+        :returns: a dictionary mapping each node UUID or logical name, as
+                  given, to a dictionary with a 'result' boolean, True if
+                  the power action was started, and a 'reason' for the
+                  failure.
+        :raises: InvalidParameterValue (HTTP 400) if the requested target
+                 state is not valid, or if there are no nodes or more than
+                 [api]max_limit nodes.
+
+        """
+        if pecan.request.version.minor < 9:
+            raise exception.HTTPNotFound
+        # /power should only work against collections
+        parent = pecan.request.path.split('/')[:-1][-1]
+        if parent != "nodes" or self.from_chassis:
+            raise exception.HTTPNotFound
+
+        api_utils.validate_bulk_size(request.nodes)
+        if request.target not in [ir_states.POWER_ON,
+                                  ir_states.POWER_OFF,
+                                  ir_states.REBOOT]:
+            raise exception.InvalidParameterValue(
+                _("Invalid power state %s.") % request.target)
+
+        rpc_nodes, errors = api_utils.get_rpc_nodes(set(request.nodes))
+        results = dict((node_ident, api_utils.bulk_result(e))
+                       for node_ident, e in errors.items())
+        nodes = {}
+        for node_ident, rpc_node in rpc_nodes.items():
+            # Don't change power state for nodes in cleaning
+            if rpc_node.provision_state == ir_states.CLEANING:
+                results[node_ident] = api_utils.bulk_result(
+                    exception.InvalidStateRequested(
+                        action=request.target, node=node_ident,
+                        state=rpc_node.provision_state))
+                continue
+            nodes[rpc_node.uuid] = (node_ident, rpc_node)
+
+        rpcapi = pecan.request.rpcapi
+        topics, unsupported = rpcapi.group_by_topic(
+            [node for _ident, node in nodes.values()])
+        for rpc_node in unsupported:
+            results[nodes[rpc_node.uuid][0]] = api_utils.bulk_result(
+                _no_conductor_error(rpc_node))
+
+        # NOTE: the request is not available from other greenthreads
+        context = pecan.request.context
+        batch_size = _power_batch_size()
+
+        def _change_power_state(topic, topic_nodes):
+            topic_uuids = [node.uuid for node in topic_nodes]
+            for start in range(0, len(topic_uuids), batch_size):
+                uuids = topic_uuids[start:start + batch_size]
+                try:
+                    batch_results = rpcapi.change_nodes_power_state(
+                        context, uuids, request.target, topic)
+                except Exception as e:
+                    LOG.warning(_LW('Failed to change the power state of '
+                                    'nodes %(nodes)s on %(topic)s: %(err)s'),
+                                {'nodes': uuids, 'topic': topic, 'err': e})
+                    batch_results = dict((uuid, api_utils.bulk_result(e))
+                                         for uuid in uuids)
+                for uuid, result in batch_results.items():
+                    results[nodes[uuid][0]] = result
+
+        # One worker per conductor, whose batches are sent one at a time
+        pool = greenpool.GreenPool(max(1, len(topics)))
+        for topic, topic_nodes in topics.items():
+            pool.spawn_n(_change_power_state, topic, topic_nodes)
+        pool.waitall()
+        return results
+
+    @expose.expose(wtypes.text, body=NodeBulkCreateRequest)
+    def bulk(self, request):
+        """Create several nodes.
+
+        The nodes are inserted in the database in batched transactions. A
+        failure to create one node does not prevent the creation of the
+        other ones.
+
+        :param request: a NodeBulkCreateRequest with the nodes to create.
+        :returns: a dictionary with a 'nodes' list holding, for each node
+                  of the request and in the same order, a dictionary with
+                  the 'uuid' of the node, a 'result' boolean, True if the
+                  node was created, and a 'reason' for the failure.
+        :raises: InvalidParameterValue (HTTP 400) if there are no nodes or
+                 more than [api]max_limit nodes.
+
+        """
+        if pecan.request.version.minor < 10:
+            raise exception.HTTPNotFound
+        # /bulk should only work against collections
+        parent = pecan.request.path.split('/')[:-1][-1]
+        if parent != "nodes" or self.from_chassis:
+            raise exception.HTTPNotFound
+
+        api_utils.validate_bulk_size(request.nodes)
+        for node in request.nodes:
+            if not node.uuid:
+                node.uuid = uuidutils.generate_uuid()
+        # NOTE: the hash rings are only loaded once to check that the
+        # drivers of all the nodes are supported.
+        _topics, unsupported = pecan.request.rpcapi.group_by_topic(
+            request.nodes)
+        unsupported = set(node.uuid for node in unsupported)
+
+        errors = [None] * len(request.nodes)
+        new_nodes = []
+        for i, node in enumerate(request.nodes):
+            if node.uuid in unsupported:
+                errors[i] = _no_conductor_error(node)
+            elif node.name and not api_utils.is_valid_node_name(node.name):
+                errors[i] = (_("Cannot create node with invalid name "
+                               "%(name)s") % {'name': node.name})
+            else:
+                new_nodes.append((i, objects.Node(pecan.request.context,
+                                                  **node.as_dict())))
+
+        create_errors = objects.Node.create_many(
+            pecan.request.context, [new_node for _i, new_node in new_nodes])
+        for (i, _new_node), error in zip(new_nodes, create_errors):
+            errors[i] = error
+
+        results = []
+        for node, error in zip(request.nodes, errors):
+            result = api_utils.bulk_result(error)
+            result['uuid'] = node.uuid
+            results.append(result)
+        return {'nodes': results}
 
     @expose.expose(wtypes.text, types.uuid_or_name, types.uuid)
     def validate(self, node=None, node_uuid=None):
@@ -932,6 +1336,9 @@ class NodesController(rest.RestController):
             raise exception.OperationNotPermitted
 
         rpc_node = api_utils.get_rpc_node(node_ident)
+        not_modified = api_utils.check_etag(_node_etag(rpc_node))
+        if not_modified:
+            return not_modified
         return Node.convert_with_links(rpc_node)
 
     @expose.expose(Node, body=Node, status_code=201)
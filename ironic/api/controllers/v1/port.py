@@ -165,6 +165,46 @@ class PortCollection(collection.Collection):
         return sample
 
 
+class BulkPort(base.APIBase):
+    """API representation of a port created by a bulk request.
+
+    Unlike Port, its node is not looked up when the request is parsed, but
+    with the nodes of the other ports when the request is handled.
+    """
+
+    uuid = types.uuid
+    """Unique UUID for this port"""
+
+    address = wsme.wsattr(types.macaddress, mandatory=True)
+    """MAC Address for this port"""
+
+    extra = {wtypes.text: types.jsontype}
+    """This port's meta data"""
+
+    node_uuid = wsme.wsattr(types.uuid, mandatory=True)
+    """The UUID of the node this port belongs to"""
+
+    @classmethod
+    def sample(cls):
+        sample = cls(uuid='27e3153e-d5bf-4b7e-b517-fb518e17f34c',
+                     address='fe:54:00:77:07:d9',
+                     extra={'foo': 'bar'},
+                     node_uuid='7ae81bb3-dec3-4289-8d6c-da80bd8001ae')
+        return sample
+
+
+class PortBulkCreateRequest(base.APIBase):
+    """API representation of the creation of several ports."""
+
+    ports = wsme.wsattr([BulkPort], mandatory=True)
+    """The ports to create"""
+
+    @classmethod
+    def sample(cls):
+        sample = cls(ports=[BulkPort.sample()])
+        return sample
+
+
 class PortsController(rest.RestController):
     """REST controller for Ports."""
 
@@ -174,6 +214,7 @@ class PortsController(rest.RestController):
 
     _custom_actions = {
         'detail': ['GET'],
+        'bulk': ['POST'],
     }
 
     def _get_ports_collection(self, node_ident, address, marker, limit,
@@ -186,17 +227,30 @@ class PortsController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Port.get_by_uuid(pecan.request.context,
-                                                  marker)
-
+        node = None
         if node_ident:
             # FIXME(comstud): Since all we need is the node ID, we can
             #                 make this more efficient by only querying
             #                 for that column. This will get cleaned up
             #                 as we move to the object interface.
             node = api_utils.get_rpc_node(node_ident)
+        if node or not address:
+            version = pecan.request.dbapi.get_port_list_version(
+                node_id=node.id if node else None)
+            # NOTE: ports have no change counter, and their timestamps
+            # only have a one second precision on MySQL.
+            not_modified = api_utils.check_etag(
+                api_utils.make_etag(objects.Port.VERSION, *version),
+                weak=True)
+            if not_modified:
+                return not_modified
+
+        marker_obj = None
+        if marker:
+            marker_obj = objects.Port.get_by_uuid(pecan.request.context,
+                                                  marker)
+
+        if node:
             ports = objects.Port.list_by_node_id(pecan.request.context,
                                                  node.id, limit, marker_obj,
                                                  sort_key=sort_key,
@@ -310,8 +364,73 @@ class PortsController(rest.RestController):
             raise exception.OperationNotPermitted
 
         rpc_port = objects.Port.get_by_uuid(pecan.request.context, port_uuid)
+        not_modified = api_utils.check_etag(api_utils.make_etag(
+            objects.Port.VERSION, rpc_port.uuid, rpc_port.created_at,
+            rpc_port.updated_at), weak=True)
+        if not_modified:
+            return not_modified
         return Port.convert_with_links(rpc_port)
 
+    @expose.expose(wtypes.text, body=PortBulkCreateRequest)
+    def bulk(self, request):
+        """Create several ports.
+
+        The ports are inserted in the database in batched transactions. A
+        failure to create one port does not prevent the creation of the
+        other ones.
+
+        :param request: a PortBulkCreateRequest with the ports to create.
+        :returns: a dictionary with a 'ports' list holding, for each port
+                  of the request and in the same order, a dictionary with
+                  the 'uuid' of the port, a 'result' boolean, True if the
+                  port was created, and a 'reason' for the failure.
+        :raises: InvalidParameterValue (HTTP 400) if there are no ports or
+                 more than [api]max_limit ports.
+
+        """
+        if pecan.request.version.minor < 10:
+            raise exception.HTTPNotFound
+        # /bulk should only work against collections
+        parent = pecan.request.path.split('/')[:-1][-1]
+        if parent != "ports" or self.from_nodes:
+            raise exception.HTTPNotFound
+
+        api_utils.validate_bulk_size(request.ports)
+        context = pecan.request.context
+        node_uuids = list(set(port.node_uuid for port in request.ports))
+        # NOTE: the nodes may just have been created, read them from the
+        # primary database
+        node_ids = dict((node.uuid, node.id) for node in objects.Node.list(
+            context, filters={'uuids_or_names': node_uuids},
+            use_slave=False))
+
+        errors = [None] * len(request.ports)
+        new_ports = []
+        for index, port in enumerate(request.ports):
+            if not port.uuid:
+                port.uuid = uuidutils.generate_uuid()
+            if port.node_uuid not in node_ids:
+                errors[index] = exception.NodeNotFound(node=port.node_uuid)
+                continue
+            values = {'uuid': port.uuid, 'address': port.address,
+                      'node_id': node_ids[port.node_uuid]}
+            if port.extra is not wtypes.Unset:
+                values['extra'] = port.extra
+            new_ports.append((index, objects.Port(context, **values)))
+
+        if new_ports:
+            create_errors = objects.Port.create_many(
+                context, [new_port for _index, new_port in new_ports])
+            for (index, _new_port), error in zip(new_ports, create_errors):
+                errors[index] = error
+
+        results = []
+        for port, error in zip(request.ports, errors):
+            result = api_utils.bulk_result(error)
+            result['uuid'] = port.uuid
+            results.append(result)
+        return {'ports': results}
+
     @expose.expose(Port, body=Port, status_code=201)
     def post(self, port):
         """Create a new port.
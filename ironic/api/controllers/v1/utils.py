@@ -13,10 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import datetime
+import hashlib
+
 import jsonpatch
 from oslo_config import cfg
+from oslo_serialization import jsonutils
 from oslo_utils import uuidutils
 import pecan
+import six
 import wsme
 
 from ironic.common import exception
@@ -40,6 +46,29 @@ def validate_limit(limit):
     return min(CONF.api.max_limit, limit) or CONF.api.max_limit
 
 
+def validate_bulk_size(items):
+    """Check the number of items of a bulk request.
+
+    :raises: InvalidParameterValue if there are no items, or more than
+             [api]max_limit items.
+    """
+    if not items or len(items) > CONF.api.max_limit:
+        raise exception.InvalidParameterValue(
+            _("Between 1 and %d items must be given.") % CONF.api.max_limit)
+
+
+def bulk_result(error=None):
+    """Return the result of one item of a bulk request.
+
+    :param error: the error raised when processing the item, if any.
+    :returns: a dictionary with a 'result' boolean, True if the item was
+              processed, and the 'reason' of the failure.
+    """
+    if error is None:
+        return {'result': True, 'reason': None}
+    return {'result': False, 'reason': six.text_type(error)}
+
+
 def validate_sort_dir(sort_dir):
     if sort_dir not in ['asc', 'desc']:
         raise wsme.exc.ClientSideError(_("Invalid sort direction: %s. "
@@ -48,6 +77,91 @@ def validate_sort_dir(sort_dir):
     return sort_dir
 
 
+def encode_marker(obj, sort_key):
+    """Build the pagination marker pointing after an object.
+
+    Unless the sort key cannot be compared reliably, the marker embeds the
+    values of the sort key and the ID of the object, so that the next page
+    can be fetched without looking the object up first. Otherwise, it is
+    the UUID of the object.
+
+    :param obj: the last object of the current page.
+    :param sort_key: the attribute the objects are sorted by.
+    :returns: a marker to use in the link to the next page.
+    """
+    if sort_key not in obj.fields:
+        return obj.uuid
+    value = getattr(obj, sort_key)
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    elif not (value is None or
+              isinstance(value, six.string_types + six.integer_types)):
+        return obj.uuid
+    data = jsonutils.dumps([obj.uuid, obj.id, sort_key, value])
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def get_marker_object(obj_cls, marker, sort_key):
+    """Get the object to paginate from, given a pagination marker.
+
+    :param obj_cls: the class of the objects being listed.
+    :param marker: a UUID or a marker built by :func:`encode_marker`.
+    :param sort_key: the attribute the objects are sorted by.
+    :returns: an object holding at least the ID and sort key value of the
+              last object of the previous page.
+    :raises: InvalidParameterValue if the marker is not valid.
+    """
+    if uuidutils.is_uuid_like(marker):
+        return obj_cls.get_by_uuid(pecan.request.context, marker)
+
+    try:
+        padded = str(marker) + '=' * (-len(marker) % 4)
+        uuid, obj_id, key, value = jsonutils.loads(
+            base64.urlsafe_b64decode(padded))
+        if not uuidutils.is_uuid_like(uuid):
+            raise ValueError(uuid)
+        if key != sort_key:
+            # NOTE: the sort key changed since the marker was built.
+            return obj_cls.get_by_uuid(pecan.request.context, uuid)
+        marker_obj = obj_cls(pecan.request.context)
+        marker_obj.id = obj_id
+        marker_obj.uuid = uuid
+        setattr(marker_obj, key, value)
+    except (TypeError, ValueError, UnicodeError):
+        raise exception.InvalidParameterValue(
+            _("Invalid pagination marker: %s") % marker)
+    return marker_obj
+
+
+def make_etag(*parts):
+    """Build an entity tag for the response to the current request.
+
+    :param parts: values identifying the version of the data returned.
+        The host, path, query string and API version of the request are
+        added, as the response also depends on them.
+    :returns: a strong entity tag.
+    """
+    data = [pecan.request.host_url, pecan.request.path_qs,
+            str(pecan.request.version)]
+    data.extend(six.text_type(part) for part in parts)
+    return hashlib.sha1(u'\n'.join(data).encode('utf-8')).hexdigest()
+
+
+def check_etag(etag, weak=False):
+    """Set the entity tag of the response and handle If-None-Match.
+
+    :param etag: the entity tag of the response.
+    :param weak: whether the tag is weak, i.e. built from values which do
+        not change on every update of the data, like timestamps with a
+        one second precision.
+    :returns: a "304 Not Modified" response if the client already has this
+              version of the response, None otherwise.
+    """
+    pecan.response.etag = (etag, not weak)
+    if etag in pecan.request.if_none_match:
+        return wsme.api.Response(None, status_code=304, return_type=None)
+
+
 def apply_jsonpatch(doc, patch):
     for p in patch:
         if p['op'] == 'add' and p['path'].count('/') == 1:
@@ -93,6 +207,46 @@ def get_rpc_node(node_ident):
     raise exception.NodeNotFound(node=node_ident)
 
 
+def get_rpc_nodes(node_idents):
+    """Get the RPC nodes from node uuids or logical names with one query.
+
+    :param node_idents: a list of UUIDs or logical names of nodes.
+    :returns: a tuple with a dictionary mapping the identifiers of the
+              nodes found to the RPC Nodes, and a dictionary mapping the
+              other identifiers to the exception get_rpc_node() would
+              have raised for them.
+    """
+    nodes = {}
+    errors = {}
+    valid = []
+    for node_ident in node_idents:
+        if uuidutils.is_uuid_like(node_ident):
+            valid.append(node_ident)
+        elif not allow_node_logical_names():
+            errors[node_ident] = exception.NodeNotFound(node=node_ident)
+        elif utils.is_hostname_safe(node_ident):
+            valid.append(node_ident)
+        else:
+            errors[node_ident] = exception.InvalidUuidOrName(name=node_ident)
+
+    found = {}
+    if valid:
+        # NOTE: the nodes are about to be acted on, read them from the
+        # primary database
+        for node in objects.Node.list(pecan.request.context,
+                                      filters={'uuids_or_names': valid},
+                                      use_slave=False):
+            found[node.uuid] = node
+            if node.name:
+                found[node.name] = node
+    for node_ident in valid:
+        if node_ident in found:
+            nodes[node_ident] = found[node_ident]
+        else:
+            errors[node_ident] = exception.NodeNotFound(node=node_ident)
+    return nodes, errors
+
+
 def is_valid_node_name(name):
     """Determine if the provided name is a valid node name.
 
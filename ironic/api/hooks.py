@@ -95,7 +95,7 @@ class RPCHook(hooks.PecanHook):
     """Attach the rpcapi object to the request so controllers can get to it."""
 
     def before(self, state):
-        state.request.rpcapi = rpcapi.ConductorAPI()
+        state.request.rpcapi = rpcapi.ConductorAPI(use_slave=True)
 
 
 class TrustedCallHook(hooks.PecanHook):
@@ -447,6 +447,16 @@ class NoFreeConductorWorker(TemporaryFailure):
     code = 503  # Service Unavailable (temporary).
 
 
+class NativeCallTimeout(IronicException):
+    message = _("Call %(call)s did not finish within %(timeout)s seconds.")
+
+
+class NoFreeNativeThread(TemporaryFailure):
+    message = _("All the %(size)s native threads are busy with calls which "
+                "timed out.")
+    code = 503  # Service Unavailable (temporary).
+
+
 class VendorPassthruException(IronicException):
     pass
 
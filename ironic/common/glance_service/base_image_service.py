@@ -28,6 +28,7 @@ import sendfile
 import six.moves.urllib.parse as urlparse
 
 from ironic.common import exception
+from ironic.common.glance_service import metadata_cache
 from ironic.common.glance_service import service_utils
 from ironic.common.i18n import _LE
 
@@ -175,17 +176,32 @@ class BaseImageService(object):
 
         :raises: ImageNotFound
         """
-        LOG.debug("Getting image metadata from glance. Image: %s"
-                  % image_href)
         (image_id, self.glance_host,
          self.glance_port, use_ssl) = service_utils.parse_image_ref(image_href)
 
-        image = self.call(method, image_id)
+        cache = metadata_cache.get_cache()
+        if cache is not None:
+            image_meta = cache.get(image_id, self.context)
+            if image_meta is not None:
+                LOG.debug("Using cached image metadata. Image: %s",
+                          image_href)
+                return image_meta
+
+        LOG.debug("Getting image metadata from glance. Image: %s"
+                  % image_href)
+        try:
+            image = self.call(method, image_id)
 
-        if not service_utils.is_image_available(self.context, image):
-            raise exception.ImageNotFound(image_id=image_id)
+            if not service_utils.is_image_available(self.context, image):
+                raise exception.ImageNotFound(image_id=image_id)
+        except exception.ImageNotFound:
+            if cache is not None:
+                cache.put_not_found(image_id, self.context)
+            raise
 
         base_image_meta = service_utils.translate_from_glance(image)
+        if cache is not None:
+            cache.put(image_id, self.context, base_image_meta)
         return base_image_meta
 
     @check_image_service
@@ -262,6 +278,7 @@ class BaseImageService(object):
         # passed in by calling code. Let's be nice and ignore it.
         image_meta.pop('id', None)
 
+        metadata_cache.invalidate(image_id)
         image_meta = self.call(method, image_id, **image_meta)
 
         if self.version == 2 and data:
@@ -284,4 +301,5 @@ class BaseImageService(object):
         (image_id, glance_host,
          glance_port, use_ssl) = service_utils.parse_image_ref(image_id)
 
+        metadata_cache.invalidate(image_id)
         self.call(method, image_id)
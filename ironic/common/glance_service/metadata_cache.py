@@ -0,0 +1,174 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Process-wide cache of Glance image metadata.
+
+A deploy looks up the same image several times (image properties, size,
+whole disk detection, PXE image info), and a conductor usually deploys
+many nodes from a handful of images. The cache keeps the translated
+result of ``show()`` for a short time so those lookups do not all hit the
+Glance API.
+"""
+
+import collections
+import copy
+import threading
+import time
+
+from oslo_config import cfg
+
+from ironic.common import exception
+
+
+cache_opts = [
+    cfg.IntOpt('image_metadata_cache_ttl',
+               default=0,
+               help='Time (in seconds) for which image metadata fetched '
+                    'from Glance is cached by the conductor. 0 disables '
+                    'the cache.'),
+    cfg.IntOpt('image_metadata_cache_negative_ttl',
+               default=10,
+               help='Time (in seconds) for which a "not found" answer '
+                    'from Glance is cached. 0 disables negative caching. '
+                    'Only used when image_metadata_cache_ttl is '
+                    'greater than 0.'),
+    cfg.IntOpt('image_metadata_cache_size',
+               default=1000,
+               help='Maximum number of image metadata entries kept in '
+                    'the cache. The least recently used entries are '
+                    'evicted first.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(cache_opts, group='glance')
+
+_NOT_FOUND = object()
+
+
+def _visibility_key(context):
+    """Return the part of the cache key describing who asked.
+
+    Glance applies visibility rules per tenant when a token is used, and
+    :func:`service_utils.is_image_available` applies them per tenant and
+    user otherwise, so cached answers must not be shared between callers
+    that could see different results.
+    """
+    if context is None:
+        return (None, None, False, False)
+    authenticated = bool(getattr(context, 'auth_token', None))
+    user = None if authenticated else getattr(context, 'user', None)
+    return (getattr(context, 'tenant', None), user,
+            bool(getattr(context, 'is_admin', False)), authenticated)
+
+
+class ImageMetadataCache(object):
+    """A bounded LRU cache of image metadata with per-entry expiry."""
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_id, context):
+        """Return cached metadata for an image.
+
+        :param image_id: The image UUID.
+        :param context: The request context of the caller.
+        :returns: A copy of the cached metadata dict, or None on a miss.
+        :raises: ImageNotFound if a "not found" answer is cached.
+        """
+        key = (image_id, _visibility_key(context))
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                return None
+            # Re-insert to mark the entry as most recently used
+            self._entries[key] = entry
+
+        if value is _NOT_FOUND:
+            raise exception.ImageNotFound(image_id=image_id)
+        return copy.deepcopy(value)
+
+    def _store(self, image_id, context, value, ttl):
+        if ttl <= 0:
+            return
+        key = (image_id, _visibility_key(context))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put(self, image_id, context, image_meta):
+        """Cache the metadata of an image."""
+        self._store(image_id, context, copy.deepcopy(image_meta), self.ttl)
+
+    def put_not_found(self, image_id, context):
+        """Cache the fact that an image could not be found."""
+        self._store(image_id, context, _NOT_FOUND, self.negative_ttl)
+
+    def invalidate(self, image_id):
+        """Drop all cached entries for an image, whoever asked for it."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == image_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide metadata cache.
+
+    :returns: An :class:`ImageMetadataCache`, or None if caching is
+              disabled in the configuration.
+    """
+    global _CACHE
+
+    if CONF.glance.image_metadata_cache_ttl <= 0:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ImageMetadataCache(
+                    CONF.glance.image_metadata_cache_size,
+                    CONF.glance.image_metadata_cache_ttl,
+                    CONF.glance.image_metadata_cache_negative_ttl)
+    return _CACHE
+
+
+def invalidate(image_id):
+    """Drop the cached metadata of an image, if any."""
+    if _CACHE is not None:
+        _CACHE.invalidate(image_id)
+
+
+def reset():
+    """Discard the process-wide cache (mostly useful for tests)."""
+    global _CACHE
+
+    with _CACHE_LOCK:
+        _CACHE = None
@@ -16,6 +16,7 @@
 import bisect
 import hashlib
 import threading
+import time
 
 from oslo_config import cfg
 
@@ -46,6 +47,14 @@ hash_opts = [
                     'conductor services to prepare deployment environments '
                     'and potentially allow the Ironic cluster to recover '
                     'more quickly if a conductor instance is terminated.'),
+    cfg.IntOpt('hash_ring_reset_interval',
+               default=10,
+               help='Interval (in seconds) after which the cached list of '
+                    'active conductors and of their drivers, and the hash '
+                    'rings built from it, are reloaded from the database. '
+                    'It is used to route requests to the conductors and to '
+                    'list the drivers in the API. 0 reloads them every '
+                    'time they are used.'),
 ]
 
 CONF = cfg.CONF
@@ -158,28 +167,56 @@ class HashRing(object):
 
 
 class HashRingManager(object):
-    _hash_rings = None
+    """Cache of the conductor membership and of the hash rings.
+
+    The active conductors and their drivers are loaded from the database
+    at most once every [DEFAULT]hash_ring_reset_interval seconds, and are
+    shared by all the instances in the process using the same database
+    connection.
+
+    :param use_slave: whether to load the conductors from the read-only
+                      database replica. Only the API, which tolerates a
+                      slightly stale membership, should set it.
+    """
+
+    # NOTE: maps use_slave to a tuple of the driver to hosts dictionary,
+    # of the hash rings and of the time they were loaded at, so that they
+    # are always replaced at once.
+    _caches = {}
     _lock = threading.Lock()
 
-    def __init__(self):
+    def __init__(self, use_slave=False):
         self.dbapi = dbapi.get_instance()
+        self.use_slave = use_slave
 
-    @property
-    def ring(self):
+    def _get_cache(self):
         # Hot path, no lock
-        if self._hash_rings is not None:
-            return self._hash_rings
+        cache = self._caches.get(self.use_slave)
+        if (cache is not None and
+                time.time() - cache[2] < CONF.hash_ring_reset_interval):
+            return cache
 
         with self._lock:
-            if self._hash_rings is None:
-                rings = self._load_hash_rings()
-                self.__class__._hash_rings = rings
-            return self._hash_rings
+            # NOTE: reload unless another thread did it in the meantime.
+            current = self._caches.get(self.use_slave)
+            if current is None or current is cache:
+                d2c = self.dbapi.get_active_driver_dict(
+                    use_slave=self.use_slave)
+                current = (d2c, self._load_hash_rings(d2c), time.time())
+                self._caches[self.use_slave] = current
+            return current
 
-    def _load_hash_rings(self):
-        rings = {}
-        d2c = self.dbapi.get_active_driver_dict()
+    @property
+    def ring(self):
+        return self._get_cache()[1]
 
+    @property
+    def driver_hosts(self):
+        """A dictionary mapping driver names to sets of conductor hosts."""
+        return self._get_cache()[0]
+
+    def _load_hash_rings(self, d2c):
+        rings = {}
         for driver_name, hosts in d2c.iteritems():
             rings[driver_name] = HashRing(hosts)
         return rings
@@ -187,7 +224,7 @@ class HashRingManager(object):
     @classmethod
     def reset(cls):
         with cls._lock:
-            cls._hash_rings = None
+            cls._caches.clear()
 
     def __getitem__(self, driver_name):
         try:
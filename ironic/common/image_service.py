@@ -17,10 +17,12 @@
 
 import abc
 import os
-import shutil
+import time
 
+import eventlet
 from oslo_config import cfg
 from oslo_utils import importutils
+from oslo_utils import units
 import requests
 import sendfile
 import six
@@ -28,6 +30,8 @@ import six.moves.urllib.parse as urlparse
 
 from ironic.common import exception
 from ironic.common.i18n import _
+from ironic.common.i18n import _LI
+from ironic.common.i18n import _LW
 from ironic.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
@@ -70,7 +74,72 @@ glance_opts = [
                     'supported by ironic.'),
 ]
 
+http_download_opts = [
+    cfg.IntOpt('image_download_retries',
+               default=3,
+               help='Number of times a failed HTTP(S) image download is '
+                    'retried. Connection errors and HTTP 429 and 5xx '
+                    'responses are retried. Retries resume from the last '
+                    'byte received when the server supports range '
+                    'requests.'),
+    cfg.IntOpt('image_download_retry_interval',
+               default=2,
+               help='Time (in seconds) to wait between HTTP(S) image '
+                    'download retries. A longer Retry-After sent by the '
+                    'server is honoured.'),
+    cfg.IntOpt('image_download_timeout',
+               default=60,
+               help='Timeout (in seconds) for connecting to and reading '
+                    'from the server when downloading HTTP(S) images.'),
+    cfg.IntOpt('image_download_range_workers',
+               default=1,
+               help='Number of byte ranges of a single HTTP(S) image '
+                    'fetched in parallel. 1 disables parallel range '
+                    'downloads.'),
+    cfg.IntOpt('image_download_range_min_size',
+               default=1024,
+               help='Minimum size (in MiB) of an HTTP(S) image for it to be '
+                    'fetched in parallel byte ranges.'),
+]
+
 CONF.register_opts(glance_opts, group='glance')
+CONF.register_opts(http_download_opts)
+
+_SESSION = None
+
+
+def _get_session():
+    """Return the HTTP session shared by all image downloads.
+
+    Using a single session keeps connections to the image servers pooled
+    instead of doing a new TCP (and TLS) handshake for every request.
+    """
+    global _SESSION
+
+    if _SESSION is None:
+        session = requests.Session()
+        pool_size = max(CONF.image_download_range_workers,
+                        requests.adapters.DEFAULT_POOLSIZE)
+        for prefix in ('http://', 'https://'):
+            session.mount(prefix, requests.adapters.HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size))
+        _SESSION = session
+    return _SESSION
+
+
+def _get_retry_interval(response):
+    """Return the time to wait before retrying a failed download.
+
+    It honours the Retry-After header (in seconds) of the response, if
+    any, when it asks for a longer wait than
+    CONF.image_download_retry_interval.
+    """
+    interval = CONF.image_download_retry_interval
+    retry_after = (response.headers.get('Retry-After')
+                   if response is not None else None)
+    if retry_after and retry_after.isdigit():
+        interval = max(interval, int(retry_after))
+    return interval
 
 
 def import_versioned_module(version, submodule=None):
@@ -144,26 +213,191 @@ class HttpImageService(BaseImageService):
     def download(self, image_href, image_file):
         """Downloads image to specified location.
 
+        Failed transfers are retried, resuming from the last byte received
+        when the server supports range requests. Large images may be
+        fetched in several byte ranges in parallel, see the
+        image_download_range_workers option.
+
         :param image_href: Image reference.
         :param image_file: File object to write data to.
         :raises: exception.ImageRefValidationFailed if GET request returned
-            response code not equal to 200.
+            response code not equal to 200 or 206.
         :raises: exception.ImageDownloadFailed if:
             * IOError happened during file write;
-            * GET request failed.
+            * GET request failed more times than allowed by the
+              image_download_retries option.
+        """
+        start_time = time.time()
+        workers = CONF.image_download_range_workers
+        image_size = None
+        if workers > 1:
+            image_size = self._get_ranged_size(image_href)
+
+        if (image_size is not None and
+                image_size >= CONF.image_download_range_min_size * units.Mi):
+            self._download_ranges(image_href, image_file, image_size,
+                                  workers)
+        else:
+            workers = 1
+            image_size = self._download_range(image_href, image_file)
+
+        elapsed = max(time.time() - start_time, 0.001)
+        LOG.info(_LI("Downloaded %(size)s bytes of image %(image_href)s in "
+                     "%(elapsed).1f seconds (%(rate).2f MiB/s, %(workers)s "
+                     "stream(s))."),
+                 {'size': image_size, 'image_href': image_href,
+                  'elapsed': elapsed, 'workers': workers,
+                  'rate': float(image_size) / units.Mi / elapsed})
+
+    def _get_ranged_size(self, image_href):
+        """Get the size of an image if it can be fetched in ranges.
+
+        :param image_href: Image reference.
+        :returns: the image size in bytes, or None if the server did not
+            report a size or does not accept byte range requests.
         """
         try:
-            response = requests.get(image_href, stream=True)
-            if response.status_code != 200:
-                raise exception.ImageRefValidationFailed(image_href=image_href,
-                    reason=_("Got HTTP code %s instead of 200 in response to "
-                             "GET request.") % response.status_code)
-            with response.raw as input_img:
-                shutil.copyfileobj(input_img, image_file, IMAGE_CHUNK_SIZE)
-        except (requests.RequestException, IOError) as e:
+            response = _get_session().head(
+                image_href, timeout=CONF.image_download_timeout)
+        except requests.RequestException as e:
+            LOG.debug("HEAD request to %(image_href)s failed, not using "
+                      "parallel range download: %(error)s",
+                      {'image_href': image_href, 'error': e})
+            return None
+
+        image_size = response.headers.get('Content-Length')
+        if (response.status_code != 200 or image_size is None or
+                response.headers.get('Accept-Ranges') != 'bytes'):
+            return None
+        return int(image_size)
+
+    def _download_ranges(self, image_href, image_file, image_size, workers):
+        """Download an image in parallel byte ranges.
+
+        The destination file is extended to the full image size first and
+        each range is written at its own offset through a separate file
+        object.
+
+        :param image_href: Image reference.
+        :param image_file: File object to write data to. Must be a regular
+            file, as it is reopened by name for every range.
+        :param image_size: Size of the image in bytes.
+        :param workers: Number of ranges to download in parallel.
+        """
+        try:
+            image_file.truncate(image_size)
+            image_file.flush()
+        except IOError as e:
             raise exception.ImageDownloadFailed(image_href=image_href,
                                                 reason=e)
 
+        def _fetch(start, end):
+            try:
+                with open(image_file.name, 'r+b') as range_file:
+                    range_file.seek(start)
+                    self._download_range(image_href, range_file, start, end)
+            except IOError as e:
+                raise exception.ImageDownloadFailed(image_href=image_href,
+                                                    reason=e)
+
+        range_size = -(-image_size // workers)
+        pool = eventlet.GreenPool(workers)
+        threads = [pool.spawn(_fetch, start,
+                              min(start + range_size, image_size) - 1)
+                   for start in range(0, image_size, range_size)]
+        try:
+            for thread in threads:
+                thread.wait()
+        except Exception:
+            for thread in threads:
+                thread.kill()
+            raise
+        image_file.seek(image_size)
+
+    def _download_range(self, image_href, image_file, start=0, end=None):
+        """Download (part of) an image, resuming after failures.
+
+        :param image_href: Image reference.
+        :param image_file: File object to write data to, positioned at
+            the offset matching start.
+        :param start: First byte to download.
+        :param end: Last byte to download (inclusive), or None to download
+            up to the end of the image.
+        :raises: exception.ImageRefValidationFailed if GET request returned
+            unexpected response code.
+        :raises: exception.ImageDownloadFailed if the download failed.
+        :returns: number of bytes written.
+        """
+        session = _get_session()
+        offset = start
+        attempt = 0
+        while True:
+            headers = {}
+            if offset or end is not None:
+                headers['Range'] = 'bytes=%d-%s' % (
+                    offset, '' if end is None else end)
+            try:
+                response = session.get(image_href, stream=True,
+                                       headers=headers,
+                                       timeout=CONF.image_download_timeout)
+                if response.status_code == 200 and headers:
+                    if start or end is not None:
+                        raise exception.ImageDownloadFailed(
+                            image_href=image_href,
+                            reason=_("Server does not support range "
+                                     "requests."))
+                    # The server ignored the Range header, so the whole
+                    # image is being sent again.
+                    image_file.seek(0)
+                    image_file.truncate()
+                    offset = 0
+                elif (response.status_code == 429 or
+                      response.status_code >= 500):
+                    # The server is overloaded or temporarily failing,
+                    # the download may work later.
+                    response.close()
+                    raise requests.HTTPError(
+                        _("Got HTTP code %s in response to GET request.")
+                        % response.status_code, response=response)
+                elif response.status_code not in (200, 206):
+                    raise exception.ImageRefValidationFailed(
+                        image_href=image_href,
+                        reason=_("Got HTTP code %s instead of 200 in "
+                                 "response to GET request.")
+                        % response.status_code)
+
+                expected_end = end
+                length = response.headers.get('Content-Length')
+                if expected_end is None and length is not None:
+                    expected_end = offset + int(length) - 1
+
+                for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+                    image_file.write(chunk)
+                    offset += len(chunk)
+
+                if expected_end is not None and offset <= expected_end:
+                    raise requests.ConnectionError(
+                        _("Connection closed after %(received)s of "
+                          "%(expected)s bytes.") %
+                        {'received': offset - start,
+                         'expected': expected_end + 1 - start})
+                return offset - start
+            except requests.RequestException as e:
+                attempt += 1
+                if attempt > CONF.image_download_retries:
+                    raise exception.ImageDownloadFailed(image_href=image_href,
+                                                        reason=e)
+                LOG.warning(_LW("Downloading image %(image_href)s failed at "
+                                "byte %(offset)s, attempt %(attempt)s of "
+                                "%(retries)s. Retrying. Error: %(error)s"),
+                            {'image_href': image_href, 'offset': offset,
+                             'attempt': attempt, 'error': e,
+                             'retries': CONF.image_download_retries})
+                time.sleep(_get_retry_interval(e.response))
+            except IOError as e:
+                raise exception.ImageDownloadFailed(image_href=image_href,
+                                                    reason=e)
+
     def show(self, image_href):
         """Get dictionary of image properties.
 
@@ -128,6 +128,16 @@ def get_admin_auth_token():
     return ksclient.auth_token
 
 
+def get_admin_auth_ref():
+    """Get an admin auth reference from the Keystone.
+
+    :returns: the access info of an admin token, giving both the token
+              (auth_token) and its expiration (will_expire_soon()).
+    """
+    ksclient = _get_ksclient()
+    return ksclient.auth_ref
+
+
 def token_expires_soon(token, duration=None):
     """Determines if token expiration is about to occur.
 
@@ -0,0 +1,195 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Run blocking calls into C libraries in native threads.
+
+pywsman, the openwsman bindings used by the DRAC and AMT drivers, does its
+network I/O in C code that eventlet cannot make cooperative. A slow BMC
+would then stall every green thread of the conductor, including RPC
+handling and heartbeats. Calls made through :func:`execute` run in
+eventlet's native thread pool instead, so only the calling green thread
+waits for them.
+
+A native thread cannot be interrupted: when a green thread stops waiting
+for a call, the call keeps its native thread until it returns. Callers
+must therefore also put a timeout on the underlying connections, see
+:func:`get_transport_timeout`.
+"""
+
+import threading
+import time
+
+import eventlet
+from eventlet import tpool
+from oslo_config import cfg
+
+from ironic.common import exception
+from ironic.common.i18n import _LW
+from ironic.openstack.common import log as logging
+
+
+native_executor_opts = [
+    cfg.IntOpt('native_thread_pool_size',
+               default=20,
+               help='Size of the pool of native threads used to run '
+                    'blocking calls of the pywsman library (DRAC and AMT '
+                    'drivers). 0 runs these calls in the calling green '
+                    'thread, blocking the conductor while they are in '
+                    'progress.'),
+    cfg.IntOpt('native_call_timeout',
+               default=300,
+               help='Time (in seconds) after which a green thread stops '
+                    'waiting for a blocking pywsman call. It is also the '
+                    'timeout of the underlying connections, so that the '
+                    'native thread is freed as well. 0 waits forever.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(native_executor_opts, group='conductor')
+
+LOG = logging.getLogger(__name__)
+
+_STATS = {}
+_STATS_LOCK = threading.Lock()
+_POOL_SIZE = None
+# Calls which timed out but still occupy a native thread.
+_ABANDONED = set()
+
+
+def _call_name(func):
+    name = getattr(func, '__name__', None) or func.__class__.__name__
+    owner = getattr(func, '__self__', None)
+    if owner is not None:
+        return '%s.%s' % (owner.__class__.__name__, name)
+    return name
+
+
+def _record(name, elapsed, outcome):
+    with _STATS_LOCK:
+        stats = _STATS.setdefault(name, {'calls': 0, 'errors': 0,
+                                         'timeouts': 0, 'total_time': 0.0,
+                                         'max_time': 0.0})
+        stats['calls'] += 1
+        stats['total_time'] += elapsed
+        stats['max_time'] = max(stats['max_time'], elapsed)
+        if outcome in ('errors', 'timeouts'):
+            stats[outcome] += 1
+
+
+class _Call(object):
+    """A call run in a native thread, which knows when it returned."""
+
+    def __init__(self, func):
+        self.func = func
+        self.done = False
+
+    def __call__(self, *args, **kwargs):
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            # NOTE: this runs in the native thread, so no green lock may be
+            # used; the set operations are atomic.
+            self.done = True
+            _ABANDONED.discard(self)
+
+    def abandon(self):
+        _ABANDONED.add(self)
+        if self.done:
+            _ABANDONED.discard(self)
+
+
+def _ensure_pool_size():
+    global _POOL_SIZE
+
+    size = CONF.conductor.native_thread_pool_size
+    if size != _POOL_SIZE:
+        tpool.set_num_threads(size)
+        _POOL_SIZE = size
+
+
+def execute(func, *args, **kwargs):
+    """Run a blocking call in a native thread.
+
+    :param func: The callable to run.
+    :param args: Positional arguments for the callable.
+    :param kwargs: Keyword arguments for the callable.
+    :raises: NativeCallTimeout if the call did not finish within
+             [conductor]native_call_timeout seconds. The native thread is
+             left to finish on its own.
+    :raises: NoFreeNativeThread if all the native threads are still
+             running calls which timed out.
+    :returns: The return value of the callable. Exceptions raised by the
+              callable are re-raised in the calling green thread.
+    """
+    name = _call_name(func)
+    size = CONF.conductor.native_thread_pool_size
+    if size <= 0:
+        return func(*args, **kwargs)
+
+    # NOTE: calls which timed out keep their native thread, new calls
+    # would wait behind them without being counted by the timeout.
+    if len(_ABANDONED) >= size:
+        raise exception.NoFreeNativeThread(size=size)
+
+    _ensure_pool_size()
+    timeout = CONF.conductor.native_call_timeout or None
+    call = _Call(func)
+    outcome = 'success'
+    start = time.time()
+    try:
+        with eventlet.Timeout(timeout, exception.NativeCallTimeout(
+                call=name, timeout=timeout)):
+            return tpool.execute(call, *args, **kwargs)
+    except exception.NativeCallTimeout:
+        outcome = 'timeouts'
+        call.abandon()
+        LOG.warning(_LW("Native call %(call)s timed out, its native thread "
+                        "stays busy until it returns. %(count)d of "
+                        "%(size)d native threads are busy with calls "
+                        "which timed out."),
+                    {'call': name, 'count': len(_ABANDONED), 'size': size})
+        raise
+    except Exception:
+        outcome = 'errors'
+        raise
+    finally:
+        elapsed = time.time() - start
+        _record(name, elapsed, outcome)
+        LOG.debug("Native call %(call)s finished in %(elapsed).3f seconds "
+                  "with result: %(outcome)s.",
+                  {'call': name, 'elapsed': elapsed, 'outcome': outcome})
+
+
+def get_transport_timeout():
+    """Return the timeout to set on the connections of native calls.
+
+    :returns: the timeout in seconds, or 0 for no timeout.
+    """
+    return CONF.conductor.native_call_timeout
+
+
+def get_stats():
+    """Return statistics about the calls made through this module.
+
+    :returns: a dictionary mapping call names to dictionaries with the
+              number of calls, errors and timeouts as well as the total and
+              maximum time spent in the call.
+    """
+    with _STATS_LOCK:
+        return dict((name, dict(stats)) for name, stats in _STATS.items())
+
+
+def reset_stats():
+    with _STATS_LOCK:
+        _STATS.clear()
+    _ABANDONED.clear()
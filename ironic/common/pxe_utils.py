@@ -14,8 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import contextlib
 import os
+import threading
 
+import eventlet
+from eventlet import event
 import jinja2
 from oslo_config import cfg
 
@@ -34,6 +39,11 @@ LOG = logging.getLogger(__name__)
 
 PXE_CFG_DIR_NAME = 'pxelinux.cfg'
 
+# Compiled templates, keyed by path, with the modification time of the
+# template file they were compiled from.
+_TEMPLATE_CACHE = {}
+_TEMPLATE_CACHE_LOCK = threading.Lock()
+
 
 def get_root_dir():
     """Returns the directory where the config files and images will live."""
@@ -54,6 +64,33 @@ def _ensure_config_dirs_exist(node_uuid):
     fileutils.ensure_tree(os.path.join(root_dir, PXE_CFG_DIR_NAME))
 
 
+def _get_template(template):
+    """Get a compiled template, compiling it only if it changed on disk.
+
+    :param template: The path of the template.
+    :returns: A jinja2 Template object.
+
+    """
+    mtime = os.path.getmtime(template)
+    with _TEMPLATE_CACHE_LOCK:
+        cached = _TEMPLATE_CACHE.get(template)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    tmpl_path, tmpl_file = os.path.split(template)
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(tmpl_path))
+    compiled = env.get_template(tmpl_file)
+    with _TEMPLATE_CACHE_LOCK:
+        _TEMPLATE_CACHE[template] = (mtime, compiled)
+    return compiled
+
+
+def clear_template_cache():
+    """Drop all the compiled templates."""
+    with _TEMPLATE_CACHE_LOCK:
+        _TEMPLATE_CACHE.clear()
+
+
 def _build_pxe_config(pxe_options, template):
     """Build the PXE boot configuration file.
 
@@ -65,9 +102,7 @@ def _build_pxe_config(pxe_options, template):
     :returns: A formatted string with the file content.
 
     """
-    tmpl_path, tmpl_file = os.path.split(template)
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(tmpl_path))
-    template = env.get_template(tmpl_file)
+    template = _get_template(template)
     return template.render({'pxe_options': pxe_options,
                             'ROOT': '{{ ROOT }}',
                             'DISK_IDENTIFIER': '{{ DISK_IDENTIFIER }}',
@@ -82,8 +117,7 @@ def _link_mac_pxe_configs(task):
     """
 
     def create_link(mac_path):
-        utils.unlink_without_raise(mac_path)
-        utils.create_link_without_raise(pxe_config_file_path, mac_path)
+        utils.replace_link_without_raise(pxe_config_file_path, mac_path)
 
     pxe_config_file_path = get_pxe_config_file_path(task.node.uuid)
     for mac in driver_utils.get_node_mac_addresses(task):
@@ -113,9 +147,8 @@ def _link_ip_address_pxe_configs(task):
             task.node.uuid)
     for port_ip_address in ip_addrs:
         ip_address_path = _get_pxe_ip_address_path(port_ip_address)
-        utils.unlink_without_raise(ip_address_path)
-        utils.create_link_without_raise(pxe_config_file_path,
-                                         ip_address_path)
+        utils.replace_link_without_raise(pxe_config_file_path,
+                                          ip_address_path)
 
 
 def _get_pxe_mac_path(mac, delimiter=None):
@@ -184,6 +217,8 @@ def create_pxe_config(task, pxe_options, template=None):
     MAC address (port) of that node, a symlink for the configuration file
     will be created under the PXE configuration directory, so regardless
     of which port boots first they'll get the same PXE configuration.
+    Within batch_pxe_configs(), the configuration is written along with
+    the ones created by other greenthreads at the same time.
 
     :param task: A TaskManager instance.
     :param pxe_options: A dictionary with the PXE configuration
@@ -192,21 +227,117 @@ def create_pxe_config(task, pxe_options, template=None):
         given the CONF.pxe.pxe_config_template will be used.
 
     """
-    LOG.debug("Building PXE config for node %s", task.node.uuid)
+    if template is None:
+        template = CONF.pxe.pxe_config_template
+
+    if getattr(_batch_local, 'enabled', False):
+        _CONFIG_BATCHER.create(task, pxe_options, template)
+    else:
+        create_pxe_configs([(task, pxe_options)], template=template)
+
+
+def create_pxe_configs(tasks_options, template=None):
+    """Generate PXE configuration files and links for several nodes.
 
+    Configuration files and links are replaced atomically, so TFTP and
+    HTTP clients never get a partially written configuration. The template
+    is only compiled again when it changes on disk.
+
+    :param tasks_options: A list of (task, pxe_options) tuples, with a
+        TaskManager instance and a dictionary with the PXE configuration
+        parameters for its node.
+    :param template: The PXE configuration template. If no template is
+        given the CONF.pxe.pxe_config_template will be used.
+
+    """
     if template is None:
         template = CONF.pxe.pxe_config_template
 
-    _ensure_config_dirs_exist(task.node.uuid)
+    for task, pxe_options in tasks_options:
+        LOG.debug("Building PXE config for node %s", task.node.uuid)
+        _ensure_config_dirs_exist(task.node.uuid)
 
-    pxe_config_file_path = get_pxe_config_file_path(task.node.uuid)
-    pxe_config = _build_pxe_config(pxe_options, template)
-    utils.write_to_file(pxe_config_file_path, pxe_config)
+        pxe_config_file_path = get_pxe_config_file_path(task.node.uuid)
+        pxe_config = _build_pxe_config(pxe_options, template)
+        utils.write_to_file_atomic(pxe_config_file_path, pxe_config)
 
-    if deploy_utils.get_boot_mode_for_deploy(task.node) == 'uefi':
-        _link_ip_address_pxe_configs(task)
-    else:
-        _link_mac_pxe_configs(task)
+        if deploy_utils.get_boot_mode_for_deploy(task.node) == 'uefi':
+            _link_ip_address_pxe_configs(task)
+        else:
+            _link_mac_pxe_configs(task)
+
+
+class _ConfigBatcher(object):
+    """Writes the PXE configurations created concurrently in batches.
+
+    The first greenthread creating a configuration lets the others queue
+    theirs, then writes all of them with create_pxe_configs(). The others
+    wait until their configuration is written, so they can use it right
+    away, e.g. to switch it to the boot mode.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._writing = False
+
+    def create(self, task, pxe_options, template):
+        done = event.Event()
+        self._pending.append((task, pxe_options, template, done))
+        if not self._writing:
+            self._writing = True
+            try:
+                # let the other greenthreads queue their configurations
+                eventlet.sleep(0)
+                while self._pending:
+                    batch, self._pending = self._pending, []
+                    self._write(batch)
+            finally:
+                self._writing = False
+        done.wait()
+
+    @staticmethod
+    def _write(batch):
+        by_template = collections.OrderedDict()
+        for item in batch:
+            by_template.setdefault(item[2], []).append(item)
+
+        for template, items in by_template.items():
+            try:
+                create_pxe_configs([(task, pxe_options)
+                                    for task, pxe_options, _t, _d in items],
+                                   template=template)
+            except Exception:
+                # Find out which configurations failed
+                for task, pxe_options, _t, done in items:
+                    try:
+                        create_pxe_configs([(task, pxe_options)],
+                                           template=template)
+                    except Exception as e:
+                        done.send_exception(e)
+                    else:
+                        done.send()
+            else:
+                for _task, _o, _t, done in items:
+                    done.send()
+
+
+_CONFIG_BATCHER = _ConfigBatcher()
+_batch_local = threading.local()
+
+
+@contextlib.contextmanager
+def batch_pxe_configs():
+    """Write the PXE configurations created in this block in batches.
+
+    The configurations created by create_pxe_config() in the block are
+    written with the ones of the other greenthreads doing so at the same
+    time, e.g. when a conductor takes many nodes over.
+    """
+    _batch_local.enabled = True
+    try:
+        yield
+    finally:
+        _batch_local.enabled = False
 
 
 def clean_up_pxe_config(task):
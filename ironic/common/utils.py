@@ -26,6 +26,7 @@ import random
 import re
 import shutil
 import tempfile
+import uuid
 
 import netaddr
 from oslo_concurrency import processutils
@@ -463,6 +464,22 @@ def write_to_file(path, contents):
         f.write(contents)
 
 
+def write_to_file_atomic(path, contents):
+    """Write a file so that readers never see it partially written.
+
+    The contents are written to a temporary file in the same directory,
+    which is then renamed over path.
+    """
+    tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(contents)
+        os.rename(tmp_path, path)
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            unlink_without_raise(tmp_path)
+
+
 def create_link_without_raise(source, link):
     try:
         os.symlink(source, link)
@@ -475,6 +492,23 @@ def create_link_without_raise(source, link):
                          {'source': source, 'link': link, 'e': e})
 
 
+def replace_link_without_raise(source, link):
+    """Atomically create or replace a symbolic link.
+
+    Unlike removing the link and creating it again, there is no moment at
+    which link does not exist.
+    """
+    tmp_link = '%s.%s.tmp' % (link, uuid.uuid4().hex)
+    try:
+        os.symlink(source, tmp_link)
+        os.rename(tmp_link, link)
+    except OSError as e:
+        unlink_without_raise(tmp_link)
+        LOG.warn(_LW("Failed to create symlink from %(source)s to %(link)s"
+                     ", error: %(e)s"),
+                 {'source': source, 'link': link, 'e': e})
+
+
 def safe_rstrip(value, chars=None):
     """Removes trailing characters from a string if that does not make it empty
 
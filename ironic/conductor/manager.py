@@ -42,6 +42,7 @@ a change, etc.
 """
 
 import collections
+import copy
 import datetime
 import inspect
 import tempfile
@@ -49,6 +50,7 @@ import threading
 
 import eventlet
 from eventlet import greenpool
+from eventlet import semaphore
 from oslo import messaging
 from oslo_concurrency import lockutils
 from oslo_config import cfg
@@ -56,6 +58,7 @@ from oslo_context import context as ironic_context
 from oslo_db import exception as db_exception
 from oslo_utils import excutils
 from oslo_utils import uuidutils
+import six
 
 from ironic.common import dhcp_factory
 from ironic.common import driver_factory
@@ -69,12 +72,16 @@ from ironic.common.i18n import _LI
 from ironic.common.i18n import _LW
 from ironic.common import images
 from ironic.common import keystone
+from ironic.common import pxe_utils
 from ironic.common import rpc
 from ironic.common import states
 from ironic.common import swift
+from ironic.conductor import takeover
 from ironic.conductor import task_manager
 from ironic.conductor import utils
+from ironic.conductor import worker_pool
 from ironic.db import api as dbapi
+from ironic.drivers.modules import console_gateway
 from ironic import objects
 from ironic.openstack.common import log
 from ironic.openstack.common import periodic_task
@@ -128,6 +135,22 @@ conductor_opts = [
         cfg.IntOpt('workers_pool_size',
                    default=100,
                    help='The size of the workers greenthread pool.'),
+        cfg.IntOpt('workers_queue_size',
+                   default=100,
+                   help='Maximum number of tasks waiting for a free worker '
+                        'when all the workers are busy. Tasks submitted '
+                        'when the queue is full are rejected. 0 disables '
+                        'queueing.'),
+        cfg.IntOpt('workers_queue_timeout',
+                   default=30,
+                   help='New tasks are rejected when the oldest task in the '
+                        'workers queue has been waiting for longer than '
+                        'this number of seconds. 0 disables this check.'),
+        cfg.IntOpt('bulk_power_max_workers',
+                   default=10,
+                   help='Maximum number of nodes locked and validated at '
+                        'once by a bulk power state change. The power '
+                        'actions themselves run in the workers pool.'),
         cfg.IntOpt('node_locked_retry_attempts',
                    default=3,
                    help='Number of attempts to grab a node lock.'),
@@ -157,6 +180,13 @@ conductor_opts = [
                         'conductor will check for nodes that it should '
                         '"take over". Set it to a negative value to disable '
                         'the check entirely.'),
+        cfg.FloatOpt('takeover_max_rate',
+                     default=0.0,
+                     help='Maximum number of node takeovers started per '
+                          'second when this conductor becomes responsible '
+                          'for nodes of other conductors. At most '
+                          'periodic_max_workers nodes are taken over at '
+                          'once. 0 means no limit.'),
         cfg.BoolOpt('configdrive_use_swift',
                     default=False,
                     help='Whether to upload the config drive to Swift.'),
@@ -204,7 +234,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
     """Ironic Conductor manager main class."""
 
     # NOTE(rloo): This must be in sync with rpcapi.ConductorAPI's.
-    RPC_API_VERSION = '1.27'
+    RPC_API_VERSION = '1.29'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -216,6 +246,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
         self.topic = topic
         self.power_state_sync_count = collections.defaultdict(int)
         self.notifier = rpc.get_notifier()
+        self._takeover_auth_ref = None
+        self._takeover_auth_lock = semaphore.Semaphore()
 
     def _get_driver(self, driver_name):
         """Get the driver.
@@ -237,9 +269,16 @@ class ConductorManager(periodic_task.PeriodicTasks):
         self._keepalive_evt = threading.Event()
         """Event for the keepalive thread."""
 
-        self._worker_pool = greenpool.GreenPool(
-                                size=CONF.conductor.workers_pool_size)
-        """GreenPool of background workers for performing tasks async."""
+        self._worker_pool = worker_pool.WorkerPool(
+            CONF.conductor.workers_pool_size,
+            max_queue_size=CONF.conductor.workers_queue_size,
+            max_queue_wait=CONF.conductor.workers_queue_timeout)
+        """Pool of background workers for performing tasks async."""
+
+        self._takeover_engine = takeover.TakeoverEngine(
+            self._takeover_node, CONF.conductor.periodic_max_workers,
+            max_rate=CONF.conductor.takeover_max_rate)
+        """Takes over the nodes mapped to this conductor in background."""
 
         self.ring_manager = hash.HashRingManager()
         """Consistent hash ring which maps drivers to conductors."""
@@ -297,6 +336,17 @@ class ConductorManager(periodic_task.PeriodicTasks):
                 LOG.critical(_LC('Failed to start keepalive'))
                 self.del_host()
 
+        # NOTE: the sessions of the console gateway live in the conductor
+        # process, so they did not survive its restart. shellinabox
+        # daemons run on their own and are left alone.
+        if console_gateway.is_enabled():
+            try:
+                self._spawn_periodic_worker(
+                    self._start_consoles, ironic_context.get_admin_context())
+            except exception.NoFreeConductorWorker:
+                LOG.warning(_LW('No free conductor workers available to '
+                                'start the consoles of the nodes.'))
+
     def _collect_periodic_tasks(self, obj):
         for n, method in inspect.getmembers(obj, inspect.ismethod):
             if getattr(method, '_periodic_enabled', False):
@@ -319,6 +369,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
             LOG.info(_LI('Not deregistering conductor with hostname '
                          '%(hostname)s.'),
                      {'hostname': self.host})
+        self._takeover_engine.stop()
         # Waiting here to give workers the chance to finish. This has the
         # benefit of releasing locks workers placed on nodes, as well as
         # having work complete normally.
@@ -329,21 +380,43 @@ class ConductorManager(periodic_task.PeriodicTasks):
         return self.run_periodic_tasks(context, raise_on_error=raise_on_error)
 
     @lockutils.synchronized(WORKER_SPAWN_lOCK, 'ironic-')
+    def _spawn_worker_with_priority(self, priority, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a worker greenthread.
+
+        The work starts right away if there are free slots in the pool,
+        otherwise it is queued and started by priority when a worker
+        becomes free. Execution control returns immediately to the caller.
+
+        :param priority: a worker_pool.PRIORITY_* constant.
+        :returns: a worker_pool.QueuedWork object, which can be used like a
+                  GreenThread object.
+        :raises: NoFreeConductorWorker if the work cannot be queued.
+
+        """
+        return self._worker_pool.spawn(priority, func, *args, **kwargs)
+
     def _spawn_worker(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a worker, for an API request.
+
+        :returns: a worker_pool.QueuedWork object.
+        :raises: NoFreeConductorWorker if the work cannot be queued.
+
+        """
+        return self._spawn_worker_with_priority(worker_pool.PRIORITY_HIGH,
+                                                func, *args, **kwargs)
 
-        """Create a greenthread to run func(*args, **kwargs).
+    def _spawn_periodic_worker(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a worker, for a periodic task.
 
-        Spawns a greenthread if there are free slots in pool, otherwise raises
-        exception. Execution control returns immediately to the caller.
+        Work started by periodic tasks is only started when there is no
+        work for API requests waiting.
 
-        :returns: GreenThread object.
-        :raises: NoFreeConductorWorker if worker pool is currently full.
+        :returns: a worker_pool.QueuedWork object.
+        :raises: NoFreeConductorWorker if the work cannot be queued.
 
         """
-        if self._worker_pool.free():
-            return self._worker_pool.spawn(func, *args, **kwargs)
-        else:
-            raise exception.NoFreeConductorWorker()
+        return self._spawn_worker_with_priority(worker_pool.PRIORITY_LOW,
+                                                func, *args, **kwargs)
 
     def _conductor_service_record_keepalive(self):
         while not self._keepalive_evt.is_set():
@@ -365,7 +438,9 @@ class ConductorManager(periodic_task.PeriodicTasks):
         validates the parameters with the node's driver, if necessary.
 
         :param context: an admin context
-        :param node_obj: a changed (but not saved) node object.
+        :param node_obj: a changed (but not saved) node object. Since RPC
+                         API version 1.29, it may only have its identity
+                         and changed fields set.
 
         """
         node_id = node_obj.uuid
@@ -384,7 +459,13 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         driver_name = node_obj.driver if 'driver' in delta else None
         with task_manager.acquire(context, node_id, shared=False,
-                                  driver_name=driver_name):
+                                  driver_name=driver_name) as task:
+            if node_obj.obj_is_delta():
+                # NOTE: only the changed fields were sent, apply them to
+                # the node loaded by the task to return the whole node.
+                for field in node_obj.obj_what_changed():
+                    task.node[field] = node_obj[field]
+                node_obj = task.node
             node_obj.save()
 
         return node_obj
@@ -412,7 +493,9 @@ class ConductorManager(periodic_task.PeriodicTasks):
         LOG.debug("RPC change_node_power_state called for node %(node)s. "
                   "The desired new state is %(state)s."
                   % {'node': node_id, 'state': new_state})
+        self._start_power_action(context, node_id, new_state)
 
+    def _start_power_action(self, context, node_id, new_state):
         with task_manager.acquire(context, node_id, shared=False) as task:
             task.driver.power.validate(task)
             # Set the target_power_state and clear any last_error, since we're
@@ -429,6 +512,46 @@ class ConductorManager(periodic_task.PeriodicTasks):
             task.spawn_after(self._spawn_worker, utils.node_power_action,
                              task, new_state)
 
+    def change_nodes_power_state(self, context, node_ids, new_state):
+        """RPC method to change the power state of several nodes.
+
+        Each node is locked and validated, and its power action started in
+        the background, as change_node_power_state() does. At most
+        [conductor]bulk_power_max_workers nodes are handled at once.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :param new_state: the desired power state of the nodes.
+        :returns: a dictionary mapping each node id or uuid to a dictionary
+                  with a 'result' boolean, True if the power action was
+                  started, and a 'reason' for the failure.
+
+        """
+        LOG.debug("RPC change_nodes_power_state called for %(count)d nodes. "
+                  "The desired new state is %(state)s.",
+                  {'count': len(node_ids), 'state': new_state})
+        results = {}
+
+        def _start(node_id):
+            try:
+                self._start_power_action(context, node_id, new_state)
+            except exception.IronicException as e:
+                results[node_id] = {'result': False,
+                                    'reason': six.text_type(e)}
+            except Exception as e:
+                LOG.exception(_LE('Failed to start the power action on '
+                                  'node %s.'), node_id)
+                results[node_id] = {'result': False,
+                                    'reason': six.text_type(e)}
+            else:
+                results[node_id] = {'result': True, 'reason': None}
+
+        pool = greenpool.GreenPool(CONF.conductor.bulk_power_max_workers)
+        for node_id in node_ids:
+            pool.spawn_n(_start, node_id)
+        pool.waitall()
+        return results
+
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
                                    exception.NodeLocked,
                                    exception.InvalidParameterValue,
@@ -465,8 +588,10 @@ class ConductorManager(periodic_task.PeriodicTasks):
         # NOTE(max_lobur): Even though not all vendor_passthru calls may
         # require an exclusive lock, we need to do so to guarantee that the
         # state doesn't unexpectedly change between doing a vendor.validate
-        # and vendor.vendor_passthru.
-        with task_manager.acquire(context, node_id, shared=False) as task:
+        # and vendor.vendor_passthru. Methods declared with
+        # require_exclusive_lock=False are responsible for upgrading the
+        # lock themselves before changing the node.
+        with task_manager.acquire(context, node_id, shared=True) as task:
             if not getattr(task.driver, 'vendor', None):
                 raise exception.UnsupportedDriverExtension(
                     driver=task.node.driver,
@@ -485,6 +610,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
                                 "of vendor_passthru() has been deprecated. "
                                 "Please update the code to use the "
                                 "@passthru decorator."))
+                task.upgrade_lock()
                 vendor_iface.validate(task, method=driver_method,
                                             **info)
                 task.spawn_after(self._spawn_worker,
@@ -506,6 +632,9 @@ class ConductorManager(periodic_task.PeriodicTasks):
                     _('The method %(method)s does not support HTTP %(http)s') %
                     {'method': driver_method, 'http': http_method})
 
+            if vendor_opts.get('require_exclusive_lock', True):
+                task.upgrade_lock()
+
             vendor_iface.validate(task, method=driver_method,
                                   http_method=http_method, **info)
 
@@ -1053,7 +1182,10 @@ class ConductorManager(periodic_task.PeriodicTasks):
         # and first set of checks below.
 
         filters = {'reserved': False, 'maintenance': False}
-        node_iter = self.iter_nodes(fields=['id'], filters=filters)
+        # NOTE: the nodes are reloaded and checked again below, so
+        # reading them from the database replica is fine.
+        node_iter = self.iter_nodes(fields=['id'], filters=filters,
+                                    use_slave=True)
         for (node_uuid, driver, node_id) in node_iter:
             try:
                 # NOTE(deva): we should not acquire a lock on a node in
@@ -1109,13 +1241,98 @@ class ConductorManager(periodic_task.PeriodicTasks):
     def _do_takeover(self, task):
         LOG.debug(('Conductor %(cdr)s taking over node %(node)s'),
                   {'cdr': self.host, 'node': task.node.uuid})
-        task.driver.deploy.prepare(task)
+        # NOTE: many nodes may be taken over at once, write their PXE
+        # configurations together.
+        with pxe_utils.batch_pxe_configs():
+            task.driver.deploy.prepare(task)
         task.driver.deploy.take_over(task)
+        # NOTE: the console gateway of the previous conductor served the
+        # console of the node, serve it from this one instead
+        if task.node.console_enabled and console_gateway.is_enabled():
+            self._restart_console(task)
         # NOTE(lucasagomes): Set the ID of the new conductor managing
         #                    this node
         task.node.conductor_affinity = self.conductor.id
         task.node.save()
 
+    def _restart_console(self, task):
+        """Start again the console of a node which has it enabled."""
+        try:
+            task.driver.console.start_console(task)
+        except Exception as e:
+            LOG.error(_LE('Failed to start the console of node %(node)s: '
+                          '%(err)s'), {'node': task.node.uuid, 'err': e})
+
+    def _start_consoles(self, context):
+        """Start the gateway consoles of the nodes mapped to this conductor.
+
+        The nodes are not modified, so they are only locked shared.
+        """
+        node_iter = self.iter_nodes(filters={'console_enabled': True})
+        for node_uuid, driver in node_iter:
+            try:
+                with task_manager.acquire(context, node_uuid,
+                                          shared=True) as task:
+                    if task.node.console_enabled:
+                        self._restart_console(task)
+            except exception.NodeNotFound:
+                pass
+
+    def _get_takeover_auth_token(self, rejected=None):
+        """Get the admin auth token used to take nodes over.
+
+        A single token is shared by all the takeovers. It is only fetched
+        again when it is about to expire, or when it is the token that
+        was rejected.
+
+        :param rejected: a token rejected by a service, if any.
+        :returns: an admin auth token.
+        """
+        with self._takeover_auth_lock:
+            auth_ref = self._takeover_auth_ref
+            if (auth_ref is None or auth_ref.will_expire_soon() or
+                    auth_ref.auth_token == rejected):
+                auth_ref = keystone.get_admin_auth_ref()
+                self._takeover_auth_ref = auth_ref
+            return auth_ref.auth_token
+
+    def _takeover_node(self, context, node_uuid):
+        """Take a node over if it is still needed.
+
+        :returns: True if the node was taken over, False otherwise.
+        :raises: NodeLocked, NodeNotFound
+        """
+        # NOTE(lucasagomes): The context provided by the periodic task
+        # will make the glance client to fail with an 401 (Unauthorized)
+        # so we have to use the admin_context with an admin auth_token.
+        context = copy.copy(context)
+        context.auth_token = self._get_takeover_auth_token()
+        try:
+            return self._takeover_locked_node(context, node_uuid)
+        except exception.NotAuthorized:
+            # NOTE: the token may have been revoked since it was fetched,
+            # try once more with a new one.
+            context.auth_token = self._get_takeover_auth_token(
+                rejected=context.auth_token)
+            return self._takeover_locked_node(context, node_uuid)
+
+    def _takeover_locked_node(self, context, node_uuid):
+        with task_manager.acquire(context, node_uuid) as task:
+            # NOTE(deva): now that we have the lock, check again to
+            # avoid racing with deletes and other state changes. The
+            # hash ring may also have changed since the takeover of the
+            # node was planned.
+            node = task.node
+            if (node.maintenance or
+                    node.conductor_affinity == self.conductor.id or
+                    node.provision_state != states.ACTIVE or
+                    not self._mapped_to_this_conductor(node.uuid,
+                                                       node.driver)):
+                return False
+
+            self._do_takeover(task)
+        return True
+
     @periodic_task.periodic_task(
             spacing=CONF.conductor.sync_local_state_interval)
     def _sync_local_state(self, context):
@@ -1126,6 +1343,9 @@ class ConductorManager(periodic_task.PeriodicTasks):
         determines which, if any, nodes need to be "taken over".
         The ensuing actions could include preparing a PXE environment,
         updating the DHCP server, and so on.
+
+        All the nodes found are handed to the takeover engine, which takes
+        them over in the background until none is left.
         """
         self.ring_manager.reset()
         filters = {'reserved': False,
@@ -1134,40 +1354,15 @@ class ConductorManager(periodic_task.PeriodicTasks):
         node_iter = self.iter_nodes(fields=['id', 'conductor_affinity'],
                                     filters=filters)
 
-        admin_context = None
-        workers_count = 0
-        for node_uuid, driver, node_id, conductor_affinity in node_iter:
-            if conductor_affinity == self.conductor.id:
-                continue
-
-            # NOTE(lucasagomes): The context provided by the periodic task
-            # will make the glance client to fail with an 401 (Unauthorized)
-            # so we have to use the admin_context with an admin auth_token
-            if not admin_context:
-                admin_context = ironic_context.get_admin_context()
-                admin_context.auth_token = keystone.get_admin_auth_token()
-
-            # Node is mapped here, but not updated by this conductor last
-            try:
-                with task_manager.acquire(admin_context, node_uuid) as task:
-                    # NOTE(deva): now that we have the lock, check again to
-                    # avoid racing with deletes and other state changes
-                    node = task.node
-                    if (node.maintenance or
-                            node.conductor_affinity == self.conductor.id or
-                            node.provision_state != states.ACTIVE):
-                        continue
-
-                    task.spawn_after(self._spawn_worker,
-                                     self._do_takeover, task)
+        node_uuids = [node_uuid for node_uuid, driver, node_id,
+                      conductor_affinity in node_iter
+                      if conductor_affinity != self.conductor.id]
+        if not node_uuids:
+            return
 
-            except exception.NoFreeConductorWorker:
-                break
-            except (exception.NodeLocked, exception.NodeNotFound):
-                continue
-            workers_count += 1
-            if workers_count == CONF.conductor.periodic_max_workers:
-                break
+        # NOTE: the admin auth_token is fetched by _takeover_node
+        admin_context = ironic_context.get_admin_context()
+        self._takeover_engine.add(admin_context, node_uuids)
 
     def _mapped_to_this_conductor(self, node_uuid, driver):
         """Check that node is mapped to this conductor.
@@ -1467,7 +1662,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         filters = {'associated': True}
         node_iter = self.iter_nodes(fields=['instance_uuid'],
-                                    filters=filters)
+                                    filters=filters, use_slave=True)
 
         for (node_uuid, driver, instance_uuid) in node_iter:
             # populate the message which will be sent to ceilometer
@@ -1732,10 +1927,11 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
                     # timeout has been reached - process the event 'fail'
                     if callback_method:
-                        task.process_event('fail',
-                                           callback=self._spawn_worker,
-                                           call_args=(callback_method, task),
-                                           err_handler=err_handler)
+                        task.process_event(
+                            'fail',
+                            callback=self._spawn_periodic_worker,
+                            call_args=(callback_method, task),
+                            err_handler=err_handler)
                     else:
                         task.node.last_error = last_error
                         task.process_event('fail')
@@ -70,13 +70,23 @@ class ConductorAPI(object):
     |    1.25 - Added destroy_port
     |    1.26 - Added continue_node_clean
     |    1.27 - Convert continue_node_clean to cast
+    |    1.28 - Added change_nodes_power_state
+    |    1.29 - update_node accepts a node with only its identity and
+    |           changed fields
 
     """
 
     # NOTE(rloo): This must be in sync with manager.ConductorManager's.
-    RPC_API_VERSION = '1.27'
+    RPC_API_VERSION = '1.29'
 
-    def __init__(self, topic=None):
+    def __init__(self, topic=None, use_slave=False):
+        """Create a client of the conductor RPC API.
+
+        :param topic: the RPC topic of the conductors, defaults to the
+                      topic of the conductor manager.
+        :param use_slave: whether to read the conductors the nodes are
+                          mapped to from the read-only database replica.
+        """
         super(ConductorAPI, self).__init__()
         self.topic = topic
         if self.topic is None:
@@ -89,7 +99,7 @@ class ConductorAPI(object):
                                      version_cap=self.RPC_API_VERSION,
                                      serializer=serializer)
         # NOTE(deva): this is going to be buggy
-        self.ring_manager = hash_ring.HashRingManager()
+        self.ring_manager = hash_ring.HashRingManager(use_slave=use_slave)
 
     def get_topic_for(self, node):
         """Get the RPC topic for the conductor service the node is mapped to.
@@ -99,8 +109,6 @@ class ConductorAPI(object):
         :raises: NoValidHost
 
         """
-        self.ring_manager.reset()
-
         try:
             ring = self.ring_manager[node.driver]
             dest = ring.get_hosts(node.uuid)
@@ -110,6 +118,27 @@ class ConductorAPI(object):
                         'driver %s.') % node.driver)
             raise exception.NoValidHost(reason=reason)
 
+    def group_by_topic(self, nodes):
+        """Group nodes by the RPC topic of the conductor they are mapped to.
+
+        :param nodes: a list of node objects.
+        :returns: a tuple with a dictionary mapping RPC topic strings to
+                  lists of nodes, and a list of the nodes which no conductor
+                  service supports.
+
+        """
+        topics = {}
+        unsupported = []
+        for node in nodes:
+            try:
+                ring = self.ring_manager[node.driver]
+            except exception.DriverNotFound:
+                unsupported.append(node)
+                continue
+            topic = self.topic + "." + ring.get_hosts(node.uuid)[0]
+            topics.setdefault(topic, []).append(node)
+        return topics, unsupported
+
     def get_topic_for_driver(self, driver_name):
         """Get RPC topic name for a conductor supporting the given driver.
 
@@ -122,8 +151,6 @@ class ConductorAPI(object):
         :raises: DriverNotFound
 
         """
-        self.ring_manager.reset()
-
         hash_ring = self.ring_manager[driver_name]
         host = random.choice(list(hash_ring.hosts))
         return self.topic + "." + host
@@ -146,8 +173,12 @@ class ConductorAPI(object):
         :returns: updated node object, including all fields.
 
         """
-        cctxt = self.client.prepare(topic=topic or self.topic, version='1.1')
-        return cctxt.call(context, 'update_node', node_obj=node_obj)
+        # NOTE: the conductor loads the node anyway, so only send the changed
+        # fields instead of e.g. all of driver_info, instance_info and
+        # properties.
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.29')
+        return cctxt.call(context, 'update_node',
+                          node_obj=node_obj.obj_to_primitive(delta=True))
 
     def change_node_power_state(self, context, node_id, new_state, topic=None):
         """Change a node's power state.
@@ -167,6 +198,27 @@ class ConductorAPI(object):
         return cctxt.call(context, 'change_node_power_state', node_id=node_id,
                           new_state=new_state)
 
+    def change_nodes_power_state(self, context, node_ids, new_state,
+                                 topic=None):
+        """Change the power state of several nodes.
+
+        Synchronously, acquire the lock of each node and start the conductor
+        background tasks to change their power state. All the nodes must
+        be mapped to the conductor service of the topic.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids.
+        :param new_state: one of ironic.common.states power state values
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dictionary mapping each node id or uuid to a dictionary
+                  with a 'result' boolean, True if the power action was
+                  started, and a 'reason' for the failure.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.28')
+        return cctxt.call(context, 'change_nodes_power_state',
+                          node_ids=node_ids, new_state=new_state)
+
     def vendor_passthru(self, context, node_id, driver_method, http_method,
                         info, topic=None):
         """Receive requests for vendor-specific actions.
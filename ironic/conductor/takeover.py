@@ -0,0 +1,211 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Takeover of the nodes of failed or rebalanced conductors.
+
+When the hash ring changes, a conductor may become responsible for many
+ACTIVE nodes at once, e.g. thousands of nodes after another conductor
+died. The :class:`TakeoverEngine` takes all of them over in the
+background, a bounded number at a time and optionally rate limited,
+until none is left, instead of a fixed number per periodic task run.
+"""
+
+import collections
+import time
+
+import eventlet
+from eventlet import greenpool
+
+from ironic.common import exception
+from ironic.common.i18n import _LE
+from ironic.common.i18n import _LI
+from ironic.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+# Number of times a node is tried again when it is locked.
+_MAX_ATTEMPTS = 3
+# Time (in seconds) to wait before trying a locked node again.
+_RETRY_DELAY = 10
+
+# Outcomes of takeover attempts.
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class TakeoverEngine(object):
+    """Takes nodes over in the background.
+
+    :param takeover_func: a callable taking a context and a node UUID. It
+        takes the node over and returns True, or returns False if the
+        node does not need to be taken over anymore. It raises NodeLocked
+        if the node is locked, in which case it is tried again later.
+    :param max_workers: the maximum number of nodes taken over at once.
+    :param max_rate: the maximum number of takeovers started per second.
+        0 means no limit.
+    """
+
+    def __init__(self, takeover_func, max_workers, max_rate=0):
+        self.takeover_func = takeover_func
+        self.max_workers = max(1, max_workers)
+        self.max_rate = max_rate
+        # NOTE: nodes tried again after being locked go to the retry
+        # queue, which is only used once the main queue is empty.
+        self._queue = collections.deque()
+        self._retry_queue = collections.deque()
+        self._queued = set()
+        self._running = set()
+        self._thread = None
+        self._pool = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {DONE: 0, SKIPPED: 0, FAILED: 0, 'total': 0,
+                       'started_at': None, 'finished_at': None}
+
+    def add(self, context, node_uuids):
+        """Plan the takeover of nodes and start it if needed.
+
+        Nodes already planned or being taken over are ignored.
+
+        :param context: the context to take the nodes over with.
+        :param node_uuids: an iterable of node UUIDs.
+        :returns: the number of nodes added.
+        """
+        added = 0
+        for node_uuid in node_uuids:
+            if node_uuid in self._queued or node_uuid in self._running:
+                continue
+            self._queue.append((context, node_uuid, 1, 0))
+            self._queued.add(node_uuid)
+            added += 1
+
+        if added:
+            if not self.is_running():
+                self._reset_stats()
+            self._stats['total'] += added
+            LOG.info(_LI('Planned the takeover of %(count)d nodes, '
+                         '%(pending)d nodes pending in total.'),
+                     {'count': added, 'pending': len(self._queued)})
+            self._start()
+        return added
+
+    def is_running(self):
+        return self._thread is not None
+
+    def _start(self):
+        if self._thread is None:
+            self._stats['started_at'] = time.time()
+            self._stats['finished_at'] = None
+            self._thread = eventlet.spawn(self._run)
+
+    def stop(self):
+        """Stop the takeover, forgetting about the nodes not started yet.
+
+        The takeovers already started are waited for, so that they release
+        the locks they hold on their nodes.
+        """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.kill()
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.waitall()
+        self._queue.clear()
+        self._retry_queue.clear()
+        self._queued.clear()
+
+    def _next(self):
+        if self._queue:
+            return self._queue.popleft()
+        if self._retry_queue and self._retry_queue[0][3] <= time.time():
+            return self._retry_queue.popleft()
+
+    def _run(self):
+        pool = self._pool = greenpool.GreenPool(self.max_workers)
+        interval = 1.0 / self.max_rate if self.max_rate > 0 else 0
+        try:
+            while self._queue or self._retry_queue or pool.running():
+                item = self._next()
+                if item is None:
+                    # NOTE: only nodes being taken over or locked nodes
+                    # waiting to be tried again are left.
+                    if self._retry_queue:
+                        eventlet.sleep(1)
+                    else:
+                        pool.waitall()
+                    continue
+
+                pool.spawn_n(self._takeover, *item)
+                if interval:
+                    eventlet.sleep(interval)
+        finally:
+            self._stats['finished_at'] = time.time()
+            if self._thread is eventlet.getcurrent():
+                self._thread = None
+        progress = self.get_progress()
+        LOG.info(_LI('Takeover of %(total)d nodes finished in %(elapsed).1f '
+                     'seconds: %(done)d taken over, %(skipped)d skipped, '
+                     '%(failed)d failed.'), progress)
+
+    def _takeover(self, context, node_uuid, attempt, _not_before):
+        self._queued.discard(node_uuid)
+        self._running.add(node_uuid)
+        try:
+            result = self.takeover_func(context, node_uuid)
+        except exception.NodeLocked:
+            if attempt < _MAX_ATTEMPTS:
+                self._retry_queue.append((context, node_uuid, attempt + 1,
+                                          time.time() + _RETRY_DELAY))
+                self._queued.add(node_uuid)
+                return
+            LOG.info(_LI('Node %s is still locked, it will be taken over '
+                         'later.'), node_uuid)
+            outcome = SKIPPED
+        except exception.NodeNotFound:
+            outcome = SKIPPED
+        except Exception:
+            LOG.exception(_LE('Failed to take over node %s.'), node_uuid)
+            outcome = FAILED
+        else:
+            outcome = DONE if result else SKIPPED
+        finally:
+            self._running.discard(node_uuid)
+
+        self._stats[outcome] += 1
+        finished = (self._stats[DONE] + self._stats[SKIPPED] +
+                    self._stats[FAILED])
+        if finished % 100 == 0:
+            LOG.info(_LI('Takeover progress: %(finished)d of %(total)d '
+                         'nodes.'),
+                     {'finished': finished, 'total': self._stats['total']})
+
+    def get_progress(self):
+        """Return the progress of the current or last takeover.
+
+        :returns: a dictionary with the total number of nodes planned, the
+                  number of nodes taken over, skipped and failed, the
+                  number of nodes pending and being taken over, the time
+                  elapsed and the takeover rate (in nodes per second).
+        """
+        progress = dict(self._stats)
+        progress['pending'] = len(self._queued)
+        progress['running'] = len(self._running)
+        started_at = progress.pop('started_at')
+        finished_at = progress.pop('finished_at') or time.time()
+        progress['elapsed'] = (finished_at - started_at
+                               if started_at else 0.0)
+        progress['rate'] = (progress[DONE] / progress['elapsed']
+                            if progress['elapsed'] else 0.0)
+        return progress
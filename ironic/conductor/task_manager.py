@@ -181,21 +181,9 @@ class TaskManager(object):
 
         self.fsm = states.machine.copy()
 
-        # NodeLocked exceptions can be annoying. Let's try to alleviate
-        # some of that pain by retrying our lock attempts. The retrying
-        # module expects a wait_fixed value in milliseconds.
-        @retrying.retry(
-            retry_on_exception=lambda e: isinstance(e, exception.NodeLocked),
-            stop_max_attempt_number=CONF.conductor.node_locked_retry_attempts,
-            wait_fixed=CONF.conductor.node_locked_retry_interval * 1000)
-        def reserve_node():
-            LOG.debug("Attempting to reserve node %(node)s",
-                      {'node': node_id})
-            self.node = objects.Node.reserve(context, CONF.host, node_id)
-
         try:
             if not self.shared:
-                reserve_node()
+                self._lock(node_id)
             else:
                 self.node = objects.Node.get(context, node_id)
             self.ports = objects.Port.list_by_node_id(context, self.node.id)
@@ -214,6 +202,37 @@ class TaskManager(object):
             with excutils.save_and_reraise_exception():
                 self.release_resources()
 
+    def _lock(self, node_id):
+        # NodeLocked exceptions can be annoying. Let's try to alleviate
+        # some of that pain by retrying our lock attempts. The retrying
+        # module expects a wait_fixed value in milliseconds.
+        @retrying.retry(
+            retry_on_exception=lambda e: isinstance(e, exception.NodeLocked),
+            stop_max_attempt_number=CONF.conductor.node_locked_retry_attempts,
+            wait_fixed=CONF.conductor.node_locked_retry_interval * 1000)
+        def reserve_node():
+            LOG.debug("Attempting to reserve node %(node)s",
+                      {'node': node_id})
+            self.node = objects.Node.reserve(self.context, CONF.host,
+                                             node_id)
+
+        reserve_node()
+
+    def upgrade_lock(self):
+        """Upgrade a shared lock to an exclusive lock.
+
+        The node is reloaded from the database when the lock is taken.
+        Does nothing if the lock is already exclusive.
+
+        :raises: NodeLocked if an exclusive lock cannot be obtained.
+        """
+        if not self.shared:
+            return
+        LOG.debug('Upgrading shared lock on node %s to an exclusive one.',
+                  self.node.uuid)
+        self._lock(self.node.id)
+        self.shared = False
+
     def spawn_after(self, _spawn_method, *args, **kwargs):
         """Call this to spawn a thread to complete the task.
 
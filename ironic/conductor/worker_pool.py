@@ -0,0 +1,217 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Pool of conductor worker threads with a bounded priority queue.
+
+When all the workers are busy, new work waits in a queue instead of being
+rejected right away, so that bursts of requests (e.g. many deploys
+started by Nova at once) are smoothed out. Work is started by priority
+and then in submission order. It is still rejected, with
+NoFreeConductorWorker, when the queue is full or when the queue does not
+drain quickly enough. Both limits only take into account the work that
+would be started before the new one, so that a backlog of low priority
+work does not cause high priority work to be rejected.
+"""
+
+import collections
+import time
+
+from eventlet import event
+from eventlet import greenpool
+
+from ironic.common import exception
+from ironic.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+# Priority classes, lower values are started first.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class QueuedWork(object):
+    """Handle on work submitted to a :class:`WorkerPool`.
+
+    It supports the parts of the GreenThread interface used by the
+    conductor (link, cancel, kill and wait), whether the work is still
+    queued or already running.
+    """
+
+    def __init__(self, priority, func, args, kwargs):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted_at = time.time()
+        self.thread = None
+        self.cancelled = False
+        self._links = []
+        self._started = event.Event()
+
+    def _start(self, thread):
+        self.thread = thread
+        for func, args, kwargs in self._links:
+            thread.link(func, *args, **kwargs)
+        self._links = []
+        self._started.send(thread)
+
+    def link(self, func, *args, **kwargs):
+        """Call func(thread, *args, **kwargs) when the work finishes."""
+        if self.thread is not None:
+            self.thread.link(func, *args, **kwargs)
+        else:
+            self._links.append((func, args, kwargs))
+
+    def cancel(self, *throw_args):
+        """Cancel the work if it has not started yet."""
+        if self.thread is not None:
+            self.thread.cancel(*throw_args)
+        else:
+            self.cancelled = True
+
+    def kill(self, *throw_args):
+        """Cancel the work, killing it if it is already running."""
+        if self.thread is not None:
+            self.thread.kill(*throw_args)
+        else:
+            self.cancelled = True
+
+    def wait(self):
+        """Wait for the work to finish and return its result."""
+        return self._started.wait().wait()
+
+
+class WorkerPool(object):
+    """A green thread pool with a bounded priority queue in front of it.
+
+    :param size: the maximum number of work items running at once.
+    :param max_queue_size: the maximum number of work items of the same
+                           or a higher priority waiting for a free worker.
+                           0 disables queueing.
+    :param max_queue_wait: new work is rejected when the oldest queued work
+                           of the same or a higher priority has been
+                           waiting for longer than this (in seconds). 0
+                           disables this check.
+    """
+
+    def __init__(self, size, max_queue_size=0, max_queue_wait=0):
+        self.max_queue_size = max_queue_size
+        self.max_queue_wait = max_queue_wait
+        self._pool = greenpool.GreenPool(size=size)
+        # One FIFO queue per priority, so the oldest work of a priority is
+        # always the first one of its queue.
+        self._queues = collections.defaultdict(collections.deque)
+        self._waiting = 0
+        self._stats = {'started': 0, 'queued': 0, 'rejected': 0,
+                       'total_wait_time': 0.0, 'max_wait_time': 0.0}
+
+    def free(self):
+        """Return the number of free workers."""
+        return self._pool.free()
+
+    def running(self):
+        """Return the number of running work items."""
+        return self._pool.running()
+
+    def waiting(self):
+        """Return the number of queued work items."""
+        return self._waiting
+
+    def _ahead_of(self, priority):
+        """Return the queues started before work of the given priority."""
+        return [queue for prio, queue in self._queues.items()
+                if prio <= priority and queue]
+
+    def _next_queue(self):
+        queues = [(prio, queue) for prio, queue in self._queues.items()
+                  if queue]
+        return min(queues)[1] if queues else None
+
+    def spawn(self, priority, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a worker, queueing it if needed.
+
+        :param priority: one of the PRIORITY_* constants.
+        :returns: a :class:`QueuedWork` object.
+        :raises: NoFreeConductorWorker if the work cannot be queued.
+        """
+        work = QueuedWork(priority, func, args, kwargs)
+        if self._pool.free() and not self._waiting:
+            self._start(work)
+            return work
+
+        ahead = self._ahead_of(priority)
+        oldest = min([queue[0].submitted_at for queue in ahead] or
+                     [work.submitted_at])
+        if (sum(len(queue) for queue in ahead) >= self.max_queue_size or
+                (self.max_queue_wait and
+                 work.submitted_at - oldest > self.max_queue_wait)):
+            self._stats['rejected'] += 1
+            raise exception.NoFreeConductorWorker()
+
+        self._queues[priority].append(work)
+        self._waiting += 1
+        self._stats['queued'] += 1
+        LOG.debug('All conductor workers are busy, queued %(func)s with '
+                  'priority %(prio)s (%(count)d work items waiting).',
+                  {'func': getattr(func, '__name__', func), 'prio': priority,
+                   'count': self._waiting})
+        self._dispatch()
+        return work
+
+    def _start(self, work):
+        wait_time = time.time() - work.submitted_at
+        self._stats['started'] += 1
+        self._stats['total_wait_time'] += wait_time
+        self._stats['max_wait_time'] = max(self._stats['max_wait_time'],
+                                           wait_time)
+        thread = self._pool.spawn(work.func, *work.args, **work.kwargs)
+        thread.link(self._dispatch)
+        work._start(thread)
+
+    def _dispatch(self, *args):
+        while self._waiting and self._pool.free():
+            work = self._next_queue().popleft()
+            self._waiting -= 1
+            if not work.cancelled:
+                self._start(work)
+                LOG.debug('Started queued %(func)s after waiting for '
+                          '%(wait).2f seconds.',
+                          {'func': getattr(work.func, '__name__', work.func),
+                           'wait': time.time() - work.submitted_at})
+
+    def waitall(self):
+        """Wait for all queued and running work to finish."""
+        # NOTE: queued work is started from the link callbacks of the
+        # finishing threads, possibly after the pool reported that nothing
+        # is running anymore, so check again.
+        self._pool.waitall()
+        while self._waiting or self._pool.running():
+            self._dispatch()
+            self._pool.waitall()
+
+    def get_stats(self):
+        """Return statistics about the pool.
+
+        :returns: a dictionary with the number of running and waiting work
+                  items, the number of work items started, queued and
+                  rejected so far, and the average and maximum time spent
+                  waiting in the queue.
+        """
+        stats = dict(self._stats)
+        stats['running'] = self.running()
+        stats['waiting'] = self.waiting()
+        stats['average_wait_time'] = (
+            stats['total_wait_time'] / stats['started']
+            if stats['started'] else 0.0)
+        return stats
@@ -44,7 +44,8 @@ class Connection(object):
 
     @abc.abstractmethod
     def get_nodeinfo_list(self, columns=None, filters=None, limit=None,
-                          marker=None, sort_key=None, sort_dir=None):
+                          marker=None, sort_key=None, sort_dir=None,
+                          use_slave=False):
         """Get specific columns for matching nodes.
 
         Return a list of the specified columns for all nodes that match the
@@ -57,24 +58,33 @@ class Connection(object):
                         :associated: True | False
                         :reserved: True | False
                         :maintenance: True | False
+                        :console_enabled: True | False
                         :chassis_uuid: uuid of chassis
                         :driver: driver's name
                         :provision_state: provision state of node
+                        :power_state: power state of node
+                        :conductor: hostname of the conductor the node
+                                    has affinity with
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
+                        :uuids_or_names: list of node uuids or names
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param use_slave: Whether to read from the read-only database
+                          connection, when one is configured. Only for
+                          scans which do not rely on seeing previous
+                          writes, e.g. before locking the nodes.
         :returns: A list of tuples of the specified columns.
         """
 
     @abc.abstractmethod
     def get_node_list(self, filters=None, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, use_slave=True):
         """Return a list of nodes.
 
         :param filters: Filters to apply. Defaults to None.
@@ -82,18 +92,62 @@ class Connection(object):
                         :associated: True | False
                         :reserved: True | False
                         :maintenance: True | False
+                        :console_enabled: True | False
                         :chassis_uuid: uuid of chassis
                         :driver: driver's name
                         :provision_state: provision state of node
+                        :power_state: power state of node
+                        :conductor: hostname of the conductor the node
+                                    has affinity with
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
+                        :uuids_or_names: list of node uuids or names
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param use_slave: Whether to read from the read-only database
+                          connection, when one is configured. Pass False
+                          when the result must reflect previous writes.
+        """
+
+    @abc.abstractmethod
+    def get_node_list_version(self, filters=None, use_slave=True):
+        """Return a value that changes whenever the matching nodes change.
+
+        :param filters: Filters to apply, as in get_node_list().
+        :param use_slave: As in get_node_list().
+        :returns: A tuple with the number of matching nodes, the number
+                  of them which are reserved, and their maximum change_seq
+                  and updated_at.
+        """
+
+    @abc.abstractmethod
+    def get_node_changes(self, since, until=None, limit=None):
+        """Return the nodes changed or deleted after a change sequence.
+
+        Each node creation or update sets the change_seq of the node to
+        the current time in microseconds since the epoch, except for the
+        updates only changing the reservation or conductor_affinity of the
+        node. Deleting a node records its uuid with such a change_seq, to
+        be reported with the other changes. Changes may commit out of
+        order and the clocks of the hosts differ, so callers should only
+        look at the changes older than the longest node update plus the
+        clock offset between the hosts.
+
+        :param since: a change sequence value; only the nodes changed after
+                      it are returned.
+        :param until: a change sequence value; only the nodes changed up to
+                      it are returned. Default: no upper bound.
+        :param limit: Maximum number of changes to return. As change
+                      sequences are not unique, more changes are returned
+                      when several ones share the change_seq of the last.
+        :returns: A tuple with the list of the changed nodes and the list
+                  of the node deletions, which have a uuid and a
+                  change_seq, both ordered by change sequence.
         """
 
     @abc.abstractmethod
@@ -145,6 +199,19 @@ class Connection(object):
         :returns: A node.
         """
 
+    @abc.abstractmethod
+    def create_nodes(self, values_list):
+        """Create several new nodes, in batched transactions.
+
+        A failure to create one node does not prevent the creation of the
+        other nodes.
+
+        :param values_list: A list of dicts, as passed to create_node().
+        :returns: A list with, for each dict, the node created or the
+                  exception raised when creating it, as create_node()
+                  would.
+        """
+
     @abc.abstractmethod
     def get_node_by_id(self, node_id):
         """Return a node.
@@ -177,6 +244,15 @@ class Connection(object):
         :returns: A node.
         """
 
+    @abc.abstractmethod
+    def get_node_by_port_addresses(self, addresses):
+        """Find a node by any matching port address.
+
+        :param addresses: list of port addresses (e.g. MACs).
+        :returns: Node object.
+        :raises: NodeNotFound if none or several nodes are found.
+        """
+
     @abc.abstractmethod
     def destroy_node(self, node_id):
         """Destroy a node and all associated interfaces.
@@ -207,6 +283,23 @@ class Connection(object):
         :raises: NodeNotFound
         """
 
+    @abc.abstractmethod
+    def update_node_values(self, node_id, values):
+        """Update columns of a node without reading it back.
+
+        Unlike :meth:`update_node`, this issues a single conditional UPDATE
+        statement in most cases, and only locks and reads the node when the
+        values to set depend on its current state.
+
+        :param node_id: The id or uuid of a node.
+        :param values: Dict of values to update.
+        :returns: A dict of the columns that were set, including the ones
+                  computed from the values (e.g. provision_updated_at and
+                  change_seq).
+        :raises: NodeAssociated
+        :raises: NodeNotFound
+        """
+
     @abc.abstractmethod
     def get_port_by_id(self, port_id):
         """Return a network port representation.
@@ -231,9 +324,17 @@ class Connection(object):
         :returns: A port.
         """
 
+    @abc.abstractmethod
+    def get_ports_by_addresses(self, addresses):
+        """Return the network ports matching any of the given addresses.
+
+        :param addresses: A list of MAC addresses.
+        :returns: A list of ports, possibly empty.
+        """
+
     @abc.abstractmethod
     def get_port_list(self, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, use_slave=True):
         """Return a list of ports.
 
         :param limit: Maximum number of ports to return.
@@ -242,6 +343,19 @@ class Connection(object):
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param use_slave: Whether to read from the read-only database
+                          connection, when one is configured. Pass False
+                          when the result must reflect previous writes.
+        """
+
+    @abc.abstractmethod
+    def get_port_list_version(self, node_id=None, use_slave=True):
+        """Return a value that changes whenever the matching ports change.
+
+        :param node_id: The id of a node, to only consider its ports.
+        :param use_slave: As in get_port_list().
+        :returns: A tuple with the number of matching ports and their
+                  maximum created_at and updated_at.
         """
 
     @abc.abstractmethod
@@ -266,6 +380,19 @@ class Connection(object):
         :param values: Dict of values.
         """
 
+    @abc.abstractmethod
+    def create_ports(self, values_list):
+        """Create several new ports, in batched transactions.
+
+        A failure to create one port does not prevent the creation of the
+        other ports.
+
+        :param values_list: A list of dicts of values.
+        :returns: A list with, for each dict, the port created or the
+                  exception raised when creating it, as create_port()
+                  would.
+        """
+
     @abc.abstractmethod
     def update_port(self, port_id, values):
         """Update properties of an port.
@@ -307,7 +434,7 @@ class Connection(object):
 
     @abc.abstractmethod
     def get_chassis_list(self, limit=None, marker=None,
-                         sort_key=None, sort_dir=None):
+                         sort_key=None, sort_dir=None, use_slave=True):
         """Return a list of chassis.
 
         :param limit: Maximum number of chassis to return.
@@ -316,6 +443,18 @@ class Connection(object):
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param use_slave: Whether to read from the read-only database
+                          connection, when one is configured. Pass False
+                          when the result must reflect previous writes.
+        """
+
+    @abc.abstractmethod
+    def get_chassis_list_version(self, use_slave=True):
+        """Return a value that changes whenever a chassis changes.
+
+        :param use_slave: As in get_chassis_list().
+        :returns: A tuple with the number of chassis and their maximum
+                  created_at and updated_at.
         """
 
     @abc.abstractmethod
@@ -381,10 +520,13 @@ class Connection(object):
         """
 
     @abc.abstractmethod
-    def get_active_driver_dict(self, interval):
+    def get_active_driver_dict(self, interval, use_slave=False):
         """Retrieve drivers for the registered and active conductors.
 
         :param interval: Seconds since last check-in of a conductor.
+        :param use_slave: Whether to read from the read-only database
+                          connection, when one is configured. Pass False
+                          when the result must reflect previous writes.
         :returns: A dict which maps driver names to the set of hosts
                   which support them. For example:
 
@@ -0,0 +1,57 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add sequences table and node.change_seq
+
+Revision ID: 1c2f3e5a8d4b
+Revises: 3a1f6fc8a2e5
+Create Date: 2015-03-30 14:05:37.520419
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1c2f3e5a8d4b'
+down_revision = '3a1f6fc8a2e5'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import sql
+
+
+def upgrade():
+    sequences = op.create_table(
+        'sequences',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        mysql_ENGINE='InnoDB',
+        mysql_DEFAULT_CHARSET='UTF8'
+    )
+    op.add_column('nodes', sa.Column('change_seq', sa.BigInteger(),
+                                     nullable=True))
+    op.create_index('nodes_change_seq_idx', 'nodes', ['change_seq'])
+
+    # Existing nodes are considered changed in the order they were created
+    nodes = sql.table('nodes', sql.column('id', sa.Integer),
+                      sql.column('change_seq', sa.BigInteger))
+    op.execute(nodes.update().values(change_seq=nodes.c.id))
+    max_id = op.get_bind().execute(
+        sql.select([sa.func.max(nodes.c.id)])).scalar()
+    op.bulk_insert(sequences, [{'name': 'nodes', 'value': max_id or 0}])
+
+
+def downgrade():
+    op.drop_index('nodes_change_seq_idx', 'nodes')
+    op.drop_column('nodes', 'change_seq')
+    op.drop_table('sequences')
@@ -0,0 +1,50 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add indexes for the node and port queries of the conductor
+
+Revision ID: 3a1f6fc8a2e5
+Revises: 2fb93ffd2af1
+Create Date: 2015-03-27 10:42:18.316942
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a1f6fc8a2e5'
+down_revision = '2fb93ffd2af1'
+
+from alembic import op
+
+
+NODE_INDEXES = (
+    ('nodes_reservation_maintenance_idx', ['reservation', 'maintenance']),
+    ('nodes_provision_state_updated_at_idx',
+     ['provision_state', 'provision_updated_at']),
+    ('nodes_provision_state_inspection_started_at_idx',
+     ['provision_state', 'inspection_started_at']),
+    ('nodes_driver_idx', ['driver']),
+)
+
+
+def upgrade():
+    for name, columns in NODE_INDEXES:
+        op.create_index(name, 'nodes', columns)
+    # NOTE: MySQL already indexes ports.node_id for its foreign key.
+    if op.get_bind().dialect.name != 'mysql':
+        op.create_index('ports_node_id_idx', 'ports', ['node_id'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        op.drop_index('ports_node_id_idx', 'ports')
+    for name, _columns in NODE_INDEXES:
+        op.drop_index(name, 'nodes')
@@ -0,0 +1,50 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Drop the sequences table
+
+Revision ID: 5e8a0c1f4d27
+Revises: 1c2f3e5a8d4b
+Create Date: 2015-04-14 09:12:45.208113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5e8a0c1f4d27'
+down_revision = '1c2f3e5a8d4b'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import sql
+
+
+def upgrade():
+    # node.change_seq is now the time of the change in microseconds,
+    # which is way beyond the values of the sequence.
+    op.drop_table('sequences')
+
+
+def downgrade():
+    sequences = op.create_table(
+        'sequences',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        mysql_ENGINE='InnoDB',
+        mysql_DEFAULT_CHARSET='UTF8'
+    )
+    nodes = sql.table('nodes', sql.column('change_seq', sa.BigInteger))
+    max_seq = op.get_bind().execute(
+        sql.select([sa.func.max(nodes.c.change_seq)])).scalar()
+    op.bulk_insert(sequences, [{'name': 'nodes', 'value': max_seq or 0}])
@@ -18,6 +18,8 @@
 
 import collections
 import datetime
+import itertools
+import time
 
 from oslo_config import cfg
 from oslo_db import exception as db_exc
@@ -26,6 +28,8 @@ from oslo_db.sqlalchemy import utils as db_utils
 from oslo_utils import strutils
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
+from sqlalchemy import func
+from sqlalchemy import or_
 from sqlalchemy.orm.exc import NoResultFound
 
 from ironic.common import exception
@@ -47,6 +51,18 @@ LOG = log.getLogger(__name__)
 
 _FACADE = None
 
+# Maximum number of rows inserted in one transaction by bulk creations.
+BULK_CREATE_BATCH_SIZE = 100
+
+# Target provision states for which the inspection timestamps to set
+# depend on the current provision state of the node.
+_PROVISION_STATES_NEED_OLD = (states.MANAGEABLE, states.INSPECTFAIL)
+
+# Node fields whose changes do not bump the nodes change sequence. They
+# are updated by the conductors far more often than anything else, and
+# clients watching the nodes for changes do not need them.
+_NODE_UNTRACKED_FIELDS = frozenset(['reservation', 'conductor_affinity'])
+
 
 def _create_facade_lazily():
     global _FACADE
@@ -55,9 +71,9 @@ def _create_facade_lazily():
     return _FACADE
 
 
-def get_engine():
+def get_engine(use_slave=False):
     facade = _create_facade_lazily()
-    return facade.get_engine()
+    return facade.get_engine(use_slave=use_slave)
 
 
 def get_session(**kwargs):
@@ -74,9 +90,13 @@ def model_query(model, *args, **kwargs):
     """Query helper for simpler session usage.
 
     :param session: if present, the session to use
+    :param use_slave: if True, and if no session is given, use a session
+                      of the read-only database connection
+                      ([database]slave_connection) when one is configured
     """
 
-    session = kwargs.get('session') or get_session()
+    session = (kwargs.get('session') or
+               get_session(use_slave=kwargs.get('use_slave', False)))
     query = session.query(model, *args)
     return query
 
@@ -133,10 +153,94 @@ def add_node_filter_by_chassis(query, value):
         return query.filter(models.Chassis.uuid == value)
 
 
+def _node_change_seq():
+    """Return the change_seq of a node changed now.
+
+    Change sequences are the time of the change in microseconds since the
+    epoch, so that a node change is a single statement on the node row,
+    without any counter shared by all the changes. Concurrent changes may
+    commit out of order and the clocks of the hosts differ slightly, see
+    get_node_changes().
+    """
+    return int(time.time() * 1000000)
+
+
+def iter_batches(items, batch_size=None):
+    """Split a list into lists of at most batch_size items.
+
+    :param batch_size: defaults to BULK_CREATE_BATCH_SIZE.
+    """
+    batch_size = batch_size or BULK_CREATE_BATCH_SIZE
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def add_batch(session, objs):
+    """Insert model objects in a single transaction.
+
+    Nodes get consecutive change sequences, in the order of objs.
+
+    :param session: a session in autocommit mode.
+    :param objs: a list of new model objects.
+    :returns: objs.
+    """
+    nodes = [obj for obj in objs if isinstance(obj, models.Node)]
+    for seq, node in enumerate(nodes, _node_change_seq()):
+        node.change_seq = seq
+    with session.begin():
+        session.add_all(objs)
+        session.flush()
+    return objs
+
+
+def _tracks_node_changes(values):
+    """Whether updating a node with values bumps its change_seq."""
+    return not _NODE_UNTRACKED_FIELDS.issuperset(values)
+
+
+def _bulk_create(model, values_list, create_one):
+    """Create rows in batched transactions, reporting errors per row.
+
+    When a batch fails, e.g. because of a duplicate entry, its rows are
+    created one at a time with create_one to find out which ones failed.
+    """
+    results = []
+    for batch in iter_batches(values_list):
+        objs = []
+        for values in batch:
+            obj = model()
+            obj.update(values)
+            objs.append(obj)
+        try:
+            results.extend(add_batch(get_session(), objs))
+        except db_exc.DBError:
+            for values in batch:
+                try:
+                    results.append(create_one(values))
+                except exception.IronicException as e:
+                    results.append(e)
+                except db_exc.DBReferenceError as e:
+                    # e.g. the node of a port was deleted meanwhile
+                    results.append(exception.InvalidParameterValue(
+                        _("%(key)s does not refer to an existing entry of "
+                          "%(table)s.") % {'key': e.key, 'table': e.table}))
+                except db_exc.DBError as e:
+                    LOG.warning(_LW('Failed to create a %(model)s: %(err)s'),
+                                {'model': model.__name__, 'err': e})
+                    results.append(e)
+    return results
+
+
+def _get_list_version(model, query, *columns):
+    """Return the number of rows of a query and the maximum of columns."""
+    entities = [func.count(model.id)] + [func.max(c) for c in columns]
+    return tuple(query.with_entities(*entities).one())
+
+
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
-                    sort_dir=None, query=None):
+                    sort_dir=None, query=None, use_slave=False):
     if not query:
-        query = model_query(model)
+        query = model_query(model, use_slave=use_slave)
     sort_keys = ['id']
     if sort_key and sort_key not in sort_keys:
         sort_keys.insert(0, sort_key)
@@ -151,15 +255,23 @@ class Connection(api.Connection):
     def __init__(self):
         pass
 
-    def _add_nodes_filters(self, query, filters):
+    def _add_nodes_filters(self, query, filters, use_slave=False):
         if filters is None:
             filters = []
 
         if 'chassis_uuid' in filters:
             # get_chassis_by_uuid() to raise an exception if the chassis
             # is not found
-            chassis_obj = self.get_chassis_by_uuid(filters['chassis_uuid'])
+            chassis_obj = self._get_chassis(filters['chassis_uuid'],
+                                            use_slave=use_slave)
             query = query.filter_by(chassis_id=chassis_obj.id)
+        if 'uuids_or_names' in filters:
+            uuids = [ident for ident in filters['uuids_or_names']
+                     if uuidutils.is_uuid_like(ident)]
+            names = [ident for ident in filters['uuids_or_names']
+                     if not uuidutils.is_uuid_like(ident)]
+            query = query.filter(or_(models.Node.uuid.in_(uuids),
+                                     models.Node.name.in_(names)))
         if 'associated' in filters:
             if filters['associated']:
                 query = query.filter(models.Node.instance_uuid != None)
@@ -170,12 +282,17 @@ class Connection(api.Connection):
                 query = query.filter(models.Node.reservation != None)
             else:
                 query = query.filter(models.Node.reservation == None)
-        if 'maintenance' in filters:
-            query = query.filter_by(maintenance=filters['maintenance'])
-        if 'driver' in filters:
-            query = query.filter_by(driver=filters['driver'])
-        if 'provision_state' in filters:
-            query = query.filter_by(provision_state=filters['provision_state'])
+        for field in ('maintenance', 'console_enabled', 'driver',
+                      'provision_state', 'power_state'):
+            if field in filters:
+                query = query.filter_by(**{field: filters[field]})
+        if 'conductor' in filters:
+            conductor_ids = (model_query(models.Conductor.id,
+                                         use_slave=use_slave)
+                             .filter_by(hostname=filters['conductor'])
+                             .subquery())
+            query = query.filter(
+                models.Node.conductor_affinity.in_(conductor_ids))
         if 'provisioned_before' in filters:
             limit = timeutils.utcnow() - datetime.timedelta(
                                          seconds=filters['provisioned_before'])
@@ -189,7 +306,8 @@ class Connection(api.Connection):
         return query
 
     def get_nodeinfo_list(self, columns=None, filters=None, limit=None,
-                          marker=None, sort_key=None, sort_dir=None):
+                          marker=None, sort_key=None, sort_dir=None,
+                          use_slave=False):
         # list-ify columns default values because it is bad form
         # to include a mutable list in function definitions.
         if columns is None:
@@ -197,18 +315,53 @@ class Connection(api.Connection):
         else:
             columns = [getattr(models.Node, c) for c in columns]
 
-        query = model_query(*columns, base_model=models.Node)
-        query = self._add_nodes_filters(query, filters)
+        query = model_query(*columns, base_model=models.Node,
+                            use_slave=use_slave)
+        query = self._add_nodes_filters(query, filters, use_slave=use_slave)
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
 
     def get_node_list(self, filters=None, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
-        query = model_query(models.Node)
-        query = self._add_nodes_filters(query, filters)
+                      sort_key=None, sort_dir=None, use_slave=True):
+        query = model_query(models.Node, use_slave=use_slave)
+        query = self._add_nodes_filters(query, filters, use_slave=use_slave)
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
 
+    def get_node_list_version(self, filters=None, use_slave=True):
+        query = model_query(models.Node, use_slave=use_slave)
+        query = self._add_nodes_filters(query, filters, use_slave=use_slave)
+        # NOTE: reservations do not bump change_seq, so the number of
+        # reserved nodes is part of the version instead.
+        entities = [func.count(models.Node.id),
+                    func.count(models.Node.reservation),
+                    func.max(models.Node.change_seq),
+                    func.max(models.Node.updated_at)]
+        return tuple(query.with_entities(*entities).one())
+
+    @staticmethod
+    def _get_changes_query(model, since, until):
+        query = model_query(model).filter(model.change_seq > since)
+        if until is not None:
+            query = query.filter(model.change_seq <= until)
+        return query.order_by(model.change_seq, model.id)
+
+    def get_node_changes(self, since, until=None, limit=None):
+        if limit:
+            seqs = sorted(seq for (seq,) in itertools.chain(*[
+                self._get_changes_query(model, since, until)
+                .with_entities(model.change_seq).limit(limit)
+                for model in (models.Node, models.NodeDeletion)]))
+            if len(seqs) >= limit:
+                # Change sequences are not unique, also return the changes
+                # sharing the change_seq of the last one, so that the next
+                # page can start after it.
+                until = seqs[limit - 1]
+        nodes = self._get_changes_query(models.Node, since, until).all()
+        deletions = self._get_changes_query(models.NodeDeletion, since,
+                                            until).all()
+        return nodes, deletions
+
     def reserve_node(self, tag, node_id):
         session = get_session()
         with session.begin():
@@ -247,7 +400,8 @@ class Connection(api.Connection):
             except NoResultFound:
                 raise exception.NodeNotFound(node_id)
 
-    def create_node(self, values):
+    @staticmethod
+    def _set_node_defaults(values):
         # ensure defaults are present for new nodes
         if 'uuid' not in values:
             values['uuid'] = uuidutils.generate_uuid()
@@ -257,8 +411,11 @@ class Connection(api.Connection):
             # TODO(deva): change this to ENROLL
             values['provision_state'] = states.AVAILABLE
 
+    def create_node(self, values):
+        self._set_node_defaults(values)
         node = models.Node()
         node.update(values)
+        node.change_seq = _node_change_seq()
         try:
             node.save()
         except db_exc.DBDuplicateEntry as exc:
@@ -271,6 +428,11 @@ class Connection(api.Connection):
             raise exception.NodeAlreadyExists(uuid=values['uuid'])
         return node
 
+    def create_nodes(self, values_list):
+        for values in values_list:
+            self._set_node_defaults(values)
+        return _bulk_create(models.Node, values_list, self.create_node)
+
     def get_node_by_id(self, node_id):
         query = model_query(models.Node).filter_by(id=node_id)
         try:
@@ -306,6 +468,26 @@ class Connection(api.Connection):
 
         return result
 
+    def get_node_by_port_addresses(self, addresses):
+        if not addresses:
+            raise exception.NodeNotFound(
+                _('No MAC addresses were given to look up a node.'))
+        query = model_query(models.Node).distinct()
+        query = query.join(models.Port, models.Port.node_id == models.Node.id)
+        query = query.filter(models.Port.address.in_(addresses))
+
+        nodes = query.all()
+        if not nodes:
+            raise exception.NodeNotFound(
+                _('No ports matching the given MAC addresses %s exist in '
+                  'the database.') % addresses)
+        if len(nodes) > 1:
+            raise exception.NodeNotFound(
+                _('Ports matching mac addresses match multiple nodes. '
+                  'MACs: %(macs)s. Node UUIDs: %(nodes)s') %
+                {'macs': addresses, 'nodes': [n.uuid for n in nodes]})
+        return nodes[0]
+
     def destroy_node(self, node_id):
         session = get_session()
         with session.begin():
@@ -327,6 +509,8 @@ class Connection(api.Connection):
             port_query.delete()
 
             query.delete()
+            session.add(models.NodeDeletion(uuid=node_ref['uuid'],
+                                            change_seq=_node_change_seq()))
 
     def update_node(self, node_id, values):
         # NOTE(dtantsur): this can lead to very strange errors
@@ -337,16 +521,39 @@ class Connection(api.Connection):
         try:
             return self._do_update_node(node_id, values)
         except db_exc.DBDuplicateEntry as e:
-            if 'name' in e.columns:
-                raise exception.DuplicateName(name=values['name'])
-            elif 'uuid' in e.columns:
-                raise exception.NodeAlreadyExists(uuid=values['uuid'])
-            elif 'instance_uuid' in e.columns:
-                raise exception.InstanceAssociated(
-                    instance_uuid=values['instance_uuid'],
-                    node=node_id)
+            self._raise_node_duplicate(e, node_id, values)
+
+    def update_node_values(self, node_id, values):
+        if 'uuid' in values:
+            msg = _("Cannot overwrite UUID for an existing Node.")
+            raise exception.InvalidParameterValue(err=msg)
+
+        values = dict(values)
+        if not values:
+            return values
+
+        try:
+            if values.get('provision_state') in _PROVISION_STATES_NEED_OLD:
+                # The timestamps to set depend on the current provision
+                # state, fall back to the locking read.
+                self._do_update_node(node_id, values)
             else:
-                raise e
+                self._do_update_node_values(node_id, values)
+        except db_exc.DBDuplicateEntry as e:
+            self._raise_node_duplicate(e, node_id, values)
+        return values
+
+    def _raise_node_duplicate(self, e, node_id, values):
+        if 'name' in e.columns:
+            raise exception.DuplicateName(name=values['name'])
+        elif 'uuid' in e.columns:
+            raise exception.NodeAlreadyExists(uuid=values['uuid'])
+        elif 'instance_uuid' in e.columns:
+            raise exception.InstanceAssociated(
+                instance_uuid=values['instance_uuid'],
+                node=node_id)
+        else:
+            raise e
 
     def _do_update_node(self, node_id, values):
         session = get_session()
@@ -376,9 +583,43 @@ class Connection(api.Connection):
                       values['provision_state'] == states.INSPECTFAIL):
                     values['inspection_started_at'] = None
 
+            changed = any(ref[k] != v for k, v in values.items())
+            if changed and _tracks_node_changes(values):
+                values['change_seq'] = _node_change_seq()
             ref.update(values)
         return ref
 
+    def _do_update_node_values(self, node_id, values):
+        if 'provision_state' in values:
+            values['provision_updated_at'] = timeutils.utcnow()
+            if values['provision_state'] == states.INSPECTING:
+                values['inspection_started_at'] = timeutils.utcnow()
+                values['inspection_finished_at'] = None
+        if _tracks_node_changes(values):
+            values['change_seq'] = _node_change_seq()
+
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Node, session=session)
+            query = add_identity_filter(query, node_id)
+            update_query = query
+            if values.get('instance_uuid'):
+                # Prevent instance_uuid overwriting
+                update_query = update_query.filter_by(instance_uuid=None)
+            # be optimistic and assume the conditions usually hold
+            count = update_query.update(values, synchronize_session=False)
+            if count == 1:
+                return
+
+            # Nothing updated, find out why
+            try:
+                instance_uuid = query.with_entities(
+                    models.Node.instance_uuid).one()[0]
+            except NoResultFound:
+                raise exception.NodeNotFound(node=node_id)
+            raise exception.NodeAssociated(node=node_id,
+                                           instance=instance_uuid)
+
     def get_port_by_id(self, port_id):
         query = model_query(models.Port).filter_by(id=port_id)
         try:
@@ -400,10 +641,24 @@ class Connection(api.Connection):
         except NoResultFound:
             raise exception.PortNotFound(port=address)
 
+    def get_ports_by_addresses(self, addresses):
+        if not addresses:
+            return []
+        query = model_query(models.Port)
+        return query.filter(models.Port.address.in_(addresses)).all()
+
     def get_port_list(self, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, use_slave=True):
         return _paginate_query(models.Port, limit, marker,
-                               sort_key, sort_dir)
+                               sort_key, sort_dir, use_slave=use_slave)
+
+    def get_port_list_version(self, node_id=None, use_slave=True):
+        query = model_query(models.Port, use_slave=use_slave)
+        if node_id is not None:
+            query = query.filter_by(node_id=node_id)
+        return _get_list_version(models.Port, query,
+                                 models.Port.created_at,
+                                 models.Port.updated_at)
 
     def get_ports_by_node_id(self, node_id, limit=None, marker=None,
                              sort_key=None, sort_dir=None):
@@ -425,6 +680,12 @@ class Connection(api.Connection):
             raise exception.PortAlreadyExists(uuid=values['uuid'])
         return port
 
+    def create_ports(self, values_list):
+        for values in values_list:
+            if not values.get('uuid'):
+                values['uuid'] = uuidutils.generate_uuid()
+        return _bulk_create(models.Port, values_list, self.create_port)
+
     def update_port(self, port_id, values):
         # NOTE(dtantsur): this can lead to very strange errors
         if 'uuid' in values:
@@ -460,17 +721,27 @@ class Connection(api.Connection):
         except NoResultFound:
             raise exception.ChassisNotFound(chassis=chassis_id)
 
-    def get_chassis_by_uuid(self, chassis_uuid):
-        query = model_query(models.Chassis).filter_by(uuid=chassis_uuid)
+    def _get_chassis(self, chassis_uuid, use_slave=False):
+        query = (model_query(models.Chassis, use_slave=use_slave)
+                 .filter_by(uuid=chassis_uuid))
         try:
             return query.one()
         except NoResultFound:
             raise exception.ChassisNotFound(chassis=chassis_uuid)
 
+    def get_chassis_by_uuid(self, chassis_uuid):
+        return self._get_chassis(chassis_uuid)
+
     def get_chassis_list(self, limit=None, marker=None,
-                         sort_key=None, sort_dir=None):
+                         sort_key=None, sort_dir=None, use_slave=True):
         return _paginate_query(models.Chassis, limit, marker,
-                               sort_key, sort_dir)
+                               sort_key, sort_dir, use_slave=use_slave)
+
+    def get_chassis_list_version(self, use_slave=True):
+        query = model_query(models.Chassis, use_slave=use_slave)
+        return _get_list_version(models.Chassis, query,
+                                 models.Chassis.created_at,
+                                 models.Chassis.updated_at)
 
     def create_chassis(self, values):
         if not values.get('uuid'):
@@ -584,12 +855,12 @@ class Connection(api.Connection):
             LOG.warn(_LW('Cleared reservations held by %(hostname)s: '
                          '%(nodes)s'), {'hostname': hostname, 'nodes': nodes})
 
-    def get_active_driver_dict(self, interval=None):
+    def get_active_driver_dict(self, interval=None, use_slave=False):
         if interval is None:
             interval = CONF.conductor.heartbeat_timeout
 
         limit = timeutils.utcnow() - datetime.timedelta(seconds=interval)
-        result = (model_query(models.Conductor)
+        result = (model_query(models.Conductor, use_slave=use_slave)
                   .filter_by(online=True)
                   .filter(models.Conductor.updated_at >= limit)
                   .all())
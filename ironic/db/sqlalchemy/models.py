@@ -24,7 +24,7 @@ from oslo_config import cfg
 from oslo_db import options as db_options
 from oslo_db.sqlalchemy import models
 import six.moves.urllib.parse as urlparse
-from sqlalchemy import Boolean, Column, DateTime
+from sqlalchemy import BigInteger, Boolean, Column, DateTime
 from sqlalchemy import ForeignKey, Integer
 from sqlalchemy import schema, String, Text
 from sqlalchemy.ext.declarative import declarative_base
@@ -147,6 +147,16 @@ class Node(Base):
         schema.UniqueConstraint('instance_uuid',
                                 name='uniq_nodes0instance_uuid'),
         schema.UniqueConstraint('name', name='uniq_nodes0name'),
+        # NOTE: indexes matching the filters of the conductor periodic
+        #       tasks, see Connection._add_nodes_filters().
+        schema.Index('nodes_reservation_maintenance_idx',
+                     'reservation', 'maintenance'),
+        schema.Index('nodes_provision_state_updated_at_idx',
+                     'provision_state', 'provision_updated_at'),
+        schema.Index('nodes_provision_state_inspection_started_at_idx',
+                     'provision_state', 'inspection_started_at'),
+        schema.Index('nodes_driver_idx', 'driver'),
+        schema.Index('nodes_change_seq_idx', 'change_seq'),
         table_args())
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
@@ -190,6 +200,22 @@ class Node(Base):
     inspection_started_at = Column(DateTime, nullable=True)
     extra = Column(JSONEncodedDict)
 
+    # NOTE: time in microseconds since the epoch when the node was last
+    #       created or updated, used to list the nodes changed since then.
+    change_seq = Column(BigInteger, nullable=True)
+
+
+class NodeDeletion(Base):
+    """Represents the deletion of a node, reported with the node changes."""
+
+    __tablename__ = 'node_deletions'
+    __table_args__ = (
+        schema.Index('node_deletions_change_seq_idx', 'change_seq'),
+        table_args())
+    id = Column(Integer, primary_key=True)
+    uuid = Column(String(36), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+
 
 class Port(Base):
     """Represents a network port of a bare metal node."""
@@ -198,6 +224,9 @@ class Port(Base):
     __table_args__ = (
         schema.UniqueConstraint('address', name='uniq_ports0address'),
         schema.UniqueConstraint('uuid', name='uniq_ports0uuid'),
+        # NOTE: not created on MySQL, which already indexes node_id for
+        #       the foreign key.
+        schema.Index('ports_node_id_idx', 'node_id'),
         table_args())
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
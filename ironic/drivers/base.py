@@ -469,7 +469,7 @@ VendorMetadata = collections.namedtuple('VendorMetadata', ['method',
 
 
 def _passthru(http_methods, method=None, async=True, driver_passthru=False,
-              description=None):
+              description=None, require_exclusive_lock=True):
     """A decorator for registering a function as a passthru function.
 
     Decorator ensures function is ready to catch any ironic exceptions
@@ -491,6 +491,12 @@ def _passthru(http_methods, method=None, async=True, driver_passthru=False,
                             passthru method, and False if it is a node
                             vendor passthru method.
     :param description: a string shortly describing what the method does.
+    :param require_exclusive_lock: Boolean value. Only valid for node
+                                   passthru methods. If True, lock the node
+                                   exclusively before calling the method;
+                                   if False, only take a shared lock, and
+                                   leave it to the method to upgrade it if
+                                   needed. Defaults to True.
 
     """
     def handle_passthru(func):
@@ -503,6 +509,9 @@ def _passthru(http_methods, method=None, async=True, driver_passthru=False,
         metadata = VendorMetadata(api_method, {'http_methods': supported_,
                                                'async': async,
                                                'description': description_})
+        if not driver_passthru:
+            metadata.metadata['require_exclusive_lock'] = (
+                require_exclusive_lock)
         if driver_passthru:
             func._driver_metadata = metadata
         else:
@@ -525,9 +534,11 @@ def _passthru(http_methods, method=None, async=True, driver_passthru=False,
     return handle_passthru
 
 
-def passthru(http_methods, method=None, async=True, description=None):
+def passthru(http_methods, method=None, async=True, description=None,
+             require_exclusive_lock=True):
     return _passthru(http_methods, method, async, driver_passthru=False,
-                     description=description)
+                     description=description,
+                     require_exclusive_lock=require_exclusive_lock)
 
 
 def driver_passthru(http_methods, method=None, async=True, description=None):
@@ -35,6 +35,7 @@ from ironic.conductor import rpcapi
 from ironic.conductor import utils as manager_utils
 from ironic.drivers import base
 from ironic.drivers.modules import agent_client
+from ironic.drivers.modules import agent_heartbeat
 from ironic.drivers.modules import deploy_utils
 from ironic import objects
 from ironic.openstack.common import log
@@ -67,6 +68,13 @@ class BaseAgentVendor(base.VendorInterface):
         self.supported_payload_versions = ['2']
         self._client = _get_client()
 
+    @base.driver_periodic_task(
+        spacing=CONF.agent.heartbeat_flush_interval,
+        enabled=CONF.agent.heartbeat_flush_interval > 0)
+    def _flush_heartbeats(self, manager, context):
+        """Periodic task writing agent heartbeats to the database."""
+        agent_heartbeat.flush(context)
+
     def continue_deploy(self, task, **kwargs):
         """Continues the deployment of baremetal node.
 
@@ -156,6 +164,14 @@ class BaseAgentVendor(base.VendorInterface):
             # Command is not done yet
             return
 
+        # The node is going to change state, lock it
+        clean_step = task.node.clean_step
+        if not self._upgrade_lock(
+                task, lambda task: (task.node.provision_state ==
+                                    states.CLEANING and
+                                    task.node.clean_step == clean_step)):
+            return
+
         if command.get('command_status') == 'FAILED':
             msg = (_('Agent returned error for clean step %(step)s on node '
                      '%(node)s : %(err)s.') %
@@ -189,7 +205,43 @@ class BaseAgentVendor(base.VendorInterface):
             LOG.error(msg)
             return manager.cleaning_error_handler(task, msg)
 
-    @base.passthru(['POST'])
+    def _upgrade_lock(self, task, check):
+        """Upgrade the lock of a task and check its node again.
+
+        If the node was checked under a shared lock, another heartbeat may
+        have handled it while waiting for the exclusive lock.
+
+        :param task: a TaskManager instance.
+        :param check: a callable taking the task, which returns whether the
+                      node (reloaded with the exclusive lock) still has to
+                      be handled.
+        :returns: whether the node still has to be handled.
+        """
+        if not task.shared:
+            return True
+        task.upgrade_lock()
+        if check(task):
+            return True
+        LOG.debug('Node %s changed while waiting for its lock, ignoring the '
+                  'heartbeat.', task.node.uuid)
+        return False
+
+    def _heartbeat_needs_lock(self, task, agent_url):
+        """Whether a heartbeat has to be handled with an exclusive lock."""
+        node = task.node
+        if not agent_heartbeat.is_enabled():
+            return True
+        if node.driver_internal_info.get('agent_url') != agent_url:
+            # The agent URL is used to talk back to the agent, it must be
+            # saved before doing anything else.
+            return True
+        if node.maintenance:
+            return False
+        return (node.provision_state == states.DEPLOYWAIT or
+                (node.provision_state == states.CLEANING and
+                 not node.clean_step))
+
+    @base.passthru(['POST'], require_exclusive_lock=False)
     def heartbeat(self, task, **kwargs):
         """Method for agent to periodically check in.
 
@@ -201,23 +253,34 @@ class BaseAgentVendor(base.VendorInterface):
          }
 
         AGENT_PORT defaults to 9999.
+
+        Heartbeats which do not lead to any action are only recorded in the
+        conductor and written to the database later by a periodic task, so
+        the node is only locked exclusively when something has to be done.
         """
         node = task.node
-        driver_internal_info = node.driver_internal_info
+        last = agent_heartbeat.get_store().get(node.uuid)
         LOG.debug(
             'Heartbeat from %(node)s, last heartbeat at %(heartbeat)s.',
             {'node': node.uuid,
-             'heartbeat': driver_internal_info.get('agent_last_heartbeat')})
-        driver_internal_info['agent_last_heartbeat'] = int(_time())
+             'heartbeat': (last[1] if last else
+                           node.driver_internal_info.get(
+                               'agent_last_heartbeat'))})
         try:
-            driver_internal_info['agent_url'] = kwargs['agent_url']
+            agent_url = kwargs['agent_url']
         except KeyError:
             raise exception.MissingParameterValue(_('For heartbeat operation, '
                                                     '"agent_url" must be '
                                                     'specified.'))
 
-        node.driver_internal_info = driver_internal_info
-        node.save()
+        timestamp = int(_time())
+        if self._heartbeat_needs_lock(task, agent_url):
+            task.upgrade_lock()
+            node = task.node
+            agent_heartbeat.save_heartbeat(node, agent_url, timestamp)
+        else:
+            agent_heartbeat.get_store().record(node.uuid, agent_url,
+                                               timestamp)
 
         # Async call backs don't set error state on their own
         # TODO(jimrollenhagen) improve error messages here
@@ -234,7 +297,11 @@ class BaseAgentVendor(base.VendorInterface):
             elif (node.provision_state == states.DEPLOYING and
                   self.deploy_is_done(task)):
                 msg = _('Node failed to move to active state.')
-                self.reboot_to_instance(task, **kwargs)
+                if self._upgrade_lock(
+                        task, lambda task: (task.node.provision_state ==
+                                            states.DEPLOYING and
+                                            self.deploy_is_done(task))):
+                    self.reboot_to_instance(task, **kwargs)
             elif (node.provision_state == states.CLEANING and
                   not node.clean_step):
                 # Agent booted from prepare_cleaning
@@ -249,7 +316,10 @@ class BaseAgentVendor(base.VendorInterface):
             last_error = _('Asynchronous exception for node %(node)s: '
                            '%(msg)s exception: %(e)s') % err_info
             LOG.exception(last_error)
-            deploy_utils.set_failed_state(task, last_error)
+            state = node.provision_state
+            if self._upgrade_lock(
+                    task, lambda task: task.node.provision_state == state):
+                deploy_utils.set_failed_state(task, last_error)
 
     @base.driver_passthru(['POST'], async=False)
     def lookup(self, context, **kwargs):
@@ -356,19 +426,14 @@ class BaseAgentVendor(base.VendorInterface):
         """Get nodes for a given list of MAC addresses.
 
         Given a list of MAC addresses, find the ports that match the MACs
-        and return the node they are all connected to.
+        and return the node they are all connected to. This is done in a
+        single database query.
 
         :raises: NodeNotFound if the ports point to multiple nodes or no
         nodes.
         """
-        ports = self._find_ports_by_macs(context, mac_addresses)
-        if not ports:
-            raise exception.NodeNotFound(_(
-                'No ports matching the given MAC addresses %sexist in the '
-                'database.') % mac_addresses)
-        node_id = self._get_node_id(ports)
         try:
-            node = objects.Node.get_by_id(context, node_id)
+            node = objects.Node.get_by_port_addresses(context, mac_addresses)
         except exception.NodeNotFound:
             with excutils.save_and_reraise_exception():
                 LOG.exception(_LE('Could not find matching node for the '
@@ -376,51 +441,6 @@ class BaseAgentVendor(base.VendorInterface):
 
         return node
 
-    def _find_ports_by_macs(self, context, mac_addresses):
-        """Get ports for a given list of MAC addresses.
-
-        Given a list of MAC addresses, find the ports that match the MACs
-        and return them as a list of Port objects, or an empty list if there
-        are no matches
-        """
-        ports = []
-        for mac in mac_addresses:
-            # Will do a search by mac if the mac isn't malformed
-            try:
-                port_ob = objects.Port.get_by_address(context, mac)
-                ports.append(port_ob)
-
-            except exception.PortNotFound:
-                LOG.warning(_LW('MAC address %s not found in database'), mac)
-
-        return ports
-
-    def _get_node_id(self, ports):
-        """Get a node ID for a list of ports.
-
-        Given a list of ports, either return the node_id they all share or
-        raise a NotFound if there are multiple node_ids, which indicates some
-        ports are connected to one node and the remaining port(s) are connected
-        to one or more other nodes.
-
-        :raises: NodeNotFound if the MACs match multiple nodes. This
-        could happen if you swapped a NIC from one server to another and
-        don't notify Ironic about it or there is a MAC collision (since
-        they're not guaranteed to be unique).
-        """
-        # See if all the ports point to the same node
-        node_ids = set(port_ob.node_id for port_ob in ports)
-        if len(node_ids) > 1:
-            raise exception.NodeNotFound(_(
-                'Ports matching mac addresses match multiple nodes. MACs: '
-                '%(macs)s. Port ids: %(port_ids)s') %
-                {'macs': [port_ob.address for port_ob in ports], 'port_ids':
-                 [port_ob.uuid for port_ob in ports]}
-            )
-
-        # Only have one node_id left, return it.
-        return node_ids.pop()
-
     def _log_and_raise_deployment_error(self, task, msg):
         """Helper method to log the error and raise exception."""
         LOG.error(msg)
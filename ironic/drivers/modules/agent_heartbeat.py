@@ -0,0 +1,156 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-conductor store of agent heartbeats.
+
+Most agent heartbeats do not lead to any action: the agent is still
+running a long deploy or clean step. Recording each of them in the node's
+driver_internal_info means locking the node and rewriting the whole blob
+every few seconds per node. Instead, such heartbeats are recorded here
+and written to the database in batches by a periodic task.
+"""
+
+import threading
+
+from oslo_config import cfg
+
+from ironic.common import exception
+from ironic.common.i18n import _LW
+from ironic.conductor import task_manager
+from ironic.openstack.common import log
+
+
+heartbeat_opts = [
+    cfg.IntOpt('heartbeat_flush_interval',
+               default=300,
+               help='Interval (in seconds) between writes of the agent '
+                    'heartbeats that did not trigger any action to the '
+                    'database. 0 writes every heartbeat immediately, '
+                    'locking the node each time.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(heartbeat_opts, group='agent')
+
+LOG = log.getLogger(__name__)
+
+
+class HeartbeatStore(object):
+    """Last heartbeat time and agent URL of the nodes of this conductor."""
+
+    def __init__(self):
+        self._entries = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def record(self, node_uuid, agent_url, timestamp):
+        """Record a heartbeat, to be written to the database later."""
+        with self._lock:
+            self._entries[node_uuid] = (agent_url, timestamp)
+            self._dirty.add(node_uuid)
+
+    def mark_saved(self, node_uuid, agent_url, timestamp):
+        """Record a heartbeat that was already written to the database."""
+        with self._lock:
+            self._entries[node_uuid] = (agent_url, timestamp)
+            self._dirty.discard(node_uuid)
+
+    def get(self, node_uuid):
+        """Return the (agent URL, timestamp) of the last heartbeat, if any."""
+        return self._entries.get(node_uuid)
+
+    def pop_dirty(self):
+        """Return the heartbeats not written yet and mark them as written.
+
+        :returns: a dictionary mapping node UUIDs to (agent URL, timestamp)
+                  tuples.
+        """
+        with self._lock:
+            dirty = dict((uuid, self._entries[uuid]) for uuid in self._dirty)
+            self._dirty.clear()
+        return dirty
+
+    def requeue(self, node_uuid, agent_url, timestamp):
+        """Mark a heartbeat as not written, unless a newer one arrived."""
+        with self._lock:
+            if self._entries.get(node_uuid, (None, 0))[1] <= timestamp:
+                self._entries[node_uuid] = (agent_url, timestamp)
+                self._dirty.add(node_uuid)
+
+    def forget(self, node_uuid):
+        with self._lock:
+            self._entries.pop(node_uuid, None)
+            self._dirty.discard(node_uuid)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_STORE = HeartbeatStore()
+
+
+def get_store():
+    """Return the heartbeat store of this conductor."""
+    return _STORE
+
+
+def is_enabled():
+    return CONF.agent.heartbeat_flush_interval > 0
+
+
+def save_heartbeat(node, agent_url, timestamp):
+    """Write a heartbeat into a node's driver_internal_info.
+
+    The caller must hold an exclusive lock on the node.
+    """
+    driver_internal_info = node.driver_internal_info
+    driver_internal_info['agent_last_heartbeat'] = timestamp
+    driver_internal_info['agent_url'] = agent_url
+    node.driver_internal_info = driver_internal_info
+    node.save()
+    _STORE.mark_saved(node.uuid, agent_url, timestamp)
+
+
+def flush(context):
+    """Write the pending heartbeats to the database.
+
+    Nodes locked by somebody else are retried on the next flush.
+
+    :param context: an admin context.
+    """
+    pending = _STORE.pop_dirty()
+    if not pending:
+        return
+
+    LOG.debug('Writing %d agent heartbeats to the database.', len(pending))
+    for node_uuid, (agent_url, timestamp) in pending.items():
+        try:
+            with task_manager.acquire(context, node_uuid) as task:
+                info = task.node.driver_internal_info
+                if info.get('agent_last_heartbeat', 0) >= timestamp:
+                    continue
+                save_heartbeat(task.node, agent_url, timestamp)
+        except exception.NodeLocked:
+            _STORE.requeue(node_uuid, agent_url, timestamp)
+        except exception.NodeNotFound:
+            _STORE.forget(node_uuid)
+        except Exception as e:
+            LOG.warning(_LW('Failed to save the last agent heartbeat of '
+                            'node %(node)s: %(err)s'),
+                        {'node': node_uuid, 'err': e})
+            _STORE.requeue(node_uuid, agent_url, timestamp)
@@ -24,6 +24,7 @@ from ironic.common import boot_devices
 from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common.i18n import _LE
+from ironic.common import native_executor
 from ironic.openstack.common import log as logging
 
 
@@ -86,6 +87,11 @@ class Client(object):
         path = '/wsman'
         self.client = pywsman.Client(address, port, path, protocol,
                                      username, password)
+        # NOTE: the calls run in native threads, which are only freed
+        # when the call returns, so they must not wait forever.
+        timeout = native_executor.get_transport_timeout()
+        if timeout:
+            pywsman.wsman_transport_set_timeout(self.client, timeout)
 
     def wsman_get(self, resource_uri, options=None):
         """Get target server info
@@ -98,7 +104,8 @@ class Client(object):
         """
         if options is None:
             options = pywsman.ClientOptions()
-        doc = self.client.get(options, resource_uri)
+        doc = native_executor.execute(self.client.get, options,
+                                      resource_uri)
         item = 'Fault'
         fault = xml_find(doc, _SOAP_ENVELOPE, item)
         if fault is not None:
@@ -120,9 +127,11 @@ class Client(object):
         :raises: AMTConnectFailure if unable to connect to the server.
         """
         if data is None:
-            doc = self.client.invoke(options, resource_uri, method)
+            doc = native_executor.execute(self.client.invoke, options,
+                                          resource_uri, method)
         else:
-            doc = self.client.invoke(options, resource_uri, method, data)
+            doc = native_executor.execute(self.client.invoke, options,
+                                          resource_uri, method, data)
         item = "ReturnValue"
         return_value = xml_find(doc, resource_uri, item).text
         if return_value != RET_SUCCESS:
@@ -0,0 +1,159 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Cache of hardware vendor client objects.
+
+Power and management calls used to build (and for some drivers,
+authenticate) a new client object every time. The caches defined with
+this module keep client objects for a while, keyed by the connection
+parameters and credentials they were built from, so that periodic tasks
+like the power state sync reuse them.
+"""
+
+import collections
+import threading
+import time
+
+from oslo_config import cfg
+
+
+client_cache_opts = [
+    cfg.IntOpt('vendor_client_cache_ttl',
+               default=300,
+               help='Time (in seconds) for which hardware vendor client '
+                    'objects (iLO, iRMC and SeaMicro) are reused '
+                    'before being rebuilt. 0 disables caching.'),
+    cfg.IntOpt('vendor_client_cache_size',
+               default=1000,
+               help='Maximum number of client objects kept by each '
+                    'hardware vendor client cache.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(client_cache_opts, group='conductor')
+
+_CACHES = []
+
+
+def _make_key(credentials):
+    return tuple(sorted(credentials.items()))
+
+
+class _Entry(object):
+    """A cached client and the nodes using it."""
+
+    __slots__ = ('client', 'expires_at', 'node_uuids')
+
+    def __init__(self, client, expires_at):
+        self.client = client
+        self.expires_at = expires_at
+        self.node_uuids = set()
+
+
+class ClientCache(object):
+    """A bounded cache of client objects with expiry.
+
+    Entries are keyed by the parameters the client was built from, so a
+    client may be shared by several nodes. When a node asks for a client
+    with different parameters than last time (its driver_info was
+    updated), the client built from its old parameters is dropped unless
+    other nodes still use it. Nodes are forgotten together with the
+    entries they use, so deleted nodes do not stay in the cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._entries = collections.OrderedDict()
+        self._node_keys = {}
+        self._lock = threading.Lock()
+        _CACHES.append(self)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for node_uuid in entry.node_uuids:
+            if self._node_keys.get(node_uuid) == key:
+                del self._node_keys[node_uuid]
+
+    def _use(self, node_uuid, key):
+        old_key = self._node_keys.get(node_uuid)
+        if old_key is not None and old_key != key:
+            old_entry = self._entries.get(old_key)
+            if old_entry is not None:
+                old_entry.node_uuids.discard(node_uuid)
+                if not old_entry.node_uuids:
+                    self._remove(old_key)
+        self._node_keys[node_uuid] = key
+        self._entries[key].node_uuids.add(node_uuid)
+
+    def get(self, node_uuid, credentials, factory):
+        """Return a client, building it if needed.
+
+        :param node_uuid: UUID of the node the client is used for.
+        :param credentials: A dictionary with the parameters identifying
+            the client, e.g. address, port and credentials.
+        :param factory: A callable taking no arguments and returning a new
+            client.
+        :returns: A client returned by factory, possibly cached.
+        """
+        ttl = CONF.conductor.vendor_client_cache_ttl
+        if ttl <= 0:
+            return factory()
+
+        key = _make_key(credentials)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.time():
+                # Keep the entries in least recently used order
+                del self._entries[key]
+                self._entries[key] = entry
+                self._use(node_uuid, key)
+                return entry.client
+
+        # NOTE: the factory may do network I/O (e.g. authenticate), so it is
+        # called without holding the lock.
+        client = factory()
+        with self._lock:
+            now = time.time()
+            for old_key in [k for k, e in self._entries.items()
+                            if k == key or e.expires_at <= now]:
+                self._remove(old_key)
+            self._entries[key] = _Entry(client, now + ttl)
+            self._use(node_uuid, key)
+            while len(self._entries) > CONF.conductor.vendor_client_cache_size:
+                self._remove(next(iter(self._entries)))
+        return client
+
+    def invalidate(self, credentials):
+        """Drop the client built from the given parameters, if any.
+
+        This is meant to be called when a client fails in a way that
+        rebuilding it may fix, e.g. when its session has expired.
+        """
+        with self._lock:
+            self._remove(_make_key(credentials))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._node_keys.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def clear_all():
+    """Empty all the client caches of this process."""
+    for cache in _CACHES:
+        cache.clear()
@@ -0,0 +1,405 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-process serial console gateway.
+
+Instead of running one shellinaboxd daemon (and its console subprocess)
+per node, the conductor can serve the consoles of all its nodes on a
+single TCP port. Clients connect to the port and send a single line::
+
+    <node uuid> <token>\\n
+
+where the token is the one returned in the node's console information.
+On success the gateway replays the recent console output of the node
+(scrollback) and then relays data in both directions. The console
+subprocess of a node (e.g. ``ipmitool sol activate``) is only started
+when the first client attaches, and is stopped when the last one leaves.
+"""
+
+import collections
+import hmac
+import shlex
+import socket
+import uuid
+
+import eventlet
+from eventlet.green import os as green_os
+from eventlet.green import subprocess
+from oslo_config import cfg
+from oslo_utils import netutils
+
+from ironic.common import exception
+from ironic.common.i18n import _
+from ironic.common.i18n import _LI
+from ironic.common.i18n import _LW
+from ironic.openstack.common import log as logging
+
+
+opts = [
+    cfg.BoolOpt('gateway_enabled',
+                default=False,
+                help='Serve the serial consoles of all the nodes managed by '
+                     'a conductor through a single in-process gateway '
+                     'instead of one shellinabox daemon per node.'),
+    cfg.StrOpt('gateway_host',
+               default='$my_ip',
+               help='IP address the console gateway listens on and '
+                    'advertises to clients.'),
+    cfg.IntOpt('gateway_port',
+               default=7770,
+               help='TCP port the console gateway listens on.'),
+    cfg.IntOpt('gateway_scrollback_size',
+               default=64 * 1024,
+               help='Maximum number of bytes of console output kept per '
+                    'node and replayed to clients when they attach.'),
+    cfg.IntOpt('gateway_auth_timeout',
+               default=10,
+               help='Time (in seconds) a client has to authenticate after '
+                    'connecting to the console gateway.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(opts, group='console')
+CONF.import_opt('my_ip', 'ironic.netconf')
+
+LOG = logging.getLogger(__name__)
+
+_READ_SIZE = 4096
+
+
+class RingBuffer(object):
+    """A buffer keeping only the last max_size bytes written to it."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._chunks = collections.deque()
+        self._size = 0
+
+    def append(self, data):
+        if self.max_size <= 0 or not data:
+            return
+        data = data[-self.max_size:]
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self.max_size:
+            excess = self._size - self.max_size
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+
+    def getvalue(self):
+        return b''.join(self._chunks)
+
+    def __len__(self):
+        return self._size
+
+
+def _parse_console_cmd(console_cmd):
+    """Get the arguments of the command to run from a console command.
+
+    The console drivers build commands in the shellinabox service format
+    ``/:<uid>:<gid>:<home>:<command>``; only the command part is used.
+    """
+    if console_cmd.startswith('/:'):
+        console_cmd = console_cmd.split(':', 4)[4]
+    return shlex.split(console_cmd)
+
+
+class ConsoleSession(object):
+    """The console of a single node."""
+
+    def __init__(self, node_uuid, console_cmd):
+        self.node_uuid = node_uuid
+        self.console_cmd = console_cmd
+        self.token = uuid.uuid4().hex
+        self.scrollback = RingBuffer(CONF.console.gateway_scrollback_size)
+        self.clients = set()
+        self.process = None
+        self._reader = None
+
+    def _ensure_started(self):
+        if self.process is not None:
+            return
+        args = _parse_console_cmd(self.console_cmd)
+        LOG.debug('Starting console subprocess for node %(node)s: '
+                  '%(args)s', {'node': self.node_uuid, 'args': args})
+        try:
+            self.process = subprocess.Popen(args,
+                                            stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT)
+        except (OSError, ValueError) as e:
+            raise exception.ConsoleSubprocessFailed(
+                error=_("%(error)s\nCommand: %(command)s") %
+                {'error': e, 'command': ' '.join(args)})
+        self._reader = eventlet.spawn(self._read_output, self.process)
+
+    def _read_output(self, process):
+        fd = process.stdout.fileno()
+        while True:
+            try:
+                data = green_os.read(fd, _READ_SIZE)
+            except OSError:
+                data = b''
+            if not data:
+                break
+            self.scrollback.append(data)
+            for client in list(self.clients):
+                try:
+                    client.sendall(data)
+                except socket.error:
+                    self.detach(client)
+
+        # NOTE: reap the subprocess, which closed its output, so that it
+        # does not stay around as a zombie
+        try:
+            returncode = process.wait()
+        except OSError:
+            returncode = None
+        LOG.info(_LI('Console subprocess for node %(node)s exited with '
+                     'code %(code)s.'),
+                 {'node': self.node_uuid, 'code': returncode})
+        if self.process is process:
+            self.process = None
+            self._reader = None
+            for client in list(self.clients):
+                self.detach(client)
+
+    def _stop_process(self):
+        process, self.process = self.process, None
+        reader, self._reader = self._reader, None
+        if process is None:
+            return
+        if reader is not None and reader is not eventlet.getcurrent():
+            reader.kill()
+        try:
+            process.terminate()
+            process.wait()
+        except OSError:
+            pass
+
+    def attach(self, client):
+        """Attach a client socket, starting the console if needed."""
+        self._ensure_started()
+        self.clients.add(client)
+        backlog = self.scrollback.getvalue()
+        if backlog:
+            client.sendall(backlog)
+
+    def detach(self, client):
+        """Detach a client socket, stopping the console if it was the last."""
+        if client not in self.clients:
+            return
+        self.clients.discard(client)
+        try:
+            client.close()
+        except socket.error:
+            pass
+        if not self.clients:
+            self._stop_process()
+
+    def write(self, data):
+        """Send client input to the console."""
+        process = self.process
+        if process is None:
+            return
+        try:
+            process.stdin.write(data)
+            process.stdin.flush()
+        except (IOError, OSError) as e:
+            LOG.warning(_LW('Failed to write to the console of node '
+                            '%(node)s: %(err)s'),
+                        {'node': self.node_uuid, 'err': e})
+
+    def close(self):
+        for client in list(self.clients):
+            self.clients.discard(client)
+            try:
+                client.close()
+            except socket.error:
+                pass
+        self._stop_process()
+
+
+class ConsoleGateway(object):
+    """Serves the consoles of many nodes on a single TCP port."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.sessions = {}
+        self._socket = None
+        self._server = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        try:
+            self._socket = eventlet.listen((self.host, self.port))
+        except socket.error as e:
+            raise exception.ConsoleError(
+                message=_("Cannot listen on %(host)s:%(port)s for the "
+                          "console gateway. Reason: %(err)s") %
+                {'host': self.host, 'port': self.port, 'err': e})
+        self._server = eventlet.spawn(self._serve)
+        LOG.info(_LI('Console gateway listening on %(host)s:%(port)s.'),
+                 {'host': self.host, 'port': self.port})
+
+    def stop(self):
+        for node_uuid in list(self.sessions):
+            self.unregister(node_uuid)
+        if self._server is not None:
+            self._server.kill()
+            self._server = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _serve(self):
+        while True:
+            client, address = self._socket.accept()
+            eventlet.spawn_n(self._handle_client, client)
+
+    def _authenticate(self, client):
+        """Read the handshake line and return the matching session."""
+        data = b''
+        with eventlet.Timeout(CONF.console.gateway_auth_timeout, False):
+            while b'\n' not in data and len(data) < 256:
+                chunk = client.recv(256)
+                if not chunk:
+                    break
+                data += chunk
+        line, _sep, rest = data.partition(b'\n')
+        try:
+            node_uuid, token = line.strip().split()
+        except ValueError:
+            return None, b''
+        session = self.sessions.get(node_uuid)
+        if session is None or not hmac.compare_digest(session.token,
+                                                      token):
+            return None, b''
+        return session, rest
+
+    def _handle_client(self, client):
+        session, rest = self._authenticate(client)
+        if session is None:
+            try:
+                client.sendall(b'Authentication failed.\r\n')
+            except socket.error:
+                pass
+            client.close()
+            return
+
+        try:
+            session.attach(client)
+        except (exception.ConsoleSubprocessFailed, socket.error) as e:
+            LOG.warning(_LW('Failed to attach a client to the console of '
+                            'node %(node)s: %(err)s'),
+                        {'node': session.node_uuid, 'err': e})
+            session.detach(client)
+            client.close()
+            return
+
+        if rest:
+            session.write(rest)
+        try:
+            while client in session.clients:
+                data = client.recv(_READ_SIZE)
+                if not data:
+                    break
+                session.write(data)
+        except socket.error:
+            pass
+        finally:
+            session.detach(client)
+
+    def register(self, node_uuid, console_cmd):
+        """Enable the console of a node.
+
+        :param node_uuid: the UUID of the node.
+        :param console_cmd: the command that gets the console, possibly in
+                            the shellinabox service format.
+        :returns: the session of the node.
+        """
+        self.unregister(node_uuid)
+        self.start()
+        session = ConsoleSession(node_uuid, console_cmd)
+        self.sessions[node_uuid] = session
+        return session
+
+    def unregister(self, node_uuid):
+        """Disable the console of a node, disconnecting its clients."""
+        session = self.sessions.pop(node_uuid, None)
+        if session is not None:
+            session.close()
+        return session is not None
+
+    def get_console_url(self, node_uuid):
+        session = self.sessions.get(node_uuid)
+        if session is None:
+            raise exception.ConsoleError(
+                message=_("The console of node %s is not enabled on the "
+                          "console gateway.") % node_uuid)
+        host = self.host
+        if netutils.is_valid_ipv6(host):
+            host = '[%s]' % host
+        return 'tcp://%s:%s/%s?token=%s' % (host, self.port, node_uuid,
+                                            session.token)
+
+
+_GATEWAY = None
+
+
+def get_gateway():
+    """Return the console gateway of this process."""
+    global _GATEWAY
+
+    if _GATEWAY is None:
+        _GATEWAY = ConsoleGateway(CONF.console.gateway_host,
+                                  CONF.console.gateway_port)
+    return _GATEWAY
+
+
+def reset():
+    """Stop and discard the console gateway of this process."""
+    global _GATEWAY
+
+    if _GATEWAY is not None:
+        _GATEWAY.stop()
+        _GATEWAY = None
+
+
+def is_enabled():
+    return CONF.console.gateway_enabled
+
+
+def start_console(node_uuid, console_cmd):
+    """Enable the console of a node on the gateway."""
+    get_gateway().register(node_uuid, console_cmd)
+
+
+def stop_console(node_uuid):
+    """Disable the console of a node on the gateway."""
+    if not get_gateway().unregister(node_uuid):
+        LOG.warning(_LW("No console gateway session found for node %s "
+                        "while trying to stop its console."), node_uuid)
+
+
+def get_console(node_uuid):
+    """Get the console information of a node for the API."""
+    return {'type': 'gateway',
+            'url': get_gateway().get_console_url(node_uuid)}
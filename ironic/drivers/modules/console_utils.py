@@ -32,6 +32,7 @@ from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common.i18n import _LW
 from ironic.common import utils
+from ironic.drivers.modules import console_gateway
 from ironic.openstack.common import log as logging
 from ironic.openstack.common import loopingcall
 
@@ -265,3 +266,48 @@ def stop_shellinabox_console(node_uuid):
             msg = (_("Could not stop the console for node '%(node)s'. "
                      "Reason: %(err)s.") % {'node': node_uuid, 'err': exc})
             raise exception.ConsoleError(message=msg)
+
+
+def start_console(node_uuid, port, console_cmd):
+    """Open the serial console for a node.
+
+    The console is served by the in-process console gateway if it is
+    enabled, and by a shellinabox daemon otherwise.
+
+    :param node_uuid: the uuid for the node.
+    :param port: the terminal port for the node. Not used by the gateway.
+    :param console_cmd: the shell command that gets the console.
+    :raises: ConsoleError if the console could not be set up.
+    :raises: ConsoleSubprocessFailed when invoking the subprocess failed.
+    """
+    if console_gateway.is_enabled():
+        console_gateway.start_console(node_uuid, console_cmd)
+    else:
+        start_shellinabox_console(node_uuid, port, console_cmd)
+
+
+def stop_console(node_uuid):
+    """Close the serial console for a node.
+
+    :param node_uuid: the UUID of the node
+    :raises: ConsoleError if unable to stop the console
+    """
+    if console_gateway.is_enabled():
+        console_gateway.stop_console(node_uuid)
+    else:
+        stop_shellinabox_console(node_uuid)
+
+
+def get_console(node_uuid, port):
+    """Get the type and connection information about a node console.
+
+    :param node_uuid: the UUID of the node
+    :param port: the terminal port for the node. Not used by the gateway.
+    :raises: ConsoleError if the console is served by the gateway and is
+             not enabled.
+    :returns: a dictionary with the console type and url.
+    """
+    if console_gateway.is_enabled():
+        return console_gateway.get_console(node_uuid)
+    return {'type': 'shellinabox',
+            'url': get_shellinabox_console_url(port)}
@@ -16,15 +16,15 @@
 
 import base64
 import contextlib
-import gzip
 import math
 import os
 import re
-import shutil
 import socket
 import stat
+import struct
 import tempfile
 import time
+import zlib
 
 from oslo_concurrency import processutils
 from oslo_config import cfg
@@ -39,6 +39,7 @@ from ironic.common import disk_partitioner
 from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common.i18n import _LE
+from ironic.common.i18n import _LI
 from ironic.common.i18n import _LW
 from ironic.common import images
 from ironic.common import states
@@ -59,6 +60,15 @@ deploy_opts = [
     cfg.StrOpt('dd_block_size',
                default='1M',
                help='Block size to use when writing to the nodes disk.'),
+    cfg.BoolOpt('sparse_image_write',
+                default=False,
+                help='Skip the blocks of images that contain only zeros '
+                     'instead of writing them to the nodes disk during '
+                     'iSCSI deploys. Non-raw images are converted to '
+                     'sparse raw files on the conductor first. Only enable '
+                     'this if the disks read back zeros from blocks never '
+                     'written (e.g. they are wiped or thin provisioned), as '
+                     'skipped blocks keep their previous content.'),
     cfg.IntOpt('iscsi_verify_attempts',
                default=3,
                help='Maximum attempts to verify an iSCSI connection is '
@@ -68,6 +78,12 @@ deploy_opts = [
 CONF = cfg.CONF
 CONF.register_opts(deploy_opts, group='deploy')
 
+# Size of the buffers used to download, decode and uncompress configdrives.
+_CONFIGDRIVE_CHUNK_SIZE = 64 * units.Ki
+
+# Characters skipped by base64.b64decode.
+_BASE64_IGNORED_CHARS = re.compile('[^A-Za-z0-9+/=]')
+
 LOG = logging.getLogger(__name__)
 
 VALID_ROOT_DEVICE_HINTS = set(('size', 'model', 'wwn', 'serial', 'vendor'))
@@ -311,12 +327,51 @@ def dd(src, dst):
     utils.dd(src, dst, 'bs=%s' % CONF.deploy.dd_block_size, 'oflag=direct')
 
 
+def _sparse_dd(src, dst):
+    """Execute dd from src to dst, skipping blocks that contain only zeros.
+
+    Logs how much data was written and the throughput.
+    """
+    stat_result = os.stat(src)
+    size = stat_result.st_size
+    # NOTE: holes of sparse files are never written, zero blocks that are
+    # actually allocated are skipped too but are not accounted for here.
+    allocated = min(size, stat_result.st_blocks * 512)
+    start = time.time()
+    utils.dd(src, dst, 'bs=%s' % CONF.deploy.dd_block_size, 'oflag=direct',
+             'conv=sparse')
+    elapsed = max(time.time() - start, 0.001)
+    LOG.info(_LI('Wrote image %(src)s to %(dst)s in %(time).1f seconds: '
+                 '%(size)d MiB image, at most %(written)d MiB written, at '
+                 'least %(skipped)d MiB of zeros skipped (%(rate).1f MiB/s).'),
+             {'src': src, 'dst': dst, 'time': elapsed,
+              'size': size // units.Mi, 'written': allocated // units.Mi,
+              'skipped': (size - allocated) // units.Mi,
+              'rate': float(size) / units.Mi / elapsed})
+
+
 def populate_image(src, dst):
     data = images.qemu_img_info(src)
+    if not CONF.deploy.sparse_image_write:
+        if data.file_format == 'raw':
+            dd(src, dst)
+        else:
+            images.convert_image(src, dst, 'raw', True)
+        return
+
     if data.file_format == 'raw':
-        dd(src, dst)
-    else:
-        images.convert_image(src, dst, 'raw', True)
+        _sparse_dd(src, dst)
+        return
+
+    # NOTE: qemu-img writes every block to devices, including zero ones, so
+    # convert to a (sparse) raw file locally and copy that instead.
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(src) or None)
+    try:
+        raw_path = os.path.join(tmp_dir, 'image.raw')
+        images.convert_image(src, raw_path, 'raw')
+        _sparse_dd(raw_path, dst)
+    finally:
+        utils.rmtree_without_raise(tmp_dir)
 
 
 # TODO(rameshg87): Remove this one-line method and use utils.mkfs
@@ -479,9 +534,89 @@ def destroy_disk_metadata(dev, node_uuid):
                            'error': err.stderr})
 
 
+def _iter_configdrive_chunks(configdrive, is_url):
+    """Iterate over the base64 encoded configdrive in fixed size chunks."""
+    if is_url:
+        resp = requests.get(configdrive, stream=True)
+        for chunk in resp.iter_content(_CONFIGDRIVE_CHUNK_SIZE):
+            yield chunk
+    else:
+        for start in six.moves.range(0, len(configdrive),
+                                     _CONFIGDRIVE_CHUNK_SIZE):
+            yield configdrive[start:start + _CONFIGDRIVE_CHUNK_SIZE]
+
+
+def _iter_base64_decode(chunks):
+    """Decode base64 data given as an iterable of chunks.
+
+    :raises: TypeError if the data is not base64 encoded.
+    """
+    remainder = ''
+    for chunk in chunks:
+        data = remainder + _BASE64_IGNORED_CHARS.sub('', chunk)
+        # NOTE: decode whole 4 character groups only, the rest is kept
+        # until the next chunk arrives.
+        split = len(data) - len(data) % 4
+        remainder = data[split:]
+        if split:
+            yield base64.b64decode(data[:split])
+    if remainder:
+        yield base64.b64decode(remainder)
+
+
+def _iter_gunzip(chunks):
+    """Uncompress gzip data given as an iterable of chunks.
+
+    The data may be made of several gzip members, like the output of
+    ``cat a.gz b.gz``. zlib stops at the end of each member, leaving the
+    data which follows in unused_data. It does not report whether the end
+    of the last member was reached (zlib decompressor objects have no
+    ``eof`` attribute on Python 2), so the trailer of each member, made of
+    the CRC32 and the size of the uncompressed data, is tracked to detect
+    truncated data.
+
+    :raises: zlib.error if the data is not gzipped or is truncated.
+    """
+    decompressor = None
+    for data in chunks:
+        while data:
+            if decompressor is None:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                crc, size, tail = 0, 0, b''
+            out = decompressor.decompress(data, _CONFIGDRIVE_CHUNK_SIZE)
+            crc = zlib.crc32(out, crc)
+            size += len(out)
+            if out:
+                yield out
+            if decompressor.unused_data:
+                # NOTE: end of the member, the rest is the next member
+                data = decompressor.unused_data
+                decompressor = None
+            else:
+                consumed = len(data) - len(decompressor.unconsumed_tail)
+                tail = (tail + data[:consumed])[-8:]
+                data = decompressor.unconsumed_tail
+        if decompressor is not None and tail == struct.pack(
+                '<II', crc & 0xffffffff, size & 0xffffffff):
+            # NOTE: the member ended exactly at the end of the chunk
+            decompressor = None
+
+    if decompressor is not None:
+        out = decompressor.flush()
+        crc = zlib.crc32(out, crc)
+        size += len(out)
+        if out:
+            yield out
+        if tail != struct.pack('<II', crc & 0xffffffff, size & 0xffffffff):
+            raise zlib.error(_('The compressed data is truncated.'))
+
+
 def _get_configdrive(configdrive, node_uuid):
     """Get the information about size and location of the configdrive.
 
+    The configdrive is downloaded, decoded and uncompressed as a stream, so
+    only a small fixed size buffer is kept in memory.
+
     :param configdrive: Base64 encoded Gzipped configdrive content or
         configdrive HTTP URL.
     :param node_uuid: Node's uuid. Used for logging.
@@ -493,48 +628,42 @@ def _get_configdrive(configdrive, node_uuid):
     """
     # Check if the configdrive option is a HTTP URL or the content directly
     is_url = utils.is_http_url(configdrive)
-    if is_url:
-        try:
-            data = requests.get(configdrive).content
-        except requests.exceptions.RequestException as e:
-            raise exception.InstanceDeployFailure(
-                _("Can't download the configdrive content for node %(node)s "
-                  "from '%(url)s'. Reason: %(reason)s") %
-                {'node': node_uuid, 'url': configdrive, 'reason': e})
-    else:
-        data = configdrive
+    chunks = _iter_configdrive_chunks(configdrive, is_url)
 
+    configdrive_file = tempfile.NamedTemporaryFile(delete=False,
+                                                   prefix='configdrive')
+    configdrive_mb = 0
     try:
-        data = six.StringIO(base64.b64decode(data))
+        for data in _iter_gunzip(_iter_base64_decode(chunks)):
+            configdrive_file.write(data)
+    except requests.exceptions.RequestException as e:
+        utils.unlink_without_raise(configdrive_file.name)
+        raise exception.InstanceDeployFailure(
+            _("Can't download the configdrive content for node %(node)s "
+              "from '%(url)s'. Reason: %(reason)s") %
+            {'node': node_uuid, 'url': configdrive, 'reason': e})
     except TypeError:
+        utils.unlink_without_raise(configdrive_file.name)
         error_msg = (_('Config drive for node %s is not base64 encoded '
                        'or the content is malformed.') % node_uuid)
         if is_url:
             error_msg += _(' Downloaded from "%s".') % configdrive
         raise exception.InstanceDeployFailure(error_msg)
+    except (EnvironmentError, zlib.error) as e:
+        # Delete the created file
+        utils.unlink_without_raise(configdrive_file.name)
+        raise exception.InstanceDeployFailure(
+            _('Encountered error while decompressing and writing '
+              'config drive for node %(node)s. Error: %(exc)s') %
+            {'node': node_uuid, 'exc': e})
+    else:
+        # Get the file size and convert to MiB
+        bytes_ = configdrive_file.tell()
+        configdrive_mb = int(math.ceil(float(bytes_) / units.Mi))
+    finally:
+        configdrive_file.close()
 
-    configdrive_file = tempfile.NamedTemporaryFile(delete=False,
-                                                   prefix='configdrive')
-    configdrive_mb = 0
-    with gzip.GzipFile('configdrive', 'rb', fileobj=data) as gunzipped:
-        try:
-            shutil.copyfileobj(gunzipped, configdrive_file)
-        except EnvironmentError as e:
-            # Delete the created file
-            utils.unlink_without_raise(configdrive_file.name)
-            raise exception.InstanceDeployFailure(
-                _('Encountered error while decompressing and writing '
-                  'config drive for node %(node)s. Error: %(exc)s') %
-                {'node': node_uuid, 'exc': e})
-        else:
-            # Get the file size and convert to MiB
-            configdrive_file.seek(0, os.SEEK_END)
-            bytes_ = configdrive_file.tell()
-            configdrive_mb = int(math.ceil(float(bytes_) / units.Mi))
-        finally:
-            configdrive_file.close()
-
-        return (configdrive_mb, configdrive_file.name)
+    return (configdrive_mb, configdrive_file.name)
 
 
 def work_on_disk(dev, root_mb, swap_mb, ephemeral_mb, ephemeral_format,
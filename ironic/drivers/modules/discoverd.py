@@ -19,6 +19,7 @@ import eventlet
 from oslo_config import cfg
 from oslo_utils import importutils
 
+from ironic.common import driver_factory
 from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common.i18n import _LE
@@ -42,7 +43,11 @@ discoverd_opts = [
                'will be used.'),
     cfg.IntOpt('status_check_period', default=60,
                help='period (in seconds) to check status of nodes '
-               'on inspection')
+               'on inspection'),
+    cfg.IntOpt('status_check_concurrency', default=10,
+               help='maximum number of concurrent requests to '
+               'ironic-discoverd when checking status of nodes on '
+               'inspection'),
 ]
 
 CONF = cfg.CONF
@@ -129,20 +134,54 @@ class DiscoverdInspect(base.InspectInterface):
     @base.driver_periodic_task(spacing=CONF.discoverd.status_check_period,
                                enabled=CONF.discoverd.enabled)
     def _periodic_check_result(self, manager, context):
-        """Periodic task checking results of inspection."""
-        filters = {'provision_state': states.INSPECTING}
-        node_iter = manager.iter_nodes(filters=filters)
+        """Periodic task checking results of inspection.
 
-        for node_uuid, driver in node_iter:
+        Statuses are fetched concurrently and without locking the nodes,
+        reusing a single admin token. Nodes are only locked when their
+        inspection has finished or failed.
+        """
+        filters = {'provision_state': states.INSPECTING}
+        node_uuids = [node_uuid for node_uuid, driver
+                      in manager.iter_nodes(filters=filters)
+                      if _is_discoverd_driver(driver)]
+        if not node_uuids:
+            return
+
+        # NOTE(dtantsur): periodic tasks do not have proper tokens in context
+        try:
+            context.auth_token = keystone.get_admin_auth_token()
+        except Exception:
+            LOG.exception(_LE('Failed to get an admin token to check the '
+                              'inspection status of nodes, will retry '
+                              'later'))
+            return
+
+        LOG.debug('Calling to discoverd to check status of %d nodes',
+                  len(node_uuids))
+        pool = eventlet.GreenPool(
+            size=max(1, CONF.discoverd.status_check_concurrency))
+        statuses = pool.imap(lambda uuid: (uuid, _get_status(uuid, context)),
+                             node_uuids)
+
+        for node_uuid, status in statuses:
+            if not status or not (status.get('error') or
+                                  status.get('finished')):
+                continue
             try:
-                # TODO(dtantsur): we need an exclusive lock only once
-                # inspection is finished.
                 with task_manager.acquire(context, node_uuid) as task:
-                    _check_status(task)
+                    _check_status(task, status)
             except (exception.NodeLocked, exception.NodeNotFound):
                 continue
 
 
+def _is_discoverd_driver(driver_name):
+    try:
+        driver = driver_factory.get_driver(driver_name)
+    except exception.DriverNotFound:
+        return False
+    return isinstance(driver.inspect, DiscoverdInspect)
+
+
 def _call_discoverd(func, uuid, context):
     """Wrapper around calls to discoverd."""
     # NOTE(dtantsur): due to bug #1428652 None is not accepted for base_url.
@@ -170,27 +209,34 @@ def _start_inspection(node_uuid, context):
                  node_uuid)
 
 
-def _check_status(task):
-    """Check inspection status for node given by a task."""
-    node = task.node
-    if node.provision_state != states.INSPECTING:
-        return
-    if not isinstance(task.driver.inspect, DiscoverdInspect):
-        return
-
-    LOG.debug('Calling to discoverd to check status of node %s',
-              task.node.uuid)
+def _get_status(node_uuid, context):
+    """Get inspection status of a node from discoverd.
 
-    # NOTE(dtantsur): periodic tasks do not have proper tokens in context
-    task.context.auth_token = keystone.get_admin_auth_token()
+    :returns: the status dictionary or None if discoverd could not be
+              contacted.
+    """
     try:
-        status = _call_discoverd(client.get_status, node.uuid, task.context)
+        return _call_discoverd(client.get_status, node_uuid, context)
     except Exception:
         # NOTE(dtantsur): get_status should not normally raise
         # let's assume it's a transient failure and retry later
         LOG.exception(_LE('Unexpected exception while getting '
                           'inspection status for node %s, will retry later'),
-                      node.uuid)
+                      node_uuid)
+
+
+def _check_status(task, status):
+    """Process inspection status of a node given by a task.
+
+    :param task: a task from TaskManager with an exclusive lock.
+    :param status: the status returned by discoverd for the node.
+    """
+    node = task.node
+    # NOTE(dtantsur): the status was fetched before locking the node, so
+    # it might have changed in the meantime.
+    if node.provision_state != states.INSPECTING:
+        return
+    if not isinstance(task.driver.inspect, DiscoverdInspect):
         return
 
     if status.get('error'):
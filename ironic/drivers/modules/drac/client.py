@@ -22,6 +22,7 @@ from oslo_utils import importutils
 
 from ironic.common import exception
 from ironic.common.i18n import _LW
+from ironic.common import native_executor
 from ironic.drivers.modules.drac import common as drac_common
 from ironic.openstack.common import log as logging
 
@@ -49,7 +50,9 @@ def get_wsman_client(node):
     """Return a DRAC client object.
 
     Given an ironic node object, this method gives back a
-    Client object which is a wrapper for pywsman.Client.
+    Client object which is a wrapper for pywsman.Client. A new object is
+    returned every time, as pywsman clients are not thread-safe and cannot
+    be shared between the calls running in native threads.
 
     :param node: an ironic node object.
     :returns: a Client object.
@@ -62,11 +65,15 @@ def get_wsman_client(node):
 
 
 def retry_on_empty_response(client, action, *args, **kwargs):
-    """Wrapper to retry an action on failure."""
+    """Wrapper to retry an action on failure.
+
+    The pywsman call itself is run in a native thread, so that waiting for
+    the DRAC does not block other green threads.
+    """
 
     func = getattr(client, action)
     for i in range(RETRY_COUNT):
-        response = func(*args, **kwargs)
+        response = native_executor.execute(func, *args, **kwargs)
         if response:
             return response
         else:
@@ -94,6 +101,11 @@ class Client(object):
         # TODO(ifarkas): Add support for CACerts
         pywsman.wsman_transport_set_verify_peer(pywsman_client, False)
         pywsman.wsman_transport_set_verify_host(pywsman_client, False)
+        # NOTE: the calls run in native threads, which are only freed
+        # when the call returns, so they must not wait forever.
+        timeout = native_executor.get_transport_timeout()
+        if timeout:
+            pywsman.wsman_transport_set_timeout(pywsman_client, timeout)
 
         self.client = pywsman_client
 
@@ -30,6 +30,7 @@ from ironic.common.i18n import _LI
 from ironic.common import images
 from ironic.common import swift
 from ironic.common import utils
+from ironic.drivers.modules import client_cache
 from ironic.drivers.modules import deploy_utils
 from ironic.openstack.common import log as logging
 
@@ -88,6 +89,8 @@ BOOT_MODE_GENERIC_TO_ILO = {'bios': 'legacy', 'uefi': 'uefi'}
 BOOT_MODE_ILO_TO_GENERIC = dict((v, k)
                            for (k, v) in BOOT_MODE_GENERIC_TO_ILO.items())
 
+_CLIENT_CACHE = client_cache.ClientCache('ilo')
+
 
 def parse_driver_info(node):
     """Gets the driver specific Node info.
@@ -144,7 +147,8 @@ def get_ilo_object(node):
     """Gets an IloClient object from proliantutils library.
 
     Given an ironic node object, this method gives back a IloClient object
-    to do operations on the iLO.
+    to do operations on the iLO. Client objects are cached and shared
+    between calls using the same driver_info.
 
     :param node: an ironic node object.
     :returns: an IloClient object.
@@ -153,12 +157,16 @@ def get_ilo_object(node):
         is missing on the node
     """
     driver_info = parse_driver_info(node)
-    ilo_object = ilo_client.IloClient(driver_info['ilo_address'],
-                                      driver_info['ilo_username'],
-                                      driver_info['ilo_password'],
-                                      driver_info['client_timeout'],
-                                      driver_info['client_port'])
-    return ilo_object
+
+    def _create_client():
+        ilo_object = ilo_client.IloClient(driver_info['ilo_address'],
+                                          driver_info['ilo_username'],
+                                          driver_info['ilo_password'],
+                                          driver_info['client_timeout'],
+                                          driver_info['client_port'])
+        return ilo_object
+
+    return _CLIENT_CACHE.get(node.uuid, driver_info, _create_client)
 
 
 def get_ilo_license(node):
@@ -15,9 +15,12 @@
 iLO Deploy Driver(s) and supporting methods.
 """
 
+import hashlib
 import tempfile
 
+from oslo_concurrency import lockutils
 from oslo_config import cfg
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
 
 from ironic.common import boot_devices
@@ -57,6 +60,23 @@ clean_opts = [
                     'disabled and will not run during cleaning.')
               ]
 
+boot_iso_opts = [
+    cfg.BoolOpt('use_shared_boot_iso',
+                default=False,
+                help='Share the boot ISOs generated from the kernel and '
+                     'ramdisk of the deployed image between all the nodes '
+                     'booting identical ones, instead of building one per '
+                     'node. Shared boot ISOs are not deleted when the '
+                     'nodes are torn down, Swift expires them once no node '
+                     'has used them for shared_boot_iso_ttl seconds.'),
+    cfg.IntOpt('shared_boot_iso_ttl',
+               default=604800,
+               help='Time (in seconds) after which Swift deletes a shared '
+                    'boot ISO that is not used anymore. The conductors '
+                    'extend the life of the shared boot ISOs used by their '
+                    'nodes every quarter of this time.'),
+]
+
 REQUIRED_PROPERTIES = {
     'ilo_deploy_iso': _("UUID (from Glance) of the deployment ISO. "
                     "Required.")
@@ -68,6 +88,9 @@ CONF.import_opt('pxe_append_params', 'ironic.drivers.modules.iscsi_deploy',
 CONF.import_opt('swift_ilo_container', 'ironic.drivers.modules.ilo.common',
                 group='ilo')
 CONF.register_opts(clean_opts, group='ilo')
+CONF.register_opts(boot_iso_opts, group='ilo')
+
+SHARED_BOOT_ISO_PREFIX = 'boot-iso-'
 
 
 def _get_boot_iso_object_name(node):
@@ -78,6 +101,86 @@ def _get_boot_iso_object_name(node):
     return "boot-%s" % node.uuid
 
 
+def _get_shared_boot_iso_object_name(kernel_href, ramdisk_href,
+                                     deploy_iso_href, root_uuid,
+                                     kernel_params, boot_mode):
+    """Returns the object name of a shared boot iso.
+
+    The name is derived from everything the content of the boot ISO
+    depends on, so that identical boot ISOs have the same name.
+    """
+    # NOTE: the deploy ISO is only used to build UEFI boot ISOs.
+    if boot_mode != 'uefi':
+        deploy_iso_href = None
+    key = jsonutils.dumps([kernel_href, ramdisk_href, deploy_iso_href,
+                           root_uuid, kernel_params, boot_mode])
+    return SHARED_BOOT_ISO_PREFIX + hashlib.sha256(key).hexdigest()
+
+
+def _get_shared_boot_iso_headers():
+    """Returns the Swift headers setting the expiry of a shared boot iso."""
+    return {'X-Delete-After': str(CONF.ilo.shared_boot_iso_ttl)}
+
+
+def _get_shared_boot_iso(task, kernel_href, ramdisk_href, deploy_iso_href,
+                         root_uuid, kernel_params, boot_mode):
+    """Gets a shared boot ISO in Swift, creating it if needed.
+
+    Shared boot ISOs are never deleted explicitly, since another conductor
+    may be about to reuse them. Swift expires them once they have not been
+    used for [ilo]shared_boot_iso_ttl seconds, see
+    :meth:`VendorPassthru._refresh_shared_boot_isos`.
+
+    :returns: the name of the boot ISO object in Swift.
+    :raises: SwiftOperationError, if operation with Swift fails.
+    :raises: ImageCreationFailed, if creation of boot ISO failed.
+    """
+    container = CONF.ilo.swift_ilo_container
+    object_name = _get_shared_boot_iso_object_name(
+        kernel_href, ramdisk_href, deploy_iso_href, root_uuid,
+        kernel_params, boot_mode)
+    headers = _get_shared_boot_iso_headers()
+    swift_api = swift.SwiftAPI()
+
+    # NOTE: nodes deployed at the same time on this conductor mostly use
+    # the same boot ISO, only build it once.
+    with lockutils.lock(object_name):
+        # NOTE: extending the life of the boot ISO fails if it does not
+        # exist or has already expired, in which case it is built again.
+        try:
+            swift_api.update_object_meta(container, object_name, headers)
+        except exception.SwiftOperationError:
+            pass
+        else:
+            LOG.debug("Reusing shared boot_iso %(iso)s in Swift for node "
+                      "%(node)s", {'iso': object_name,
+                                   'node': task.node.uuid})
+            return object_name
+
+        with tempfile.NamedTemporaryFile() as fileobj:
+            boot_iso_tmp_file = fileobj.name
+            images.create_boot_iso(task.context, boot_iso_tmp_file,
+                                   kernel_href, ramdisk_href,
+                                   deploy_iso_href, root_uuid,
+                                   kernel_params, boot_mode)
+            swift_api.create_object(container, object_name,
+                                    boot_iso_tmp_file,
+                                    object_headers=headers)
+
+    LOG.debug("Created shared boot_iso %s in Swift", object_name)
+    return object_name
+
+
+def _get_shared_boot_iso_name(node_instance_info):
+    """Returns the name of the shared boot ISO used by a node, if any."""
+    ilo_boot_iso = (node_instance_info or {}).get('ilo_boot_iso') or ''
+    if not ilo_boot_iso.startswith('swift:'):
+        return
+    object_name = ilo_boot_iso[len('swift:'):]
+    if object_name.startswith(SHARED_BOOT_ISO_PREFIX):
+        return object_name
+
+
 def _get_boot_iso(task, root_uuid):
     """This method returns a boot ISO to boot the node.
 
@@ -151,18 +254,19 @@ def _get_boot_iso(task, root_uuid):
                   {'image': image_href, 'node': task.node.uuid})
         return
 
-    # NOTE(rameshg87): Functionality to share the boot ISOs created for
-    # similar instances (instances with same deployed image) is
-    # not implemented as of now. Creation/Deletion of such a shared boot ISO
-    # will require synchronisation across conductor nodes for the shared boot
-    # ISO.  Such a synchronisation mechanism doesn't exist in ironic as of now.
-
     # Option 3 - Create boot_iso from kernel/ramdisk, upload to Swift
     # and provide its name.
     deploy_iso_uuid = deploy_info['ilo_deploy_iso']
     boot_mode = deploy_utils.get_boot_mode_for_deploy(task.node)
-    boot_iso_object_name = _get_boot_iso_object_name(task.node)
     kernel_params = CONF.pxe.pxe_append_params
+
+    if CONF.ilo.use_shared_boot_iso:
+        boot_iso_object_name = _get_shared_boot_iso(
+            task, kernel_href, ramdisk_href, deploy_iso_uuid, root_uuid,
+            kernel_params, boot_mode)
+        return 'swift:%s' % boot_iso_object_name
+
+    boot_iso_object_name = _get_boot_iso_object_name(task.node)
     container = CONF.ilo.swift_ilo_container
 
     with tempfile.NamedTemporaryFile() as fileobj:
@@ -188,6 +292,11 @@ def _clean_up_boot_iso_for_instance(node):
     ilo_boot_iso = node.instance_info.get('ilo_boot_iso')
     if not (ilo_boot_iso and ilo_boot_iso.startswith('swift')):
         return
+    if _get_shared_boot_iso_name(node.instance_info):
+        # NOTE: other nodes may use the same boot ISO, it expires once no
+        # conductor extends its life anymore.
+        return
+
     swift_api = swift.SwiftAPI()
     container = CONF.ilo.swift_ilo_container
     boot_iso_object_name = _get_boot_iso_object_name(node)
@@ -732,6 +841,36 @@ class VendorPassthru(agent_base_vendor.BaseAgentVendor):
         elif method == 'pass_bootloader_install_info':
             iscsi_deploy.validate_pass_bootloader_info_input(task, kwargs)
 
+    @base.driver_periodic_task(
+        spacing=max(1, CONF.ilo.shared_boot_iso_ttl // 4),
+        enabled=CONF.ilo.use_shared_boot_iso)
+    def _refresh_shared_boot_isos(self, manager, context):
+        """Periodic task extending the life of the shared boot ISOs.
+
+        Only the boot ISOs used by the nodes mapped to this conductor are
+        refreshed, those of the nodes mapped to other conductors are
+        refreshed by their own conductor.
+        """
+        object_names = set()
+        for node_uuid, driver, instance_info in manager.iter_nodes(
+                fields=['instance_info']):
+            object_name = _get_shared_boot_iso_name(instance_info)
+            if object_name:
+                object_names.add(object_name)
+        if not object_names:
+            return
+
+        container = CONF.ilo.swift_ilo_container
+        headers = _get_shared_boot_iso_headers()
+        swift_api = swift.SwiftAPI()
+        for object_name in object_names:
+            try:
+                swift_api.update_object_meta(container, object_name, headers)
+            except exception.SwiftOperationError as e:
+                LOG.warning(_LW("Failed to extend the life of the shared "
+                                "boot ISO %(iso)s. Error: %(error)s"),
+                            {'iso': object_name, 'error': e})
+
     def _configure_vmedia_boot(self, task, root_uuid):
         """Configure vmedia boot for the node."""
         node = task.node
@@ -525,9 +525,9 @@ class NativeIPMIShellinaboxConsole(base.ConsoleInterface):
                           'user': driver_info['username'],
                           'passwd_file': pw_file})
         try:
-            console_utils.start_shellinabox_console(driver_info['uuid'],
-                                                    driver_info['port'],
-                                                    console_cmd)
+            console_utils.start_console(driver_info['uuid'],
+                                        driver_info['port'],
+                                        console_cmd)
         except exception.ConsoleError:
             with excutils.save_and_reraise_exception():
                 utils.unlink_without_raise(path)
@@ -544,7 +544,7 @@ class NativeIPMIShellinaboxConsole(base.ConsoleInterface):
         """
         driver_info = _parse_driver_info(task.node)
         try:
-            console_utils.stop_shellinabox_console(driver_info['uuid'])
+            console_utils.stop_console(driver_info['uuid'])
         finally:
             password_file = _console_pwfile_path(driver_info['uuid'])
             utils.unlink_without_raise(password_file)
@@ -559,5 +559,5 @@ class NativeIPMIShellinaboxConsole(base.ConsoleInterface):
                 an integer.
         """
         driver_info = _parse_driver_info(task.node)
-        url = console_utils.get_shellinabox_console_url(driver_info['port'])
-        return {'type': 'shellinabox', 'url': url}
+        return console_utils.get_console(driver_info['uuid'],
+                                         driver_info['port'])
@@ -1029,9 +1029,9 @@ class IPMIShellinaboxConsole(base.ConsoleInterface):
             ipmi_cmd += " -v"
         ipmi_cmd += " sol activate"
         try:
-            console_utils.start_shellinabox_console(driver_info['uuid'],
-                                                    driver_info['port'],
-                                                    ipmi_cmd)
+            console_utils.start_console(driver_info['uuid'],
+                                        driver_info['port'],
+                                        ipmi_cmd)
         except (exception.ConsoleError, exception.ConsoleSubprocessFailed):
             with excutils.save_and_reraise_exception():
                 utils.unlink_without_raise(path)
@@ -1045,7 +1045,7 @@ class IPMIShellinaboxConsole(base.ConsoleInterface):
         """
         driver_info = _parse_driver_info(task.node)
         try:
-            console_utils.stop_shellinabox_console(driver_info['uuid'])
+            console_utils.stop_console(driver_info['uuid'])
         finally:
             utils.unlink_without_raise(
                     _console_pwfile_path(driver_info['uuid']))
@@ -1053,5 +1053,5 @@ class IPMIShellinaboxConsole(base.ConsoleInterface):
     def get_console(self, task):
         """Get the type and connection information about the console."""
         driver_info = _parse_driver_info(task.node)
-        url = console_utils.get_shellinabox_console_url(driver_info['port'])
-        return {'type': 'shellinabox', 'url': url}
+        return console_utils.get_console(driver_info['uuid'],
+                                         driver_info['port'])
@@ -20,6 +20,7 @@ from oslo_utils import importutils
 
 from ironic.common import exception
 from ironic.common.i18n import _
+from ironic.drivers.modules import client_cache
 from ironic.openstack.common import log as logging
 
 scci = importutils.try_import('scciclient.irmc.scci')
@@ -68,6 +69,8 @@ OPTIONAL_PROPERTIES = {
 COMMON_PROPERTIES = REQUIRED_PROPERTIES.copy()
 COMMON_PROPERTIES.update(OPTIONAL_PROPERTIES)
 
+_CLIENT_CACHE = client_cache.ClientCache('irmc')
+
 
 def parse_driver_info(node):
     """Gets the specific Node driver info.
@@ -122,7 +125,8 @@ def get_irmc_client(node):
     """Gets an iRMC SCCI client.
 
     Given an ironic node object, this method gives back a iRMC SCCI client
-    to do operations on the iRMC.
+    to do operations on the iRMC. Clients are cached and shared between
+    calls using the same driver_info.
 
     :param node: An ironic node object.
     :returns: scci_cmd partial function which takes a SCCI command param.
@@ -132,14 +136,17 @@ def get_irmc_client(node):
     """
     driver_info = parse_driver_info(node)
 
-    scci_client = scci.get_client(
-        driver_info['irmc_address'],
-        driver_info['irmc_username'],
-        driver_info['irmc_password'],
-        port=driver_info['irmc_port'],
-        auth_method=driver_info['irmc_auth_method'],
-        client_timeout=driver_info['irmc_client_timeout'])
-    return scci_client
+    def _create_client():
+        scci_client = scci.get_client(
+            driver_info['irmc_address'],
+            driver_info['irmc_username'],
+            driver_info['irmc_password'],
+            port=driver_info['irmc_port'],
+            auth_method=driver_info['irmc_auth_method'],
+            client_timeout=driver_info['irmc_client_timeout'])
+        return scci_client
+
+    return _CLIENT_CACHE.get(node.uuid, driver_info, _create_client)
 
 
 def update_ipmi_properties(task):
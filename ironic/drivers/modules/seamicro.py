@@ -33,6 +33,7 @@ from ironic.common.i18n import _LW
 from ironic.common import states
 from ironic.conductor import task_manager
 from ironic.drivers import base
+from ironic.drivers.modules import client_cache
 from ironic.drivers.modules import console_utils
 from ironic.openstack.common import log as logging
 from ironic.openstack.common import loopingcall
@@ -82,24 +83,58 @@ CONSOLE_PROPERTIES = {
 }
 PORT_BASE = 2000
 
+_CLIENT_CACHE = client_cache.ClientCache('seamicro')
+
 
 def _get_client(*args, **kwargs):
     """Creates the python-seamicro_client
 
+    Clients are authenticated when they are created, so they are cached and
+    shared by all the nodes of a chassis. See _forget_client_on_auth_error()
+    for dropping a client whose session has expired.
+
     :param kwargs: A dict of keyword arguments to be passed to the method,
                    which should contain: 'username', 'password',
-                   'auth_url', 'api_version' parameters.
+                   'api_endpoint', 'api_version' and 'uuid' parameters.
     :returns: SeaMicro API client.
     """
 
     cl_kwargs = {'username': kwargs['username'],
                  'password': kwargs['password'],
                  'auth_url': kwargs['api_endpoint']}
-    try:
-        return seamicro_client.Client(kwargs['api_version'], **cl_kwargs)
-    except seamicro_client_exception.UnsupportedVersion as e:
-        raise exception.InvalidParameterValue(_(
-            "Invalid 'seamicro_api_version' parameter. Reason: %s.") % e)
+
+    def _create_client():
+        try:
+            return seamicro_client.Client(kwargs['api_version'], **cl_kwargs)
+        except seamicro_client_exception.UnsupportedVersion as e:
+            raise exception.InvalidParameterValue(_(
+                "Invalid 'seamicro_api_version' parameter. Reason: %s.") % e)
+
+    return _CLIENT_CACHE.get(kwargs.get('uuid'), _client_credentials(kwargs),
+                             _create_client)
+
+
+def _client_credentials(driver_info):
+    """Return the parameters identifying the client of a chassis."""
+    return {'username': driver_info['username'],
+            'password': driver_info['password'],
+            'auth_url': driver_info['api_endpoint'],
+            'api_version': driver_info['api_version']}
+
+
+def _forget_client_on_auth_error(driver_info, ex):
+    """Drop the cached client if the chassis rejected its session.
+
+    The next call then authenticates again instead of failing until the
+    cached client expires.
+
+    :param driver_info: the parsed driver_info of the node.
+    :param ex: the exception raised by the SeaMicro client.
+    """
+    if getattr(ex, 'code', None) == 401:
+        LOG.debug("SeaMicro session rejected for node %s, authenticating "
+                  "again on the next call.", driver_info['uuid'])
+        _CLIENT_CACHE.invalidate(_client_credentials(driver_info))
 
 
 def _parse_driver_info(node):
@@ -194,6 +229,7 @@ def _get_power_status(node):
     except seamicro_client_exception.NotFound:
         raise exception.NodeNotFound(node=node.uuid)
     except seamicro_client_exception.ClientException as ex:
+        _forget_client_on_auth_error(seamicro_info, ex)
         LOG.error(_LE("SeaMicro client exception %(msg)s for node %(uuid)s"),
                   {'msg': ex.message, 'uuid': node.uuid})
         raise exception.ServiceUnavailable(message=ex.message)
@@ -229,7 +265,8 @@ def _power_on(node, timeout=None):
         try:
             retries[0] += 1
             server.power_on()
-        except seamicro_client_exception.ClientException:
+        except seamicro_client_exception.ClientException as ex:
+            _forget_client_on_auth_error(seamicro_info, ex)
             LOG.warning(_LW("Power-on failed for node %s."),
                         node.uuid)
 
@@ -269,7 +306,8 @@ def _power_off(node, timeout=None):
         try:
             retries[0] += 1
             server.power_off()
-        except seamicro_client_exception.ClientException:
+        except seamicro_client_exception.ClientException as ex:
+            _forget_client_on_auth_error(seamicro_info, ex)
             LOG.warning(_LW("Power-off failed for node %s."),
                         node.uuid)
 
@@ -310,7 +348,8 @@ def _reboot(node, timeout=None):
         try:
             retries[0] += 1
             server.reset()
-        except seamicro_client_exception.ClientException:
+        except seamicro_client_exception.ClientException as ex:
+            _forget_client_on_auth_error(seamicro_info, ex)
             LOG.warning(_LW("Reboot failed for node %s."),
                         node.uuid)
 
@@ -475,6 +514,7 @@ class VendorPassthru(base.VendorInterface):
             server = server.refresh(5)
             server.set_untagged_vlan(vlan_id)
         except seamicro_client_exception.ClientException as ex:
+            _forget_client_on_auth_error(seamicro_info, ex)
             LOG.error(_LE("SeaMicro client exception: %s"), ex.message)
             raise exception.VendorPassthruException(message=ex.message)
 
@@ -514,6 +554,7 @@ class VendorPassthru(base.VendorInterface):
                 server = server.refresh(5)
                 server.attach_volume(volume_id)
             except seamicro_client_exception.ClientException as ex:
+                _forget_client_on_auth_error(seamicro_info, ex)
                 LOG.error(_LE("SeaMicro client exception: %s"), ex.message)
                 raise exception.VendorPassthruException(message=ex.message)
 
@@ -577,6 +618,7 @@ class Management(base.ManagementInterface):
             boot_device = _BOOT_DEVICES_MAP[device]
             server.set_boot_order(boot_device)
         except seamicro_client_exception.ClientException as ex:
+            _forget_client_on_auth_error(seamicro_info, ex)
             LOG.error(_LE("Seamicro set boot device failed for node "
                           "%(node)s with the following error: %(error)s"),
                       {'node': task.node.uuid, 'error': ex.message})
@@ -656,9 +698,9 @@ class ShellinaboxConsole(base.ConsoleInterface):
                           'chassis': chassis_ip,
                           'port': telnet_port})
 
-        console_utils.start_shellinabox_console(driver_info['uuid'],
-                                                driver_info['port'],
-                                                seamicro_cmd)
+        console_utils.start_console(driver_info['uuid'],
+                                    driver_info['port'],
+                                    seamicro_cmd)
 
     def stop_console(self, task):
         """Stop the remote console session for the node.
@@ -671,7 +713,7 @@ class ShellinaboxConsole(base.ConsoleInterface):
         """
 
         driver_info = _parse_driver_info(task.node)
-        console_utils.stop_shellinabox_console(driver_info['uuid'])
+        console_utils.stop_console(driver_info['uuid'])
 
     def get_console(self, task):
         """Get the type and connection information about the console.
@@ -682,5 +724,5 @@ class ShellinaboxConsole(base.ConsoleInterface):
         """
 
         driver_info = _parse_driver_info(task.node)
-        url = console_utils.get_shellinabox_console_url(driver_info['port'])
-        return {'type': 'shellinabox', 'url': url}
+        return console_utils.get_console(driver_info['uuid'],
+                                         driver_info['port'])
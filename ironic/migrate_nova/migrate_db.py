@@ -20,6 +20,7 @@ import sqlalchemy as sa
 from sqlalchemy.orm import sessionmaker
 
 from ironic.common import states as ironic_states
+from ironic.db.sqlalchemy import api as ironic_api
 from ironic.db.sqlalchemy import models as ironic_models
 from ironic.migrate_nova import nova_baremetal_states as nova_states
 from ironic.migrate_nova import nova_models
@@ -200,13 +201,19 @@ def convert_nova_ports(ports):
     return ironic_ports
 
 
-def save_ironic_objects(objects):
-    Session = sessionmaker(bind=IRONIC_ENGINE)
+def save_ironic_objects(objects,
+                        batch_size=ironic_api.BULK_CREATE_BATCH_SIZE):
+    Session = sessionmaker(bind=IRONIC_ENGINE, autocommit=True)
     session = Session()
 
+    saved = 0
     try:
-        session.add_all(objects)
-        session.commit()
+        # NOTE: objects are saved in batches, one transaction per batch, the
+        # same way as by the bulk creations of the Ironic API.
+        for batch in ironic_api.iter_batches(objects, batch_size):
+            ironic_api.add_batch(session, batch)
+            saved += len(batch)
+            print("Saved %d of %d objects..." % (saved, len(objects)))
     except sa.exc.OperationalError as err:
         print("Could not send data to Ironic:\n%s" % err, file=sys.stderr)
         sys.exit(2)
@@ -270,6 +277,12 @@ def parse_args():
                         default='/etc/nova/nova.conf',
                         help='Path to nova.conf. (default: '
                              '/etc/nova/nova.conf)')
+    parser.add_argument('--batch-size', type=int,
+                        required=False, dest='batch_size',
+                        default=ironic_api.BULK_CREATE_BATCH_SIZE,
+                        help='Number of objects saved to the Ironic '
+                             'database per transaction. (default: '
+                             '%d)' % ironic_api.BULK_CREATE_BATCH_SIZE)
     return parser.parse_args(sys.argv[1:])
 
 
@@ -296,7 +309,7 @@ def main():
                                       nova_conf)
 
     print("Saving nodes to Ironic...")
-    save_ironic_objects(ironic_nodes)
+    save_ironic_objects(ironic_nodes, args.batch_size)
 
     # Process ports
     print("Getting baremetal ports from Nova...")
@@ -306,7 +319,7 @@ def main():
     print("Converting Nova ports...")
     ironic_ports = convert_nova_ports(nova_ports)
     print("Saving ports to Ironic...")
-    save_ironic_objects(ironic_ports)
+    save_ironic_objects(ironic_ports, args.batch_size)
 
     # Printing summary
     print("All done!")
@@ -36,9 +36,11 @@ class NotSpecifiedSentinel:
     pass
 
 
-def get_attrname(name):
-    """Return the mangled name of the attribute's underlying storage."""
-    return '_%s' % name
+# Type functions which leave the values loaded from the database as they
+# are. They are skipped when loading objects from the database, see
+# IronicObject.obj_set_db_values().
+_DB_NOOP_TYPEFNS = frozenset([int, bool, obj_utils.int_or_none,
+                              obj_utils.str_or_none])
 
 
 def make_class_properties(cls):
@@ -54,18 +56,21 @@ def make_class_properties(cls):
         for name, field in supercls.fields.items():
             if name not in cls.fields:
                 cls.fields[name] = field
+    cls._db_typefns = [(name, None if typefn in _DB_NOOP_TYPEFNS else typefn)
+                       for name, typefn in cls.fields.iteritems()]
     for name, typefn in cls.fields.iteritems():
 
         def getter(self, name=name):
-            attrname = get_attrname(name)
-            if not hasattr(self, attrname):
+            try:
+                return self._obj_values[name]
+            except KeyError:
                 self.obj_load_attr(name)
-            return getattr(self, attrname)
+                return self._obj_values[name]
 
         def setter(self, value, name=name, typefn=typefn):
             self._changed_fields.add(name)
             try:
-                return setattr(self, get_attrname(name), typefn(value))
+                self._obj_values[name] = typefn(value)
             except Exception:
                 attr = "%s.%s" % (self.obj_name(), name)
                 LOG.exception(_LE('Error setting %(attr)s'),
@@ -198,14 +203,21 @@ class IronicObject(object):
         }
     obj_extra_fields = []
 
+    # The fields identifying an object, which are always included when
+    # only the changed fields are serialized (see obj_to_primitive()).
+    obj_identity_fields = []
+
     _attr_created_at_from_primitive = obj_utils.dt_deserializer
     _attr_updated_at_from_primitive = obj_utils.dt_deserializer
     _attr_created_at_to_primitive = obj_utils.dt_serializer('created_at')
     _attr_updated_at_to_primitive = obj_utils.dt_serializer('updated_at')
 
     def __init__(self, context, **kwargs):
+        # NOTE: the values of the fields which are set, by field name.
+        self._obj_values = {}
         self._changed_fields = set()
         self._context = context
+        self._obj_delta = False
         self.update(kwargs)
 
     @classmethod
@@ -270,6 +282,7 @@ class IronicObject(object):
                 setattr(self, name,
                         self._attr_from_primitive(name, objdata[name]))
         self._changed_fields = set([x for x in changes if x in self.fields])
+        self._obj_delta = primitive.get('ironic_object.delta', False)
         return self
 
     @classmethod
@@ -299,11 +312,10 @@ class IronicObject(object):
         # of issues by copying only our field data.
 
         nobj = self.__class__(self._context)
-        for name in self.fields:
-            if self.obj_attr_is_set(name):
-                nval = copy.deepcopy(getattr(self, name), memo)
-                setattr(nobj, name, nval)
+        for name, value in self._obj_values.iteritems():
+            nobj._obj_values[name] = copy.deepcopy(value, memo)
         nobj._changed_fields = set(self._changed_fields)
+        nobj._obj_delta = self._obj_delta
         return nobj
 
     def obj_clone(self):
@@ -323,23 +335,42 @@ class IronicObject(object):
         else:
             return getattr(self, attribute)
 
-    def obj_to_primitive(self):
+    def obj_to_primitive(self, delta=False):
         """Simple base-case dehydration.
 
         This calls self._attr_to_primitive() for each item in fields.
+
+        :param delta: if True, only serialize the identity fields and the
+                      changed fields, for receivers which load the rest
+                      of the object themselves. See obj_is_delta().
         """
+        changes = self.obj_what_changed()
+        if delta:
+            names = changes.union(self.obj_identity_fields)
+        else:
+            names = self.fields
         primitive = dict()
-        for name in self.fields:
-            if hasattr(self, get_attrname(name)):
+        for name in names:
+            if name in self._obj_values:
                 primitive[name] = self._attr_to_primitive(name)
         obj = {'ironic_object.name': self.obj_name(),
                'ironic_object.namespace': 'ironic',
                'ironic_object.version': self.VERSION,
                'ironic_object.data': primitive}
-        if self.obj_what_changed():
-            obj['ironic_object.changes'] = list(self.obj_what_changed())
+        if changes:
+            obj['ironic_object.changes'] = list(changes)
+        if delta:
+            obj['ironic_object.delta'] = True
         return obj
 
+    def obj_is_delta(self):
+        """Whether only the identity and changed fields were received.
+
+        The other fields of such an object are not set, the receiver has
+        to load them, e.g. from the database, and apply the changes.
+        """
+        return self._obj_delta
+
     def obj_load_attr(self, attrname):
         """Load an additional attribute from the real object.
 
@@ -390,7 +421,21 @@ class IronicObject(object):
             raise AttributeError(
                 _("%(objname)s object has no attribute '%(attrname)s'") %
                 {'objname': self.obj_name(), 'attrname': attrname})
-        return hasattr(self, get_attrname(attrname))
+        return attrname in self._obj_values
+
+    def obj_set_db_values(self, db_obj):
+        """Set all the fields from a database entity.
+
+        This is the fast path of the _from_db_object() methods. The type
+        functions which do not change the values loaded from the database
+        are skipped, and the fields are not marked as changed.
+
+        :param db_obj: a DB model or a dictionary with all the fields.
+        """
+        values = self._obj_values
+        for name, typefn in self._db_typefns:
+            value = db_obj[name]
+            values[name] = value if typefn is None else typefn(value)
 
     @property
     def obj_fields(self):
@@ -402,10 +447,10 @@ class IronicObject(object):
 
         NOTE(danms): May be removed in the future.
         """
-        for name in self.fields.keys() + self.obj_extra_fields:
-            if (hasattr(self, get_attrname(name)) or
-                    name in self.obj_extra_fields):
-                yield name, getattr(self, name)
+        for name, value in self._obj_values.iteritems():
+            yield name, value
+        for name in self.obj_extra_fields:
+            yield name, getattr(self, name)
 
     items = lambda self: list(self.iteritems())
 
@@ -428,7 +473,7 @@ class IronicObject(object):
 
         NOTE(danms): May be removed in the future.
         """
-        return hasattr(self, get_attrname(name))
+        return name in self._obj_values
 
     def get(self, key, value=NotSpecifiedSentinel):
         """For backwards-compatibility with dict-based objects.
@@ -453,9 +498,11 @@ class IronicObject(object):
             self[key] = value
 
     def as_dict(self):
-        return dict((k, getattr(self, k))
-                for k in self.fields
-                if hasattr(self, k))
+        values = dict(self._obj_values)
+        for k in self.fields:
+            if k not in values and hasattr(self, k):
+                values[k] = getattr(self, k)
+        return values
 
 
 class ObjectListBase(object):
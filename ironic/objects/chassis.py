@@ -28,7 +28,8 @@ class Chassis(base.IronicObject):
     #              only work with a uuid
     # Version 1.2: Add create() and destroy()
     # Version 1.3: Add list()
-    VERSION = '1.3'
+    # Version 1.4: Add use_slave to list()
+    VERSION = '1.4'
 
     dbapi = dbapi.get_instance()
 
@@ -47,8 +48,7 @@ class Chassis(base.IronicObject):
         :param db_chassis: A DB model of a chassis.
         :return: a :class:`Chassis` object.
         """
-        for field in chassis.fields:
-            chassis[field] = db_chassis[field]
+        chassis.obj_set_db_values(db_chassis)
 
         chassis.obj_reset_changes()
         return chassis
@@ -92,7 +92,7 @@ class Chassis(base.IronicObject):
 
     @base.remotable_classmethod
     def list(cls, context, limit=None, marker=None,
-             sort_key=None, sort_dir=None):
+             sort_key=None, sort_dir=None, use_slave=True):
         """Return a list of Chassis objects.
 
         :param context: Security context.
@@ -100,13 +100,16 @@ class Chassis(base.IronicObject):
         :param marker: pagination marker for large data sets.
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
+        :param use_slave: whether to read from the read-only database
+                          replica.
         :returns: a list of :class:`Chassis` object.
 
         """
         db_chassis = cls.dbapi.get_chassis_list(limit=limit,
                                                 marker=marker,
                                                 sort_key=sort_key,
-                                                sort_dir=sort_dir)
+                                                sort_dir=sort_dir,
+                                                use_slave=use_slave)
         return [Chassis._from_db_object(cls(context), obj)
                 for obj in db_chassis]
 
@@ -181,6 +184,6 @@ class Chassis(base.IronicObject):
         """
         current = self.__class__.get_by_uuid(self._context, uuid=self.uuid)
         for field in self.fields:
-            if (hasattr(self, base.get_attrname(field)) and
+            if (self.obj_attr_is_set(field) and
                     self[field] != current[field]):
                 self[field] = current[field]
@@ -33,8 +33,7 @@ class Conductor(base.IronicObject):
     @staticmethod
     def _from_db_object(conductor, db_obj):
         """Converts a database entity to a formal object."""
-        for field in conductor.fields:
-            conductor[field] = db_obj[field]
+        conductor.obj_set_db_values(db_obj)
 
         conductor.obj_reset_changes()
         return conductor
@@ -73,7 +72,7 @@ class Conductor(base.IronicObject):
         current = self.__class__.get_by_hostname(self._context,
                                                  hostname=self.hostname)
         for field in self.fields:
-            if (hasattr(self, base.get_attrname(field)) and
+            if (self.obj_attr_is_set(field) and
                     self[field] != current[field]):
                 self[field] = current[field]
 
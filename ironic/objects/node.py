@@ -36,7 +36,11 @@ class Node(base.IronicObject):
     # Version 1.9: Add driver_internal_info
     # Version 1.10: Add name and get_by_name()
     # Version 1.11: Add clean_step
-    VERSION = '1.11'
+    # Version 1.12: Add get_by_port_addresses()
+    # Version 1.13: Add change_seq and list_changes()
+    # Version 1.14: Add create_many()
+    # Version 1.15: Add use_slave to list()
+    VERSION = '1.15'
 
     dbapi = db_api.get_instance()
 
@@ -89,13 +93,18 @@ class Node(base.IronicObject):
             'inspection_started_at': obj_utils.datetime_or_str_or_none,
 
             'extra': obj_utils.dict_or_none,
+
+            # Set by the database layer each time the node is created or
+            # updated, see list_changes()
+            'change_seq': obj_utils.int_or_none,
             }
 
+    obj_identity_fields = ['id', 'uuid']
+
     @staticmethod
     def _from_db_object(node, db_node):
         """Converts a database entity to a formal object."""
-        for field in node.fields:
-            node[field] = db_node[field]
+        node.obj_set_db_values(db_node)
         node.obj_reset_changes()
         return node
 
@@ -157,9 +166,23 @@ class Node(base.IronicObject):
         node = Node._from_db_object(cls(context), db_node)
         return node
 
+    @base.remotable_classmethod
+    def get_by_port_addresses(cls, context, addresses):
+        """Get a node by associated port addresses.
+
+        :param context: Security context.
+        :param addresses: A list of port addresses.
+        :raises: NodeNotFound if the node is not found or if the ports
+                 match several nodes.
+        :returns: a :class:`Node` object.
+        """
+        db_node = cls.dbapi.get_node_by_port_addresses(addresses)
+        node = Node._from_db_object(cls(context), db_node)
+        return node
+
     @base.remotable_classmethod
     def list(cls, context, limit=None, marker=None, sort_key=None,
-             sort_dir=None, filters=None):
+             sort_dir=None, filters=None, use_slave=True):
         """Return a list of Node objects.
 
         :param context: Security context.
@@ -168,14 +191,39 @@ class Node(base.IronicObject):
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
         :param filters: Filters to apply.
+        :param use_slave: whether to read from the read-only database
+                          replica. Pass False when the nodes are about to be
+                          acted on.
         :returns: a list of :class:`Node` object.
 
         """
         db_nodes = cls.dbapi.get_node_list(filters=filters, limit=limit,
                                            marker=marker, sort_key=sort_key,
-                                           sort_dir=sort_dir)
+                                           sort_dir=sort_dir,
+                                           use_slave=use_slave)
         return [Node._from_db_object(cls(context), obj) for obj in db_nodes]
 
+    @base.remotable_classmethod
+    def list_changes(cls, context, since, until=None, limit=None):
+        """Return the nodes changed or deleted after a change sequence.
+
+        :param context: Security context.
+        :param since: a change sequence value, e.g. the change_seq of the
+                      last change returned by a previous call.
+        :param until: a change sequence value; only the nodes changed up to
+                      it are returned.
+        :param limit: maximum number of changes to return in a single result.
+        :returns: a tuple with a list of :class:`Node` object and a list of
+                  the deleted nodes, as dicts with a uuid and a change_seq,
+                  both ordered by change_seq.
+        """
+        db_nodes, db_deletions = cls.dbapi.get_node_changes(
+            since, until=until, limit=limit)
+        nodes = [Node._from_db_object(cls(context), obj) for obj in db_nodes]
+        deletions = [{'uuid': d.uuid, 'change_seq': d.change_seq}
+                     for d in db_deletions]
+        return nodes, deletions
+
     @base.remotable_classmethod
     def reserve(cls, context, tag, node_id):
         """Get and reserve a node.
@@ -206,6 +254,28 @@ class Node(base.IronicObject):
         """
         cls.dbapi.release_node(tag, node_id)
 
+    @base.remotable_classmethod
+    def create_many(cls, context, nodes):
+        """Create several Node records in the DB, in batched transactions.
+
+        :param context: Security context.
+        :param nodes: a list of Node objects, not created yet.
+        :returns: a list with, for each node, None if it was created,
+                  in which case the object is updated with the new record,
+                  or the exception raised when creating it.
+
+        """
+        results = cls.dbapi.create_nodes(
+            [node.obj_get_changes() for node in nodes])
+        errors = []
+        for node, result in zip(nodes, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+            else:
+                cls._from_db_object(node, result)
+                errors.append(None)
+        return errors
+
     @base.remotable
     def create(self, context=None):
         """Create a Node record in the DB.
@@ -262,7 +332,12 @@ class Node(base.IronicObject):
             # Clean driver_internal_info when changes driver
             self.driver_internal_info = {}
             updates = self.obj_get_changes()
-        self.dbapi.update_node(self.uuid, updates)
+        updated = self.dbapi.update_node_values(self.uuid, updates)
+        # Keep the timestamps computed by the database layer in sync
+        for field in ('provision_updated_at', 'inspection_started_at',
+                      'inspection_finished_at', 'change_seq'):
+            if field in updated:
+                self[field] = updated[field]
         self.obj_reset_changes()
 
     @base.remotable
@@ -278,6 +353,6 @@ class Node(base.IronicObject):
         """
         current = self.__class__.get_by_uuid(self._context, self.uuid)
         for field in self.fields:
-            if (hasattr(self, base.get_attrname(field)) and
+            if (self.obj_attr_is_set(field) and
                     self[field] != current[field]):
                 self[field] = current[field]
@@ -30,7 +30,10 @@ class Port(base.IronicObject):
     # Version 1.2: Add create() and destroy()
     # Version 1.3: Add list()
     # Version 1.4: Add list_by_node_id()
-    VERSION = '1.4'
+    # Version 1.5: Add list_by_addresses()
+    # Version 1.6: Add create_many()
+    # Version 1.7: Add use_slave to list()
+    VERSION = '1.7'
 
     dbapi = dbapi.get_instance()
 
@@ -45,8 +48,7 @@ class Port(base.IronicObject):
     @staticmethod
     def _from_db_object(port, db_port):
         """Converts a database entity to a formal object."""
-        for field in port.fields:
-            port[field] = db_port[field]
+        port.obj_set_db_values(db_port)
 
         port.obj_reset_changes()
         return port
@@ -107,9 +109,21 @@ class Port(base.IronicObject):
         port = Port._from_db_object(cls(context), db_port)
         return port
 
+    @base.remotable_classmethod
+    def list_by_addresses(cls, context, addresses):
+        """Return a list of Port objects matching any of the given addresses.
+
+        :param context: Security context.
+        :param addresses: a list of port addresses.
+        :returns: a list of :class:`Port` object.
+
+        """
+        db_ports = cls.dbapi.get_ports_by_addresses(addresses)
+        return Port._from_db_object_list(db_ports, cls, context)
+
     @base.remotable_classmethod
     def list(cls, context, limit=None, marker=None,
-             sort_key=None, sort_dir=None):
+             sort_key=None, sort_dir=None, use_slave=True):
         """Return a list of Port objects.
 
         :param context: Security context.
@@ -117,13 +131,16 @@ class Port(base.IronicObject):
         :param marker: pagination marker for large data sets.
         :param sort_key: column to sort results by.
         :param sort_dir: direction to sort. "asc" or "desc".
+        :param use_slave: whether to read from the read-only database
+                          replica.
         :returns: a list of :class:`Port` object.
 
         """
         db_ports = cls.dbapi.get_port_list(limit=limit,
                                            marker=marker,
                                            sort_key=sort_key,
-                                           sort_dir=sort_dir)
+                                           sort_dir=sort_dir,
+                                           use_slave=use_slave)
         return Port._from_db_object_list(db_ports, cls, context)
 
     @base.remotable_classmethod
@@ -146,6 +163,28 @@ class Port(base.IronicObject):
                                                   sort_dir=sort_dir)
         return Port._from_db_object_list(db_ports, cls, context)
 
+    @base.remotable_classmethod
+    def create_many(cls, context, ports):
+        """Create several Port records in the DB, in batched transactions.
+
+        :param context: Security context.
+        :param ports: a list of Port objects, not created yet.
+        :returns: a list with, for each port, None if it was created,
+                  in which case the object is updated with the new record,
+                  or the exception raised when creating it.
+
+        """
+        results = cls.dbapi.create_ports(
+            [port.obj_get_changes() for port in ports])
+        errors = []
+        for port, result in zip(ports, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+            else:
+                cls._from_db_object(port, result)
+                errors.append(None)
+        return errors
+
     @base.remotable
     def create(self, context=None):
         """Create a Port record in the DB.
@@ -212,6 +251,6 @@ class Port(base.IronicObject):
         """
         current = self.__class__.get_by_uuid(self._context, uuid=self.uuid)
         for field in self.fields:
-            if (hasattr(self, base.get_attrname(field)) and
+            if (self.obj_attr_is_set(field) and
                     self[field] != current[field]):
                 self[field] = current[field]
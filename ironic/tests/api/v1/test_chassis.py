@@ -61,6 +61,34 @@ class TestListChassis(api_base.FunctionalTest):
         self.assertIn('extra', data)
         self.assertIn('nodes', data)
 
+    def test_get_one_etag(self):
+        chassis = obj_utils.create_test_chassis(self.context)
+        etag = self.app.get('/v1/chassis/%s' % chassis.uuid).headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = self.app.get('/v1/chassis/%s' % chassis.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(b'', response.body)
+
+        chassis.description = 'updated'
+        chassis.save()
+        response = self.app.get('/v1/chassis/%s' % chassis.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
+    def test_list_etag(self):
+        obj_utils.create_test_chassis(self.context)
+        etag = self.app.get('/v1/chassis').headers['ETag']
+        response = self.app.get('/v1/chassis',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+
+        obj_utils.create_test_chassis(self.context,
+                                      uuid=uuidutils.generate_uuid())
+        response = self.app.get('/v1/chassis',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
     def test_detail(self):
         chassis = obj_utils.create_test_chassis(self.context)
         data = self.get_json('/chassis/detail')
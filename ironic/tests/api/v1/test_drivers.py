@@ -69,6 +69,16 @@ class TestListDrivers(base.FunctionalTest):
         self.validate_link(data['links'][0]['href'])
         self.validate_link(data['links'][1]['href'])
 
+    def test_drivers_cached(self):
+        self.register_fake_conductors()
+        self.get_json('/drivers')
+        with mock.patch.object(self.dbapi, 'get_active_driver_dict',
+                               autospec=True) as mock_d2c:
+            data = self.get_json('/drivers/%s' % self.d2)
+            self.assertEqual(sorted([self.h1, self.h2]), sorted(data['hosts']))
+            self.assertThat(self.get_json('/drivers')['drivers'], HasLength(2))
+            self.assertFalse(mock_d2c.called)
+
     def test_drivers_get_one_not_found(self):
         response = self.get_json('/drivers/%s' % self.d1, expect_errors=True)
         self.assertEqual(404, response.status_int)
@@ -16,8 +16,11 @@ Tests for the API /nodes/ methods.
 """
 
 import datetime
+import itertools
 import json
+import time
 
+import eventlet
 import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
@@ -130,6 +133,91 @@ class TestListNodes(test_api_base.FunctionalTest):
         # never expose the chassis_id
         self.assertNotIn('chassis_id', data)
 
+    def test_get_one_etag(self):
+        node = obj_utils.create_test_node(self.context)
+        response = self.app.get('/v1/nodes/%s' % node.uuid)
+        etag = response.headers['ETag']
+        self.assertEqual(etag, self.app.get('/v1/nodes/%s' % node.uuid)
+                         .headers['ETag'])
+
+        response = self.app.get('/v1/nodes/%s' % node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(b'', response.body)
+
+        node.extra = {'foo': 'bar'}
+        node.save()
+        response = self.app.get('/v1/nodes/%s' % node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_get_one_etag_reservation(self):
+        node = obj_utils.create_test_node(self.context)
+        etag = self.app.get('/v1/nodes/%s' % node.uuid).headers['ETag']
+        self.dbapi.reserve_node('fake-host', node.id)
+        response = self.app.get('/v1/nodes/%s' % node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
+    def test_get_one_etag_depends_on_version(self):
+        node = obj_utils.create_test_node(self.context)
+        etag = self.app.get('/v1/nodes/%s' % node.uuid).headers['ETag']
+        response = self.app.get(
+            '/v1/nodes/%s' % node.uuid,
+            headers={'If-None-Match': etag,
+                     api_base.Version.string: str(api_v1.MAX_VER)})
+        self.assertEqual(200, response.status_int)
+
+    def test_states_etag(self):
+        node = obj_utils.create_test_node(self.context)
+        etag = self.app.get('/v1/nodes/%s/states' % node.uuid).headers['ETag']
+        response = self.app.get('/v1/nodes/%s/states' % node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+
+        node.power_state = states.POWER_OFF
+        node.save()
+        response = self.app.get('/v1/nodes/%s/states' % node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
+    def test_list_etag(self):
+        obj_utils.create_test_node(self.context)
+        etag = self.app.get('/v1/nodes').headers['ETag']
+        with mock.patch.object(objects.Node, 'list',
+                               autospec=True) as mock_list:
+            response = self.app.get('/v1/nodes',
+                                    headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+        self.assertFalse(mock_list.called)
+
+        obj_utils.create_test_node(self.context,
+                                   uuid=uuidutils.generate_uuid())
+        response = self.app.get('/v1/nodes', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(2, len(response.json['nodes']))
+
+    def test_list_etag_reservation(self):
+        node = obj_utils.create_test_node(self.context)
+        etag = self.app.get('/v1/nodes').headers['ETag']
+        self.dbapi.reserve_node('fake-host', node.id)
+        response = self.app.get('/v1/nodes', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
+    def test_list_etag_filters(self):
+        node = obj_utils.create_test_node(self.context, maintenance=True)
+        etag = self.app.get('/v1/nodes?maintenance=false').headers['ETag']
+        node.extra = {'foo': 'bar'}
+        node.save()
+        # The updated node does not match the filters
+        response = self.app.get('/v1/nodes?maintenance=false',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+        response = self.app.get('/v1/nodes?maintenance=true',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
     def test_detail(self):
         node = obj_utils.create_test_node(self.context,
                                           chassis_id=self.chassis.id)
@@ -515,6 +603,258 @@ class TestListNodes(test_api_base.FunctionalTest):
         uuids = [n['uuid'] for n in data['nodes']]
         self.assertIn(node.uuid, uuids)
 
+    def test_state_filters(self):
+        self.dbapi.register_conductor({'hostname': 'host1',
+                                       'drivers': ['fake']})
+        conductor = self.dbapi.get_conductor('host1')
+        node1 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid(),
+                                           power_state=states.POWER_ON,
+                                           provision_state=states.ACTIVE,
+                                           conductor_affinity=conductor.id)
+        node2 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid(),
+                                           driver='fake_ipmitool',
+                                           power_state=states.POWER_OFF,
+                                           provision_state=states.AVAILABLE)
+        headers = {api_base.Version.string: '1.7'}
+
+        for query, expected in (('provision_state=active', node1),
+                                ('provision_state=available', node2),
+                                ('driver=fake_ipmitool', node2),
+                                ('power_state=power%20on', node1),
+                                ('conductor=host1', node1)):
+            data = self.get_json('/nodes?%s' % query, headers=headers)
+            self.assertEqual([expected.uuid],
+                             [n['uuid'] for n in data['nodes']])
+
+        data = self.get_json('/nodes/detail?provision_state=active&'
+                             'driver=fake_ipmitool', headers=headers)
+        self.assertEqual([], data['nodes'])
+
+    def test_state_filters_old_version(self):
+        response = self.get_json('/nodes?provision_state=active',
+                                 headers={api_base.Version.string: '1.6'},
+                                 expect_errors=True)
+        self.assertEqual(406, response.status_int)
+
+    def test_state_filters_in_next_link(self):
+        for i in range(3):
+            obj_utils.create_test_node(self.context,
+                                       uuid=uuidutils.generate_uuid(),
+                                       provision_state=states.ACTIVE)
+        data = self.get_json('/nodes?provision_state=active&limit=2',
+                             headers={api_base.Version.string: '1.7'})
+        self.assertIn('provision_state=active', data['next'])
+
+    def _get_next_marker(self, data):
+        query = urlparse.urlparse(data['next']).query
+        return urlparse.parse_qs(query)['marker'][0]
+
+    @mock.patch.object(objects.Node, 'get_by_uuid')
+    def test_keyset_pagination(self, mock_get_by_uuid):
+        uuids = [obj_utils.create_test_node(
+                     self.context, uuid=uuidutils.generate_uuid()).uuid
+                 for i in range(5)]
+        headers = {api_base.Version.string: '1.7'}
+
+        seen = []
+        url = '/nodes?limit=2'
+        while url:
+            data = self.get_json(url, headers=headers)
+            seen.extend(n['uuid'] for n in data['nodes'])
+            if 'next' not in data:
+                break
+            marker = self._get_next_marker(data)
+            self.assertFalse(uuidutils.is_uuid_like(marker))
+            url = '/nodes?limit=2&marker=%s' % marker
+
+        self.assertEqual(uuids, seen)
+        self.assertFalse(mock_get_by_uuid.called)
+
+    def test_keyset_pagination_sort_by_date(self):
+        start = datetime.datetime(2000, 1, 1, 0, 0)
+        uuids = []
+        for i in range(4):
+            node = obj_utils.create_test_node(
+                self.context, uuid=uuidutils.generate_uuid(),
+                provision_updated_at=start - datetime.timedelta(hours=i))
+            uuids.insert(0, node.uuid)
+        headers = {api_base.Version.string: '1.7'}
+
+        data = self.get_json('/nodes?limit=2&sort_key=provision_updated_at',
+                             headers=headers)
+        marker = self._get_next_marker(data)
+        data2 = self.get_json('/nodes?limit=2&sort_key=provision_updated_at'
+                              '&marker=%s' % marker, headers=headers)
+        self.assertEqual(uuids, [n['uuid'] for n in data['nodes']] +
+                                [n['uuid'] for n in data2['nodes']])
+
+    def test_keyset_marker_other_sort_key(self):
+        uuids = [obj_utils.create_test_node(
+                     self.context, uuid=uuidutils.generate_uuid()).uuid
+                 for i in range(3)]
+        headers = {api_base.Version.string: '1.7'}
+        data = self.get_json('/nodes?limit=1', headers=headers)
+        marker = self._get_next_marker(data)
+        data = self.get_json('/nodes?sort_key=uuid&marker=%s' % marker,
+                             headers=headers)
+        self.assertEqual(sorted(u for u in uuids if u > uuids[0]),
+                         [n['uuid'] for n in data['nodes']])
+
+    def test_uuid_marker_old_version(self):
+        uuids = [obj_utils.create_test_node(
+                     self.context, uuid=uuidutils.generate_uuid()).uuid
+                 for i in range(3)]
+        data = self.get_json('/nodes?limit=1',
+                             headers={api_base.Version.string: '1.6'})
+        self.assertEqual(uuids[0], self._get_next_marker(data))
+        data = self.get_json('/nodes?marker=%s' % uuids[0])
+        self.assertEqual(uuids[1:], [n['uuid'] for n in data['nodes']])
+
+    def test_invalid_marker(self):
+        response = self.get_json('/nodes?marker=not-a-marker',
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_changes(self):
+        cfg.CONF.set_override('changes_settle_time', 0, 'api')
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid())
+                 for i in range(3)]
+        nodes[0].extra = {'foo': 'bar'}
+        nodes[0].save()
+        headers = {api_base.Version.string: '1.8'}
+
+        data = self.get_json('/nodes/changes', headers=headers)
+        self.assertEqual([nodes[1].uuid, nodes[2].uuid, nodes[0].uuid],
+                         [n['uuid'] for n in data['nodes']])
+        self.assertGreaterEqual(data['change_seq'], nodes[0].change_seq)
+        self.assertIn('driver_info', data['nodes'][0])
+        self.assertNotIn('next', data)
+
+        data = self.get_json('/nodes/changes?since=%d' % nodes[1].change_seq,
+                             headers=headers)
+        self.assertEqual([nodes[2].uuid, nodes[0].uuid],
+                         [n['uuid'] for n in data['nodes']])
+
+    def test_changes_limit(self):
+        cfg.CONF.set_override('changes_settle_time', 0, 'api')
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid())
+                 for i in range(3)]
+        data = self.get_json('/nodes/changes?limit=2',
+                             headers={api_base.Version.string: '1.8'})
+        self.assertEqual([nodes[0].uuid, nodes[1].uuid],
+                         [n['uuid'] for n in data['nodes']])
+        self.assertEqual(nodes[1].change_seq, data['change_seq'])
+        self.assertIn('since=%d' % nodes[1].change_seq, data['next'])
+
+    def test_changes_deleted(self):
+        cfg.CONF.set_override('changes_settle_time', 0, 'api')
+        node1 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        node1.destroy()
+        headers = {api_base.Version.string: '1.8'}
+
+        data = self.get_json('/nodes/changes?since=%d' % node2.change_seq,
+                             headers=headers)
+        self.assertEqual([], data['nodes'])
+        self.assertEqual([node1.uuid],
+                         [d['uuid'] for d in data['deleted_nodes']])
+        self.assertGreater(data['deleted_nodes'][0]['change_seq'],
+                           node2.change_seq)
+
+        data = self.get_json('/nodes/changes?limit=2', headers=headers)
+        self.assertEqual([node2.uuid], [n['uuid'] for n in data['nodes']])
+        self.assertEqual([node1.uuid],
+                         [d['uuid'] for d in data['deleted_nodes']])
+        self.assertEqual(data['deleted_nodes'][0]['change_seq'],
+                         data['change_seq'])
+        self.assertIn('since=%d' % data['change_seq'], data['next'])
+
+    def test_changes_settle_time(self):
+        cfg.CONF.set_override('changes_settle_time', 60, 'api')
+        node = obj_utils.create_test_node(self.context)
+        data = self.get_json('/nodes/changes',
+                             headers={api_base.Version.string: '1.8'})
+        self.assertEqual([], data['nodes'])
+        self.assertLess(data['change_seq'], node.change_seq)
+
+    @mock.patch('time.sleep', autospec=True)
+    def test_changes_no_change(self, mock_sleep):
+        cfg.CONF.set_override('changes_settle_time', 0, 'api')
+        node = obj_utils.create_test_node(self.context)
+        data = self.get_json('/nodes/changes?since=%d' % node.change_seq,
+                             headers={api_base.Version.string: '1.8'})
+        self.assertEqual([], data['nodes'])
+        self.assertGreaterEqual(data['change_seq'], node.change_seq)
+        self.assertNotIn(mock.call(api_node._CHANGES_POLL_INTERVAL),
+                         mock_sleep.call_args_list)
+
+    @mock.patch('time.sleep', autospec=True)
+    @mock.patch.object(api_node, '_changes_horizon', autospec=True)
+    @mock.patch.object(objects.Node, 'list_changes')
+    def test_changes_wait(self, mock_list_changes, mock_horizon, mock_sleep):
+        node = obj_utils.get_test_node(self.context, change_seq=43)
+        mock_list_changes.side_effect = (([], []), ([], []), ([node], []))
+        mock_horizon.side_effect = iter([40, 41, 50])
+        data = self.get_json('/nodes/changes?since=42&timeout=10',
+                             headers={api_base.Version.string: '1.8'})
+        self.assertEqual([node.uuid], [n['uuid'] for n in data['nodes']])
+        self.assertEqual(50, data['change_seq'])
+        self.assertEqual(2, mock_sleep.call_args_list.count(
+            mock.call(api_node._CHANGES_POLL_INTERVAL)))
+        mock_list_changes.assert_called_with(mock.ANY, 42, until=50,
+                                             limit=1000)
+
+    @mock.patch('time.sleep', autospec=True)
+    @mock.patch.object(api_node, '_changes_horizon', autospec=True,
+                       return_value=40)
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_changes_wait_timeout(self, mock_time, mock_horizon,
+                                  mock_sleep):
+        cfg.CONF.set_override('max_changes_timeout', 2, 'api')
+        mock_time.side_effect = itertools.count(100, 0.1)
+        data = self.get_json('/nodes/changes?since=42&timeout=60',
+                             headers={api_base.Version.string: '1.8'})
+        self.assertEqual([], data['nodes'])
+        self.assertEqual(42, data['change_seq'])
+        self.assertIn(mock.call(api_node._CHANGES_POLL_INTERVAL),
+                      mock_sleep.call_args_list)
+
+    @mock.patch('time.sleep', autospec=True)
+    @mock.patch.object(api_node, '_changes_horizon', autospec=True,
+                       return_value=40)
+    @mock.patch.object(objects.Node, 'list_changes')
+    def test_changes_too_many_waiters(self, mock_list_changes, mock_horizon,
+                                      mock_sleep):
+        cfg.CONF.set_override('max_changes_waiters', 1, 'api')
+        mock_list_changes.return_value = [], []
+        with mock.patch.object(api_node, '_changes_waiters', 1):
+            data = self.get_json('/nodes/changes?since=42&timeout=10',
+                                 headers={api_base.Version.string: '1.8'})
+        self.assertEqual([], data['nodes'])
+        self.assertEqual(42, data['change_seq'])
+        mock_list_changes.assert_called_once_with(mock.ANY, 42, until=40,
+                                                  limit=1000)
+        self.assertNotIn(mock.call(api_node._CHANGES_POLL_INTERVAL),
+                         mock_sleep.call_args_list)
+
+    def test_changes_invalid(self):
+        response = self.get_json('/nodes/changes?since=-1',
+                                 headers={api_base.Version.string: '1.8'},
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_changes_old_version(self):
+        response = self.get_json('/nodes/changes',
+                                 headers={api_base.Version.string: '1.7'},
+                                 expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
     def test_get_console_information(self):
         node = obj_utils.create_test_node(self.context)
         expected_console_info = {'test': 'test-data'}
@@ -1937,3 +2277,256 @@ class TestPut(test_api_base.FunctionalTest):
                                                          mock_get):
         self._test_set_node_maintenance_mode(mock_update, mock_get, None,
                                              self.node.name, is_by_name=True)
+
+
+class TestPutBulkPower(test_api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestPutBulkPower, self).setUp()
+        self.node1 = obj_utils.create_test_node(
+            self.context, uuid=uuidutils.generate_uuid(), name='node-1')
+        self.node2 = obj_utils.create_test_node(
+            self.context, uuid=uuidutils.generate_uuid(), name='node-2')
+        self.headers = {api_base.Version.string: str(api_v1.MAX_VER)}
+        p = mock.patch.object(rpcapi.ConductorAPI, 'group_by_topic',
+                              autospec=True)
+        self.mock_gbt = p.start()
+        self.mock_gbt.side_effect = lambda api, nodes: (
+            {'test-topic': nodes}, [])
+        self.addCleanup(p.stop)
+        p = mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state',
+                              autospec=True)
+        self.mock_cnps = p.start()
+        self.mock_cnps.side_effect = (
+            lambda api, ctx, uuids, target, topic: dict(
+                (uuid, {'result': True, 'reason': None}) for uuid in uuids))
+        self.addCleanup(p.stop)
+
+    def test_power(self):
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, 'node-2'],
+                             'target': states.POWER_ON},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.assertEqual({self.node1.uuid: {'result': True, 'reason': None},
+                          'node-2': {'result': True, 'reason': None}},
+                         ret.json)
+        self.assertEqual(1, self.mock_cnps.call_count)
+        uuids = self.mock_cnps.call_args[0][2]
+        self.assertEqual(sorted([self.node1.uuid, self.node2.uuid]),
+                         sorted(uuids))
+        self.assertEqual((states.POWER_ON, 'test-topic'),
+                         self.mock_cnps.call_args[0][3:])
+
+    def test_power_one_call_per_topic(self):
+        self.mock_gbt.side_effect = lambda api, nodes: (
+            dict(('topic-%s' % n.uuid, [n]) for n in nodes), [])
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, self.node2.uuid],
+                             'target': states.REBOOT},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.mock_cnps.assert_has_calls(
+            [mock.call(mock.ANY, mock.ANY, [self.node1.uuid], states.REBOOT,
+                       'topic-%s' % self.node1.uuid),
+             mock.call(mock.ANY, mock.ANY, [self.node2.uuid], states.REBOOT,
+                       'topic-%s' % self.node2.uuid)],
+            any_order=True)
+
+    def test_power_partial_failures(self):
+        self.node2.provision_state = states.CLEANING
+        self.node2.save()
+        node3 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        self.mock_gbt.side_effect = lambda api, nodes: (
+            {'test-topic': [n for n in nodes if n.uuid != node3.uuid]},
+            [n for n in nodes if n.uuid == node3.uuid])
+        missing = uuidutils.generate_uuid()
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, self.node2.uuid,
+                                       node3.uuid, missing],
+                             'target': states.POWER_OFF},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.assertTrue(ret.json[self.node1.uuid]['result'])
+        for ident in (self.node2.uuid, node3.uuid, missing):
+            self.assertFalse(ret.json[ident]['result'])
+            self.assertTrue(ret.json[ident]['reason'])
+        self.mock_cnps.assert_called_once_with(
+            mock.ANY, mock.ANY, [self.node1.uuid], states.POWER_OFF,
+            'test-topic')
+
+    @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
+    @mock.patch.object(objects.Node, 'get_by_name', autospec=True)
+    def test_power_one_query(self, mock_gbn, mock_gbu):
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, 'node-2',
+                                       'missing'],
+                             'target': states.POWER_ON},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.assertTrue(ret.json[self.node1.uuid]['result'])
+        self.assertTrue(ret.json['node-2']['result'])
+        self.assertFalse(ret.json['missing']['result'])
+        self.assertFalse(mock_gbu.called)
+        self.assertFalse(mock_gbn.called)
+
+    def test_power_conductors_in_parallel(self):
+        self.mock_gbt.side_effect = lambda api, nodes: (
+            dict(('topic-%s' % n.uuid, [n]) for n in nodes), [])
+        calls = {'running': 0, 'max_running': 0}
+
+        def change_nodes_power_state(api, ctx, uuids, target, topic):
+            calls['running'] += 1
+            calls['max_running'] = max(calls['max_running'],
+                                       calls['running'])
+            eventlet.sleep(0)
+            calls['running'] -= 1
+            return dict((uuid, {'result': True, 'reason': None})
+                        for uuid in uuids)
+
+        self.mock_cnps.side_effect = change_nodes_power_state
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, self.node2.uuid],
+                             'target': states.POWER_ON},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.assertEqual(2, calls['max_running'])
+        self.assertTrue(ret.json[self.node1.uuid]['result'])
+        self.assertTrue(ret.json[self.node2.uuid]['result'])
+
+    def test_power_batch_size(self):
+        cfg.CONF.set_override('rpc_response_timeout', 60)
+        self.assertEqual(150, api_node._power_batch_size())
+        cfg.CONF.set_override('rpc_response_timeout', 1)
+        self.assertEqual(2, api_node._power_batch_size())
+        cfg.CONF.set_override('rpc_response_timeout', 0)
+        self.assertEqual(1, api_node._power_batch_size())
+
+    @mock.patch.object(api_node, '_power_batch_size', autospec=True,
+                       return_value=1)
+    def test_power_batches(self, mock_batch_size):
+        def change_nodes_power_state(api, ctx, uuids, target, topic):
+            if uuids == [self.node2.uuid]:
+                raise exception.NoFreeConductorWorker()
+            return {self.node1.uuid: {'result': True, 'reason': None}}
+
+        self.mock_cnps.side_effect = change_nodes_power_state
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, self.node2.uuid],
+                             'target': states.POWER_ON},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.assertEqual(2, self.mock_cnps.call_count)
+        for call in self.mock_cnps.call_args_list:
+            self.assertEqual(1, len(call[0][2]))
+        self.assertTrue(ret.json[self.node1.uuid]['result'])
+        self.assertFalse(ret.json[self.node2.uuid]['result'])
+
+    def test_power_rpc_failure(self):
+        self.mock_cnps.side_effect = exception.NoValidHost(reason='boom')
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid],
+                             'target': states.POWER_ON},
+                            headers=self.headers)
+        self.assertEqual(202, ret.status_code)
+        self.assertFalse(ret.json[self.node1.uuid]['result'])
+        self.assertIn('boom', ret.json[self.node1.uuid]['reason'])
+
+    def test_power_invalid_target(self):
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid],
+                             'target': 'not-supported'},
+                            headers=self.headers, expect_errors=True)
+        self.assertEqual(400, ret.status_code)
+        self.assertFalse(self.mock_cnps.called)
+
+    def test_power_too_many_nodes(self):
+        cfg.CONF.set_override('max_limit', 1, 'api')
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid, self.node2.uuid],
+                             'target': states.POWER_ON},
+                            headers=self.headers, expect_errors=True)
+        self.assertEqual(400, ret.status_code)
+        self.assertFalse(self.mock_cnps.called)
+
+    def test_power_old_version(self):
+        ret = self.put_json('/nodes/power',
+                            {'nodes': [self.node1.uuid],
+                             'target': states.POWER_ON},
+                            headers={api_base.Version.string: '1.8'},
+                            expect_errors=True)
+        self.assertEqual(404, ret.status_code)
+        self.assertFalse(self.mock_cnps.called)
+
+
+class TestPostBulk(test_api_base.FunctionalTest):
+
+    def setUp(self):
+        super(TestPostBulk, self).setUp()
+        self.chassis = obj_utils.create_test_chassis(self.context)
+        self.headers = {api_base.Version.string: str(api_v1.MAX_VER)}
+        p = mock.patch.object(rpcapi.ConductorAPI, 'group_by_topic',
+                              autospec=True)
+        self.mock_gbt = p.start()
+        self.mock_gbt.side_effect = lambda api, nodes: (
+            {'test-topic': nodes}, [])
+        self.addCleanup(p.stop)
+
+    def test_create_nodes(self):
+        ndicts = [test_api_utils.post_get_test_node(
+            uuid=uuidutils.generate_uuid()) for i in range(3)]
+        del ndicts[2]['uuid']
+        ret = self.post_json('/nodes/bulk', {'nodes': ndicts},
+                             headers=self.headers)
+        self.assertEqual(200, ret.status_int)
+        results = ret.json['nodes']
+        self.assertEqual([ndicts[0]['uuid'], ndicts[1]['uuid']],
+                         [r['uuid'] for r in results[:2]])
+        self.assertTrue(uuidutils.is_uuid_like(results[2]['uuid']))
+        self.assertTrue(all(r['result'] for r in results))
+        for result in results:
+            node = self.get_json('/nodes/%s' % result['uuid'])
+            self.assertEqual(self.chassis.uuid, node['chassis_uuid'])
+
+    def test_create_nodes_errors(self):
+        existing = obj_utils.create_test_node(self.context,
+                                              uuid=uuidutils.generate_uuid())
+        ndicts = [test_api_utils.post_get_test_node(
+            uuid=uuidutils.generate_uuid()) for i in range(4)]
+        ndicts[1]['uuid'] = existing.uuid
+        ndicts[2]['name'] = 'invalid_name'
+        ndicts[3]['driver'] = 'unknown'
+        self.mock_gbt.side_effect = lambda api, nodes: (
+            {'test-topic': [n for n in nodes if n.driver != 'unknown']},
+            [n for n in nodes if n.driver == 'unknown'])
+        ret = self.post_json('/nodes/bulk', {'nodes': ndicts},
+                             headers=self.headers)
+        self.assertEqual(200, ret.status_int)
+        results = ret.json['nodes']
+        self.assertEqual([n['uuid'] for n in ndicts],
+                         [r['uuid'] for r in results])
+        self.assertEqual([True, False, False, False],
+                         [r['result'] for r in results])
+        self.assertIn('already exists', results[1]['reason'])
+        self.assertIn('invalid_name', results[2]['reason'])
+        self.assertIn('unknown', results[3]['reason'])
+        self.get_json('/nodes/%s' % ndicts[0]['uuid'])
+        ret = self.get_json('/nodes/%s' % ndicts[2]['uuid'],
+                            expect_errors=True)
+        self.assertEqual(404, ret.status_int)
+
+    def test_create_nodes_too_many(self):
+        cfg.CONF.set_override('max_limit', 1, 'api')
+        ndicts = [test_api_utils.post_get_test_node(
+            uuid=uuidutils.generate_uuid()) for i in range(2)]
+        ret = self.post_json('/nodes/bulk', {'nodes': ndicts},
+                             headers=self.headers, expect_errors=True)
+        self.assertEqual(400, ret.status_int)
+
+    def test_create_nodes_old_version(self):
+        ndicts = [test_api_utils.post_get_test_node()]
+        ret = self.post_json('/nodes/bulk', {'nodes': ndicts},
+                             headers={api_base.Version.string: '1.9'},
+                             expect_errors=True)
+        self.assertEqual(404, ret.status_int)
@@ -31,6 +31,7 @@ from ironic.api.controllers.v1 import port as api_port
 from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import exception
 from ironic.conductor import rpcapi
+from ironic import objects
 from ironic.tests.api import base as api_base
 from ironic.tests.api import utils as apiutils
 from ironic.tests import base
@@ -85,6 +86,37 @@ class TestListPorts(api_base.FunctionalTest):
         # never expose the node_id
         self.assertNotIn('node_id', data)
 
+    def test_get_one_etag(self):
+        port = obj_utils.create_test_port(self.context, node_id=self.node.id)
+        etag = self.app.get('/v1/ports/%s' % port.uuid).headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = self.app.get('/v1/ports/%s' % port.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(b'', response.body)
+
+        port.extra = {'foo': 'bar'}
+        port.save()
+        response = self.app.get('/v1/ports/%s' % port.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+
+    def test_list_etag(self):
+        obj_utils.create_test_port(self.context, node_id=self.node.id)
+        etag = self.app.get('/v1/nodes/%s/ports' % self.node.uuid
+                            ).headers['ETag']
+        response = self.app.get('/v1/nodes/%s/ports' % self.node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_int)
+
+        obj_utils.create_test_port(self.context, node_id=self.node.id,
+                                   uuid=uuidutils.generate_uuid(),
+                                   address='52:54:00:cf:2d:32')
+        response = self.app.get('/v1/nodes/%s/ports' % self.node.uuid,
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(2, len(response.json['ports']))
+
     def test_detail(self):
         port = obj_utils.create_test_port(self.context, node_id=self.node.id)
         data = self.get_json('/ports/detail')
@@ -582,6 +614,55 @@ class TestPost(api_base.FunctionalTest):
         self.assertEqual(urlparse.urlparse(response.location).path,
                          expected_location)
 
+    def test_create_ports(self):
+        headers = {api_controller.Version.string: '1.10'}
+        pdicts = [post_get_test_port(uuid=uuidutils.generate_uuid(),
+                                     address='52:54:00:cf:2d:4%d' % i)
+                  for i in range(3)]
+        pdicts[1]['address'] = pdicts[0]['address']
+        del pdicts[2]['uuid']
+        with mock.patch.object(objects.Node, 'list',
+                               wraps=objects.Node.list) as mock_list:
+            ret = self.post_json('/ports/bulk', {'ports': pdicts},
+                                 headers=headers)
+            # The nodes are read from the primary database
+            mock_list.assert_called_once_with(
+                mock.ANY, filters={'uuids_or_names': [self.node.uuid]},
+                use_slave=False)
+        self.assertEqual(200, ret.status_int)
+        results = ret.json['ports']
+        self.assertEqual([True, False, True],
+                         [r['result'] for r in results])
+        self.assertIn(pdicts[0]['address'], results[1]['reason'])
+        self.assertEqual(pdicts[0]['uuid'], results[0]['uuid'])
+        result = self.get_json('/ports/%s' % results[2]['uuid'])
+        self.assertEqual(self.node.uuid, result['node_uuid'])
+        self.assertEqual(2, len(self.get_json('/ports')['ports']))
+
+    @mock.patch.object(objects.Node, 'get', autospec=True)
+    def test_create_ports_missing_node(self, mock_get):
+        headers = {api_controller.Version.string: '1.10'}
+        pdicts = [post_get_test_port(uuid=uuidutils.generate_uuid(),
+                                     address='52:54:00:cf:2d:4%d' % i)
+                  for i in range(2)]
+        pdicts[1]['node_uuid'] = uuidutils.generate_uuid()
+        ret = self.post_json('/ports/bulk', {'ports': pdicts},
+                             headers=headers)
+        self.assertEqual(200, ret.status_int)
+        results = ret.json['ports']
+        self.assertEqual([True, False], [r['result'] for r in results])
+        self.assertIn(pdicts[1]['node_uuid'], results[1]['reason'])
+        self.assertEqual(pdicts[1]['uuid'], results[1]['uuid'])
+        # The nodes are not looked up one by one
+        self.assertFalse(mock_get.called)
+        self.assertEqual(1, len(self.dbapi.get_port_list()))
+
+    def test_create_ports_old_version(self):
+        ret = self.post_json('/ports/bulk', {'ports': [post_get_test_port()]},
+                             headers={api_controller.Version.string: '1.9'},
+                             expect_errors=True)
+        self.assertEqual(404, ret.status_int)
+
     def test_create_port_doesnt_contain_id(self):
         with mock.patch.object(self.dbapi, 'create_port',
                                wraps=self.dbapi.create_port) as cp_mock:
@@ -154,3 +154,43 @@ class TestNodeIdent(base.TestCase):
         self.assertRaises(exception.NodeNotFound,
                           utils.get_rpc_node,
                           self.valid_name)
+
+    @mock.patch.object(pecan, 'request')
+    @mock.patch.object(utils, 'allow_node_logical_names')
+    @mock.patch.object(objects.Node, 'list')
+    def test_get_rpc_nodes(self, mock_list, mock_anln, mock_pr):
+        mock_anln.return_value = True
+        node = mock.Mock(uuid=self.valid_uuid)
+        node.name = None
+        named_node = mock.Mock(uuid=uuidutils.generate_uuid())
+        named_node.name = self.valid_name
+        mock_list.return_value = [node, named_node]
+        missing = uuidutils.generate_uuid()
+        idents = [self.valid_uuid, self.valid_name, missing,
+                  self.invalid_name]
+
+        nodes, errors = utils.get_rpc_nodes(idents)
+
+        self.assertEqual({self.valid_uuid: node,
+                          self.valid_name: named_node}, nodes)
+        self.assertEqual(set([missing, self.invalid_name]), set(errors))
+        self.assertIsInstance(errors[missing], exception.NodeNotFound)
+        self.assertIsInstance(errors[self.invalid_name],
+                              exception.InvalidUuidOrName)
+        mock_list.assert_called_once_with(
+            mock_pr.context,
+            filters={'uuids_or_names': [self.valid_uuid, self.valid_name,
+                                        missing]},
+            use_slave=False)
+
+    @mock.patch.object(pecan, 'request')
+    @mock.patch.object(utils, 'allow_node_logical_names')
+    @mock.patch.object(objects.Node, 'list')
+    def test_get_rpc_nodes_no_logical_name(self, mock_list, mock_anln,
+                                           mock_pr):
+        mock_anln.return_value = False
+        nodes, errors = utils.get_rpc_nodes([self.valid_name])
+        self.assertEqual({}, nodes)
+        self.assertIsInstance(errors[self.valid_name],
+                              exception.NodeNotFound)
+        self.assertFalse(mock_list.called)
@@ -33,6 +33,8 @@ from oslo_context import context as ironic_context
 import testtools
 
 from ironic.common import hash_ring
+from ironic.drivers.modules import agent_heartbeat
+from ironic.drivers.modules import client_cache
 from ironic.objects import base as objects_base
 from ironic.openstack.common import log as logging
 from ironic.tests import conf_fixture
@@ -106,6 +108,8 @@ class TestCase(testtools.TestCase):
 
         self.addCleanup(self._clear_attrs)
         self.addCleanup(hash_ring.HashRingManager().reset)
+        self.addCleanup(client_cache.clear_all)
+        self.addCleanup(agent_heartbeat.get_store().clear)
         self.useFixture(fixtures.EnvironmentVariable('http_proxy'))
         self.policy = self.useFixture(policy_fixture.PolicyFixture())
         CONF.set_override('fatal_exception_format_errors', True)
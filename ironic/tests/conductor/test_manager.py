@@ -21,6 +21,7 @@
 import datetime
 
 import eventlet
+from eventlet import greenpool
 import mock
 from oslo import messaging
 from oslo_config import cfg
@@ -34,13 +35,16 @@ from ironic.common import driver_factory
 from ironic.common import exception
 from ironic.common import images
 from ironic.common import keystone
+from ironic.common import pxe_utils
 from ironic.common import states
 from ironic.common import swift
 from ironic.conductor import manager
 from ironic.conductor import task_manager
 from ironic.conductor import utils as conductor_utils
+from ironic.conductor import worker_pool
 from ironic.db import api as dbapi
 from ironic.drivers import base as drivers_base
+from ironic.drivers.modules import fake
 from ironic import objects
 from ironic.tests import base as tests_base
 from ironic.tests.conductor import utils as mgr_utils
@@ -291,7 +295,45 @@ class StartStopTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
                           self.service.init_host)
         self.assertTrue(log_mock.error.called)
 
-    @mock.patch.object(eventlet.greenpool.GreenPool, 'waitall')
+    @mock.patch.object(fake.FakeConsole, 'start_console')
+    def test_start_starts_consoles(self, start_console_mock):
+        self.config(gateway_enabled=True, group='console')
+        started = []
+        start_console_mock.side_effect = (
+            lambda task: started.append((task.node.uuid, task.shared)))
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          console_enabled=True)
+        obj_utils.create_test_node(self.context, driver='fake',
+                                   uuid=uuidutils.generate_uuid(),
+                                   console_enabled=False)
+        self._start_service()
+        self.service._worker_pool.waitall()
+        self.assertEqual([(node.uuid, True)], started)
+
+    @mock.patch.object(fake.FakeConsole, 'start_console')
+    def test_start_starts_consoles_fails(self, start_console_mock):
+        self.config(gateway_enabled=True, group='console')
+        start_console_mock.side_effect = exception.ConsoleError('boom')
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          console_enabled=True)
+        self._start_service()
+        self.service._worker_pool.waitall()
+        self.assertTrue(start_console_mock.called)
+        node.refresh()
+        # The node is left as it was
+        self.assertTrue(node.console_enabled)
+        self.assertIsNone(node.last_error)
+        self.assertIsNone(node.reservation)
+
+    @mock.patch.object(fake.FakeConsole, 'start_console')
+    def test_start_shellinabox_consoles_left_alone(self, start_console_mock):
+        obj_utils.create_test_node(self.context, driver='fake',
+                                   console_enabled=True)
+        self._start_service()
+        self.service._worker_pool.waitall()
+        self.assertFalse(start_console_mock.called)
+
+    @mock.patch.object(worker_pool.WorkerPool, 'waitall')
     def test_del_host_waits_on_workerpool(self, wait_mock):
         self._start_service()
         self.service.del_host()
@@ -476,6 +518,54 @@ class ChangeNodePowerStateTestCase(_ServiceSetUpMixin,
 
 
 @_mock_record_keepalive
+class ChangeNodesPowerStateTestCase(_ServiceSetUpMixin,
+                                    tests_db_base.DbTestCase):
+
+    @mock.patch.object(conductor_utils, 'node_power_action', autospec=True)
+    def test_change_nodes_power_state(self, pwr_act_mock):
+        node1 = obj_utils.create_test_node(self.context, driver='fake',
+                                           uuid=uuidutils.generate_uuid())
+        node2 = obj_utils.create_test_node(self.context, driver='fake',
+                                           uuid=uuidutils.generate_uuid(),
+                                           reservation='fake-reserv')
+        self._start_service()
+
+        results = self.service.change_nodes_power_state(
+            self.context, [node1.uuid, node2.uuid, 'missing'],
+            states.POWER_OFF)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual({'result': True, 'reason': None},
+                         results[node1.uuid])
+        self.assertFalse(results[node2.uuid]['result'])
+        self.assertIn('fake-reserv', results[node2.uuid]['reason'])
+        self.assertFalse(results['missing']['result'])
+        pwr_act_mock.assert_called_once_with(mock.ANY, states.POWER_OFF)
+        self.assertEqual(node1.uuid, pwr_act_mock.call_args[0][0].node.uuid)
+        node1.refresh()
+        self.assertEqual(states.POWER_OFF, node1.target_power_state)
+        self.assertIsNone(node1.reservation)
+
+    @mock.patch.object(conductor_utils, 'node_power_action', autospec=True)
+    def test_change_nodes_power_state_bounded(self, pwr_act_mock):
+        self.config(bulk_power_max_workers=2, group='conductor')
+        uuids = [obj_utils.create_test_node(
+            self.context, driver='fake',
+            uuid=uuidutils.generate_uuid()).uuid for i in range(5)]
+        self._start_service()
+
+        with mock.patch.object(greenpool, 'GreenPool',
+                               wraps=greenpool.GreenPool) as pool_mock:
+            results = self.service.change_nodes_power_state(
+                self.context, uuids, states.REBOOT)
+        self.service._worker_pool.waitall()
+
+        pool_mock.assert_called_once_with(2)
+        self.assertEqual(set(uuids), set(results))
+        self.assertTrue(all(r['result'] for r in results.values()))
+        self.assertEqual(5, pwr_act_mock.call_count)
+
+
 class UpdateNodeTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
     def test_update_node(self):
         node = obj_utils.create_test_node(self.context, driver='fake',
@@ -497,6 +587,28 @@ class UpdateNodeTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
         self.assertFalse(res['maintenance'])
         self.assertIsNone(res['maintenance_reason'])
 
+    def test_update_node_delta(self):
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          extra={'test': 'one'},
+                                          maintenance=True,
+                                          maintenance_reason='reason')
+        node.extra = {'test': 'two'}
+        node.maintenance = False
+        delta = objects.Node.obj_from_primitive(
+            node.obj_to_primitive(delta=True), self.context)
+        self.assertFalse(delta.obj_attr_is_set('driver'))
+
+        res = self.service.update_node(self.context, delta)
+        self.assertEqual({'test': 'two'}, res.extra)
+        self.assertFalse(res.maintenance)
+        self.assertIsNone(res.maintenance_reason)
+        # the other fields are loaded by the conductor
+        self.assertEqual('fake', res.driver)
+        self.assertEqual(node.driver_info, res.driver_info)
+        res = objects.Node.get_by_uuid(self.context, node.uuid)
+        self.assertEqual({'test': 'two'}, res.extra)
+        self.assertIsNone(res.maintenance_reason)
+
     def test_update_node_already_locked(self):
         node = obj_utils.create_test_node(self.context, driver='fake',
                                           extra={'test': 'one'})
@@ -603,6 +715,30 @@ class VendorPassthruTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
         # Verify reservation has been cleared.
         self.assertIsNone(node.reservation)
 
+    @mock.patch.object(task_manager.TaskManager, 'upgrade_lock')
+    @mock.patch.object(task_manager.TaskManager, 'spawn_after')
+    def test_vendor_passthru_exclusive_lock(self, mock_spawn, mock_upgrade):
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        self._start_service()
+
+        self.service.vendor_passthru(self.context, node.uuid,
+                                     'first_method', 'POST', {'bar': 'baz'})
+        mock_upgrade.assert_called_once_with()
+
+    @mock.patch.object(task_manager.TaskManager, 'upgrade_lock')
+    @mock.patch.object(task_manager.TaskManager, 'spawn_after')
+    def test_vendor_passthru_shared_lock(self, mock_spawn, mock_upgrade):
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        self._start_service()
+        routes = self.driver.vendor.vendor_routes
+        with mock.patch.dict(routes['first_method'],
+                             {'require_exclusive_lock': False}):
+            self.service.vendor_passthru(self.context, node.uuid,
+                                         'first_method', 'POST',
+                                         {'bar': 'baz'})
+        self.assertFalse(mock_upgrade.called)
+        self.assertTrue(mock_spawn.called)
+
     def test_vendor_passthru_http_method_not_supported(self):
         node = obj_utils.create_test_node(self.context, driver='fake')
         self._start_service()
@@ -2366,6 +2502,9 @@ class UpdatePortTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
         node = obj_utils.create_test_node(self.context,
                                           driver='fake')
         self._start_service()
+        # Ignore the nodes listed to start their consoles
+        self.service._worker_pool.waitall()
+        get_nodeinfo_list_mock.reset_mock()
         CONF.set_override('send_sensor_data', True, group='conductor')
         acquire_mock.return_value.__enter__.return_value.driver = self.driver
         with mock.patch.object(self.driver.management,
@@ -2377,7 +2516,9 @@ class UpdatePortTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
                 get_nodeinfo_list_mock.return_value = [(node.uuid, node.driver,
                                                      node.instance_uuid)]
                 self.service._send_sensor_data(self.context)
-                self.assertTrue(get_nodeinfo_list_mock.called)
+                get_nodeinfo_list_mock.assert_called_once_with(
+                    columns=['uuid', 'driver', 'instance_uuid'],
+                    filters={'associated': True}, use_slave=True)
                 self.assertTrue(_mapped_to_this_conductor_mock.called)
                 self.assertTrue(acquire_mock.called)
                 self.assertTrue(get_sensors_data_mock.called)
@@ -2509,25 +2650,32 @@ class ManagerSpawnWorkerTestCase(tests_base.TestCase):
         self.service = manager.ConductorManager('hostname', 'test-topic')
 
     def test__spawn_worker(self):
-        worker_pool = mock.Mock(spec_set=['free', 'spawn'])
-        worker_pool.free.return_value = True
+        worker_pool = mock.Mock(spec_set=['spawn'])
         self.service._worker_pool = worker_pool
 
         self.service._spawn_worker('fake', 1, 2, foo='bar', cat='meow')
 
         worker_pool.spawn.assert_called_once_with(
+                manager.worker_pool.PRIORITY_HIGH,
                 'fake', 1, 2, foo='bar', cat='meow')
 
+    def test__spawn_periodic_worker(self):
+        worker_pool = mock.Mock(spec_set=['spawn'])
+        self.service._worker_pool = worker_pool
+
+        self.service._spawn_periodic_worker('fake', 1, foo='bar')
+
+        worker_pool.spawn.assert_called_once_with(
+                manager.worker_pool.PRIORITY_LOW, 'fake', 1, foo='bar')
+
     def test__spawn_worker_none_free(self):
-        worker_pool = mock.Mock(spec_set=['free', 'spawn'])
-        worker_pool.free.return_value = False
+        worker_pool = mock.Mock(spec_set=['spawn'])
+        worker_pool.spawn.side_effect = exception.NoFreeConductorWorker()
         self.service._worker_pool = worker_pool
 
         self.assertRaises(exception.NoFreeConductorWorker,
                           self.service._spawn_worker, 'fake')
 
-        self.assertFalse(worker_pool.spawn.called)
-
 
 @mock.patch.object(conductor_utils, 'node_power_action')
 class ManagerDoSyncPowerStateTestCase(tests_db_base.DbTestCase):
@@ -2747,7 +2895,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         self.assertFalse(get_node_mock.called)
@@ -2764,7 +2913,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2782,7 +2932,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2798,7 +2949,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2814,7 +2966,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2832,7 +2985,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2854,7 +3008,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2874,7 +3029,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2893,7 +3049,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2911,7 +3068,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
         get_node_mock.assert_called_once_with(self.context, self.node.id)
@@ -2982,7 +3140,8 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
             self.assertEqual(len(nodes) - 1, sleep_mock.call_count)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_calls = [mock.call(x.uuid, x.driver) for x in nodes]
         self.assertEqual(mapped_calls, mapped_mock.call_args_list)
         get_node_calls = [mock.call(self.context, x.id)
@@ -3058,7 +3217,7 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
         acquire_mock.assert_called_once_with(self.context, self.node.uuid)
         self.task.process_event.assert_called_with(
                 'fail',
-                callback=self.service._spawn_worker,
+                callback=self.service._spawn_periodic_worker,
                 call_args=(conductor_utils.cleanup_after_timeout, self.task),
                 err_handler=manager.provisioning_error_handler)
 
@@ -3140,7 +3299,7 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
         # Second node spawned
         self.task2.process_event.assert_called_with(
                 'fail',
-                callback=self.service._spawn_worker,
+                callback=self.service._spawn_periodic_worker,
                 call_args=(conductor_utils.cleanup_after_timeout, self.task2),
                 err_handler=manager.provisioning_error_handler)
 
@@ -3164,7 +3323,7 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
                                              self.node.uuid)
         self.task.process_event.assert_called_with(
                 'fail',
-                callback=self.service._spawn_worker,
+                callback=self.service._spawn_periodic_worker,
                 call_args=(conductor_utils.cleanup_after_timeout, self.task),
                 err_handler=manager.provisioning_error_handler)
 
@@ -3190,7 +3349,7 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
                                              self.node.uuid)
         self.task.process_event.assert_called_with(
                 'fail',
-                callback=self.service._spawn_worker,
+                callback=self.service._spawn_periodic_worker,
                 call_args=(conductor_utils.cleanup_after_timeout, self.task),
                 err_handler=manager.provisioning_error_handler)
 
@@ -3215,7 +3374,7 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
                          acquire_mock.call_args_list)
         process_event_call = mock.call(
                 'fail',
-                callback=self.service._spawn_worker,
+                callback=self.service._spawn_periodic_worker,
                 call_args=(conductor_utils.cleanup_after_timeout, self.task),
                 err_handler=manager.provisioning_error_handler)
         self.assertEqual([process_event_call] * 2,
@@ -3360,7 +3519,7 @@ class ManagerTestProperties(tests_db_base.DbTestCase):
         self.assertEqual(exception.DriverNotFound, exc.exc_info[0])
 
 
-@mock.patch.object(keystone, 'get_admin_auth_token')
+@mock.patch.object(keystone, 'get_admin_auth_ref')
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
 @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
@@ -3374,6 +3533,7 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service.conductor = mock.Mock()
         self.service.dbapi = self.dbapi
         self.service.ring_manager = mock.Mock()
+        self.service._takeover_engine = mock.Mock()
 
         self.node = self._create_node(provision_state=states.ACTIVE,
                                       target_provision_state=states.NOSTATE)
@@ -3399,6 +3559,7 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
         self.assertFalse(acquire_mock.called)
         self.assertFalse(get_authtoken_mock.called)
+        self.assertFalse(self.service._takeover_engine.add.called)
         self.service.ring_manager.reset.assert_called_once_with()
 
     def test_already_mapped(self, get_nodeinfo_mock, mapped_mock,
@@ -3416,6 +3577,7 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
         self.assertFalse(acquire_mock.called)
         self.assertFalse(get_authtoken_mock.called)
+        self.assertFalse(self.service._takeover_engine.add.called)
         self.service.ring_manager.reset.assert_called_once_with()
 
     @mock.patch.object(context, 'get_admin_context')
@@ -3424,124 +3586,219 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         get_ctx_mock.return_value = self.context
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        acquire_mock.side_effect = self._get_acquire_side_effect(self.task)
 
         self.service._sync_local_state(self.context)
 
         self._assert_get_nodeinfo_args(get_nodeinfo_mock)
         mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
-        get_authtoken_mock.assert_called_once_with()
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid)
-        # assert spawn_after has been called
-        self.task.spawn_after.assert_called_once_with(
-                self.service._spawn_worker,
-                self.service._do_takeover, self.task)
+        # The auth token is fetched by the takeover engine
+        self.assertFalse(get_authtoken_mock.called)
+        # Nodes are only locked by the takeover engine
+        self.assertFalse(acquire_mock.called)
+        self.service._takeover_engine.add.assert_called_once_with(
+            self.context, [self.node.uuid])
 
     @mock.patch.object(context, 'get_admin_context')
-    def test_no_free_worker(self, get_ctx_mock, get_nodeinfo_mock, mapped_mock,
-                            acquire_mock, get_authtoken_mock):
+    def test_all_nodes_planned(self, get_ctx_mock, get_nodeinfo_mock,
+                               mapped_mock, acquire_mock,
+                               get_authtoken_mock):
+        # No limit on the number of nodes planned per run
+        self.config(periodic_max_workers=1, group='conductor')
         get_ctx_mock.return_value = self.context
+        nodes = [self._create_node(provision_state=states.ACTIVE)
+                 for i in range(3)]
         mapped_mock.return_value = True
-        acquire_mock.side_effect = self._get_acquire_side_effect(
-                                       [self.task] * 3)
-        self.task.spawn_after.side_effect = [
-            None,
-            exception.NoFreeConductorWorker('error')
-        ]
-
-        # 3 nodes to be checked
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                                             [self.node] * 3)
+            nodes)
 
         self.service._sync_local_state(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-
-        # assert  _mapped_to_this_conductor() gets called 2 times only
-        # instead of 3. When NoFreeConductorWorker is raised the loop
-        # should be broken
-        expected = [mock.call(self.node.uuid, self.node.driver)] * 2
-        self.assertEqual(expected, mapped_mock.call_args_list)
-
-        # assert  acquire() gets called 2 times only instead of 3. When
-        # NoFreeConductorWorker is raised the loop should be broken
-        expected = [mock.call(self.context, self.node.uuid)] * 2
-        self.assertEqual(expected, acquire_mock.call_args_list)
-
-        # Only one auth token needed for all runs
-        get_authtoken_mock.assert_called_once_with()
+        self.service._takeover_engine.add.assert_called_once_with(
+            self.context, [node.uuid for node in nodes])
 
-        # assert spawn_after has been called twice
-        expected = [mock.call(self.service._spawn_worker,
-                    self.service._do_takeover, self.task)] * 2
-        self.assertEqual(expected, self.task.spawn_after.call_args_list)
+    def _get_auth_ref(self, token):
+        return mock.Mock(auth_token=token,
+                         **{'will_expire_soon.return_value': False})
 
-    @mock.patch.object(context, 'get_admin_context')
-    def test_node_locked(self, get_ctx_mock, get_nodeinfo_mock, mapped_mock,
-                            acquire_mock, get_authtoken_mock):
-        get_ctx_mock.return_value = self.context
-        mapped_mock.return_value = True
+    def test__takeover_node(self, get_nodeinfo_mock, mapped_mock,
+                            acquire_mock, get_authref_mock):
+        get_authref_mock.return_value = self._get_auth_ref('token')
+        acquire_mock.side_effect = self._get_acquire_side_effect(self.task)
+        with mock.patch.object(self.service, '_do_takeover',
+                               autospec=True) as takeover_mock:
+            self.assertTrue(self.service._takeover_node(self.context,
+                                                        self.node.uuid))
+            takeover_mock.assert_called_once_with(self.task)
+        acquire_mock.assert_called_once_with(mock.ANY, self.node.uuid)
+        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+        # The admin auth token is set without changing the context shared
+        # by all the nodes
+        get_authref_mock.assert_called_once_with()
+        ctx = acquire_mock.call_args[0][0]
+        self.assertEqual('token', ctx.auth_token)
+        self.assertIsNot(self.context, ctx)
+        self.assertNotEqual('token', self.context.auth_token)
+
+    def test__takeover_node_token_reused(self, get_nodeinfo_mock,
+                                         mapped_mock, acquire_mock,
+                                         get_authref_mock):
+        get_authref_mock.return_value = self._get_auth_ref('token')
         acquire_mock.side_effect = self._get_acquire_side_effect(
-                [self.task, exception.NodeLocked('error'), self.task])
-        self.task.spawn_after.side_effect = [None, None]
-
-        # 3 nodes to be checked
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                                             [self.node] * 3)
-
-        self.service._sync_local_state(self.context)
-
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-
-        # assert _mapped_to_this_conductor() gets called 3 times
-        expected = [mock.call(self.node.uuid, self.node.driver)] * 3
-        self.assertEqual(expected, mapped_mock.call_args_list)
-
-        # assert acquire() gets called 3 times
-        expected = [mock.call(self.context, self.node.uuid)] * 3
-        self.assertEqual(expected, acquire_mock.call_args_list)
-
-        # Only one auth token needed for all runs
-        get_authtoken_mock.assert_called_once_with()
+            [self.task] * 3)
+        with mock.patch.object(self.service, '_do_takeover', autospec=True):
+            for i in range(3):
+                self.service._takeover_node(self.context, self.node.uuid)
+        # Only one auth token needed for all the nodes
+        get_authref_mock.assert_called_once_with()
+        for call in acquire_mock.call_args_list:
+            self.assertEqual('token', call[0][0].auth_token)
+
+    def test__takeover_node_token_expires(self, get_nodeinfo_mock,
+                                          mapped_mock, acquire_mock,
+                                          get_authref_mock):
+        old_ref = self._get_auth_ref('old-token')
+        get_authref_mock.side_effect = iter([old_ref,
+                                             self._get_auth_ref('token')])
+        acquire_mock.side_effect = self._get_acquire_side_effect(
+            [self.task] * 2)
+        with mock.patch.object(self.service, '_do_takeover', autospec=True):
+            self.service._takeover_node(self.context, self.node.uuid)
+            old_ref.will_expire_soon.return_value = True
+            self.service._takeover_node(self.context, self.node.uuid)
+        self.assertEqual(2, get_authref_mock.call_count)
+        self.assertEqual('token', acquire_mock.call_args[0][0].auth_token)
+
+    def test__takeover_node_token_rejected(self, get_nodeinfo_mock,
+                                           mapped_mock, acquire_mock,
+                                           get_authref_mock):
+        get_authref_mock.side_effect = iter([self._get_auth_ref('old-token'),
+                                             self._get_auth_ref('token')])
+        fake_acquire = self._get_acquire_side_effect([self.task] * 2)
+        tokens = []
+
+        def _acquire(context, node_id, *args, **kwargs):
+            tokens.append(context.auth_token)
+            return fake_acquire(context, node_id, *args, **kwargs)
+
+        acquire_mock.side_effect = _acquire
+        with mock.patch.object(self.service, '_do_takeover',
+                               autospec=True) as takeover_mock:
+            takeover_mock.side_effect = iter([
+                exception.ImageNotAuthorized(image_id='image'), None])
+            self.assertTrue(self.service._takeover_node(self.context,
+                                                        self.node.uuid))
+        self.assertEqual(2, get_authref_mock.call_count)
+        self.assertEqual(['old-token', 'token'], tokens)
+
+    def _test__takeover_node_not_needed(self, acquire_mock):
+        acquire_mock.side_effect = self._get_acquire_side_effect(self.task)
+        with mock.patch.object(self.service, '_do_takeover',
+                               autospec=True) as takeover_mock:
+            self.assertFalse(self.service._takeover_node(self.context,
+                                                         self.node.uuid))
+            self.assertFalse(takeover_mock.called)
+
+    def test__takeover_node_maintenance(self, get_nodeinfo_mock, mapped_mock,
+                                        acquire_mock, get_authtoken_mock):
+        self.node.maintenance = True
+        self._test__takeover_node_not_needed(acquire_mock)
 
-        # assert spawn_after has been called only 2 times
-        expected = [mock.call(self.service._spawn_worker,
-                    self.service._do_takeover, self.task)] * 2
-        self.assertEqual(expected, self.task.spawn_after.call_args_list)
+    def test__takeover_node_already_mapped(self, get_nodeinfo_mock,
+                                           mapped_mock, acquire_mock,
+                                           get_authtoken_mock):
+        self.node.conductor_affinity = 123
+        self.service.conductor.id = 123
+        self._test__takeover_node_not_needed(acquire_mock)
 
-    @mock.patch.object(context, 'get_admin_context')
-    def test_worker_limit(self, get_ctx_mock, get_nodeinfo_mock, mapped_mock,
-                          acquire_mock, get_authtoken_mock):
-        # Limit to only 1 worker
-        self.config(periodic_max_workers=1, group='conductor')
-        get_ctx_mock.return_value = self.context
-        mapped_mock.return_value = True
-        acquire_mock.side_effect = self._get_acquire_side_effect(
-                                       [self.task] * 3)
-        self.task.spawn_after.side_effect = [None] * 3
+    def test__takeover_node_not_active(self, get_nodeinfo_mock, mapped_mock,
+                                       acquire_mock, get_authtoken_mock):
+        self.node.provision_state = states.DELETING
+        self._test__takeover_node_not_needed(acquire_mock)
 
-        # 3 nodes to be checked
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                                             [self.node] * 3)
+    def test__takeover_node_not_mapped_anymore(self, get_nodeinfo_mock,
+                                               mapped_mock, acquire_mock,
+                                               get_authtoken_mock):
+        # The hash ring changed after the takeover was planned
+        mapped_mock.return_value = False
+        self._test__takeover_node_not_needed(acquire_mock)
+        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
 
-        self.service._sync_local_state(self.context)
+    def test__takeover_node_locked(self, get_nodeinfo_mock, mapped_mock,
+                                   acquire_mock, get_authtoken_mock):
+        acquire_mock.side_effect = exception.NodeLocked(node='node',
+                                                        host='host')
+        self.assertRaises(exception.NodeLocked, self.service._takeover_node,
+                          self.context, self.node.uuid)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
 
-        # assert _mapped_to_this_conductor() gets called only once
-        # because of the worker limit
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+@_mock_record_keepalive
+@mock.patch.object(fake.FakeConsole, 'start_console')
+@mock.patch.object(fake.FakeDeploy, 'take_over')
+@mock.patch.object(fake.FakeDeploy, 'prepare')
+class DoTakeoverTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
 
-        # assert acquire() gets called only once because of the worker limit
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid)
+    def test__do_takeover(self, prepare_mock, take_over_mock,
+                          start_console_mock):
+        self._start_service()
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        with task_manager.acquire(self.context, node.uuid) as task:
+            self.service._do_takeover(task)
+            node.refresh()
+            self.assertEqual(self.service.conductor.id,
+                             node.conductor_affinity)
+            prepare_mock.assert_called_once_with(task)
+            take_over_mock.assert_called_once_with(task)
+            self.assertFalse(start_console_mock.called)
+
+    def test__do_takeover_batches_pxe_configs(self, prepare_mock,
+                                              take_over_mock,
+                                              start_console_mock):
+        batched = []
+        prepare_mock.side_effect = lambda task: batched.append(
+            pxe_utils._batch_local.enabled)
+        self._start_service()
+        node = obj_utils.create_test_node(self.context, driver='fake')
+        with task_manager.acquire(self.context, node.uuid) as task:
+            self.service._do_takeover(task)
+        self.assertEqual([True], batched)
+        self.assertFalse(pxe_utils._batch_local.enabled)
+
+    def test__do_takeover_with_console(self, prepare_mock, take_over_mock,
+                                       start_console_mock):
+        self.config(gateway_enabled=True, group='console')
+        self._start_service()
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          console_enabled=True)
+        with task_manager.acquire(self.context, node.uuid) as task:
+            self.service._do_takeover(task)
+            start_console_mock.assert_called_once_with(task)
+        node.refresh()
+        self.assertTrue(node.console_enabled)
 
-        # Only one auth token needed for all runs
-        get_authtoken_mock.assert_called_once_with()
+    def test__do_takeover_with_console_fails(self, prepare_mock,
+                                             take_over_mock,
+                                             start_console_mock):
+        self.config(gateway_enabled=True, group='console')
+        start_console_mock.side_effect = exception.ConsoleError('boom')
+        self._start_service()
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          console_enabled=True)
+        with task_manager.acquire(self.context, node.uuid) as task:
+            self.service._do_takeover(task)
+        node.refresh()
+        self.assertTrue(node.console_enabled)
+        self.assertIsNone(node.last_error)
+        self.assertEqual(self.service.conductor.id, node.conductor_affinity)
 
-        # assert spawn_after has been called
-        self.task.spawn_after.assert_called_once_with(
-                self.service._spawn_worker,
-                self.service._do_takeover, self.task)
+    def test__do_takeover_with_shellinabox_console(self, prepare_mock,
+                                                   take_over_mock,
+                                                   start_console_mock):
+        self._start_service()
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          console_enabled=True)
+        with task_manager.acquire(self.context, node.uuid) as task:
+            self.service._do_takeover(task)
+        self.assertFalse(start_console_mock.called)
 
 
 @mock.patch.object(swift, 'SwiftAPI')
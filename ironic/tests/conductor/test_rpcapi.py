@@ -19,9 +19,11 @@ Unit Tests for :py:class:`ironic.conductor.rpcapi.ConductorAPI`.
 """
 
 import copy
+import time
 
 import mock
 from oslo_config import cfg
+from oslo_utils import uuidutils
 
 from ironic.common import boot_devices
 from ironic.common import exception
@@ -76,7 +78,7 @@ class RPCAPITestCase(base.DbTestCase):
                          rpcapi.get_topic_for,
                          self.fake_node_obj)
 
-    def test_get_topic_doesnt_cache(self):
+    def test_get_topic_for_cached(self):
         CONF.set_override('host', 'fake-host')
 
         rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
@@ -88,9 +90,36 @@ class RPCAPITestCase(base.DbTestCase):
                                        'drivers': ['fake-driver']})
 
         rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        self.assertRaises(exception.NoValidHost,
+                         rpcapi.get_topic_for,
+                         self.fake_node_obj)
+
         expected_topic = 'fake-topic.fake-host'
-        self.assertEqual(expected_topic,
-                         rpcapi.get_topic_for(self.fake_node_obj))
+        later = time.time() + CONF.hash_ring_reset_interval
+        with mock.patch.object(time, 'time', autospec=True) as mock_time:
+            mock_time.return_value = later
+            self.assertEqual(expected_topic,
+                             rpcapi.get_topic_for(self.fake_node_obj))
+
+    def test_group_by_topic(self):
+        self.dbapi.register_conductor({'hostname': 'host1',
+                                       'drivers': ['fake-driver']})
+        self.dbapi.register_conductor({'hostname': 'host2',
+                                       'drivers': ['fake-driver',
+                                                   'other-driver']})
+        node1 = objects.Node(self.context, uuid=uuidutils.generate_uuid(),
+                             driver='fake-driver')
+        node2 = objects.Node(self.context, uuid=uuidutils.generate_uuid(),
+                             driver='other-driver')
+        node3 = objects.Node(self.context, uuid=uuidutils.generate_uuid(),
+                             driver='unknown-driver')
+
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        topics, unsupported = rpcapi.group_by_topic([node1, node2, node3])
+        self.assertEqual([node3], unsupported)
+        self.assertIn(node1, topics[rpcapi.get_topic_for(node1)])
+        self.assertIn(node2, topics['fake-topic.host2'])
+        self.assertEqual(2, sum(len(nodes) for nodes in topics.values()))
 
     def test_get_topic_for_driver_known_driver(self):
         CONF.set_override('host', 'fake-host')
@@ -113,8 +142,9 @@ class RPCAPITestCase(base.DbTestCase):
                           rpcapi.get_topic_for_driver,
                           'fake-driver')
 
-    def test_get_topic_for_driver_doesnt_cache(self):
+    def test_get_topic_for_driver_no_cache(self):
         CONF.set_override('host', 'fake-host')
+        CONF.set_override('hash_ring_reset_interval', 0)
         rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
         self.assertRaises(exception.DriverNotFound,
                           rpcapi.get_topic_for_driver,
@@ -169,10 +199,25 @@ class RPCAPITestCase(base.DbTestCase):
                     self.assertEqual(arg, expected_arg)
 
     def test_update_node(self):
-        self._test_rpcapi('update_node',
-                          'call',
-                          version='1.1',
-                          node_obj=self.fake_node)
+        self.fake_node_obj.obj_reset_changes()
+        self.fake_node_obj.extra = {'foo': 'bar'}
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        with mock.patch.object(rpcapi.client, 'prepare') as mock_prepare:
+            mock_prepare.return_value.call.return_value = 'node'
+            self.assertEqual('node', rpcapi.update_node(self.context,
+                                                        self.fake_node_obj))
+            mock_prepare.assert_called_once_with(topic='fake-topic',
+                                                 version='1.29')
+            mock_call = mock_prepare.return_value.call
+            mock_call.assert_called_once_with(self.context, 'update_node',
+                                              node_obj=mock.ANY)
+            primitive = mock_call.call_args[1]['node_obj']
+            self.assertTrue(primitive['ironic_object.delta'])
+            self.assertEqual(['extra'], primitive['ironic_object.changes'])
+            self.assertEqual({'id': self.fake_node_obj.id,
+                              'uuid': self.fake_node_obj.uuid,
+                              'extra': {'foo': 'bar'}},
+                             primitive['ironic_object.data'])
 
     def test_change_node_power_state(self):
         self._test_rpcapi('change_node_power_state',
@@ -181,6 +226,13 @@ class RPCAPITestCase(base.DbTestCase):
                           node_id=self.fake_node['uuid'],
                           new_state=states.POWER_ON)
 
+    def test_change_nodes_power_state(self):
+        self._test_rpcapi('change_nodes_power_state',
+                          'call',
+                          version='1.28',
+                          node_ids=[self.fake_node['uuid']],
+                          new_state=states.POWER_ON)
+
     def test_vendor_passthru(self):
         self._test_rpcapi('vendor_passthru',
                           'call',
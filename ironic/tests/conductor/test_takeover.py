@@ -0,0 +1,163 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the conductor takeover engine."""
+
+import eventlet
+from eventlet import event
+import mock
+
+from ironic.common import exception
+from ironic.conductor import takeover
+from ironic.tests import base
+
+
+class TakeoverEngineTestCase(base.TestCase):
+
+    def setUp(self):
+        super(TakeoverEngineTestCase, self).setUp()
+        self.results = {}
+        self.calls = []
+        self.engine = takeover.TakeoverEngine(self._takeover, 2)
+        self.addCleanup(self.engine.stop)
+
+    def _takeover(self, context, node_uuid):
+        self.calls.append((context, node_uuid))
+        result = self.results.get(node_uuid, True)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _wait(self):
+        with eventlet.Timeout(5):
+            while self.engine.is_running():
+                eventlet.sleep(0)
+
+    def test_takeover_all(self):
+        uuids = ['node%d' % i for i in range(10)]
+        self.assertEqual(10, self.engine.add('ctx', uuids))
+        self._wait()
+
+        self.assertEqual([('ctx', uuid) for uuid in uuids], self.calls)
+        progress = self.engine.get_progress()
+        self.assertEqual(10, progress['total'])
+        self.assertEqual(10, progress['done'])
+        self.assertEqual(0, progress['pending'])
+        self.assertEqual(0, progress['running'])
+
+    def test_max_workers(self):
+        blocker = event.Event()
+        running = []
+
+        def _takeover(context, node_uuid):
+            running.append(node_uuid)
+            blocker.wait()
+            return True
+
+        self.engine.takeover_func = _takeover
+        self.engine.add('ctx', ['node1', 'node2', 'node3'])
+        eventlet.sleep(0.1)
+        self.assertEqual(['node1', 'node2'], running)
+        self.assertEqual(1, self.engine.get_progress()['pending'])
+        self.assertEqual(2, self.engine.get_progress()['running'])
+        blocker.send()
+        self._wait()
+        self.assertEqual(['node1', 'node2', 'node3'], running)
+
+    def test_add_deduplicates(self):
+        blocker = event.Event()
+        self.engine.takeover_func = lambda ctx, uuid: blocker.wait()
+        self.assertEqual(2, self.engine.add('ctx', ['node1', 'node2']))
+        eventlet.sleep(0)
+        # node1 and node2 are running, node1 is added again
+        self.assertEqual(1, self.engine.add('ctx', ['node1', 'node3']))
+        self.assertEqual(3, self.engine.get_progress()['total'])
+        blocker.send(True)
+        self._wait()
+
+    def test_outcomes(self):
+        self.results = {'node2': False,
+                        'node3': exception.NodeNotFound(node='node3'),
+                        'node4': RuntimeError('boom')}
+        self.engine.add('ctx', ['node1', 'node2', 'node3', 'node4'])
+        self._wait()
+
+        progress = self.engine.get_progress()
+        self.assertEqual(1, progress['done'])
+        self.assertEqual(2, progress['skipped'])
+        self.assertEqual(1, progress['failed'])
+
+    @mock.patch.object(takeover, '_RETRY_DELAY', 0)
+    def test_locked_retried(self):
+        attempts = []
+
+        def _takeover(context, node_uuid):
+            attempts.append(node_uuid)
+            if node_uuid == 'node1' and attempts.count('node1') < 2:
+                raise exception.NodeLocked(node=node_uuid, host='host')
+            return True
+
+        self.engine.takeover_func = _takeover
+        self.engine.add('ctx', ['node1', 'node2'])
+        self._wait()
+
+        # The locked node is tried again after the other ones
+        self.assertEqual(['node1', 'node2', 'node1'], attempts)
+        self.assertEqual(2, self.engine.get_progress()['done'])
+
+    @mock.patch.object(takeover, '_RETRY_DELAY', 0)
+    def test_locked_gives_up(self):
+        self.results = {'node1': exception.NodeLocked(node='node1',
+                                                      host='host')}
+        self.engine.add('ctx', ['node1'])
+        self._wait()
+
+        self.assertEqual(takeover._MAX_ATTEMPTS, len(self.calls))
+        self.assertEqual(1, self.engine.get_progress()['skipped'])
+
+    @mock.patch.object(eventlet, 'sleep', autospec=True)
+    def test_rate_limit(self, sleep_mock):
+        engine = takeover.TakeoverEngine(self._takeover, 2, max_rate=4)
+        engine._queue.extend([('ctx', 'node1', 1, 0), ('ctx', 'node2', 1, 0)])
+        engine._run()
+        sleep_mock.assert_has_calls([mock.call(0.25), mock.call(0.25)])
+        self.assertEqual([('ctx', 'node1'), ('ctx', 'node2')], self.calls)
+
+    def test_new_takeover_resets_progress(self):
+        self.engine.add('ctx', ['node1'])
+        self._wait()
+        self.engine.add('ctx', ['node2', 'node3'])
+        self._wait()
+        progress = self.engine.get_progress()
+        self.assertEqual(2, progress['total'])
+        self.assertEqual(2, progress['done'])
+
+    def test_stop(self):
+        blocker = event.Event()
+        finished = []
+
+        def _takeover(context, node_uuid):
+            blocker.wait()
+            finished.append(node_uuid)
+            return True
+
+        self.engine.takeover_func = _takeover
+        self.engine.add('ctx', ['node1', 'node2', 'node3'])
+        eventlet.sleep(0)
+        eventlet.spawn_n(blocker.send, True)
+        self.engine.stop()
+        self.assertFalse(self.engine.is_running())
+        # The takeovers already started are waited for, not the others
+        self.assertEqual(['node1', 'node2'], sorted(finished))
+        progress = self.engine.get_progress()
+        self.assertEqual(0, progress['pending'])
+        self.assertEqual(0, progress['running'])
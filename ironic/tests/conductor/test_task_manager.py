@@ -223,6 +223,39 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
         get_driver_mock.assert_called_once_with(self.node.driver)
 
+    def test_upgrade_lock(self, get_ports_mock, get_driver_mock,
+                          reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+        reserve_mock.return_value = self.node
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertTrue(task.shared)
+            self.assertFalse(reserve_mock.called)
+
+            task.upgrade_lock()
+            self.assertFalse(task.shared)
+            # second upgrade does nothing
+            task.upgrade_lock()
+            self.assertFalse(task.shared)
+
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+        release_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+
+    def test_upgrade_lock_node_locked(self, get_ports_mock, get_driver_mock,
+                                      reserve_mock, release_mock,
+                                      node_get_mock):
+        node_get_mock.return_value = self.node
+        reserve_mock.side_effect = exception.NodeLocked(node='fake-node-id',
+                                                        host='fake-host')
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertRaises(exception.NodeLocked, task.upgrade_lock)
+            self.assertTrue(task.shared)
+
+        self.assertFalse(release_mock.called)
+
     def test_shared_lock_with_driver(self, get_ports_mock, get_driver_mock,
                                      reserve_mock, release_mock,
                                      node_get_mock):
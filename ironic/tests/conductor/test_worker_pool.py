@@ -0,0 +1,149 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the conductor worker pool."""
+
+import time
+
+from eventlet import event
+import mock
+
+from ironic.common import exception
+from ironic.conductor import worker_pool
+from ironic.tests import base
+
+
+class WorkerPoolTestCase(base.TestCase):
+
+    def setUp(self):
+        super(WorkerPoolTestCase, self).setUp()
+        self.pool = worker_pool.WorkerPool(1, max_queue_size=3)
+        self.done = []
+        # Occupy the only worker until the event is sent
+        self.blocker = event.Event()
+        self.pool.spawn(worker_pool.PRIORITY_NORMAL, self.blocker.wait)
+        self.addCleanup(self._unblock)
+
+    def _unblock(self):
+        if not self.blocker.ready():
+            self.blocker.send()
+        self.pool.waitall()
+
+    def _work(self, name):
+        self.done.append(name)
+        return name
+
+    def test_spawn_free(self):
+        pool = worker_pool.WorkerPool(1)
+        work = pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'a')
+        self.assertIsNotNone(work.thread)
+        self.assertEqual('a', work.wait())
+
+    def test_spawn_queued(self):
+        work = self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'a')
+        self.assertIsNone(work.thread)
+        self.assertEqual(1, self.pool.waiting())
+
+        self.blocker.send()
+        self.assertEqual('a', work.wait())
+        self.assertEqual(0, self.pool.waiting())
+
+    def test_priority_order(self):
+        self.pool.spawn(worker_pool.PRIORITY_LOW, self._work, 'low')
+        self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'normal1')
+        self.pool.spawn(worker_pool.PRIORITY_HIGH, self._work, 'high')
+        self.blocker.send()
+        self.pool.waitall()
+        self.assertEqual(['high', 'normal1', 'low'], self.done)
+
+    def test_queue_full(self):
+        for i in range(3):
+            self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, i)
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.pool.spawn, worker_pool.PRIORITY_NORMAL,
+                          self._work, 'too much')
+        self.assertEqual(1, self.pool.get_stats()['rejected'])
+
+    def test_queue_full_lower_priority(self):
+        for i in range(3):
+            self.pool.spawn(worker_pool.PRIORITY_LOW, self._work, i)
+        # Low priority work does not count against higher priority work
+        work = self.pool.spawn(worker_pool.PRIORITY_HIGH, self._work, 'high')
+        self.assertIsNone(work.thread)
+        self.assertEqual(4, self.pool.waiting())
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.pool.spawn, worker_pool.PRIORITY_LOW,
+                          self._work, 'too much')
+
+    def test_queue_disabled(self):
+        pool = worker_pool.WorkerPool(1)
+        pool.spawn(worker_pool.PRIORITY_NORMAL, self.blocker.wait)
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          pool.spawn, worker_pool.PRIORITY_NORMAL,
+                          self._work, 'a')
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_queue_not_draining(self, time_mock):
+        self.pool.max_queue_wait = 10
+        time_mock.return_value = 100
+        self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'a')
+        time_mock.return_value = 105
+        self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'b')
+        time_mock.return_value = 111
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.pool.spawn, worker_pool.PRIORITY_NORMAL,
+                          self._work, 'c')
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_queue_not_draining_lower_priority(self, time_mock):
+        self.pool.max_queue_wait = 10
+        time_mock.return_value = 100
+        self.pool.spawn(worker_pool.PRIORITY_LOW, self._work, 'a')
+        time_mock.return_value = 105
+        self.pool.spawn(worker_pool.PRIORITY_HIGH, self._work, 'b')
+        time_mock.return_value = 111
+        self.pool.spawn(worker_pool.PRIORITY_HIGH, self._work, 'c')
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.pool.spawn, worker_pool.PRIORITY_LOW,
+                          self._work, 'd')
+        self.assertEqual(3, self.pool.waiting())
+
+    def test_link_before_start(self):
+        work = self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'a')
+        linked = []
+        work.link(lambda thread, arg: linked.append(arg), 'linked')
+        self.blocker.send()
+        self.pool.waitall()
+        self.assertEqual(['linked'], linked)
+
+    def test_cancel_before_start(self):
+        work = self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'a')
+        work.cancel()
+        self.blocker.send()
+        self.pool.waitall()
+        self.assertEqual([], self.done)
+
+    def test_get_stats(self):
+        self.pool.spawn(worker_pool.PRIORITY_NORMAL, self._work, 'a')
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['running'])
+        self.assertEqual(1, stats['waiting'])
+        self.assertEqual(1, stats['queued'])
+        self.assertEqual(1, stats['started'])
+
+        self.blocker.send()
+        self.pool.waitall()
+        stats = self.pool.get_stats()
+        self.assertEqual(0, stats['running'])
+        self.assertEqual(0, stats['waiting'])
+        self.assertEqual(2, stats['started'])
+        self.assertTrue(stats['max_wait_time'] >= 0)
@@ -373,6 +373,55 @@ class MigrationCheckersMixin(object):
         node = nodes.select(nodes.c.uuid == uuid).execute().first()
         self.assertEqual(bigstring, node['name'])
 
+    def _check_3a1f6fc8a2e5(self, engine, data):
+        indexes = sqlalchemy.inspect(engine).get_indexes('nodes')
+        self.assertIn({'name': 'nodes_reservation_maintenance_idx',
+                       'column_names': ['reservation', 'maintenance'],
+                       'unique': False}, indexes)
+        index_names = [index['name'] for index in indexes]
+        self.assertIn('nodes_provision_state_updated_at_idx', index_names)
+        self.assertIn('nodes_provision_state_inspection_started_at_idx',
+                      index_names)
+        self.assertIn('nodes_driver_idx', index_names)
+        indexes = sqlalchemy.inspect(engine).get_indexes('ports')
+        index_names = [index['name'] for index in indexes]
+        if engine.name == 'mysql':
+            # The index of the foreign key is used instead
+            self.assertNotIn('ports_node_id_idx', index_names)
+            self.assertIn('node_id', index_names)
+        else:
+            self.assertIn('ports_node_id_idx', index_names)
+
+    def _pre_upgrade_1c2f3e5a8d4b(self, engine):
+        nodes = db_utils.get_table(engine, 'nodes')
+        data = {'uuid': uuidutils.generate_uuid()}
+        nodes.insert().execute(data)
+        return data
+
+    def _check_1c2f3e5a8d4b(self, engine, data):
+        nodes = db_utils.get_table(engine, 'nodes')
+        self.assertIsInstance(nodes.c.change_seq.type,
+                              sqlalchemy.types.BigInteger)
+        node = nodes.select(nodes.c.uuid == data['uuid']).execute().first()
+        self.assertEqual(node['id'], node['change_seq'])
+
+        sequences = db_utils.get_table(engine, 'sequences')
+        sequence = sequences.select(
+            sequences.c.name == 'nodes').execute().first()
+        max_id = max(row['id'] for row in nodes.select().execute())
+        self.assertEqual(max_id, sequence['value'])
+
+    def _check_5e8a0c1f4d27(self, engine, data):
+        self.assertNotIn('sequences', engine.table_names())
+
+    def _check_2d7e4b9f6a13(self, engine, data):
+        deletions = db_utils.get_table(engine, 'node_deletions')
+        self.assertIsInstance(deletions.c.change_seq.type,
+                              sqlalchemy.types.BigInteger)
+        indexes = sqlalchemy.inspect(engine).get_indexes('node_deletions')
+        self.assertIn('node_deletions_change_seq_idx',
+                      [index['name'] for index in indexes])
+
     def test_upgrade_and_version(self):
         with patch_with_engine(self.engine):
             self.migration_api.upgrade('head')
@@ -426,7 +475,13 @@ class ModelsMigrationSyncMixin(object):
 class ModelsMigrationsSyncMysql(ModelsMigrationSyncMixin,
                                 test_migrations.ModelsMigrationsSync,
                                 test_base.MySQLOpportunisticTestCase):
-    pass
+
+    def include_object(self, object_, name, type_, reflected, compare_to):
+        # NOTE: the index of the foreign key is used instead on MySQL.
+        if type_ == 'index' and name == 'ports_node_id_idx':
+            return False
+        return super(ModelsMigrationsSyncMysql, self).include_object(
+            object_, name, type_, reflected, compare_to)
 
 
 class ModelsMigrationsSyncPostgres(ModelsMigrationSyncMixin,
@@ -0,0 +1,104 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests that the queries of the conductor periodic tasks use indexes.
+
+The queries run through the DB API are captured and their plan is checked
+with sqlite's EXPLAIN QUERY PLAN.
+"""
+
+import re
+
+from sqlalchemy import event
+
+from ironic.common import states
+from ironic.db.sqlalchemy import api as sqla_api
+from ironic.tests.db import base
+
+_SEARCH_RE = re.compile(r'SEARCH (?:TABLE )?(\w+) USING (?:COVERING )?'
+                        r'INDEX (\w+)')
+
+
+class QueryPlanTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(QueryPlanTestCase, self).setUp()
+        self.engine = sqla_api.get_engine()
+        if self.engine.name != 'sqlite':
+            self.skipTest('Query plans are only checked on sqlite.')
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     self._record_statement)
+        self.addCleanup(event.remove, self.engine, 'before_cursor_execute',
+                        self._record_statement)
+
+    def _record_statement(self, conn, cursor, statement, parameters,
+                          context, executemany):
+        self.statements.append((statement, parameters))
+
+    def _get_plan(self, func, *args, **kwargs):
+        del self.statements[:]
+        func(*args, **kwargs)
+        statement, parameters = self.statements[-1]
+        rows = self.engine.execute('EXPLAIN QUERY PLAN ' + statement,
+                                   parameters).fetchall()
+        # NOTE: the last of the 4 columns is the description of the step.
+        return [row[3] for row in rows]
+
+    def _assert_uses_index(self, table, index, plan):
+        searches = [m.groups() for m in map(_SEARCH_RE.match, plan) if m]
+        self.assertIn((table, index), searches,
+                      'Unexpected query plan: %s' % plan)
+
+    def _assert_nodes_query_uses_index(self, index, filters, sort_key=None):
+        plan = self._get_plan(self.dbapi.get_nodeinfo_list,
+                              columns=['uuid', 'driver', 'id'],
+                              filters=filters, sort_key=sort_key)
+        self._assert_uses_index('nodes', index, plan)
+
+    def test_sync_power_states(self):
+        self._assert_nodes_query_uses_index(
+            'nodes_reservation_maintenance_idx',
+            {'reserved': False, 'maintenance': False})
+
+    def test_check_deploy_timeouts(self):
+        self._assert_nodes_query_uses_index(
+            'nodes_provision_state_updated_at_idx',
+            {'reserved': False, 'maintenance': False,
+             'provision_state': states.DEPLOYWAIT,
+             'provisioned_before': 60},
+            sort_key='provision_updated_at')
+
+    def test_check_inspect_timeouts(self):
+        self._assert_nodes_query_uses_index(
+            'nodes_provision_state_inspection_started_at_idx',
+            {'reserved': False, 'provision_state': states.INSPECTING,
+             'inspection_started_before': 60},
+            sort_key='inspection_started_at')
+
+    def test_sync_local_state(self):
+        plan = self._get_plan(self.dbapi.get_nodeinfo_list,
+                              columns=['uuid', 'driver', 'id',
+                                       'conductor_affinity'],
+                              filters={'reserved': False,
+                                       'maintenance': False,
+                                       'provision_state': states.ACTIVE})
+        self._assert_uses_index('nodes', 'nodes_reservation_maintenance_idx',
+                                plan)
+
+    def test_nodes_by_driver(self):
+        self._assert_nodes_query_uses_index('nodes_driver_idx',
+                                            {'driver': 'fake'})
+
+    def test_ports_by_node_id(self):
+        plan = self._get_plan(self.dbapi.get_ports_by_node_id, 1)
+        self._assert_uses_index('ports', 'ports_node_id_idx', plan)
@@ -15,10 +15,12 @@
 
 """Tests for manipulating Chassis via the DB API"""
 
+import mock
 from oslo_utils import uuidutils
 import six
 
 from ironic.common import exception
+from ironic.db.sqlalchemy import api as sqla_api
 from ironic.tests.db import base
 from ironic.tests.db import utils
 
@@ -38,6 +40,24 @@ class DbChassisTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         six.assertCountEqual(self, uuids, res_uuids)
 
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_get_chassis_list_use_slave(self, mock_get_session):
+        self.assertEqual([self.chassis.uuid],
+                         [r.uuid for r in self.dbapi.get_chassis_list()])
+        self.dbapi.get_chassis_list(use_slave=False)
+        mock_get_session.assert_has_calls([mock.call(use_slave=True),
+                                           mock.call(use_slave=False)])
+
+    def test_get_chassis_list_version(self):
+        count, max_created, max_updated = (
+            self.dbapi.get_chassis_list_version())
+        self.assertEqual(1, count)
+        self.assertIsNone(max_updated)
+
+        ch = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
+        self.assertEqual((2, ch.created_at, None),
+                         self.dbapi.get_chassis_list_version())
+
     def test_get_chassis_by_id(self):
         chassis = self.dbapi.get_chassis_by_id(self.chassis.id)
 
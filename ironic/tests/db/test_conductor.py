@@ -21,6 +21,7 @@ import mock
 from oslo_utils import timeutils
 
 from ironic.common import exception
+from ironic.db.sqlalchemy import api as sqla_api
 from ironic.tests.db import base
 from ironic.tests.db import utils
 
@@ -103,12 +104,23 @@ class DbConductorTestCase(base.DbTestCase):
         node2 = self.dbapi.create_node({'reservation': 'hostname2'})
         node3 = self.dbapi.create_node({'reservation': None})
         self.dbapi.clear_node_reservations_for_conductor('hostname1')
-        node1 = self.dbapi.get_node_by_id(node1.id)
-        node2 = self.dbapi.get_node_by_id(node2.id)
-        node3 = self.dbapi.get_node_by_id(node3.id)
-        self.assertIsNone(node1.reservation)
-        self.assertEqual('hostname2', node2.reservation)
-        self.assertIsNone(node3.reservation)
+        new_node1 = self.dbapi.get_node_by_id(node1.id)
+        new_node2 = self.dbapi.get_node_by_id(node2.id)
+        new_node3 = self.dbapi.get_node_by_id(node3.id)
+        self.assertIsNone(new_node1.reservation)
+        self.assertEqual('hostname2', new_node2.reservation)
+        self.assertIsNone(new_node3.reservation)
+        self.assertEqual(node1.change_seq, new_node1.change_seq)
+
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_get_active_driver_dict_use_slave(self, mock_get_session):
+        self._create_test_cdr(hostname='fake-host', drivers=['fake'])
+        mock_get_session.reset_mock()
+        self.assertEqual({'fake': set(['fake-host'])},
+                         self.dbapi.get_active_driver_dict())
+        self.dbapi.get_active_driver_dict(use_slave=True)
+        mock_get_session.assert_has_calls([mock.call(use_slave=False),
+                                           mock.call(use_slave=True)])
 
     @mock.patch.object(timeutils, 'utcnow', autospec=True)
     def test_get_active_driver_dict_one_host_no_driver(self, mock_utcnow):
@@ -16,6 +16,8 @@
 """Tests for manipulating Nodes via the DB API"""
 
 import datetime
+import itertools
+import time
 
 import mock
 from oslo_utils import timeutils
@@ -24,12 +26,26 @@ import six
 
 from ironic.common import exception
 from ironic.common import states
+from ironic.db.sqlalchemy import api as sqla_api
 from ironic.tests.db import base
 from ironic.tests.db import utils
 
+# Not patched by DbNodeTestCase
+_node_change_seq = sqla_api._node_change_seq
+
 
 class DbNodeTestCase(base.DbTestCase):
 
+    def setUp(self):
+        super(DbNodeTestCase, self).setUp()
+        # Make the change sequences predictable, and far enough apart to
+        # number the nodes of a batch.
+        seq_patcher = mock.patch.object(sqla_api, '_node_change_seq',
+                                        autospec=True)
+        self.mock_seq = seq_patcher.start()
+        self.mock_seq.side_effect = itertools.count(1000, 1000)
+        self.addCleanup(seq_patcher.stop)
+
     def test_create_node(self):
         utils.create_test_node()
 
@@ -38,6 +54,42 @@ class DbNodeTestCase(base.DbTestCase):
         self.assertRaises(exception.NodeAlreadyExists,
                           utils.create_test_node)
 
+    def _get_test_nodes(self, count):
+        nodes = []
+        for i in range(count):
+            node = utils.get_test_node(uuid=uuidutils.generate_uuid())
+            del node['id']
+            nodes.append(node)
+        return nodes
+
+    def test_create_nodes(self):
+        res = self.dbapi.create_nodes(self._get_test_nodes(3))
+        self.assertEqual(3, len(self.dbapi.get_node_list()))
+        seqs = [node.change_seq for node in res]
+        self.assertEqual(sorted(seqs), seqs)
+        self.assertEqual(3, len(set(seqs)))
+        node = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        self.assertTrue(node.change_seq > seqs[-1])
+
+    @mock.patch.object(sqla_api, 'BULK_CREATE_BATCH_SIZE', 2)
+    def test_create_nodes_batches(self):
+        with mock.patch.object(sqla_api, 'add_batch',
+                               wraps=sqla_api.add_batch) as add_mock:
+            self.dbapi.create_nodes(self._get_test_nodes(5))
+        self.assertEqual([2, 2, 1],
+                         [len(c[0][1]) for c in add_mock.call_args_list])
+        self.assertEqual(5, len(self.dbapi.get_node_list()))
+
+    def test_create_nodes_errors(self):
+        existing = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        nodes = self._get_test_nodes(3)
+        nodes[1]['uuid'] = existing.uuid
+        res = self.dbapi.create_nodes(nodes)
+        self.assertEqual(nodes[0]['uuid'], res[0].uuid)
+        self.assertIsInstance(res[1], exception.NodeAlreadyExists)
+        self.assertEqual(nodes[2]['uuid'], res[2].uuid)
+        self.assertEqual(3, len(self.dbapi.get_node_list()))
+
     def test_create_node_instance_already_associated(self):
         instance = uuidutils.generate_uuid()
         utils.create_test_node(uuid=uuidutils.generate_uuid(),
@@ -110,7 +162,7 @@ class DbNodeTestCase(base.DbTestCase):
             uuid=uuidutils.generate_uuid())
         node2 = utils.create_test_node(driver='driver-two',
             uuid=uuidutils.generate_uuid(),
-            maintenance=True)
+            maintenance=True, console_enabled=True)
 
         res = self.dbapi.get_nodeinfo_list(filters={'driver': 'driver-one'})
         self.assertEqual([node1.id], [r[0] for r in res])
@@ -136,6 +188,9 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_list(filters={'maintenance': False})
         self.assertEqual([node1.id], [r.id for r in res])
 
+        res = self.dbapi.get_nodeinfo_list(filters={'console_enabled': True})
+        self.assertEqual([node2.id], [r[0] for r in res])
+
     @mock.patch.object(timeutils, 'utcnow', autospec=True)
     def test_get_nodeinfo_list_provision(self, mock_utcnow):
         past = datetime.datetime(2000, 1, 1, 0, 0)
@@ -196,6 +251,42 @@ class DbNodeTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         six.assertCountEqual(self, uuids, res_uuids)
 
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_get_node_list_uses_slave(self, mock_get_session):
+        node = utils.create_test_node()
+        mock_get_session.reset_mock()
+        res = self.dbapi.get_node_list(filters={'driver': 'fake'})
+        self.assertEqual([node.uuid], [r.uuid for r in res])
+        mock_get_session.assert_called_once_with(use_slave=True)
+
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_get_node_list_without_slave(self, mock_get_session):
+        utils.create_test_node()
+        mock_get_session.reset_mock()
+        self.dbapi.get_node_list(use_slave=False)
+        self.dbapi.get_node_list_version(use_slave=False)
+        mock_get_session.assert_has_calls([mock.call(use_slave=False),
+                                           mock.call(use_slave=False)])
+
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_get_nodeinfo_list_use_slave(self, mock_get_session):
+        utils.create_test_node()
+        mock_get_session.reset_mock()
+        self.dbapi.get_nodeinfo_list()
+        self.dbapi.get_nodeinfo_list(use_slave=True)
+        mock_get_session.assert_has_calls([mock.call(use_slave=False),
+                                           mock.call(use_slave=True)])
+
+    def test_get_node_list_uuids_or_names(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       name='node-2')
+        utils.create_test_node(uuid=uuidutils.generate_uuid(), name='node-3')
+        res = self.dbapi.get_node_list(
+            filters={'uuids_or_names': [node1.uuid, 'node-2', 'missing']})
+        self.assertEqual(sorted([node1.id, node2.id]),
+                         sorted(r.id for r in res))
+
     def test_get_node_list_with_filters(self):
         ch1 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
         ch2 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
@@ -240,6 +331,31 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_list(filters={'maintenance': False})
         self.assertEqual([node1.id], [r.id for r in res])
 
+    def test_get_node_list_with_state_filters(self):
+        conductor = self.dbapi.register_conductor({'hostname': 'host1',
+                                                   'drivers': ['fake']})
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       power_state=states.POWER_ON,
+                                       provision_state=states.ACTIVE,
+                                       conductor_affinity=conductor.id)
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       power_state=states.POWER_OFF,
+                                       provision_state=states.AVAILABLE)
+
+        res = self.dbapi.get_node_list(filters={'power_state':
+                                                states.POWER_ON})
+        self.assertEqual([node1.id], [r.id for r in res])
+
+        res = self.dbapi.get_node_list(filters={'provision_state':
+                                                states.AVAILABLE})
+        self.assertEqual([node2.id], [r.id for r in res])
+
+        res = self.dbapi.get_node_list(filters={'conductor': 'host1'})
+        self.assertEqual([node1.id], [r.id for r in res])
+
+        res = self.dbapi.get_node_list(filters={'conductor': 'host2'})
+        self.assertEqual([], res)
+
     def test_get_node_list_chassis_not_found(self):
         self.assertRaises(exception.ChassisNotFound,
                           self.dbapi.get_node_list,
@@ -252,6 +368,34 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_by_instance(node.instance_uuid)
         self.assertEqual(node.uuid, res.uuid)
 
+    def test_get_node_by_port_addresses(self):
+        node = utils.create_test_node()
+        utils.create_test_port(node_id=node.id, address='aa:bb:cc:dd:ee:ff')
+        utils.create_test_port(uuid=uuidutils.generate_uuid(),
+                               node_id=node.id, address='aa:bb:cc:dd:ee:fe')
+        res = self.dbapi.get_node_by_port_addresses(
+            ['aa:bb:cc:dd:ee:ff', 'aa:bb:cc:dd:ee:fe', '11:22:33:44:55:66'])
+        self.assertEqual(node.uuid, res.uuid)
+
+    def test_get_node_by_port_addresses_not_found(self):
+        node = utils.create_test_node()
+        utils.create_test_port(node_id=node.id, address='aa:bb:cc:dd:ee:ff')
+        self.assertRaises(exception.NodeNotFound,
+                          self.dbapi.get_node_by_port_addresses,
+                          ['11:22:33:44:55:66'])
+        self.assertRaises(exception.NodeNotFound,
+                          self.dbapi.get_node_by_port_addresses, [])
+
+    def test_get_node_by_port_addresses_multiple(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_port(node_id=node1.id, address='aa:bb:cc:dd:ee:ff')
+        utils.create_test_port(uuid=uuidutils.generate_uuid(),
+                               node_id=node2.id, address='aa:bb:cc:dd:ee:fe')
+        self.assertRaises(exception.NodeNotFound,
+                          self.dbapi.get_node_by_port_addresses,
+                          ['aa:bb:cc:dd:ee:ff', 'aa:bb:cc:dd:ee:fe'])
+
     def test_get_node_by_instance_wrong_uuid(self):
         utils.create_test_node(
                 instance_uuid='12345678-9999-0000-aaaa-123456789012')
@@ -272,6 +416,13 @@ class DbNodeTestCase(base.DbTestCase):
         self.assertRaises(exception.NodeNotFound,
                           self.dbapi.get_node_by_id, node.id)
 
+    def test_destroy_node_records_deletion(self):
+        node = utils.create_test_node()
+        self.dbapi.destroy_node(node.uuid)
+        res, deletions = self.dbapi.get_node_changes(node.change_seq)
+        self.assertEqual([(node.uuid, node.change_seq + 1000)],
+                         [(d.uuid, d.change_seq) for d in deletions])
+
     def test_destroy_node_by_uuid(self):
         node = utils.create_test_node()
 
@@ -402,6 +553,218 @@ class DbNodeTestCase(base.DbTestCase):
                          timeutils.normalize_time(result))
         self.assertIsNone(res['inspection_started_at'])
 
+    def test_update_node_values(self):
+        node = utils.create_test_node()
+        res = self.dbapi.update_node_values(node.uuid,
+                                            {'extra': {'foo': 'bar'}})
+        self.assertEqual({'extra': {'foo': 'bar'},
+                          'change_seq': node.change_seq + 1000}, res)
+        self.assertEqual({'foo': 'bar'},
+                         self.dbapi.get_node_by_id(node.id).extra)
+
+    def test_update_node_values_not_found(self):
+        self.assertRaises(exception.NodeNotFound,
+                          self.dbapi.update_node_values,
+                          uuidutils.generate_uuid(), {'extra': {}})
+
+    def test_update_node_values_uuid(self):
+        node = utils.create_test_node()
+        self.assertRaises(exception.InvalidParameterValue,
+                          self.dbapi.update_node_values, node.id,
+                          {'uuid': ''})
+
+    def test_update_node_values_empty(self):
+        node = utils.create_test_node()
+        with mock.patch.object(self.dbapi, '_do_update_node_values',
+                               autospec=True) as mock_update:
+            self.assertEqual({}, self.dbapi.update_node_values(node.id, {}))
+            self.assertFalse(mock_update.called)
+
+    def test_update_node_values_already_associated(self):
+        node = utils.create_test_node()
+        self.dbapi.update_node_values(
+            node.id, {'instance_uuid': uuidutils.generate_uuid()})
+        self.assertRaises(exception.NodeAssociated,
+                          self.dbapi.update_node_values, node.id,
+                          {'instance_uuid': uuidutils.generate_uuid()})
+        # Disassociating is always possible
+        self.dbapi.update_node_values(node.id, {'instance_uuid': None})
+        self.assertIsNone(self.dbapi.get_node_by_id(node.id).instance_uuid)
+
+    def test_update_node_values_name_duplicate(self):
+        utils.create_test_node(uuid=uuidutils.generate_uuid(), name='spam')
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        self.assertRaises(exception.DuplicateName,
+                          self.dbapi.update_node_values,
+                          node2.id, {'name': 'spam'})
+
+    @mock.patch.object(timeutils, 'utcnow', autospec=True)
+    def test_update_node_values_provision(self, mock_utcnow):
+        mocked_time = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = mocked_time
+        node = utils.create_test_node(inspection_started_at=mocked_time)
+        with mock.patch.object(self.dbapi, '_do_update_node',
+                               autospec=True) as mock_locking:
+            res = self.dbapi.update_node_values(
+                node.id, {'provision_state': states.INSPECTING})
+            self.assertFalse(mock_locking.called)
+        self.assertEqual({'provision_state': states.INSPECTING,
+                          'provision_updated_at': mocked_time,
+                          'inspection_started_at': mocked_time,
+                          'inspection_finished_at': None,
+                          'change_seq': node.change_seq + 1000}, res)
+        node = self.dbapi.get_node_by_id(node.id)
+        self.assertEqual(mocked_time,
+                         timeutils.normalize_time(node.provision_updated_at))
+
+    @mock.patch.object(timeutils, 'utcnow', autospec=True)
+    def test_update_node_values_inspection_finished(self, mock_utcnow):
+        mocked_time = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = mocked_time
+        node = utils.create_test_node(provision_state=states.INSPECTING,
+                                      inspection_started_at=mocked_time)
+        res = self.dbapi.update_node_values(
+            node.id, {'provision_state': states.MANAGEABLE})
+        self.assertEqual({'provision_state': states.MANAGEABLE,
+                          'provision_updated_at': mocked_time,
+                          'inspection_started_at': None,
+                          'inspection_finished_at': mocked_time,
+                          'change_seq': node.change_seq + 1000}, res)
+        node = self.dbapi.get_node_by_id(node.id)
+        self.assertIsNone(node.inspection_started_at)
+        self.assertEqual(mocked_time, timeutils.normalize_time(
+            node.inspection_finished_at))
+
+    def test_change_seq(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        self.assertEqual(node1.change_seq + 1000, node2.change_seq)
+
+        res = self.dbapi.update_node(node1.id, {'extra': {'foo': 'bar'}})
+        self.assertEqual(node2.change_seq + 1000, res.change_seq)
+        values = self.dbapi.update_node_values(node2.id,
+                                               {'power_state': 'power on'})
+        self.assertEqual(res.change_seq + 1000, values['change_seq'])
+        self.assertEqual(values['change_seq'],
+                         self.dbapi.get_node_by_id(node2.id).change_seq)
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_node_change_seq(self, mock_time):
+        mock_time.return_value = 1428997965.123456
+        self.assertEqual(1428997965123456, _node_change_seq())
+
+    def test_change_seq_not_bumped_on_failure(self):
+        node = utils.create_test_node(
+            instance_uuid=uuidutils.generate_uuid())
+        self.assertRaises(exception.NodeAssociated,
+                          self.dbapi.update_node_values,
+                          node.id,
+                          {'instance_uuid': uuidutils.generate_uuid()})
+        self.assertEqual(node.change_seq,
+                         self.dbapi.get_node_by_id(node.id).change_seq)
+
+    def test_change_seq_untracked_fields(self):
+        node = utils.create_test_node()
+        values = self.dbapi.update_node_values(node.id,
+                                               {'conductor_affinity': 1})
+        self.assertNotIn('change_seq', values)
+        res = self.dbapi.update_node(node.id, {'conductor_affinity': 2})
+        self.assertEqual(node.change_seq, res.change_seq)
+        self.assertEqual(node.change_seq,
+                         self.dbapi.get_node_by_id(node.id).change_seq)
+
+    def test_change_seq_reservation(self):
+        node = utils.create_test_node()
+        res = self.dbapi.reserve_node('host1', node.id)
+        self.assertEqual(node.change_seq, res.change_seq)
+        self.dbapi.release_node('host1', node.id)
+        self.assertEqual(node.change_seq,
+                         self.dbapi.get_node_by_id(node.id).change_seq)
+
+    def test_change_seq_unchanged_values(self):
+        node = utils.create_test_node(extra={'foo': 'bar'})
+        res = self.dbapi.update_node(node.id, {'extra': {'foo': 'bar'}})
+        self.assertEqual(node.change_seq, res.change_seq)
+
+    def test_get_node_changes(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node3 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        self.dbapi.update_node(node1.id, {'extra': {'foo': 'bar'}})
+
+        res, deletions = self.dbapi.get_node_changes(0)
+        self.assertEqual([node2.id, node3.id, node1.id], [r.id for r in res])
+        self.assertEqual([], deletions)
+
+        res, deletions = self.dbapi.get_node_changes(node2.change_seq,
+                                                     limit=1)
+        self.assertEqual([node3.id], [r.id for r in res])
+
+        last = self.dbapi.get_node_by_id(node1.id).change_seq
+        self.assertEqual(([], []), self.dbapi.get_node_changes(last))
+
+    def test_get_node_changes_until(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_node(uuid=uuidutils.generate_uuid())
+
+        res, deletions = self.dbapi.get_node_changes(
+            0, until=node2.change_seq)
+        self.assertEqual([node1.id, node2.id], [r.id for r in res])
+        res, deletions = self.dbapi.get_node_changes(
+            node1.change_seq, until=node2.change_seq, limit=5)
+        self.assertEqual([node2.id], [r.id for r in res])
+
+    def test_get_node_changes_limit_ties(self):
+        self.mock_seq.side_effect = iter([1000, 2000, 2000, 3000])
+        nodes = [utils.create_test_node(uuid=uuidutils.generate_uuid())
+                 for i in range(4)]
+
+        res, deletions = self.dbapi.get_node_changes(0, limit=2)
+        self.assertEqual([n.id for n in nodes[:3]], [r.id for r in res])
+        res, deletions = self.dbapi.get_node_changes(2000, limit=2)
+        self.assertEqual([nodes[3].id], [r.id for r in res])
+
+    def test_get_node_changes_deletions(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        self.dbapi.destroy_node(node1.id)
+        self.dbapi.update_node(node2.id, {'extra': {'foo': 'bar'}})
+
+        res, deletions = self.dbapi.get_node_changes(node2.change_seq)
+        self.assertEqual([node2.id], [r.id for r in res])
+        self.assertEqual([(node1.uuid, 3000)],
+                         [(d.uuid, d.change_seq) for d in deletions])
+
+        # The deletion is the first change after node2 was created
+        res, deletions = self.dbapi.get_node_changes(node2.change_seq,
+                                                     limit=1)
+        self.assertEqual([], res)
+        self.assertEqual([node1.uuid], [d.uuid for d in deletions])
+        res, deletions = self.dbapi.get_node_changes(3000, limit=1)
+        self.assertEqual([node2.id], [r.id for r in res])
+        self.assertEqual([], deletions)
+
+    def test_get_node_list_version(self):
+        self.assertEqual((0, 0, None, None),
+                         self.dbapi.get_node_list_version())
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       maintenance=True)
+        self.assertEqual((2, 0, node2.change_seq, None),
+                         self.dbapi.get_node_list_version())
+        self.assertEqual((1, 0, node1.change_seq, None),
+                         self.dbapi.get_node_list_version(
+                             {'maintenance': False}))
+
+        node1 = self.dbapi.update_node(node1.id, {'extra': {'foo': 'bar'}})
+        self.assertEqual((2, 0, node1.change_seq, node1.updated_at),
+                         self.dbapi.get_node_list_version())
+
+        self.dbapi.reserve_node('host1', node2.id)
+        self.assertEqual((2, 1, node1.change_seq),
+                         self.dbapi.get_node_list_version()[:3])
+
     def test_reserve_node(self):
         node = utils.create_test_node()
         uuid = node.uuid
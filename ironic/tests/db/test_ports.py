@@ -15,10 +15,13 @@
 
 """Tests for manipulating Ports via the DB API"""
 
+import mock
+from oslo_db import exception as db_exc
 from oslo_utils import uuidutils
 import six
 
 from ironic.common import exception
+from ironic.db.sqlalchemy import api as sqla_api
 from ironic.tests.db import base
 from ironic.tests.db import utils as db_utils
 
@@ -44,6 +47,19 @@ class DbPortTestCase(base.DbTestCase):
         res = self.dbapi.get_port_by_address(self.port.address)
         self.assertEqual(self.port.id, res.id)
 
+    def test_get_ports_by_addresses(self):
+        port2 = db_utils.create_test_port(uuid=uuidutils.generate_uuid(),
+                                          address='52:54:00:cf:2d:41')
+        res = self.dbapi.get_ports_by_addresses(
+            [self.port.address, port2.address, '52:54:00:cf:2d:42'])
+        self.assertEqual(sorted([self.port.id, port2.id]),
+                         sorted(p.id for p in res))
+
+    def test_get_ports_by_addresses_empty(self):
+        self.assertEqual([], self.dbapi.get_ports_by_addresses([]))
+        self.assertEqual([], self.dbapi.get_ports_by_addresses(
+            ['52:54:00:cf:2d:42']))
+
     def test_get_port_list(self):
         uuids = []
         for i in range(1, 6):
@@ -56,6 +72,14 @@ class DbPortTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         six.assertCountEqual(self, uuids, res_uuids)
 
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_get_port_list_use_slave(self, mock_get_session):
+        self.assertEqual([self.port.uuid],
+                         [r.uuid for r in self.dbapi.get_port_list()])
+        self.dbapi.get_port_list(use_slave=False)
+        mock_get_session.assert_has_calls([mock.call(use_slave=True),
+                                           mock.call(use_slave=False)])
+
     def test_get_ports_by_node_id(self):
         res = self.dbapi.get_ports_by_node_id(self.node.id)
         self.assertEqual(self.port.address, res[0].address)
@@ -63,6 +87,17 @@ class DbPortTestCase(base.DbTestCase):
     def test_get_ports_by_node_id_that_does_not_exist(self):
         self.assertEqual([], self.dbapi.get_ports_by_node_id(99))
 
+    def test_get_port_list_version(self):
+        count, max_created, max_updated = self.dbapi.get_port_list_version()
+        self.assertEqual(1, count)
+        self.assertIsNone(max_updated)
+        self.assertEqual((0, None, None),
+                         self.dbapi.get_port_list_version(node_id=99))
+
+        port = self.dbapi.update_port(self.port.id, {'extra': {'foo': 'bar'}})
+        self.assertEqual((1, max_created, port.updated_at),
+                         self.dbapi.get_port_list_version(self.node.id))
+
     def test_destroy_port(self):
         self.dbapi.destroy_port(self.port.id)
         self.assertRaises(exception.PortNotFound,
@@ -92,6 +127,57 @@ class DbPortTestCase(base.DbTestCase):
                           self.dbapi.update_port, port2.id,
                           {'address': address1})
 
+    def test_create_ports(self):
+        ports = [db_utils.get_test_port(node_id=self.node.id,
+                                        address='52:54:00:cf:2d:4%d' % i)
+                 for i in range(3)]
+        for port in ports:
+            del port['id']
+            del port['uuid']
+        res = self.dbapi.create_ports(ports)
+        self.assertEqual(['52:54:00:cf:2d:4%d' % i for i in range(3)],
+                         [port.address for port in res])
+        self.assertTrue(all(uuidutils.is_uuid_like(port.uuid)
+                            for port in res))
+        self.assertEqual(4, len(self.dbapi.get_port_list()))
+
+    def test_create_ports_errors(self):
+        ports = [db_utils.get_test_port(uuid=uuidutils.generate_uuid(),
+                                        node_id=self.node.id,
+                                        address=address)
+                 for address in ('52:54:00:cf:2d:40', self.port.address)]
+        for port in ports:
+            del port['id']
+        res = self.dbapi.create_ports(ports)
+        self.assertEqual(ports[0]['uuid'], res[0].uuid)
+        self.assertIsInstance(res[1], exception.MACAlreadyExists)
+        self.assertEqual(2, len(self.dbapi.get_port_list()))
+
+    def test_create_ports_reference_error(self):
+        ports = [db_utils.get_test_port(uuid=uuidutils.generate_uuid(),
+                                        node_id=self.node.id,
+                                        address='52:54:00:cf:2d:4%d' % i)
+                 for i in range(2)]
+        for port in ports:
+            del port['id']
+        create_port = sqla_api.Connection.create_port
+
+        def fake_create_port(dbapi, values):
+            if values['address'] == ports[1]['address']:
+                raise db_exc.DBReferenceError('nodes', 'fk', 'node_id',
+                                              'ports')
+            return create_port(dbapi, values)
+
+        with mock.patch.object(sqla_api, 'add_batch', autospec=True,
+                               side_effect=db_exc.DBError):
+            with mock.patch.object(sqla_api.Connection, 'create_port',
+                                   autospec=True,
+                                   side_effect=fake_create_port):
+                res = self.dbapi.create_ports(ports)
+        self.assertEqual(ports[0]['uuid'], res[0].uuid)
+        self.assertIsInstance(res[1], exception.InvalidParameterValue)
+        self.assertIn('node_id', six.text_type(res[1]))
+
     def test_create_port_duplicated_address(self):
         self.assertRaises(exception.MACAlreadyExists,
                           db_utils.create_test_port,
@@ -213,6 +213,7 @@ def get_test_node(**kw):
         'created_at': kw.get('created_at'),
         'inspection_finished_at': kw.get('inspection_finished_at'),
         'inspection_started_at': kw.get('inspection_started_at'),
+        'change_seq': kw.get('change_seq'),
     }
 
 
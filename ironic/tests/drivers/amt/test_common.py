@@ -109,6 +109,12 @@ class AMTCommonClientTestCase(base.TestCase):
         super(AMTCommonClientTestCase, self).setUp()
         self.info = {key[4:]: INFO_DICT[key] for key in INFO_DICT.keys()}
 
+    def test_transport_timeout(self, mock_client_pywsman):
+        self.config(native_call_timeout=60, group='conductor')
+        client = amt_common.Client(**self.info)
+        set_timeout_mock = mock_client_pywsman.wsman_transport_set_timeout
+        set_timeout_mock.assert_called_once_with(client.client, 60)
+
     def test_wsman_get(self, mock_client_pywsman):
         namespace = resource_uris.CIM_AssociatedPowerManagementService
         result_xml = test_utils.build_soap_xml([{'PowerState':
@@ -36,6 +36,18 @@ class DracClientTestCase(base.TestCase):
         super(DracClientTestCase, self).setUp()
         self.resource_uri = 'http://foo/wsman'
 
+    def test_transport_timeout(self, mock_client_pywsman):
+        self.config(native_call_timeout=60, group='conductor')
+        client = drac_client.Client(**INFO_DICT)
+        set_timeout_mock = mock_client_pywsman.wsman_transport_set_timeout
+        set_timeout_mock.assert_called_once_with(client.client, 60)
+
+    def test_transport_timeout_disabled(self, mock_client_pywsman):
+        self.config(native_call_timeout=0, group='conductor')
+        drac_client.Client(**INFO_DICT)
+        self.assertFalse(
+            mock_client_pywsman.wsman_transport_set_timeout.called)
+
     def test_wsman_enumerate(self, mock_client_pywsman):
         mock_xml = test_utils.mock_wsman_root('<test></test>')
         mock_pywsman_client = mock_client_pywsman.Client.return_value
@@ -17,6 +17,7 @@
 
 import tempfile
 
+import eventlet
 import mock
 from oslo_config import cfg
 
@@ -216,6 +217,120 @@ class IloDeployPrivateMethodsTestCase(db_base.DbTestCase):
         swift_obj_mock.delete_object.assert_called_once_with('ilo-cont',
                                                              'boot-object')
 
+    @mock.patch.object(ilo_deploy, '_get_shared_boot_iso')
+    @mock.patch.object(images, 'create_boot_iso')
+    @mock.patch.object(driver_utils, 'get_node_capability')
+    @mock.patch.object(images, 'get_image_properties')
+    @mock.patch.object(ilo_deploy, '_parse_deploy_info')
+    def test__get_boot_iso_create_shared(self, deploy_info_mock,
+                                         image_props_mock, capability_mock,
+                                         create_boot_iso_mock,
+                                         shared_boot_iso_mock):
+        self.config(use_shared_boot_iso=True, group='ilo')
+        self.config(pxe_append_params='kernel-params', group='pxe')
+        deploy_info_mock.return_value = {'image_source': 'image-uuid',
+                                         'ilo_deploy_iso': 'deploy_iso_uuid'}
+        image_props_mock.return_value = {'boot_iso': None,
+                                         'kernel_id': 'kernel_uuid',
+                                         'ramdisk_id': 'ramdisk_uuid'}
+        capability_mock.return_value = 'uefi'
+        shared_boot_iso_mock.return_value = 'boot-iso-abcdef'
+
+        with task_manager.acquire(self.context, self.node.uuid,
+                                  shared=False) as task:
+            boot_iso_actual = ilo_deploy._get_boot_iso(task, 'root-uuid')
+            shared_boot_iso_mock.assert_called_once_with(
+                task, 'kernel_uuid', 'ramdisk_uuid', 'deploy_iso_uuid',
+                'root-uuid', 'kernel-params', 'uefi')
+        self.assertEqual('swift:boot-iso-abcdef', boot_iso_actual)
+        self.assertFalse(create_boot_iso_mock.called)
+
+    def test__get_shared_boot_iso_object_name(self):
+        args = ['kernel', 'ramdisk', 'deploy-iso', 'root-uuid', 'params']
+        name = ilo_deploy._get_shared_boot_iso_object_name(*args + ['uefi'])
+        self.assertTrue(name.startswith('boot-iso-'))
+        self.assertEqual(
+            name, ilo_deploy._get_shared_boot_iso_object_name(
+                *args + ['uefi']))
+        self.assertNotEqual(
+            name, ilo_deploy._get_shared_boot_iso_object_name(
+                'kernel', 'ramdisk', 'deploy-iso', 'other-root-uuid',
+                'params', 'uefi'))
+        self.assertNotEqual(
+            name, ilo_deploy._get_shared_boot_iso_object_name(
+                *args + ['bios']))
+
+    def test__get_shared_boot_iso_object_name_bios(self):
+        # The deploy ISO is not used to build BIOS boot ISOs
+        self.assertEqual(
+            ilo_deploy._get_shared_boot_iso_object_name(
+                'kernel', 'ramdisk', 'deploy-iso1', 'root-uuid', 'params',
+                'bios'),
+            ilo_deploy._get_shared_boot_iso_object_name(
+                'kernel', 'ramdisk', 'deploy-iso2', 'root-uuid', 'params',
+                'bios'))
+
+    def _get_shared_boot_iso(self):
+        with task_manager.acquire(self.context, self.node.uuid,
+                                  shared=False) as task:
+            return ilo_deploy._get_shared_boot_iso(
+                task, 'kernel', 'ramdisk', 'deploy-iso', 'root-uuid',
+                'params', 'bios'), task
+
+    @mock.patch.object(images, 'create_boot_iso')
+    @mock.patch.object(swift, 'SwiftAPI')
+    def test__get_shared_boot_iso_exists(self, swift_api_mock,
+                                         create_boot_iso_mock):
+        self.config(swift_ilo_container='ilo-cont', group='ilo')
+        self.config(shared_boot_iso_ttl=3600, group='ilo')
+        name = ilo_deploy._get_shared_boot_iso_object_name(
+            'kernel', 'ramdisk', 'deploy-iso', 'root-uuid', 'params', 'bios')
+        swift_obj_mock = swift_api_mock.return_value
+
+        actual, task = self._get_shared_boot_iso()
+
+        self.assertEqual(name, actual)
+        swift_obj_mock.update_object_meta.assert_called_once_with(
+            'ilo-cont', name, {'X-Delete-After': '3600'})
+        self.assertFalse(swift_obj_mock.create_object.called)
+        self.assertFalse(create_boot_iso_mock.called)
+
+    @mock.patch.object(tempfile, 'NamedTemporaryFile')
+    @mock.patch.object(images, 'create_boot_iso')
+    @mock.patch.object(swift, 'SwiftAPI')
+    def test__get_shared_boot_iso_create(self, swift_api_mock,
+                                         create_boot_iso_mock,
+                                         tempfile_mock):
+        self.config(swift_ilo_container='ilo-cont', group='ilo')
+        self.config(shared_boot_iso_ttl=3600, group='ilo')
+        name = ilo_deploy._get_shared_boot_iso_object_name(
+            'kernel', 'ramdisk', 'deploy-iso', 'root-uuid', 'params', 'bios')
+        swift_obj_mock = swift_api_mock.return_value
+        swift_obj_mock.update_object_meta.side_effect = (
+            exception.SwiftOperationError(operation='post object',
+                                          error='not found'))
+        fileobj_mock = mock.MagicMock()
+        fileobj_mock.name = 'tmpfile'
+        tempfile_mock.return_value.__enter__.return_value = fileobj_mock
+
+        actual, task = self._get_shared_boot_iso()
+
+        self.assertEqual(name, actual)
+        create_boot_iso_mock.assert_called_once_with(
+            task.context, 'tmpfile', 'kernel', 'ramdisk', 'deploy-iso',
+            'root-uuid', 'params', 'bios')
+        swift_obj_mock.create_object.assert_called_once_with(
+            'ilo-cont', name, 'tmpfile',
+            object_headers={'X-Delete-After': '3600'})
+
+    @mock.patch.object(swift, 'SwiftAPI')
+    def test__clean_up_boot_iso_for_instance_shared(self, swift_mock):
+        i_info = self.node.instance_info
+        i_info['ilo_boot_iso'] = 'swift:boot-iso-abc'
+        self.node.instance_info = i_info
+        ilo_deploy._clean_up_boot_iso_for_instance(self.node)
+        self.assertFalse(swift_mock.return_value.delete_object.called)
+
     @mock.patch.object(ilo_deploy, '_get_boot_iso_object_name')
     def test__clean_up_boot_iso_for_instance_no_boot_iso(
             self, boot_object_name_mock):
@@ -762,6 +877,59 @@ class VendorPassthruTestCase(db_base.DbTestCase):
                 task, method='pass_bootloader_install_info', **kwargs)
             validate_mock.assert_called_once_with(task, kwargs)
 
+    @mock.patch.object(eventlet.greenthread, 'spawn_n',
+                       lambda f, *a, **kw: f(*a, **kw))
+    @mock.patch.object(swift, 'SwiftAPI')
+    def test__refresh_shared_boot_isos(self, swift_api_mock):
+        self.config(swift_ilo_container='ilo-cont', group='ilo')
+        self.config(shared_boot_iso_ttl=3600, group='ilo')
+        mgr = mock.Mock(spec=['iter_nodes'])
+        mgr.iter_nodes.return_value = [
+            ('1', 'iscsi_ilo', {'ilo_boot_iso': 'swift:boot-iso-abc'}),
+            ('2', 'iscsi_ilo', {'ilo_boot_iso': 'swift:boot-iso-abc'}),
+            ('3', 'iscsi_ilo', {'ilo_boot_iso': 'swift:boot-uuid'}),
+            ('4', 'iscsi_ilo', {'ilo_boot_iso': 'http://foo/boot.iso'}),
+            ('5', 'fake', None)]
+        swift_obj_mock = swift_api_mock.return_value
+
+        ilo_deploy.VendorPassthru()._refresh_shared_boot_isos(mgr,
+                                                              self.context)
+
+        mgr.iter_nodes.assert_called_once_with(fields=['instance_info'])
+        swift_obj_mock.update_object_meta.assert_called_once_with(
+            'ilo-cont', 'boot-iso-abc', {'X-Delete-After': '3600'})
+
+    @mock.patch.object(eventlet.greenthread, 'spawn_n',
+                       lambda f, *a, **kw: f(*a, **kw))
+    @mock.patch.object(swift, 'SwiftAPI')
+    def test__refresh_shared_boot_isos_failure(self, swift_api_mock):
+        mgr = mock.Mock(spec=['iter_nodes'])
+        mgr.iter_nodes.return_value = [
+            ('1', 'iscsi_ilo', {'ilo_boot_iso': 'swift:boot-iso-abc'}),
+            ('2', 'iscsi_ilo', {'ilo_boot_iso': 'swift:boot-iso-def'})]
+        swift_obj_mock = swift_api_mock.return_value
+        swift_obj_mock.update_object_meta.side_effect = (
+            exception.SwiftOperationError(operation='post object',
+                                          error='boom'))
+
+        ilo_deploy.VendorPassthru()._refresh_shared_boot_isos(mgr,
+                                                              self.context)
+
+        # A failure does not prevent refreshing the other boot ISOs
+        self.assertEqual(2, swift_obj_mock.update_object_meta.call_count)
+
+    @mock.patch.object(eventlet.greenthread, 'spawn_n',
+                       lambda f, *a, **kw: f(*a, **kw))
+    @mock.patch.object(swift, 'SwiftAPI')
+    def test__refresh_shared_boot_isos_none(self, swift_api_mock):
+        mgr = mock.Mock(spec=['iter_nodes'])
+        mgr.iter_nodes.return_value = [('1', 'iscsi_ilo', {})]
+
+        ilo_deploy.VendorPassthru()._refresh_shared_boot_isos(mgr,
+                                                              self.context)
+
+        self.assertFalse(swift_api_mock.called)
+
     @mock.patch.object(iscsi_deploy, 'get_deploy_info')
     def test_validate_heartbeat(self, get_deploy_info_mock):
         with task_manager.acquire(self.context, self.node.uuid,
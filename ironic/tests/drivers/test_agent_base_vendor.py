@@ -24,6 +24,7 @@ from ironic.conductor import task_manager
 from ironic.conductor import utils as manager_utils
 from ironic.drivers.modules import agent_base_vendor
 from ironic.drivers.modules import agent_client
+from ironic.drivers.modules import agent_heartbeat
 from ironic.drivers.modules import deploy_utils
 from ironic import objects
 from ironic.tests.conductor import utils as mgr_utils
@@ -129,108 +130,31 @@ class TestBaseAgentVendor(db_base.DbTestCase):
                               version='2',
                               inventory={'interfaces': []})
 
-    @mock.patch.object(objects.Port, 'get_by_address')
-    def test_find_ports_by_macs(self, mock_get_port):
-        fake_port = object_utils.get_test_port(self.context)
-        mock_get_port.return_value = fake_port
+    def test_find_node_by_macs(self):
+        object_utils.create_test_port(self.context, node_id=self.node.id,
+                                      address='aa:bb:cc:dd:ee:ff')
+        macs = ['aa:bb:cc:dd:ee:ff', '11:22:33:44:55:66']
+        node = self.passthru._find_node_by_macs(self.context, macs)
+        self.assertEqual(self.node.uuid, node.uuid)
 
+    def test_find_node_by_macs_no_ports(self):
         macs = ['aa:bb:cc:dd:ee:ff']
-
-        with task_manager.acquire(
-                self.context, self.node['uuid'], shared=True) as task:
-            ports = self.passthru._find_ports_by_macs(task, macs)
-        self.assertEqual(1, len(ports))
-        self.assertEqual(fake_port.uuid, ports[0].uuid)
-        self.assertEqual(fake_port.node_id, ports[0].node_id)
-
-    @mock.patch.object(objects.Port, 'get_by_address')
-    def test_find_ports_by_macs_bad_params(self, mock_get_port):
-        mock_get_port.side_effect = exception.PortNotFound(port="123")
-
-        macs = ['aa:bb:cc:dd:ee:ff']
-        with task_manager.acquire(
-                self.context, self.node['uuid'], shared=True) as task:
-            empty_ids = self.passthru._find_ports_by_macs(task, macs)
-        self.assertEqual([], empty_ids)
-
-    @mock.patch('ironic.objects.node.Node.get_by_id')
-    @mock.patch('ironic.drivers.modules.agent_base_vendor.BaseAgentVendor'
-                '._get_node_id')
-    @mock.patch('ironic.drivers.modules.agent_base_vendor.BaseAgentVendor'
-                '._find_ports_by_macs')
-    def test_find_node_by_macs(self, ports_mock, node_id_mock, node_mock):
-        ports_mock.return_value = object_utils.get_test_port(self.context)
-        node_id_mock.return_value = '1'
-        node_mock.return_value = self.node
-
-        macs = ['aa:bb:cc:dd:ee:ff']
-        with task_manager.acquire(
-                self.context, self.node['uuid'], shared=True) as task:
-            node = self.passthru._find_node_by_macs(task, macs)
-        self.assertEqual(node, node)
-
-    @mock.patch('ironic.drivers.modules.agent_base_vendor.BaseAgentVendor'
-                '._find_ports_by_macs')
-    def test_find_node_by_macs_no_ports(self, ports_mock):
-        ports_mock.return_value = []
-
-        macs = ['aa:bb:cc:dd:ee:ff']
-        with task_manager.acquire(
-                self.context, self.node['uuid'], shared=True) as task:
-            self.assertRaises(exception.NodeNotFound,
-                              self.passthru._find_node_by_macs,
-                              task,
-                              macs)
-
-    @mock.patch('ironic.objects.node.Node.get_by_uuid')
-    @mock.patch('ironic.drivers.modules.agent_base_vendor.BaseAgentVendor'
-                '._get_node_id')
-    @mock.patch('ironic.drivers.modules.agent_base_vendor.BaseAgentVendor'
-                '._find_ports_by_macs')
-    def test_find_node_by_macs_nodenotfound(self, ports_mock, node_id_mock,
-                                            node_mock):
-        port = object_utils.get_test_port(self.context)
-        ports_mock.return_value = [port]
-        node_id_mock.return_value = self.node['uuid']
-        node_mock.side_effect = [self.node,
-                                 exception.NodeNotFound(node=self.node)]
-
-        macs = ['aa:bb:cc:dd:ee:ff']
-        with task_manager.acquire(
-                self.context, self.node['uuid'], shared=True) as task:
-            self.assertRaises(exception.NodeNotFound,
-                              self.passthru._find_node_by_macs,
-                              task,
-                              macs)
-
-    def test_get_node_id(self):
-        fake_port1 = object_utils.get_test_port(self.context,
-                                                node_id=123,
-                                                address="aa:bb:cc:dd:ee:fe")
-        fake_port2 = object_utils.get_test_port(self.context,
-                                                node_id=123,
-                                                id=42,
-                                                address="aa:bb:cc:dd:ee:fb",
-                                                uuid='1be26c0b-03f2-4d2e-ae87-'
-                                                     'c02d7f33c782')
-
-        node_id = self.passthru._get_node_id([fake_port1, fake_port2])
-        self.assertEqual(fake_port2.node_id, node_id)
-
-    def test_get_node_id_exception(self):
-        fake_port1 = object_utils.get_test_port(self.context,
-                                                node_id=123,
-                                                address="aa:bb:cc:dd:ee:fc")
-        fake_port2 = object_utils.get_test_port(self.context,
-                                                node_id=321,
-                                                id=42,
-                                                address="aa:bb:cc:dd:ee:fd",
-                                                uuid='1be26c0b-03f2-4d2e-ae87-'
-                                                     'c02d7f33c782')
-
         self.assertRaises(exception.NodeNotFound,
-                          self.passthru._get_node_id,
-                          [fake_port1, fake_port2])
+                          self.passthru._find_node_by_macs,
+                          self.context, macs)
+
+    def test_find_node_by_macs_multiple_nodes(self):
+        node2 = object_utils.create_test_node(
+            self.context, id=42, uuid='1be26c0b-03f2-4d2e-ae87-c02d7f33c782')
+        object_utils.create_test_port(self.context, node_id=self.node.id,
+                                      address='aa:bb:cc:dd:ee:ff')
+        object_utils.create_test_port(
+            self.context, node_id=node2.id, address='aa:bb:cc:dd:ee:fe',
+            id=42, uuid='1be26c0b-03f2-4d2e-ae87-c02d7f33c783')
+        macs = ['aa:bb:cc:dd:ee:ff', 'aa:bb:cc:dd:ee:fe']
+        self.assertRaises(exception.NodeNotFound,
+                          self.passthru._find_node_by_macs,
+                          self.context, macs)
 
     def test_get_interfaces(self):
         fake_inventory = {
@@ -257,6 +181,103 @@ class TestBaseAgentVendor(db_base.DbTestCase):
                 self.context, self.node['uuid'], shared=True) as task:
             self.passthru.heartbeat(task, **kwargs)
 
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor, 'deploy_is_done')
+    def test_heartbeat_no_action_recorded(self, done_mock):
+        done_mock.return_value = False
+        self.node.provision_state = states.DEPLOYING
+        self.node.save()
+        kwargs = {'agent_url': DRIVER_INTERNAL_INFO['agent_url']}
+        with task_manager.acquire(
+                self.context, self.node['uuid'], shared=True) as task:
+            self.passthru.heartbeat(task, **kwargs)
+            self.assertTrue(task.shared)
+
+        self.node.refresh()
+        self.assertIsNone(self.node.reservation)
+        self.assertNotIn('agent_last_heartbeat',
+                         self.node.driver_internal_info)
+        store = agent_heartbeat.get_store()
+        self.assertEqual(kwargs['agent_url'],
+                         store.get(self.node.uuid)[0])
+        self.assertIn(self.node.uuid, store.pop_dirty())
+
+    @mock.patch.object(agent_base_vendor, '_time')
+    def test_heartbeat_new_agent_url_saved(self, time_mock):
+        time_mock.return_value = 42
+        kwargs = {'agent_url': 'http://127.0.0.1:9999/bar'}
+        with task_manager.acquire(
+                self.context, self.node['uuid'], shared=True) as task:
+            self.passthru.heartbeat(task, **kwargs)
+            self.assertFalse(task.shared)
+
+        self.node.refresh()
+        self.assertEqual('http://127.0.0.1:9999/bar',
+                         self.node.driver_internal_info['agent_url'])
+        self.assertEqual(
+            42, self.node.driver_internal_info['agent_last_heartbeat'])
+        self.assertEqual({}, agent_heartbeat.get_store().pop_dirty())
+
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor, 'continue_deploy')
+    def test_heartbeat_deploywait_locks(self, cd_mock):
+        self.node.provision_state = states.DEPLOYWAIT
+        self.node.save()
+        kwargs = {'agent_url': DRIVER_INTERNAL_INFO['agent_url']}
+        with task_manager.acquire(
+                self.context, self.node['uuid'], shared=True) as task:
+            cd_mock.side_effect = lambda task, **kw: self.assertFalse(
+                task.shared)
+            self.passthru.heartbeat(task, **kwargs)
+            cd_mock.assert_called_once_with(task, **kwargs)
+
+        self.node.refresh()
+        self.assertIn('agent_last_heartbeat', self.node.driver_internal_info)
+
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor, 'reboot_to_instance')
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor, 'deploy_is_done')
+    def test_heartbeat_deploying_locks(self, done_mock, rti_mock):
+        done_mock.return_value = True
+        self.node.provision_state = states.DEPLOYING
+        self.node.save()
+        kwargs = {'agent_url': DRIVER_INTERNAL_INFO['agent_url']}
+        with task_manager.acquire(
+                self.context, self.node['uuid'], shared=True) as task:
+            self.passthru.heartbeat(task, **kwargs)
+            self.assertFalse(task.shared)
+            rti_mock.assert_called_once_with(task, **kwargs)
+        self.assertEqual(2, done_mock.call_count)
+
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor, 'reboot_to_instance')
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor, 'deploy_is_done')
+    def test_heartbeat_deploying_already_handled(self, done_mock, rti_mock):
+        def _handled_meanwhile(task):
+            # another heartbeat finishes the deploy before the lock is taken
+            node = objects.Node.get_by_uuid(self.context, self.node.uuid)
+            node.provision_state = states.ACTIVE
+            node.save()
+            done_mock.side_effect = None
+            return True
+
+        done_mock.side_effect = _handled_meanwhile
+        self.node.provision_state = states.DEPLOYING
+        self.node.save()
+        kwargs = {'agent_url': DRIVER_INTERNAL_INFO['agent_url']}
+        with task_manager.acquire(
+                self.context, self.node['uuid'], shared=True) as task:
+            self.passthru.heartbeat(task, **kwargs)
+            self.assertFalse(rti_mock.called)
+            self.assertEqual(states.ACTIVE, task.node.provision_state)
+
+    def test_heartbeat_flush_disabled(self):
+        self.config(heartbeat_flush_interval=0, group='agent')
+        kwargs = {'agent_url': DRIVER_INTERNAL_INFO['agent_url']}
+        with task_manager.acquire(
+                self.context, self.node['uuid'], shared=True) as task:
+            self.passthru.heartbeat(task, **kwargs)
+            self.assertFalse(task.shared)
+
+        self.node.refresh()
+        self.assertIn('agent_last_heartbeat', self.node.driver_internal_info)
+
     def test_heartbeat_bad(self):
         kwargs = {}
         with task_manager.acquire(
@@ -273,10 +294,11 @@ class TestBaseAgentVendor(db_base.DbTestCase):
             'agent_url': 'http://127.0.0.1:9999/bar'
         }
         done_mock.side_effect = Exception('LlamaException')
+        self.node.provision_state = states.DEPLOYING
+        self.node.target_provision_state = states.ACTIVE
+        self.node.save()
         with task_manager.acquire(
                 self.context, self.node['uuid'], shared=True) as task:
-            task.node.provision_state = states.DEPLOYING
-            task.node.target_provision_state = states.ACTIVE
             self.passthru.heartbeat(task, **kwargs)
             failed_mock.assert_called_once_with(task, mock.ANY)
         log_mock.assert_called_once_with(
@@ -477,6 +499,33 @@ class TestBaseAgentVendor(db_base.DbTestCase):
             self.passthru.continue_cleaning(task)
             notify_mock.assert_called_once_with(task)
 
+    @mock.patch.object(agent_base_vendor.BaseAgentVendor,
+                       '_notify_conductor_resume_clean')
+    @mock.patch.object(agent_client.AgentClient, 'get_commands_status')
+    def test_continue_cleaning_already_handled(self, status_mock,
+                                               notify_mock):
+        clean_step = {'priority': 10, 'interface': 'deploy',
+                      'step': 'erase_devices', 'reboot_requested': False}
+        self.node.provision_state = states.CLEANING
+        self.node.clean_step = clean_step
+        self.node.save()
+
+        def _handled_meanwhile(node):
+            # another heartbeat moves to the next step before the lock is
+            # taken
+            node = objects.Node.get_by_uuid(self.context, self.node.uuid)
+            node.clean_step = dict(clean_step, step='update_firmware')
+            node.save()
+            return [{'command_status': 'SUCCEEDED',
+                     'command_name': 'execute_clean_step',
+                     'command_result': {'clean_step': clean_step}}]
+
+        status_mock.side_effect = _handled_meanwhile
+        with task_manager.acquire(self.context, self.node['uuid'],
+                                  shared=True) as task:
+            self.passthru.continue_cleaning(task)
+            self.assertFalse(notify_mock.called)
+
     @mock.patch.object(agent_base_vendor.BaseAgentVendor,
                        '_notify_conductor_resume_clean')
     @mock.patch.object(agent_client.AgentClient, 'get_commands_status')
@@ -516,9 +565,11 @@ class TestBaseAgentVendor(db_base.DbTestCase):
             'command_result': {}
         }]
         with task_manager.acquire(self.context, self.node['uuid'],
-                                  shared=False) as task:
+                                  shared=True) as task:
             self.passthru.continue_cleaning(task)
             self.assertFalse(notify_mock.called)
+            # Nothing to do, no need to lock the node
+            self.assertTrue(task.shared)
 
     @mock.patch('ironic.conductor.manager.cleaning_error_handler')
     @mock.patch.object(agent_client.AgentClient, 'get_commands_status')
@@ -0,0 +1,114 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Test class for the agent heartbeat store."""
+
+from ironic.drivers.modules import agent_heartbeat
+from ironic.tests import base
+from ironic.tests.conductor import utils as mgr_utils
+from ironic.tests.db import base as db_base
+from ironic.tests.db import utils as db_utils
+from ironic.tests.objects import utils as obj_utils
+
+
+class HeartbeatStoreTestCase(base.TestCase):
+
+    def setUp(self):
+        super(HeartbeatStoreTestCase, self).setUp()
+        self.store = agent_heartbeat.HeartbeatStore()
+
+    def test_record(self):
+        self.store.record('uuid1', 'url1', 10)
+        self.store.record('uuid1', 'url1', 20)
+        self.assertEqual(('url1', 20), self.store.get('uuid1'))
+        self.assertEqual({'uuid1': ('url1', 20)}, self.store.pop_dirty())
+        self.assertEqual({}, self.store.pop_dirty())
+        self.assertEqual(('url1', 20), self.store.get('uuid1'))
+
+    def test_mark_saved(self):
+        self.store.record('uuid1', 'url1', 10)
+        self.store.mark_saved('uuid1', 'url2', 20)
+        self.assertEqual(('url2', 20), self.store.get('uuid1'))
+        self.assertEqual({}, self.store.pop_dirty())
+
+    def test_requeue(self):
+        self.store.record('uuid1', 'url1', 10)
+        self.store.pop_dirty()
+        self.store.requeue('uuid1', 'url1', 10)
+        self.assertEqual({'uuid1': ('url1', 10)}, self.store.pop_dirty())
+
+    def test_requeue_newer_heartbeat(self):
+        self.store.record('uuid1', 'url1', 10)
+        self.store.pop_dirty()
+        self.store.record('uuid1', 'url1', 20)
+        self.store.requeue('uuid1', 'url1', 10)
+        self.assertEqual({'uuid1': ('url1', 20)}, self.store.pop_dirty())
+
+    def test_forget(self):
+        self.store.record('uuid1', 'url1', 10)
+        self.store.forget('uuid1')
+        self.assertIsNone(self.store.get('uuid1'))
+        self.assertEqual({}, self.store.pop_dirty())
+
+
+class FlushTestCase(db_base.DbTestCase):
+
+    def setUp(self):
+        super(FlushTestCase, self).setUp()
+        mgr_utils.mock_the_extension_manager()
+        self.config(node_locked_retry_attempts=1, group='conductor')
+        self.store = agent_heartbeat.get_store()
+        info = db_utils.get_test_agent_driver_internal_info()
+        self.node = obj_utils.create_test_node(
+            self.context, driver_internal_info=info)
+
+    def test_flush(self):
+        self.store.record(self.node.uuid, 'http://1.2.3.4:9999', 42)
+        agent_heartbeat.flush(self.context)
+
+        self.node.refresh()
+        self.assertEqual(
+            42, self.node.driver_internal_info['agent_last_heartbeat'])
+        self.assertEqual('http://1.2.3.4:9999',
+                         self.node.driver_internal_info['agent_url'])
+        self.assertIsNone(self.node.reservation)
+        self.assertEqual({}, self.store.pop_dirty())
+
+    def test_flush_older(self):
+        info = self.node.driver_internal_info
+        info['agent_last_heartbeat'] = 50
+        self.node.driver_internal_info = info
+        self.node.save()
+        self.store.record(self.node.uuid, 'http://1.2.3.4:9999', 42)
+        agent_heartbeat.flush(self.context)
+
+        self.node.refresh()
+        self.assertEqual(
+            50, self.node.driver_internal_info['agent_last_heartbeat'])
+
+    def test_flush_node_locked(self):
+        self.node.reservation = 'other-host'
+        self.node.save()
+        self.store.record(self.node.uuid, 'http://1.2.3.4:9999', 42)
+        agent_heartbeat.flush(self.context)
+
+        self.node.refresh()
+        self.assertNotIn('agent_last_heartbeat',
+                         self.node.driver_internal_info)
+        self.assertEqual({self.node.uuid: ('http://1.2.3.4:9999', 42)},
+                         self.store.pop_dirty())
+
+    def test_flush_node_not_found(self):
+        self.store.record('1be26c0b-03f2-4d2e-ae87-c02d7f33c781',
+                          'http://1.2.3.4:9999', 42)
+        agent_heartbeat.flush(self.context)
+        self.assertEqual(0, len(self.store))
@@ -33,6 +33,10 @@ class FakeVendorInterface(driver_base.VendorInterface):
     def driver_noexception(self):
         return "Fake"
 
+    @driver_base.passthru(['POST'], require_exclusive_lock=False)
+    def sharedlock(self):
+        return "Fake"
+
     @driver_base.passthru(['POST'])
     def ironicexception(self):
         raise exception.IronicException("Fake!")
@@ -80,6 +84,14 @@ class PassthruDecoratorTestCase(base.TestCase):
         self.assertNotEqual(inst1.driver_routes['driver_noexception']['func'],
                             inst2.driver_routes['driver_noexception']['func'])
 
+    def test_passthru_require_exclusive_lock(self):
+        self.assertTrue(
+            self.fvi.vendor_routes['noexception']['require_exclusive_lock'])
+        self.assertFalse(
+            self.fvi.vendor_routes['sharedlock']['require_exclusive_lock'])
+        self.assertNotIn('require_exclusive_lock',
+                         self.fvi.driver_routes['driver_noexception'])
+
 
 @mock.patch.object(eventlet.greenthread, 'spawn_n',
                    side_effect=lambda func, *args, **kw: func(*args, **kw))
@@ -0,0 +1,117 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the vendor client cache."""
+
+import time
+
+import mock
+
+from ironic.drivers.modules import client_cache
+from ironic.tests import base
+
+
+class ClientCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(ClientCacheTestCase, self).setUp()
+        self.cache = client_cache.ClientCache('test')
+        self.creds = {'address': '1.2.3.4', 'password': 'secret'}
+        self.factory = mock.Mock(side_effect=lambda: object())
+
+    def test_get_reuses_client(self):
+        client = self.cache.get('node1', self.creds, self.factory)
+        self.assertIs(client, self.cache.get('node1', self.creds,
+                                             self.factory))
+        self.factory.assert_called_once_with()
+
+    def test_get_shared_between_nodes(self):
+        client = self.cache.get('node1', self.creds, self.factory)
+        self.assertIs(client, self.cache.get('node2', dict(self.creds),
+                                             self.factory))
+        self.assertEqual(1, self.factory.call_count)
+
+    def test_get_different_credentials(self):
+        client = self.cache.get('node1', self.creds, self.factory)
+        other = self.cache.get('node2', {'address': '1.2.3.5',
+                                         'password': 'secret'},
+                               self.factory)
+        self.assertIsNot(client, other)
+
+    def test_get_disabled(self):
+        self.config(vendor_client_cache_ttl=0, group='conductor')
+        self.cache.get('node1', self.creds, self.factory)
+        self.cache.get('node1', self.creds, self.factory)
+        self.assertEqual(2, self.factory.call_count)
+        self.assertEqual(0, len(self.cache))
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_get_expired(self, time_mock):
+        time_mock.return_value = 1000
+        client = self.cache.get('node1', self.creds, self.factory)
+        time_mock.return_value = 1301
+        self.assertIsNot(client, self.cache.get('node1', self.creds,
+                                                self.factory))
+
+    def test_get_driver_info_changed(self):
+        self.cache.get('node1', self.creds, self.factory)
+        self.cache.get('node1', {'address': '1.2.3.4', 'password': 'new'},
+                       self.factory)
+        self.assertEqual(1, len(self.cache))
+
+    def test_get_driver_info_changed_shared(self):
+        client = self.cache.get('node1', self.creds, self.factory)
+        self.cache.get('node2', self.creds, self.factory)
+        self.cache.get('node1', {'address': '1.2.3.4', 'password': 'new'},
+                       self.factory)
+        # node2 still uses the first client
+        self.assertEqual(2, len(self.cache))
+        self.assertIs(client, self.cache.get('node2', self.creds,
+                                             self.factory))
+        self.cache.get('node2', {'address': '1.2.3.4', 'password': 'new'},
+                       self.factory)
+        self.assertEqual(1, len(self.cache))
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_get_forgets_expired_nodes(self, time_mock):
+        time_mock.return_value = 1000
+        self.cache.get('node1', self.creds, self.factory)
+        time_mock.return_value = 1301
+        self.cache.get('node2', {'address': '1.2.3.5'}, self.factory)
+        self.assertEqual(1, len(self.cache))
+        self.assertEqual(['node2'], list(self.cache._node_keys))
+
+    def test_get_factory_fails(self):
+        self.factory.side_effect = ValueError
+        self.assertRaises(ValueError, self.cache.get, 'node1', self.creds,
+                          self.factory)
+        self.assertEqual(0, len(self.cache))
+
+    def test_get_evicts_least_recently_used(self):
+        self.config(vendor_client_cache_size=1, group='conductor')
+        self.cache.get('node1', self.creds, self.factory)
+        self.cache.get('node2', {'address': '1.2.3.5'}, self.factory)
+        self.assertEqual(1, len(self.cache))
+        self.cache.get('node1', self.creds, self.factory)
+        self.assertEqual(3, self.factory.call_count)
+
+    def test_invalidate(self):
+        client = self.cache.get('node1', self.creds, self.factory)
+        self.cache.invalidate(self.creds)
+        self.assertEqual({}, self.cache._node_keys)
+        self.assertIsNot(client, self.cache.get('node1', self.creds,
+                                                self.factory))
+
+    def test_clear_all(self):
+        self.cache.get('node1', self.creds, self.factory)
+        client_cache.clear_all()
+        self.assertEqual(0, len(self.cache))
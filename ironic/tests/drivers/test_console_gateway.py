@@ -0,0 +1,269 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Test class for the console gateway driver module."""
+
+import eventlet
+import mock
+
+from ironic.common import exception
+from ironic.drivers.modules import console_gateway
+from ironic.tests import base
+
+
+class RingBufferTestCase(base.TestCase):
+
+    def test_append(self):
+        buf = console_gateway.RingBuffer(8)
+        buf.append(b'abc')
+        buf.append(b'def')
+        self.assertEqual(b'abcdef', buf.getvalue())
+
+    def test_append_overflow(self):
+        buf = console_gateway.RingBuffer(8)
+        buf.append(b'abcdef')
+        buf.append(b'ghij')
+        self.assertEqual(b'cdefghij', buf.getvalue())
+        self.assertEqual(8, len(buf))
+
+    def test_append_larger_than_buffer(self):
+        buf = console_gateway.RingBuffer(4)
+        buf.append(b'ab')
+        buf.append(b'cdefgh')
+        self.assertEqual(b'efgh', buf.getvalue())
+
+    def test_disabled(self):
+        buf = console_gateway.RingBuffer(0)
+        buf.append(b'ab')
+        self.assertEqual(b'', buf.getvalue())
+
+
+class ConsoleSessionTestCase(base.TestCase):
+
+    def setUp(self):
+        super(ConsoleSessionTestCase, self).setUp()
+        self.session = console_gateway.ConsoleSession(
+            'fake-uuid', '/:0:0:HOME:ipmitool -H 1.2.3.4 sol activate')
+
+    def test__parse_console_cmd(self):
+        self.assertEqual(['ipmitool', '-H', '1.2.3.4', 'sol', 'activate'],
+                         console_gateway._parse_console_cmd(
+                             self.session.console_cmd))
+        self.assertEqual(['telnet', 'host', '2000'],
+                         console_gateway._parse_console_cmd(
+                             'telnet host 2000'))
+
+    @mock.patch.object(eventlet, 'spawn', autospec=True)
+    @mock.patch.object(console_gateway.subprocess, 'Popen', autospec=True)
+    def test_attach_starts_process_once(self, popen_mock, spawn_mock):
+        client1 = mock.Mock()
+        client2 = mock.Mock()
+        self.session.scrollback.append(b'old output')
+
+        self.session.attach(client1)
+        self.session.attach(client2)
+
+        popen_mock.assert_called_once_with(
+            ['ipmitool', '-H', '1.2.3.4', 'sol', 'activate'],
+            stdin=console_gateway.subprocess.PIPE,
+            stdout=console_gateway.subprocess.PIPE,
+            stderr=console_gateway.subprocess.STDOUT)
+        self.assertEqual(1, spawn_mock.call_count)
+        client1.sendall.assert_called_once_with(b'old output')
+        client2.sendall.assert_called_once_with(b'old output')
+
+    @mock.patch.object(console_gateway.subprocess, 'Popen', autospec=True)
+    def test_attach_start_fails(self, popen_mock):
+        popen_mock.side_effect = OSError('boom')
+        self.assertRaises(exception.ConsoleSubprocessFailed,
+                          self.session.attach, mock.Mock())
+        self.assertEqual(set(), self.session.clients)
+
+    @mock.patch.object(eventlet, 'spawn', autospec=True)
+    @mock.patch.object(console_gateway.subprocess, 'Popen', autospec=True)
+    def test_detach_last_client_stops_process(self, popen_mock, spawn_mock):
+        client1 = mock.Mock()
+        client2 = mock.Mock()
+        self.session.attach(client1)
+        self.session.attach(client2)
+        process = popen_mock.return_value
+
+        self.session.detach(client1)
+        self.assertFalse(process.terminate.called)
+        client1.close.assert_called_once_with()
+
+        self.session.detach(client2)
+        process.terminate.assert_called_once_with()
+        spawn_mock.return_value.kill.assert_called_once_with()
+        self.assertIsNone(self.session.process)
+
+    @mock.patch.object(eventlet, 'spawn', autospec=True)
+    @mock.patch.object(console_gateway.subprocess, 'Popen')
+    def test_write(self, popen_mock, spawn_mock):
+        self.session.attach(mock.Mock())
+        self.session.write(b'input')
+        popen_mock.return_value.stdin.write.assert_called_once_with(b'input')
+
+    def test_write_not_started(self):
+        # Nothing to write to, data is dropped
+        self.session.write(b'input')
+
+    @mock.patch.object(console_gateway.green_os, 'read')
+    def test__read_output(self, read_mock):
+        read_mock.side_effect = [b'out', b'']
+        process = mock.Mock()
+        client = mock.Mock()
+        self.session.process = process
+        self.session.clients.add(client)
+
+        self.session._read_output(process)
+
+        self.assertEqual(b'out', self.session.scrollback.getvalue())
+        client.sendall.assert_called_once_with(b'out')
+        # The subprocess exited, clients are disconnected
+        client.close.assert_called_once_with()
+        self.assertIsNone(self.session.process)
+        # and the subprocess is reaped
+        process.wait.assert_called_once_with()
+        self.assertFalse(process.terminate.called)
+
+
+class ConsoleGatewayTestCase(base.TestCase):
+
+    def setUp(self):
+        super(ConsoleGatewayTestCase, self).setUp()
+        self.gateway = console_gateway.ConsoleGateway('127.0.0.1', 0)
+        start_patcher = mock.patch.object(self.gateway, 'start',
+                                          autospec=True)
+        self.start_mock = start_patcher.start()
+        self.addCleanup(start_patcher.stop)
+
+    def test_register(self):
+        session = self.gateway.register('fake-uuid', 'ls')
+        self.assertIs(session, self.gateway.sessions['fake-uuid'])
+        self.start_mock.assert_called_once_with()
+
+    def test_register_replaces_session(self):
+        old = self.gateway.register('fake-uuid', 'ls')
+        with mock.patch.object(old, 'close', autospec=True) as close_mock:
+            new = self.gateway.register('fake-uuid', 'ls')
+            close_mock.assert_called_once_with()
+        self.assertNotEqual(old.token, new.token)
+
+    def test_unregister(self):
+        self.gateway.register('fake-uuid', 'ls')
+        self.assertTrue(self.gateway.unregister('fake-uuid'))
+        self.assertFalse(self.gateway.unregister('fake-uuid'))
+
+    def test_get_console_url(self):
+        session = self.gateway.register('fake-uuid', 'ls')
+        self.assertEqual('tcp://127.0.0.1:0/fake-uuid?token=%s'
+                         % session.token,
+                         self.gateway.get_console_url('fake-uuid'))
+
+    def test_get_console_url_ipv6(self):
+        self.gateway.host = '::1'
+        session = self.gateway.register('fake-uuid', 'ls')
+        self.assertEqual('tcp://[::1]:0/fake-uuid?token=%s' % session.token,
+                         self.gateway.get_console_url('fake-uuid'))
+
+    def test_get_console_url_not_registered(self):
+        self.assertRaises(exception.ConsoleError,
+                          self.gateway.get_console_url, 'fake-uuid')
+
+    def _make_client(self, data):
+        client = mock.Mock()
+        client.recv.side_effect = [data, b'']
+        return client
+
+    def test__authenticate(self):
+        session = self.gateway.register('fake-uuid', 'ls')
+        client = self._make_client(b'fake-uuid %s\nls\n' % session.token)
+        self.assertEqual((session, b'ls\n'),
+                         self.gateway._authenticate(client))
+
+    def test__authenticate_bad_token(self):
+        self.gateway.register('fake-uuid', 'ls')
+        client = self._make_client(b'fake-uuid bad-token\n')
+        self.assertEqual((None, b''), self.gateway._authenticate(client))
+
+    def test__authenticate_unknown_node(self):
+        client = self._make_client(b'other-uuid token\n')
+        self.assertEqual((None, b''), self.gateway._authenticate(client))
+
+    def test__authenticate_garbage(self):
+        client = self._make_client(b'garbage\n')
+        self.assertEqual((None, b''), self.gateway._authenticate(client))
+
+    def test__handle_client_auth_failed(self):
+        client = self._make_client(b'garbage\n')
+        self.gateway._handle_client(client)
+        client.sendall.assert_called_once_with(b'Authentication failed.\r\n')
+        client.close.assert_called_once_with()
+
+    def test__handle_client(self):
+        session = self.gateway.register('fake-uuid', 'ls')
+        client = mock.Mock()
+        client.recv.side_effect = [b'fake-uuid %s\n' % session.token,
+                                   b'input', b'']
+        with mock.patch.multiple(session, attach=mock.DEFAULT,
+                                 detach=mock.DEFAULT,
+                                 write=mock.DEFAULT) as mocks:
+            mocks['attach'].side_effect = (
+                lambda c: session.clients.add(c))
+            self.gateway._handle_client(client)
+            mocks['attach'].assert_called_once_with(client)
+            mocks['write'].assert_called_once_with(b'input')
+            mocks['detach'].assert_called_once_with(client)
+
+
+class ConsoleGatewayFunctionsTestCase(base.TestCase):
+
+    def setUp(self):
+        super(ConsoleGatewayFunctionsTestCase, self).setUp()
+        self.addCleanup(console_gateway.reset)
+
+    def test_get_gateway(self):
+        self.config(gateway_host='10.0.0.1', gateway_port=1234,
+                    group='console')
+        gateway = console_gateway.get_gateway()
+        self.assertEqual(('10.0.0.1', 1234), (gateway.host, gateway.port))
+        self.assertIs(gateway, console_gateway.get_gateway())
+
+    @mock.patch.object(console_gateway.ConsoleGateway, 'start',
+                       autospec=True)
+    def test_start_get_stop_console(self, start_mock):
+        self.config(gateway_host='10.0.0.1', gateway_port=1234,
+                    group='console')
+        console_gateway.start_console('fake-uuid', 'ls')
+        token = console_gateway.get_gateway().sessions['fake-uuid'].token
+        self.assertEqual(
+            {'type': 'gateway',
+             'url': 'tcp://10.0.0.1:1234/fake-uuid?token=%s' % token},
+            console_gateway.get_console('fake-uuid'))
+        console_gateway.stop_console('fake-uuid')
+        self.assertEqual({}, console_gateway.get_gateway().sessions)
+
+    def test_end_to_end(self):
+        self.config(gateway_host='127.0.0.1', gateway_port=0,
+                    group='console')
+        gateway = console_gateway.get_gateway()
+        session = gateway.register('fake-uuid', 'cat')
+        port = gateway._socket.getsockname()[1]
+
+        client = eventlet.connect(('127.0.0.1', port))
+        client.sendall(b'fake-uuid %s\nhello\n' % session.token)
+        with eventlet.Timeout(10):
+            data = b''
+            while b'hello' not in data:
+                data += client.recv(1024)
+        client.close()
@@ -30,6 +30,7 @@ from oslo_utils import netutils
 
 from ironic.common import exception
 from ironic.common import utils
+from ironic.drivers.modules import console_gateway
 from ironic.drivers.modules import console_utils
 from ironic.drivers.modules import ipmitool as ipmi
 from ironic.tests.db import base as db_base
@@ -333,3 +334,45 @@ class ConsoleUtilsTestCase(db_base.DbTestCase):
                           self.info['uuid'])
 
         mock_stop.assert_called_once_with(self.info['uuid'])
+
+    @mock.patch.object(console_utils, 'start_shellinabox_console',
+                       autospec=True)
+    def test_start_console_shellinabox(self, mock_start):
+        console_utils.start_console(self.info['uuid'], self.info['port'],
+                                    'ls&')
+        mock_start.assert_called_once_with(self.info['uuid'],
+                                           self.info['port'], 'ls&')
+
+    @mock.patch.object(console_gateway, 'start_console', autospec=True)
+    def test_start_console_gateway(self, mock_start):
+        self.config(gateway_enabled=True, group='console')
+        console_utils.start_console(self.info['uuid'], self.info['port'],
+                                    'ls&')
+        mock_start.assert_called_once_with(self.info['uuid'], 'ls&')
+
+    @mock.patch.object(console_utils, 'stop_shellinabox_console',
+                       autospec=True)
+    def test_stop_console_shellinabox(self, mock_stop):
+        console_utils.stop_console(self.info['uuid'])
+        mock_stop.assert_called_once_with(self.info['uuid'])
+
+    @mock.patch.object(console_gateway, 'stop_console', autospec=True)
+    def test_stop_console_gateway(self, mock_stop):
+        self.config(gateway_enabled=True, group='console')
+        console_utils.stop_console(self.info['uuid'])
+        mock_stop.assert_called_once_with(self.info['uuid'])
+
+    def test_get_console_shellinabox(self):
+        self.config(my_ip='10.0.0.1')
+        self.assertEqual({'type': 'shellinabox',
+                          'url': 'http://10.0.0.1:%s' % self.info['port']},
+                         console_utils.get_console(self.info['uuid'],
+                                                   self.info['port']))
+
+    @mock.patch.object(console_gateway, 'get_console', autospec=True)
+    def test_get_console_gateway(self, mock_get):
+        self.config(gateway_enabled=True, group='console')
+        self.assertEqual(mock_get.return_value,
+                         console_utils.get_console(self.info['uuid'],
+                                                   self.info['port']))
+        mock_get.assert_called_once_with(self.info['uuid'])
@@ -21,12 +21,14 @@ import shutil
 import stat
 import tempfile
 import time
+import zlib
 
 import mock
 from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_utils import uuidutils
 import requests
+import six
 import testtools
 
 from ironic.common import boot_devices
@@ -1259,6 +1261,57 @@ class PopulateImageTestCase(tests_base.TestCase):
         self.assertFalse(mock_dd.called)
 
 
+@mock.patch.object(common_utils, 'dd', autospec=True)
+@mock.patch.object(images, 'qemu_img_info', autospec=True)
+@mock.patch.object(images, 'convert_image', autospec=True)
+class PopulateImageSparseTestCase(tests_base.TestCase):
+
+    def setUp(self):
+        super(PopulateImageSparseTestCase, self).setUp()
+        self.config(sparse_image_write=True, group='deploy')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.src = os.path.join(self.tmp_dir, 'disk')
+        with open(self.src, 'wb') as f:
+            f.truncate(4 * 1024 * 1024)
+
+    def _set_format(self, mock_qinfo, fmt):
+        type(mock_qinfo.return_value).file_format = mock.PropertyMock(
+            return_value=fmt)
+
+    def test_populate_raw_image(self, mock_cg, mock_qinfo, mock_dd):
+        self._set_format(mock_qinfo, 'raw')
+        utils.populate_image(self.src, 'dst')
+        mock_dd.assert_called_once_with(self.src, 'dst', 'bs=1M',
+                                        'oflag=direct', 'conv=sparse')
+        self.assertFalse(mock_cg.called)
+
+    def test_populate_qcow2_image(self, mock_cg, mock_qinfo, mock_dd):
+        self._set_format(mock_qinfo, 'qcow2')
+
+        def convert(src, dest, out_format, run_as_root=False):
+            shutil.copy(src, dest)
+        mock_cg.side_effect = convert
+
+        utils.populate_image(self.src, 'dst')
+        raw_path = mock_cg.call_args[0][1]
+        mock_cg.assert_called_once_with(self.src, raw_path, 'raw')
+        self.assertEqual(self.tmp_dir,
+                         os.path.dirname(os.path.dirname(raw_path)))
+        mock_dd.assert_called_once_with(raw_path, 'dst', 'bs=1M',
+                                        'oflag=direct', 'conv=sparse')
+        self.assertFalse(os.path.exists(os.path.dirname(raw_path)))
+
+    def test_populate_qcow2_image_fails(self, mock_cg, mock_qinfo, mock_dd):
+        self._set_format(mock_qinfo, 'qcow2')
+        mock_cg.side_effect = processutils.ProcessExecutionError()
+        self.assertRaises(processutils.ProcessExecutionError,
+                          utils.populate_image, self.src, 'dst')
+        raw_path = mock_cg.call_args[0][1]
+        self.assertFalse(os.path.exists(os.path.dirname(raw_path)))
+        self.assertFalse(mock_dd.called)
+
+
 @mock.patch.object(utils, 'is_block_device', lambda d: True)
 @mock.patch.object(utils, 'block_uuid', lambda p: 'uuid')
 @mock.patch.object(utils, 'dd', lambda *_: None)
@@ -1363,57 +1416,108 @@ class RealFilePartitioningTestCase(tests_base.TestCase):
                                                      [('uuid', 'path')])
 
 
-@mock.patch.object(shutil, 'copyfileobj')
 @mock.patch.object(requests, 'get')
 class GetConfigdriveTestCase(tests_base.TestCase):
 
-    @mock.patch.object(gzip, 'GzipFile')
-    def test_get_configdrive(self, mock_gzip, mock_requests, mock_copy):
-        mock_requests.return_value = mock.MagicMock(content='Zm9vYmFy')
-        utils._get_configdrive('http://1.2.3.4/cd', 'fake-node-uuid')
-        mock_requests.assert_called_once_with('http://1.2.3.4/cd')
-        mock_gzip.assert_called_once_with('configdrive', 'rb',
-                                          fileobj=mock.ANY)
-        mock_copy.assert_called_once_with(mock.ANY, mock.ANY)
-
-    @mock.patch.object(gzip, 'GzipFile')
-    def test_get_configdrive_base64_string(self, mock_gzip, mock_requests,
-                                           mock_copy):
-        utils._get_configdrive('Zm9vYmFy', 'fake-node-uuid')
+    def setUp(self):
+        super(GetConfigdriveTestCase, self).setUp()
+        self.content = os.urandom(200 * 1024)
+        buf = six.BytesIO()
+        with gzip.GzipFile('configdrive', 'wb', fileobj=buf) as gzipped:
+            gzipped.write(self.content)
+        self.encoded = base64.encodestring(buf.getvalue())
+
+    def _check_file(self, result):
+        size_mb, path = result
+        self.addCleanup(common_utils.unlink_without_raise, path)
+        self.assertEqual(1, size_mb)
+        with open(path, 'rb') as f:
+            self.assertEqual(self.content, f.read())
+
+    def _mock_response(self, mock_requests, data):
+        mock_requests.return_value.iter_content.side_effect = (
+            lambda size: iter([data[i:i + size]
+                               for i in range(0, len(data), size)]))
+
+    def test_get_configdrive(self, mock_requests):
+        self._mock_response(mock_requests, self.encoded)
+        self._check_file(utils._get_configdrive('http://1.2.3.4/cd',
+                                                'fake-node-uuid'))
+        mock_requests.assert_called_once_with('http://1.2.3.4/cd',
+                                              stream=True)
+
+    def test_get_configdrive_base64_string(self, mock_requests):
+        self._check_file(utils._get_configdrive(self.encoded,
+                                                'fake-node-uuid'))
         self.assertFalse(mock_requests.called)
-        mock_gzip.assert_called_once_with('configdrive', 'rb',
-                                          fileobj=mock.ANY)
-        mock_copy.assert_called_once_with(mock.ANY, mock.ANY)
 
-    def test_get_configdrive_bad_url(self, mock_requests, mock_copy):
+    def test_get_configdrive_base64_no_newlines(self, mock_requests):
+        self.encoded = self.encoded.replace('\n', '')
+        self._check_file(utils._get_configdrive(self.encoded,
+                                                'fake-node-uuid'))
+
+    def test_get_configdrive_bad_url(self, mock_requests):
         mock_requests.side_effect = requests.exceptions.RequestException
         self.assertRaises(exception.InstanceDeployFailure,
                           utils._get_configdrive, 'http://1.2.3.4/cd',
                           'fake-node-uuid')
-        self.assertFalse(mock_copy.called)
 
-    @mock.patch.object(base64, 'b64decode')
-    def test_get_configdrive_base64_error(self, mock_b64, mock_requests,
-                                          mock_copy):
-        mock_b64.side_effect = TypeError
+    def test_get_configdrive_download_interrupted(self, mock_requests):
+        def iter_content(size):
+            yield self.encoded[:size]
+            raise requests.exceptions.ConnectionError()
+        mock_requests.return_value.iter_content.side_effect = iter_content
+        self.assertRaises(exception.InstanceDeployFailure,
+                          utils._get_configdrive, 'http://1.2.3.4/cd',
+                          'fake-node-uuid')
+
+    @mock.patch.object(common_utils, 'unlink_without_raise', autospec=True)
+    def test_get_configdrive_base64_error(self, mock_unlink, mock_requests):
         self.assertRaises(exception.InstanceDeployFailure,
                           utils._get_configdrive,
                           'malformed', 'fake-node-uuid')
-        mock_b64.assert_called_once_with('malformed')
-        self.assertFalse(mock_copy.called)
-
-    @mock.patch.object(gzip, 'GzipFile')
-    def test_get_configdrive_gzip_error(self, mock_gzip, mock_requests,
-                                        mock_copy):
-        mock_requests.return_value = mock.MagicMock(content='Zm9vYmFy')
-        mock_copy.side_effect = IOError
+        self.assertTrue(mock_unlink.called)
+        os.unlink(mock_unlink.call_args[0][0])
+
+    @mock.patch.object(common_utils, 'unlink_without_raise', autospec=True)
+    def test_get_configdrive_gzip_error(self, mock_unlink, mock_requests):
+        self._mock_response(mock_requests, base64.b64encode('not gzip'))
         self.assertRaises(exception.InstanceDeployFailure,
                           utils._get_configdrive, 'http://1.2.3.4/cd',
                           'fake-node-uuid')
-        mock_requests.assert_called_once_with('http://1.2.3.4/cd')
-        mock_gzip.assert_called_once_with('configdrive', 'rb',
-                                          fileobj=mock.ANY)
-        mock_copy.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertTrue(mock_unlink.called)
+        os.unlink(mock_unlink.call_args[0][0])
+
+    @mock.patch.object(common_utils, 'unlink_without_raise', autospec=True)
+    def test_get_configdrive_gzip_truncated(self, mock_unlink, mock_requests):
+        data = base64.b64decode(self.encoded)
+        # Truncated in the compressed data and in the trailer
+        for truncated in (data[:len(data) // 2], data[:-4]):
+            self.assertRaises(exception.InstanceDeployFailure,
+                              utils._get_configdrive,
+                              base64.b64encode(truncated), 'fake-node-uuid')
+            os.unlink(mock_unlink.call_args[0][0])
+
+    def test_get_configdrive_gzip_members(self, mock_requests):
+        buf = six.BytesIO()
+        for part in (self.content[:1000], self.content[1000:]):
+            with gzip.GzipFile('configdrive', 'wb', fileobj=buf) as gzipped:
+                gzipped.write(part)
+        self._check_file(utils._get_configdrive(
+            base64.b64encode(buf.getvalue()), 'fake-node-uuid'))
+
+    def test__iter_gunzip_member_ends_with_chunk(self, mock_requests):
+        members = []
+        for part in (b'first', b'second'):
+            buf = six.BytesIO()
+            with gzip.GzipFile('configdrive', 'wb', fileobj=buf) as gzipped:
+                gzipped.write(part)
+            members.append(buf.getvalue())
+        self.assertEqual(b'firstsecond',
+                         b''.join(utils._iter_gunzip(iter(members))))
+        self.assertRaises(zlib.error, list,
+                          utils._iter_gunzip(iter([members[0],
+                                                   members[1][:-1]])))
 
 
 class VirtualMediaDeployUtilsTestCase(db_base.DbTestCase):
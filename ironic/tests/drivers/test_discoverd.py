@@ -132,87 +132,130 @@ class InspectHardwareTestCase(BaseTestCase):
         task.process_event.assert_called_once_with('fail')
 
 
-@mock.patch.object(keystone, 'get_admin_auth_token', lambda: 'the token')
 @mock.patch.object(client, 'get_status')
+class GetStatusTestCase(BaseTestCase):
+    def test_ok(self, mock_get):
+        mock_get.return_value = {'finished': True}
+        self.assertEqual({'finished': True},
+                         discoverd._get_status(self.node.uuid, self.context))
+        mock_get.assert_called_once_with(
+            self.node.uuid, auth_token=self.context.auth_token)
+
+    def test_exception_ignored(self, mock_get):
+        mock_get.side_effect = RuntimeError('boom')
+        self.assertIsNone(discoverd._get_status(self.node.uuid,
+                                                self.context))
+
+    def test_service_url(self, mock_get):
+        self.config(service_url='meow', group='discoverd')
+        discoverd._get_status(self.node.uuid, self.context)
+        mock_get.assert_called_once_with(self.node.uuid,
+                                         auth_token=self.context.auth_token,
+                                         base_url='meow')
+
+
 class CheckStatusTestCase(BaseTestCase):
     def setUp(self):
         super(CheckStatusTestCase, self).setUp()
         self.node.provision_state = states.INSPECTING
 
-    def test_not_inspecting(self, mock_get):
+    def test_not_inspecting(self):
         self.node.provision_state = states.MANAGEABLE
-        discoverd._check_status(self.task)
-        self.assertFalse(mock_get.called)
+        discoverd._check_status(self.task, {'finished': True})
+        self.assertFalse(self.task.process_event.called)
 
-    def test_not_discoverd(self, mock_get):
+    def test_not_discoverd(self):
         self.task.driver.inspect = object()
-        discoverd._check_status(self.task)
-        self.assertFalse(mock_get.called)
-
-    def test_not_finished(self, mock_get):
-        mock_get.return_value = {}
-        discoverd._check_status(self.task)
-        mock_get.assert_called_once_with(self.node.uuid,
-                                         auth_token='the token')
+        discoverd._check_status(self.task, {'finished': True})
         self.assertFalse(self.task.process_event.called)
 
-    def test_exception_ignored(self, mock_get):
-        mock_get.side_effect = RuntimeError('boom')
-        discoverd._check_status(self.task)
-        mock_get.assert_called_once_with(self.node.uuid,
-                                         auth_token='the token')
+    def test_not_finished(self):
+        discoverd._check_status(self.task, {})
         self.assertFalse(self.task.process_event.called)
 
-    def test_status_ok(self, mock_get):
-        mock_get.return_value = {'finished': True}
-        discoverd._check_status(self.task)
-        mock_get.assert_called_once_with(self.node.uuid,
-                                         auth_token='the token')
+    def test_status_ok(self):
+        discoverd._check_status(self.task, {'finished': True})
         self.task.process_event.assert_called_once_with('done')
 
-    def test_status_error(self, mock_get):
-        mock_get.return_value = {'error': 'boom'}
-        discoverd._check_status(self.task)
-        mock_get.assert_called_once_with(self.node.uuid,
-                                         auth_token='the token')
+    def test_status_error(self):
+        discoverd._check_status(self.task, {'error': 'boom'})
         self.task.process_event.assert_called_once_with('fail')
         self.assertIn('boom', self.node.last_error)
 
-    def test_service_url(self, mock_get):
-        self.config(service_url='meow', group='discoverd')
-        mock_get.return_value = {'finished': True}
-        discoverd._check_status(self.task)
-        mock_get.assert_called_once_with(self.node.uuid,
-                                         auth_token='the token',
-                                         base_url='meow')
-        self.task.process_event.assert_called_once_with('done')
-
 
 @mock.patch.object(eventlet.greenthread, 'spawn_n',
                    lambda f, *a, **kw: f(*a, **kw))
 @mock.patch.object(ironic_discoverd, '__version_info__', (1, 0, 0))
+@mock.patch.object(keystone, 'get_admin_auth_token', autospec=True)
 @mock.patch.object(task_manager, 'acquire', autospec=True)
 @mock.patch.object(discoverd, '_check_status', autospec=True)
+@mock.patch.object(discoverd, '_get_status', autospec=True)
 class PeriodicTaskTestCase(BaseTestCase):
-    def test_ok(self, mock_check, mock_acquire):
-        mgr = mock.Mock(spec=['iter_nodes'])
-        mgr.iter_nodes.return_value = [('1', 'd1'), ('2', 'd2')]
-        tasks = [mock.sentinel.task1, mock.sentinel.task2]
+    def setUp(self):
+        super(PeriodicTaskTestCase, self).setUp()
+        self.mgr = mock.Mock(spec=['iter_nodes'])
+        self.mgr.iter_nodes.return_value = [('1', 'fake_discoverd'),
+                                            ('2', 'fake_discoverd'),
+                                            ('3', 'fake_discoverd')]
+        self.context = mock.Mock(auth_token=None)
+
+    def _periodic_check_result(self):
+        discoverd.DiscoverdInspect()._periodic_check_result(self.mgr,
+                                                            self.context)
+
+    def test_ok(self, mock_get, mock_check, mock_acquire, mock_token):
+        statuses = {'1': {'finished': True}, '2': {},
+                    '3': {'error': 'boom'}}
+        mock_get.side_effect = lambda uuid, ctx: statuses[uuid]
+        tasks = [mock.sentinel.task1, mock.sentinel.task3]
         mock_acquire.side_effect = (
             mock.MagicMock(__enter__=mock.Mock(return_value=task))
             for task in tasks
         )
-        discoverd.DiscoverdInspect()._periodic_check_result(
-            mgr, mock.sentinel.context)
-        mock_check.assert_any_call(tasks[0])
-        mock_check.assert_any_call(tasks[1])
+        self._periodic_check_result()
+        mock_token.assert_called_once_with()
+        self.assertEqual(mock_token.return_value, self.context.auth_token)
+        self.assertEqual(3, mock_get.call_count)
+        mock_get.assert_any_call('2', self.context)
+        # Only nodes with finished inspection are locked
+        mock_acquire.assert_has_calls([mock.call(self.context, '1'),
+                                       mock.call(self.context, '3')])
         self.assertEqual(2, mock_acquire.call_count)
+        mock_check.assert_has_calls([mock.call(tasks[0], statuses['1']),
+                                     mock.call(tasks[1], statuses['3'])])
 
-    def test_node_locked(self, mock_check, mock_acquire):
-        mgr = mock.Mock(spec=['iter_nodes'])
-        mgr.iter_nodes.return_value = [('1', 'd1'), ('2', 'd2')]
+    def test_no_nodes(self, mock_get, mock_check, mock_acquire, mock_token):
+        self.mgr.iter_nodes.return_value = []
+        self._periodic_check_result()
+        self.assertFalse(mock_token.called)
+        self.assertFalse(mock_get.called)
+
+    def test_other_drivers_skipped(self, mock_get, mock_check, mock_acquire,
+                                   mock_token):
+        mgr_utils.mock_the_extension_manager("fake")
+        self.mgr.iter_nodes.return_value = [('1', 'fake'),
+                                            ('2', 'missing')]
+        self._periodic_check_result()
+        self.assertFalse(mock_get.called)
+
+    def test_token_failure(self, mock_get, mock_check, mock_acquire,
+                           mock_token):
+        mock_token.side_effect = RuntimeError('boom')
+        self._periodic_check_result()
+        self.assertFalse(mock_get.called)
+        self.assertFalse(mock_acquire.called)
+
+    def test_get_status_failure(self, mock_get, mock_check, mock_acquire,
+                                mock_token):
+        mock_get.return_value = None
+        self._periodic_check_result()
+        self.assertEqual(3, mock_get.call_count)
+        self.assertFalse(mock_acquire.called)
+
+    def test_node_locked(self, mock_get, mock_check, mock_acquire,
+                         mock_token):
+        mock_get.return_value = {'finished': True}
         mock_acquire.side_effect = exception.NodeLocked("boom")
-        discoverd.DiscoverdInspect()._periodic_check_result(
-            mgr, mock.sentinel.context)
+        self._periodic_check_result()
         self.assertFalse(mock_check.called)
-        self.assertEqual(2, mock_acquire.call_count)
+        self.assertEqual(3, mock_acquire.call_count)
@@ -155,6 +155,42 @@ class SeaMicroPrivateMethodsTestCase(db_base.DbTestCase):
         seamicro._get_client(**self.info)
         mock_client.assert_called_once_with(self.info['api_version'], **args)
 
+    @mock.patch.object(seamicro_client, "Client")
+    def test__get_client_cached(self, mock_client):
+        client = seamicro._get_client(**self.info)
+        other_info = dict(self.info, server_id='1/0', uuid='other-uuid')
+        self.assertIs(client, seamicro._get_client(**other_info))
+        self.assertEqual(1, mock_client.call_count)
+
+    @mock.patch.object(seamicro, "_get_server")
+    @mock.patch.object(seamicro_client, "Client")
+    def test__get_power_status_unauthorized(self, mock_client,
+                                            mock_get_server):
+        seamicro._get_client(**self.info)
+        ex = seamicro_client_exception.ClientException(401)
+        ex.code = 401
+        ex.message = 'Unauthorized'
+        mock_get_server.side_effect = ex
+        self.assertRaises(exception.ServiceUnavailable,
+                          seamicro._get_power_status, self.node)
+        # The next call authenticates again
+        seamicro._get_client(**self.info)
+        self.assertEqual(2, mock_client.call_count)
+
+    @mock.patch.object(seamicro, "_get_server")
+    @mock.patch.object(seamicro_client, "Client")
+    def test__get_power_status_other_error(self, mock_client,
+                                           mock_get_server):
+        seamicro._get_client(**self.info)
+        ex = seamicro_client_exception.ClientException(500)
+        ex.code = 500
+        ex.message = 'Internal error'
+        mock_get_server.side_effect = ex
+        self.assertRaises(exception.ServiceUnavailable,
+                          seamicro._get_power_status, self.node)
+        seamicro._get_client(**self.info)
+        self.assertEqual(1, mock_client.call_count)
+
     @mock.patch.object(seamicro_client, "Client")
     def test__get_client_fail(self, mock_client):
         args = {'username': self.info['username'],
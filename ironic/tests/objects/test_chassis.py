@@ -96,3 +96,15 @@ class TestChassisObject(base.DbTestCase):
             self.assertThat(chassis, HasLength(1))
             self.assertIsInstance(chassis[0], objects.Chassis)
             self.assertEqual(self.context, chassis[0]._context)
+            mock_get_list.assert_called_once_with(
+                limit=None, marker=None, sort_key=None, sort_dir=None,
+                use_slave=True)
+
+    def test_list_no_slave(self):
+        with mock.patch.object(self.dbapi, 'get_chassis_list',
+                               autospec=True) as mock_get_list:
+            mock_get_list.return_value = [self.fake_chassis]
+            objects.Chassis.list(self.context, use_slave=False)
+            mock_get_list.assert_called_once_with(
+                limit=None, marker=None, sort_key=None, sort_dir=None,
+                use_slave=False)
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 import mock
 from testtools.matchers import HasLength
 
@@ -54,13 +56,24 @@ class TestNodeObject(base.DbTestCase):
         self.assertRaises(exception.InvalidIdentity,
                           objects.Node.get, self.context, 'not-a-uuid')
 
+    def test_get_by_port_addresses(self):
+        with mock.patch.object(self.dbapi, 'get_node_by_port_addresses',
+                               autospec=True) as mock_get_node:
+            mock_get_node.return_value = self.fake_node
+            node = objects.Node.get_by_port_addresses(self.context,
+                                                      ['aa:bb:cc:dd:ee:ff'])
+            mock_get_node.assert_called_once_with(['aa:bb:cc:dd:ee:ff'])
+            self.assertEqual(self.fake_node['uuid'], node.uuid)
+            self.assertEqual(self.context, node._context)
+
     def test_save(self):
         uuid = self.fake_node['uuid']
         with mock.patch.object(self.dbapi, 'get_node_by_uuid',
                                autospec=True) as mock_get_node:
             mock_get_node.return_value = self.fake_node
-            with mock.patch.object(self.dbapi, 'update_node',
+            with mock.patch.object(self.dbapi, 'update_node_values',
                                    autospec=True) as mock_update_node:
+                mock_update_node.return_value = {}
 
                 n = objects.Node.get(self.context, uuid)
                 self.assertEqual({"foo": "bar", "fake_password": "fakepass"},
@@ -77,6 +90,28 @@ class TestNodeObject(base.DbTestCase):
                 self.assertEqual(self.context, n._context)
                 self.assertEqual({}, n.driver_internal_info)
 
+    def test_save_updates_timestamps(self):
+        uuid = self.fake_node['uuid']
+        updated_at = datetime.datetime(2000, 1, 1, 0, 0)
+        with mock.patch.object(self.dbapi, 'get_node_by_uuid',
+                               autospec=True) as mock_get_node:
+            mock_get_node.return_value = self.fake_node
+            with mock.patch.object(self.dbapi, 'update_node_values',
+                                   autospec=True) as mock_update_node:
+                mock_update_node.return_value = {
+                    'provision_state': 'fake',
+                    'provision_updated_at': updated_at}
+
+                n = objects.Node.get(self.context, uuid)
+                n.provision_state = 'fake'
+                n.save()
+
+                mock_update_node.assert_called_once_with(
+                        uuid, {'provision_state': 'fake'})
+                self.assertEqual(updated_at,
+                                 n.provision_updated_at.replace(tzinfo=None))
+                self.assertEqual({}, n.obj_get_changes())
+
     def test_refresh(self):
         uuid = self.fake_node['uuid']
         returns = [dict(self.fake_node, properties={"fake": "first"}),
@@ -100,6 +135,46 @@ class TestNodeObject(base.DbTestCase):
             self.assertThat(nodes, HasLength(1))
             self.assertIsInstance(nodes[0], objects.Node)
             self.assertEqual(self.context, nodes[0]._context)
+            mock_get_list.assert_called_once_with(
+                filters=None, limit=None, marker=None, sort_key=None,
+                sort_dir=None, use_slave=True)
+
+    def test_list_no_slave(self):
+        with mock.patch.object(self.dbapi, 'get_node_list',
+                               autospec=True) as mock_get_list:
+            mock_get_list.return_value = [self.fake_node]
+            objects.Node.list(self.context, use_slave=False)
+            mock_get_list.assert_called_once_with(
+                filters=None, limit=None, marker=None, sort_key=None,
+                sort_dir=None, use_slave=False)
+
+    def test_list_changes(self):
+        with mock.patch.object(self.dbapi, 'get_node_changes',
+                               autospec=True) as mock_get_changes:
+            deletion = mock.Mock(uuid='uuid1', change_seq=44)
+            mock_get_changes.return_value = [self.fake_node], [deletion]
+            nodes, deletions = objects.Node.list_changes(
+                self.context, 42, until=50, limit=10)
+            self.assertThat(nodes, HasLength(1))
+            self.assertIsInstance(nodes[0], objects.Node)
+            self.assertEqual(self.context, nodes[0]._context)
+            self.assertEqual([{'uuid': 'uuid1', 'change_seq': 44}],
+                             deletions)
+            mock_get_changes.assert_called_once_with(42, until=50, limit=10)
+
+    def test_create_many(self):
+        error = exception.NodeAlreadyExists(uuid='uuid2')
+        with mock.patch.object(self.dbapi, 'create_nodes',
+                               autospec=True) as mock_create_nodes:
+            mock_create_nodes.return_value = [self.fake_node, error]
+            nodes = [objects.Node(self.context, uuid='uuid1'),
+                     objects.Node(self.context, uuid='uuid2')]
+            errors = objects.Node.create_many(self.context, nodes)
+            mock_create_nodes.assert_called_once_with(
+                [{'uuid': 'uuid1'}, {'uuid': 'uuid2'}])
+            self.assertEqual([None, error], errors)
+            self.assertEqual(self.fake_node['id'], nodes[0].id)
+            self.assertEqual({}, nodes[0].obj_get_changes())
 
     def test_reserve(self):
         with mock.patch.object(self.dbapi, 'reserve_node',
@@ -17,6 +17,7 @@ import datetime
 import gettext
 
 import iso8601
+import mock
 import netaddr
 from oslo_context import context
 from oslo_utils import timeutils
@@ -342,6 +343,23 @@ class _TestObject(object):
         self.assertEqual(set(['foo']), obj2.obj_what_changed())
         obj2.obj_reset_changes()
         self.assertEqual(set(), obj2.obj_what_changed())
+        self.assertFalse(obj2.obj_is_delta())
+
+    @mock.patch.object(MyObj, 'obj_identity_fields', ['foo'])
+    def test_delta_primitive(self):
+        obj = MyObj.query(self.context)
+        obj.missing = 'changed'
+        primitive = obj.obj_to_primitive(delta=True)
+        self.assertEqual({'foo': 1, 'missing': 'changed'},
+                         primitive['ironic_object.data'])
+        self.assertEqual(['missing'], primitive['ironic_object.changes'])
+        self.assertTrue(primitive['ironic_object.delta'])
+
+        obj2 = MyObj.obj_from_primitive(primitive)
+        self.assertTrue(obj2.obj_is_delta())
+        self.assertFalse(obj2.obj_attr_is_set('bar'))
+        self.assertEqual(set(['missing']), obj2.obj_what_changed())
+        self.assertTrue(obj2.obj_clone().obj_is_delta())
 
     def test_unknown_objtype(self):
         self.assertRaises(exception.UnsupportedObjectError,
@@ -507,6 +525,28 @@ class _TestObject(object):
         self.assertEqual('abc', obj.bar)
         self.assertEqual(set(['foo', 'bar']), obj.obj_what_changed())
 
+    def test_obj_set_db_values(self):
+        class TestObj(base.IronicObject):
+            fields = {'foo': utils.int_or_none,
+                      'bar': str,
+                      'baz': utils.dict_or_none}
+
+        dt = datetime.datetime(1955, 11, 5)
+        obj = TestObj(self.context)
+        obj.obj_set_db_values({'foo': '1', 'bar': u'bar', 'baz': None,
+                               'created_at': dt, 'updated_at': None})
+        # int_or_none is skipped, the other type functions are not
+        self.assertEqual('1', obj.foo)
+        self.assertIsInstance(obj.bar, str)
+        self.assertEqual({}, obj.baz)
+        self.assertEqual(dt.replace(tzinfo=iso8601.iso8601.Utc()),
+                         obj.created_at)
+        self.assertIsNone(obj.updated_at)
+        self.assertEqual(set(), obj.obj_what_changed())
+        self.assertEqual({'foo': '1', 'bar': 'bar', 'baz': {},
+                          'created_at': obj.created_at, 'updated_at': None},
+                         obj.as_dict())
+
 
 class TestObject(_LocalTest, _TestObject):
     pass
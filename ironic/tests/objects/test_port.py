@@ -61,10 +61,37 @@ class TestPortObject(base.DbTestCase):
             mock_get_port.assert_called_once_with(address)
             self.assertEqual(self.context, port._context)
 
+    def test_list_by_addresses(self):
+        address = self.fake_port['address']
+        with mock.patch.object(self.dbapi, 'get_ports_by_addresses',
+                               autospec=True) as mock_get_ports:
+            mock_get_ports.return_value = [self.fake_port]
+
+            ports = objects.Port.list_by_addresses(self.context, [address])
+
+            mock_get_ports.assert_called_once_with([address])
+            self.assertEqual(1, len(ports))
+            self.assertIsInstance(ports[0], objects.Port)
+            self.assertEqual(self.context, ports[0]._context)
+
     def test_get_bad_id_and_uuid_and_address(self):
         self.assertRaises(exception.InvalidIdentity,
                           objects.Port.get, self.context, 'not-a-uuid')
 
+    def test_create_many(self):
+        error = exception.MACAlreadyExists(mac='52:54:00:cf:2d:32')
+        with mock.patch.object(self.dbapi, 'create_ports',
+                               autospec=True) as mock_create_ports:
+            mock_create_ports.return_value = [self.fake_port, error]
+            ports = [objects.Port(self.context, address='52:54:00:cf:2d:31'),
+                     objects.Port(self.context, address='52:54:00:cf:2d:32')]
+            errors = objects.Port.create_many(self.context, ports)
+            mock_create_ports.assert_called_once_with(
+                [{'address': '52:54:00:cf:2d:31'},
+                 {'address': '52:54:00:cf:2d:32'}])
+            self.assertEqual([None, error], errors)
+            self.assertEqual(self.fake_port['id'], ports[0].id)
+
     def test_save(self):
         uuid = self.fake_port['uuid']
         with mock.patch.object(self.dbapi, 'get_port_by_uuid',
@@ -105,3 +132,15 @@ class TestPortObject(base.DbTestCase):
             self.assertThat(ports, HasLength(1))
             self.assertIsInstance(ports[0], objects.Port)
             self.assertEqual(self.context, ports[0]._context)
+            mock_get_list.assert_called_once_with(
+                limit=None, marker=None, sort_key=None, sort_dir=None,
+                use_slave=True)
+
+    def test_list_no_slave(self):
+        with mock.patch.object(self.dbapi, 'get_port_list',
+                               autospec=True) as mock_get_list:
+            mock_get_list.return_value = [self.fake_port]
+            objects.Port.list(self.context, use_slave=False)
+            mock_get_list.assert_called_once_with(
+                limit=None, marker=None, sort_key=None, sort_dir=None,
+                use_slave=False)
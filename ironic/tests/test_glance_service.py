@@ -30,6 +30,7 @@ import testtools
 
 from ironic.common import exception
 from ironic.common.glance_service import base_image_service
+from ironic.common.glance_service import metadata_cache
 from ironic.common.glance_service import service_utils
 from ironic.common import image_service as service
 from ironic.tests import base
@@ -420,6 +421,41 @@ class TestGlanceImageService(base.TestCase):
                           self.service.show,
                           image_id)
 
+    def test_show_uses_metadata_cache(self):
+        self.config(image_metadata_cache_ttl=60, group='glance')
+        self.addCleanup(metadata_cache.reset)
+        fixture = self._make_fixture(name='image1', is_public=True)
+        image_id = self.service.create(fixture)['id']
+
+        with mock.patch.object(self.service.client.images, 'get',
+                               wraps=self.service.client.get) as get_mock:
+            image_meta = self.service.show(image_id)
+            image_meta['name'] = 'changed'
+            self.assertEqual('image1', self.service.show(image_id)['name'])
+            get_mock.assert_called_once_with(image_id)
+
+    def test_show_caches_not_found(self):
+        self.config(image_metadata_cache_ttl=60, group='glance')
+        self.addCleanup(metadata_cache.reset)
+
+        with mock.patch.object(self.service.client.images, 'get',
+                               autospec=True) as get_mock:
+            get_mock.side_effect = glance_exc.NotFound('bad')
+            for i in range(2):
+                self.assertRaises(exception.ImageNotFound,
+                                  self.service.show, 'bad image id')
+            get_mock.assert_called_once_with('bad image id')
+
+    def test_update_invalidates_metadata_cache(self):
+        self.config(image_metadata_cache_ttl=60, group='glance')
+        self.addCleanup(metadata_cache.reset)
+        fixture = self._make_fixture(name='image1', is_public=True)
+        image_id = self.service.create(fixture)['id']
+        self.service.show(image_id)
+
+        self.service.update(image_id, {'name': 'image2'})
+        self.assertEqual('image2', self.service.show(image_id)['name'])
+
     def test_detail_passes_through_to_client(self):
         fixture = self._make_fixture(name='image10', is_public=True)
         image_id = self.service.create(fixture)['id']
@@ -630,6 +666,76 @@ class TestGlanceImageService(base.TestCase):
                          wrapped_func(self.service, **params))
 
 
+class TestImageMetadataCache(base.TestCase):
+
+    def setUp(self):
+        super(TestImageMetadataCache, self).setUp()
+        self.cache = metadata_cache.ImageMetadataCache(2, 60, 10)
+        self.context = context.RequestContext(auth_token='token',
+                                              tenant='tenant1')
+
+    def test_get_miss(self):
+        self.assertIsNone(self.cache.get('image1', self.context))
+
+    def test_put_get(self):
+        self.cache.put('image1', self.context, {'id': 'image1'})
+        self.assertEqual({'id': 'image1'},
+                         self.cache.get('image1', self.context))
+
+    def test_get_other_tenant(self):
+        self.cache.put('image1', self.context, {'id': 'image1'})
+        other = context.RequestContext(auth_token='token', tenant='tenant2')
+        self.assertIsNone(self.cache.get('image1', other))
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_get_expired(self, time_mock):
+        time_mock.return_value = 1000
+        self.cache.put('image1', self.context, {'id': 'image1'})
+        time_mock.return_value = 1061
+        self.assertIsNone(self.cache.get('image1', self.context))
+        self.assertEqual(0, len(self.cache))
+
+    def test_put_not_found(self):
+        self.cache.put_not_found('image1', self.context)
+        self.assertRaises(exception.ImageNotFound,
+                          self.cache.get, 'image1', self.context)
+
+    def test_put_not_found_negative_caching_disabled(self):
+        self.cache.negative_ttl = 0
+        self.cache.put_not_found('image1', self.context)
+        self.assertIsNone(self.cache.get('image1', self.context))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('image1', self.context, {'id': 'image1'})
+        self.cache.put('image2', self.context, {'id': 'image2'})
+        self.cache.get('image1', self.context)
+        self.cache.put('image3', self.context, {'id': 'image3'})
+        self.assertIsNone(self.cache.get('image2', self.context))
+        self.assertIsNotNone(self.cache.get('image1', self.context))
+        self.assertIsNotNone(self.cache.get('image3', self.context))
+
+    def test_invalidate(self):
+        other = context.RequestContext(auth_token='token', tenant='tenant2')
+        self.cache.put('image1', self.context, {'id': 'image1'})
+        self.cache.put('image1', other, {'id': 'image1'})
+        self.cache.put('image2', self.context, {'id': 'image2'})
+        self.cache.invalidate('image1')
+        self.assertIsNone(self.cache.get('image1', self.context))
+        self.assertIsNone(self.cache.get('image1', other))
+        self.assertIsNotNone(self.cache.get('image2', self.context))
+
+    def test_get_cache_disabled(self):
+        self.config(image_metadata_cache_ttl=0, group='glance')
+        self.assertIsNone(metadata_cache.get_cache())
+
+    def test_get_cache(self):
+        self.config(image_metadata_cache_ttl=30, group='glance')
+        self.addCleanup(metadata_cache.reset)
+        cache = metadata_cache.get_cache()
+        self.assertEqual(30, cache.ttl)
+        self.assertIs(cache, metadata_cache.get_cache())
+
+
 def _create_failing_glance_client(info):
     class MyGlanceStubClient(stubs.StubGlanceClient):
         """A client that fails the first time, then succeeds."""
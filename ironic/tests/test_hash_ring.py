@@ -14,6 +14,7 @@
 #    under the License.
 
 import hashlib
+import time
 
 import mock
 from oslo_config import cfg
@@ -239,8 +240,7 @@ class HashRingManagerTestCase(db_base.DbTestCase):
 
     def test_hash_ring_manager_no_refresh(self):
         # If a new conductor is registered after the ring manager is
-        # initialized, it won't be seen. Long term this is probably
-        # undesirable, but today is the intended behavior.
+        # initialized, it won't be seen until the rings are reloaded.
         self.assertRaises(exception.DriverNotFound,
                           self.ring_manager.__getitem__,
                           'driver1')
@@ -248,3 +248,48 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         self.assertRaises(exception.DriverNotFound,
                           self.ring_manager.__getitem__,
                           'driver1')
+
+    @mock.patch.object(time, 'time', autospec=True)
+    def test_hash_ring_manager_refresh(self, mock_time):
+        mock_time.return_value = 1000
+        self.assertRaises(exception.DriverNotFound,
+                          self.ring_manager.__getitem__,
+                          'driver1')
+        self.register_conductors()
+        mock_time.return_value += CONF.hash_ring_reset_interval
+        ring = self.ring_manager['driver1']
+        self.assertEqual(sorted(['host1', 'host2']), sorted(ring.hosts))
+
+    def test_hash_ring_manager_reset(self):
+        self.assertEqual({}, self.ring_manager.driver_hosts)
+        self.register_conductors()
+        self.ring_manager.reset()
+        self.assertEqual({'driver1': set(['host1', 'host2']),
+                          'driver2': set(['host1'])},
+                         self.ring_manager.driver_hosts)
+
+    def test_hash_ring_manager_shared_cache(self):
+        with mock.patch.object(self.dbapi, 'get_active_driver_dict',
+                               autospec=True) as mock_d2c:
+            mock_d2c.return_value = {'driver1': set(['host1'])}
+            self.assertEqual(set(['host1']),
+                             self.ring_manager['driver1'].hosts)
+            other = hash_ring.HashRingManager()
+            self.assertEqual({'driver1': set(['host1'])}, other.driver_hosts)
+            self.assertEqual(set(['host1']), other['driver1'].hosts)
+            mock_d2c.assert_called_once_with(use_slave=False)
+
+    def test_hash_ring_manager_use_slave(self):
+        with mock.patch.object(self.dbapi, 'get_active_driver_dict',
+                               autospec=True) as mock_d2c:
+            mock_d2c.side_effect = iter([{'driver1': set(['host1'])},
+                                         {'driver1': set(['host2'])}])
+            self.assertEqual(set(['host1']),
+                             self.ring_manager['driver1'].hosts)
+            # The replica is cached separately from the primary
+            replica = hash_ring.HashRingManager(use_slave=True)
+            self.assertEqual(set(['host2']), replica['driver1'].hosts)
+            self.assertEqual(set(['host1']),
+                             self.ring_manager['driver1'].hosts)
+            mock_d2c.assert_has_calls([mock.call(use_slave=False),
+                                       mock.call(use_slave=True)])
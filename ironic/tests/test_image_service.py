@@ -11,7 +11,7 @@
 #    under the License.
 
 import os
-import shutil
+import tempfile
 
 import mock
 import requests
@@ -74,38 +74,193 @@ class HttpImageServiceTestCase(base.TestCase):
                           self.service.show, self.href)
         head_mock.assert_called_with(self.href)
 
-    @mock.patch.object(shutil, 'copyfileobj', autospec=True)
-    @mock.patch.object(requests, 'get', autospec=True)
-    def test_download_success(self, req_get_mock, shutil_mock):
-        response_mock = req_get_mock.return_value
-        response_mock.status_code = 200
-        response_mock.raw = mock.MagicMock(spec=file)
+    def _make_response(self, status_code=200, chunks=('data',),
+                       headers=None):
+        response = mock.Mock(status_code=status_code)
+        response.headers = headers or {}
+        response.iter_content.return_value = iter(chunks)
+        return response
+
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_success(self, session_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.return_value = self._make_response(
+            chunks=['ab', 'cd'], headers={'Content-Length': '4'})
         file_mock = mock.Mock(spec=file)
         self.service.download(self.href, file_mock)
-        shutil_mock.assert_called_once_with(
-            response_mock.raw.__enter__(), file_mock,
-            image_service.IMAGE_CHUNK_SIZE
-        )
-        req_get_mock.assert_called_once_with(self.href, stream=True)
-
-    @mock.patch.object(requests, 'get', autospec=True,
-                       side_effect=requests.ConnectionError())
-    def test_download_fail_connerror(self, req_get_mock):
+        file_mock.write.assert_has_calls([mock.call('ab'), mock.call('cd')])
+        get_mock.assert_called_once_with(self.href, stream=True, headers={},
+                                         timeout=60)
+
+    @mock.patch.object(image_service.time, 'sleep', autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_fail_connerror(self, session_mock, sleep_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.side_effect = requests.ConnectionError()
         file_mock = mock.Mock(spec=file)
         self.assertRaises(exception.ImageDownloadFailed,
                           self.service.download, self.href, file_mock)
+        self.assertEqual(4, get_mock.call_count)
+        sleep_mock.assert_called_with(2)
 
-    @mock.patch.object(shutil, 'copyfileobj', autospec=True)
-    @mock.patch.object(requests, 'get', autospec=True)
-    def test_download_fail_ioerror(self, req_get_mock, shutil_mock):
-        response_mock = req_get_mock.return_value
-        response_mock.status_code = 200
-        response_mock.raw = mock.MagicMock(spec=file)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_fail_ioerror(self, session_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.return_value = self._make_response()
         file_mock = mock.Mock(spec=file)
-        shutil_mock.side_effect = IOError
+        file_mock.write.side_effect = IOError
         self.assertRaises(exception.ImageDownloadFailed,
                           self.service.download, self.href, file_mock)
-        req_get_mock.assert_called_once_with(self.href, stream=True)
+        get_mock.assert_called_once_with(self.href, stream=True, headers={},
+                                         timeout=60)
+
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_fail_error_code(self, session_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.return_value = self._make_response(status_code=404)
+        file_mock = mock.Mock(spec=file)
+        self.assertRaises(exception.ImageRefValidationFailed,
+                          self.service.download, self.href, file_mock)
+        self.assertFalse(file_mock.write.called)
+
+    @mock.patch.object(image_service.time, 'sleep', autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_retry_server_error(self, session_mock, sleep_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.side_effect = [
+            self._make_response(status_code=503),
+            self._make_response(chunks=['ab'],
+                                headers={'Content-Length': '2'})]
+        file_mock = mock.Mock(spec=file)
+        self.service.download(self.href, file_mock)
+        file_mock.write.assert_called_once_with('ab')
+        self.assertEqual(2, get_mock.call_count)
+        sleep_mock.assert_called_once_with(2)
+
+    @mock.patch.object(image_service.time, 'sleep', autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_retry_too_many_requests(self, session_mock,
+                                              sleep_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.side_effect = [
+            self._make_response(status_code=429,
+                                headers={'Retry-After': '10'}),
+            self._make_response(chunks=['ab'],
+                                headers={'Content-Length': '2'})]
+        file_mock = mock.Mock(spec=file)
+        self.service.download(self.href, file_mock)
+        file_mock.write.assert_called_once_with('ab')
+        sleep_mock.assert_called_once_with(10)
+
+    @mock.patch.object(image_service.time, 'sleep', autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_fail_server_error(self, session_mock, sleep_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.return_value = self._make_response(status_code=500)
+        file_mock = mock.Mock(spec=file)
+        self.assertRaises(exception.ImageDownloadFailed,
+                          self.service.download, self.href, file_mock)
+        self.assertEqual(4, get_mock.call_count)
+        self.assertFalse(file_mock.write.called)
+
+    @mock.patch.object(image_service.time, 'sleep', autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_resume(self, session_mock, sleep_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.side_effect = [
+            self._make_response(chunks=['ab'],
+                                headers={'Content-Length': '4'}),
+            self._make_response(status_code=206, chunks=['cd'],
+                                headers={'Content-Length': '2'})]
+        file_mock = mock.Mock(spec=file)
+        self.service.download(self.href, file_mock)
+        file_mock.write.assert_has_calls([mock.call('ab'), mock.call('cd')])
+        self.assertFalse(file_mock.truncate.called)
+        get_mock.assert_called_with(self.href, stream=True,
+                                    headers={'Range': 'bytes=2-'},
+                                    timeout=60)
+
+    @mock.patch.object(image_service.time, 'sleep', autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_resume_range_not_supported(self, session_mock,
+                                                 sleep_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.side_effect = [
+            self._make_response(chunks=['ab'],
+                                headers={'Content-Length': '4'}),
+            self._make_response(chunks=['ab', 'cd'],
+                                headers={'Content-Length': '4'})]
+        file_mock = mock.Mock(spec=file)
+        self.service.download(self.href, file_mock)
+        file_mock.seek.assert_called_once_with(0)
+        file_mock.truncate.assert_called_once_with()
+        self.assertEqual(3, file_mock.write.call_count)
+
+    @mock.patch.object(image_service.HttpImageService, '_download_range',
+                       autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_ranges(self, session_mock, download_range_mock):
+        self.config(image_download_range_workers=3,
+                    image_download_range_min_size=0)
+        session_mock.return_value.head.return_value = self._make_response(
+            headers={'Content-Length': '10', 'Accept-Ranges': 'bytes'})
+        image_file = tempfile.NamedTemporaryFile()
+        self.service.download(self.href, image_file)
+        self.assertEqual(10, os.path.getsize(image_file.name))
+        self.assertEqual(10, image_file.tell())
+        self.assertEqual(
+            [(0, 3), (4, 7), (8, 9)],
+            sorted(c[0][3:] for c in download_range_mock.call_args_list))
+
+    @mock.patch.object(image_service.HttpImageService, '_download_ranges',
+                       autospec=True)
+    @mock.patch.object(image_service.HttpImageService, '_download_range',
+                       autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_ranges_not_accepted(self, session_mock,
+                                          download_range_mock,
+                                          download_ranges_mock):
+        self.config(image_download_range_workers=3,
+                    image_download_range_min_size=0)
+        session_mock.return_value.head.return_value = self._make_response(
+            headers={'Content-Length': '10'})
+        download_range_mock.return_value = 10
+        file_mock = mock.Mock(spec=file)
+        self.service.download(self.href, file_mock)
+        download_range_mock.assert_called_once_with(self.service, self.href,
+                                                    file_mock)
+        self.assertFalse(download_ranges_mock.called)
+
+    @mock.patch.object(image_service.HttpImageService, '_download_ranges',
+                       autospec=True)
+    @mock.patch.object(image_service.HttpImageService, '_download_range',
+                       autospec=True)
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test_download_ranges_small_image(self, session_mock,
+                                         download_range_mock,
+                                         download_ranges_mock):
+        self.config(image_download_range_workers=3)
+        session_mock.return_value.head.return_value = self._make_response(
+            headers={'Content-Length': '10', 'Accept-Ranges': 'bytes'})
+        download_range_mock.return_value = 10
+        file_mock = mock.Mock(spec=file)
+        self.service.download(self.href, file_mock)
+        download_range_mock.assert_called_once_with(self.service, self.href,
+                                                    file_mock)
+        self.assertFalse(download_ranges_mock.called)
+
+    @mock.patch.object(image_service, '_get_session', autospec=True)
+    def test__download_range_server_ignores_range(self, session_mock):
+        get_mock = session_mock.return_value.get
+        get_mock.return_value = self._make_response(
+            headers={'Content-Length': '10'})
+        file_mock = mock.Mock(spec=file)
+        self.assertRaises(exception.ImageDownloadFailed,
+                          self.service._download_range, self.href,
+                          file_mock, 4, 7)
+        get_mock.assert_called_once_with(self.href, stream=True,
+                                         headers={'Range': 'bytes=4-7'},
+                                         timeout=60)
 
 
 class FileImageServiceTestCase(base.TestCase):
@@ -122,6 +122,14 @@ class KeystoneTestCase(base.TestCase):
         mock_ks.return_value = fake_client
         self.assertEqual('123456', keystone.get_admin_auth_token())
 
+    @mock.patch('keystoneclient.v2_0.client.Client', autospec=True)
+    def test_get_admin_auth_ref(self, mock_ks):
+        fake_client = FakeClient()
+        fake_client.auth_ref = mock.sentinel.auth_ref
+        mock_ks.return_value = fake_client
+        self.assertEqual(mock.sentinel.auth_ref,
+                         keystone.get_admin_auth_ref())
+
     @mock.patch('keystoneclient.v2_0.client.Client', autospec=True)
     def test_get_region_name_v2(self, mock_ks):
         mock_ks.return_value = FakeClient()
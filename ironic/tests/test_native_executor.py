@@ -0,0 +1,110 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import eventlet
+from eventlet import patcher
+from eventlet import tpool
+import mock
+
+from ironic.common import exception
+from ironic.common import native_executor
+from ironic.tests import base
+
+original_threading = patcher.original('threading')
+
+
+class NativeExecutorTestCase(base.TestCase):
+
+    def setUp(self):
+        super(NativeExecutorTestCase, self).setUp()
+        native_executor.reset_stats()
+        self.addCleanup(native_executor.reset_stats)
+
+    def test_execute(self):
+        func = mock.Mock(return_value='result', __name__='func')
+        self.assertEqual('result',
+                         native_executor.execute(func, 'arg', kwarg='kw'))
+        func.assert_called_once_with('arg', kwarg='kw')
+        stats = native_executor.get_stats()['func']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(0, stats['errors'])
+
+    def test_execute_runs_in_native_thread(self):
+        def func():
+            return original_threading.current_thread().name
+
+        caller = original_threading.current_thread().name
+        self.assertNotEqual(caller, native_executor.execute(func))
+
+    @mock.patch.object(tpool, 'execute', autospec=True)
+    def test_execute_pool_disabled(self, execute_mock):
+        self.config(native_thread_pool_size=0, group='conductor')
+        func = mock.Mock(return_value='result', __name__='func')
+        self.assertEqual('result', native_executor.execute(func))
+        func.assert_called_once_with()
+        self.assertFalse(execute_mock.called)
+
+    def test_execute_raises(self):
+        func = mock.Mock(side_effect=exception.IronicException('boom'),
+                         __name__='func')
+        self.assertRaises(exception.IronicException,
+                          native_executor.execute, func)
+        stats = native_executor.get_stats()['func']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(1, stats['errors'])
+
+    def test_execute_timeout(self):
+        self.config(native_call_timeout=0.1, group='conductor')
+        event = threading.Event()
+
+        def func():
+            # NOTE: time.sleep is monkey patched; this blocks only the native
+            # thread as long as the test does not set the event.
+            while not event.is_set():
+                time.sleep(0.01)
+
+        self.addCleanup(event.set)
+        self.assertRaises(exception.NativeCallTimeout,
+                          native_executor.execute, func)
+        self.assertEqual(1, native_executor.get_stats()['func']['timeouts'])
+
+    def test_execute_timeout_frees_thread_when_done(self):
+        self.config(native_call_timeout=0.1, group='conductor')
+        event = threading.Event()
+
+        def func():
+            while not event.is_set():
+                time.sleep(0.01)
+
+        self.addCleanup(event.set)
+        self.assertRaises(exception.NativeCallTimeout,
+                          native_executor.execute, func)
+        self.assertEqual(1, len(native_executor._ABANDONED))
+        event.set()
+        with eventlet.Timeout(5):
+            while native_executor._ABANDONED:
+                eventlet.sleep(0.01)
+
+    def test_execute_no_free_native_thread(self):
+        self.config(native_thread_pool_size=1, group='conductor')
+        native_executor._ABANDONED.add(mock.Mock())
+        func = mock.Mock(__name__='func')
+        self.assertRaises(exception.NoFreeNativeThread,
+                          native_executor.execute, func)
+        self.assertFalse(func.called)
+
+    def test_get_transport_timeout(self):
+        self.config(native_call_timeout=60, group='conductor')
+        self.assertEqual(60, native_executor.get_transport_timeout())
@@ -16,6 +16,7 @@
 
 import os
 
+import eventlet
 import mock
 from oslo_config import cfg
 
@@ -75,6 +76,8 @@ class TestPXEUtils(db_base.DbTestCase):
         })
 
         self.node = object_utils.create_test_node(self.context)
+        pxe_utils.clear_template_cache()
+        self.addCleanup(pxe_utils.clear_template_cache)
 
     def test__build_pxe_config(self):
 
@@ -126,11 +129,10 @@ class TestPXEUtils(db_base.DbTestCase):
 
         self.assertEqual(unicode(expected_template), rendered_template)
 
-    @mock.patch('ironic.common.utils.create_link_without_raise', autospec=True)
-    @mock.patch('ironic.common.utils.unlink_without_raise', autospec=True)
+    @mock.patch('ironic.common.utils.replace_link_without_raise',
+                autospec=True)
     @mock.patch('ironic.drivers.utils.get_node_mac_addresses', autospec=True)
-    def test__write_mac_pxe_configs(self, get_macs_mock, unlink_mock,
-                                    create_link_mock):
+    def test__write_mac_pxe_configs(self, get_macs_mock, create_link_mock):
         macs = [
             '00:11:22:33:44:55:66',
             '00:11:22:33:44:55:67'
@@ -142,21 +144,15 @@ class TestPXEUtils(db_base.DbTestCase):
             mock.call(u'/tftpboot/1be26c0b-03f2-4d2e-ae87-c02d7f33c123/config',
                       '/tftpboot/pxelinux.cfg/01-00-11-22-33-44-55-67')
         ]
-        unlink_calls = [
-            mock.call('/tftpboot/pxelinux.cfg/01-00-11-22-33-44-55-66'),
-            mock.call('/tftpboot/pxelinux.cfg/01-00-11-22-33-44-55-67'),
-        ]
         with task_manager.acquire(self.context, self.node.uuid) as task:
             pxe_utils._link_mac_pxe_configs(task)
 
-        unlink_mock.assert_has_calls(unlink_calls)
         create_link_mock.assert_has_calls(create_link_calls)
 
-    @mock.patch('ironic.common.utils.create_link_without_raise', autospec=True)
-    @mock.patch('ironic.common.utils.unlink_without_raise', autospec=True)
+    @mock.patch('ironic.common.utils.replace_link_without_raise',
+                autospec=True)
     @mock.patch('ironic.drivers.utils.get_node_mac_addresses', autospec=True)
-    def test__write_mac_ipxe_configs(self, get_macs_mock, unlink_mock,
-                                     create_link_mock):
+    def test__write_mac_ipxe_configs(self, get_macs_mock, create_link_mock):
         self.config(ipxe_enabled=True, group='pxe')
         macs = [
             '00:11:22:33:44:55:66',
@@ -173,23 +169,16 @@ class TestPXEUtils(db_base.DbTestCase):
             mock.call(u'/httpboot/1be26c0b-03f2-4d2e-ae87-c02d7f33c123/config',
                       '/httpboot/pxelinux.cfg/00112233445567'),
         ]
-        unlink_calls = [
-            mock.call('/httpboot/pxelinux.cfg/00-11-22-33-44-55-66'),
-            mock.call('/httpboot/pxelinux.cfg/00112233445566'),
-            mock.call('/httpboot/pxelinux.cfg/00-11-22-33-44-55-67'),
-            mock.call('/httpboot/pxelinux.cfg/00112233445567'),
-        ]
         with task_manager.acquire(self.context, self.node.uuid) as task:
             pxe_utils._link_mac_pxe_configs(task)
 
-        unlink_mock.assert_has_calls(unlink_calls)
         create_link_mock.assert_has_calls(create_link_calls)
 
-    @mock.patch('ironic.common.utils.create_link_without_raise', autospec=True)
-    @mock.patch('ironic.common.utils.unlink_without_raise', autospec=True)
+    @mock.patch('ironic.common.utils.replace_link_without_raise',
+                autospec=True)
     @mock.patch('ironic.common.dhcp_factory.DHCPFactory.provider',
                 autospec=True)
-    def test__link_ip_address_pxe_configs(self, provider_mock, unlink_mock,
+    def test__link_ip_address_pxe_configs(self, provider_mock,
                                           create_link_mock):
         ip_address = '10.10.0.1'
         address = "aa:aa:aa:aa:aa:aa"
@@ -204,10 +193,9 @@ class TestPXEUtils(db_base.DbTestCase):
         with task_manager.acquire(self.context, self.node.uuid) as task:
             pxe_utils._link_ip_address_pxe_configs(task)
 
-        unlink_mock.assert_called_once_with('/tftpboot/0A0A0001.conf')
         create_link_mock.assert_has_calls(create_link_calls)
 
-    @mock.patch('ironic.common.utils.write_to_file', autospec=True)
+    @mock.patch('ironic.common.utils.write_to_file_atomic', autospec=True)
     @mock.patch.object(pxe_utils, '_build_pxe_config', autospec=True)
     @mock.patch('ironic.openstack.common.fileutils.ensure_tree', autospec=True)
     def test_create_pxe_config(self, ensure_tree_mock, build_mock,
@@ -227,6 +215,106 @@ class TestPXEUtils(db_base.DbTestCase):
         pxe_cfg_file_path = pxe_utils.get_pxe_config_file_path(self.node.uuid)
         write_mock.assert_called_with(pxe_cfg_file_path, self.pxe_options)
 
+    @mock.patch.object(pxe_utils, '_link_mac_pxe_configs', autospec=True)
+    @mock.patch('ironic.common.utils.write_to_file_atomic', autospec=True)
+    @mock.patch.object(pxe_utils, '_build_pxe_config', autospec=True)
+    @mock.patch('ironic.openstack.common.fileutils.ensure_tree', autospec=True)
+    def test_create_pxe_configs(self, ensure_tree_mock, build_mock,
+                                write_mock, link_mock):
+        node2 = object_utils.create_test_node(
+            self.context, id=2, uuid='da8a3bb4-9e3e-4aa6-9d3b-27aa08a7fb5c')
+        build_mock.side_effect = lambda options, template: options['id']
+        with task_manager.acquire(self.context, self.node.uuid) as task1:
+            with task_manager.acquire(self.context, node2.uuid) as task2:
+                pxe_utils.create_pxe_configs([(task1, {'id': 'cfg1'}),
+                                              (task2, {'id': 'cfg2'})])
+                link_mock.assert_has_calls([mock.call(task1),
+                                            mock.call(task2)])
+        build_mock.assert_has_calls([
+            mock.call({'id': 'cfg1'}, CONF.pxe.pxe_config_template),
+            mock.call({'id': 'cfg2'}, CONF.pxe.pxe_config_template)])
+        write_mock.assert_has_calls([
+            mock.call(pxe_utils.get_pxe_config_file_path(self.node.uuid),
+                      'cfg1'),
+            mock.call(pxe_utils.get_pxe_config_file_path(node2.uuid),
+                      'cfg2')])
+
+    def _create_batched(self, tasks_options):
+        def create(task, pxe_options):
+            with pxe_utils.batch_pxe_configs():
+                pxe_utils.create_pxe_config(task, pxe_options)
+
+        threads = [eventlet.spawn(create, task, pxe_options)
+                   for task, pxe_options in tasks_options]
+        results = []
+        for thread in threads:
+            try:
+                thread.wait()
+            except Exception as e:
+                results.append(e)
+            else:
+                results.append(None)
+        return results
+
+    @mock.patch.object(pxe_utils, 'create_pxe_configs', autospec=True)
+    def test_create_pxe_config_batched(self, create_mock):
+        node2 = object_utils.create_test_node(
+            self.context, id=2, uuid='da8a3bb4-9e3e-4aa6-9d3b-27aa08a7fb5c')
+        with task_manager.acquire(self.context, self.node.uuid) as task1:
+            with task_manager.acquire(self.context, node2.uuid) as task2:
+                results = self._create_batched([(task1, {'id': 'cfg1'}),
+                                                (task2, {'id': 'cfg2'})])
+        self.assertEqual([None, None], results)
+        create_mock.assert_called_once_with(
+            [(task1, {'id': 'cfg1'}), (task2, {'id': 'cfg2'})],
+            template=CONF.pxe.pxe_config_template)
+        self.assertFalse(pxe_utils._CONFIG_BATCHER._writing)
+
+    @mock.patch.object(pxe_utils, 'create_pxe_configs', autospec=True)
+    def test_create_pxe_config_batched_failure(self, create_mock):
+        node2 = object_utils.create_test_node(
+            self.context, id=2, uuid='da8a3bb4-9e3e-4aa6-9d3b-27aa08a7fb5c')
+
+        def create_pxe_configs(tasks_options, template):
+            if any(options['id'] == 'cfg2' for _t, options in tasks_options):
+                raise OSError('boom')
+
+        create_mock.side_effect = create_pxe_configs
+        with task_manager.acquire(self.context, self.node.uuid) as task1:
+            with task_manager.acquire(self.context, node2.uuid) as task2:
+                results = self._create_batched([(task1, {'id': 'cfg1'}),
+                                                (task2, {'id': 'cfg2'})])
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], OSError)
+        self.assertEqual(3, create_mock.call_count)
+
+    @mock.patch.object(pxe_utils, 'create_pxe_configs', autospec=True)
+    def test_create_pxe_config_not_batched(self, create_mock):
+        with task_manager.acquire(self.context, self.node.uuid) as task:
+            pxe_utils.create_pxe_config(task, self.pxe_options)
+        create_mock.assert_called_once_with(
+            [(task, self.pxe_options)],
+            template=CONF.pxe.pxe_config_template)
+
+    @mock.patch('jinja2.Environment', autospec=True)
+    def test__get_template_cached(self, env_mock):
+        template = CONF.pxe.pxe_config_template
+        compiled = pxe_utils._get_template(template)
+        self.assertIs(compiled, pxe_utils._get_template(template))
+        self.assertEqual(1, env_mock.call_count)
+        env_mock.return_value.get_template.assert_called_once_with(
+            os.path.basename(template))
+
+    @mock.patch.object(os.path, 'getmtime', autospec=True)
+    @mock.patch('jinja2.Environment', autospec=True)
+    def test__get_template_changed(self, env_mock, mtime_mock):
+        template = CONF.pxe.pxe_config_template
+        mtime_mock.return_value = 1
+        pxe_utils._get_template(template)
+        mtime_mock.return_value = 2
+        pxe_utils._get_template(template)
+        self.assertEqual(2, env_mock.call_count)
+
     @mock.patch('ironic.common.utils.rmtree_without_raise', autospec=True)
     @mock.patch('ironic.common.utils.unlink_without_raise', autospec=True)
     def test_clean_up_pxe_config(self, unlink_mock, rmtree_mock):
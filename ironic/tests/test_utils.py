@@ -66,6 +66,44 @@ class BareMetalUtilsTestCase(base.TestCase):
             utils.create_link_without_raise("/fake/source", "/fake/link")
             symlink_mock.assert_called_once_with("/fake/source", "/fake/link")
 
+    def test_replace_link(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        link = os.path.join(tmp_dir, 'link')
+        os.symlink('/fake/old', link)
+        utils.replace_link_without_raise('/fake/source', link)
+        self.assertEqual('/fake/source', os.readlink(link))
+        self.assertEqual(['link'], os.listdir(tmp_dir))
+
+    @mock.patch.object(os, "rename", autospec=True)
+    @mock.patch.object(utils, "unlink_without_raise", autospec=True)
+    def test_replace_link_fails(self, unlink_mock, rename_mock):
+        rename_mock.side_effect = OSError(errno.EPERM)
+        with mock.patch.object(os, "symlink", autospec=True):
+            utils.replace_link_without_raise("/fake/source", "/fake/link")
+        tmp_link = rename_mock.call_args[0][0]
+        self.assertTrue(tmp_link.startswith('/fake/link.'))
+        unlink_mock.assert_called_once_with(tmp_link)
+
+    def test_write_to_file_atomic(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'file')
+        utils.write_to_file(path, 'old')
+        utils.write_to_file_atomic(path, 'new')
+        with open(path) as f:
+            self.assertEqual('new', f.read())
+        self.assertEqual(['file'], os.listdir(tmp_dir))
+
+    @mock.patch.object(os, "rename", autospec=True)
+    def test_write_to_file_atomic_fails(self, rename_mock):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        rename_mock.side_effect = OSError(errno.EPERM)
+        self.assertRaises(OSError, utils.write_to_file_atomic,
+                          os.path.join(tmp_dir, 'file'), 'new')
+        self.assertEqual([], os.listdir(tmp_dir))
+
 
 class ExecuteTestCase(base.TestCase):
 
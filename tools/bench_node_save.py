@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure how many concurrent Node.save() calls the database sustains.
+
+Each thread saves its own nodes in a loop, like conductors updating the
+nodes they manage. Saves changing a field reported by /v1/nodes/changes
+also set the change_seq of the node, saves only changing
+conductor_affinity do not, so comparing both shows the cost of tracking
+the changes.
+
+Run it against an empty MySQL or PostgreSQL database: SQLite serializes
+all the writes anyway. The schema is created if needed, the nodes created
+by the benchmark are deleted at the end and its conductor is unregistered.
+"""
+
+import optparse
+import os
+import sys
+import threading
+import time
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from oslo_config import cfg
+from oslo_context import context
+from oslo_utils import uuidutils
+
+from ironic.db import api as db_api
+from ironic.db.sqlalchemy import api as sqla_api
+from ironic.db.sqlalchemy import models
+from ironic.objects import node as node_obj
+
+CONF = cfg.CONF
+
+
+def make_nodes(ctxt, count):
+    nodes = []
+    for i in range(count):
+        node = node_obj.Node(ctxt, uuid=uuidutils.generate_uuid(),
+                             driver='fake', extra={})
+        node.create()
+        nodes.append(node)
+    return nodes
+
+
+def save_tracked(node, i):
+    node.extra = {'iteration': i}
+    node.save()
+
+
+def make_save_untracked(conductor_id):
+    def save_untracked(node, i):
+        node.conductor_affinity = conductor_id if i % 2 else None
+        node.save()
+    return save_untracked
+
+
+def run(nodes, threads, saves, save):
+    per_thread = len(nodes) // threads
+
+    def worker(my_nodes):
+        for i in range(saves):
+            save(my_nodes[i % len(my_nodes)], i)
+
+    workers = [threading.Thread(target=worker,
+                                args=(nodes[t * per_thread:
+                                            (t + 1) * per_thread],))
+               for t in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.time() - start
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-c", "--connection", dest="connection",
+                      help="SQLAlchemy URL of the MySQL or PostgreSQL "
+                           "database (required)")
+    parser.add_option("-t", "--threads", dest="threads", type="int",
+                      default=8, help="number of threads (default: 8)")
+    parser.add_option("-s", "--saves", dest="saves", type="int",
+                      default=200,
+                      help="number of saves per thread (default: 200)")
+    (options, args) = parser.parse_args()
+    if not options.connection:
+        parser.error("the database URL (-c) is required")
+
+    CONF([], project='ironic')
+    CONF.set_override('connection', options.connection, 'database')
+    models.Base.metadata.create_all(sqla_api.get_engine())
+
+    # conductor_affinity is a foreign key to the conductors
+    dbapi = db_api.get_instance()
+    hostname = 'bench-%s' % uuidutils.generate_uuid()
+    conductor = dbapi.register_conductor({'hostname': hostname,
+                                          'drivers': ['fake']})
+    ctxt = context.RequestContext(is_admin=True)
+    nodes = make_nodes(ctxt, options.threads * 4)
+    try:
+        for name, save in [('tracked fields', save_tracked),
+                           ('untracked fields',
+                            make_save_untracked(conductor.id))]:
+            elapsed = run(nodes, options.threads, options.saves, save)
+            total = options.threads * options.saves
+            print("%-20s %8.3f s %10.0f saves/s" %
+                  (name, elapsed, total / elapsed))
+    finally:
+        for node in nodes:
+            node.destroy()
+        dbapi.unregister_conductor(hostname)
+
+
+if __name__ == '__main__':
+    main()
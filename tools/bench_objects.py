@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure how fast Node objects are built from rows and converted.
+
+It compares loading the rows through the field setters, which coerce
+every value, with the obj_set_db_values() fast path used by Node.list(),
+and measures the conversions done by the API and by RPC.
+"""
+
+import datetime
+import optparse
+import os
+import sys
+import time
+import uuid
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from ironic.common import states
+from ironic.objects import node as node_obj
+
+
+def make_rows(count):
+    now = datetime.datetime.utcnow()
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': i + 1,
+            'uuid': unicode(uuid.uuid4()),
+            'name': None,
+            'chassis_id': None,
+            'instance_uuid': unicode(uuid.uuid4()),
+            'driver': u'pxe_ipmitool',
+            'driver_info': {'ipmi_address': '10.0.0.%d' % (i % 250),
+                            'ipmi_username': 'admin',
+                            'ipmi_password': 'secret'},
+            'driver_internal_info': {'is_whole_disk_image': False},
+            'clean_step': {},
+            'instance_info': {'image_source': unicode(uuid.uuid4()),
+                              'root_gb': 10},
+            'properties': {'cpus': 8, 'memory_mb': 16384,
+                           'local_gb': 100, 'cpu_arch': 'x86_64'},
+            'reservation': None,
+            'conductor_affinity': 1,
+            'power_state': states.POWER_ON,
+            'target_power_state': None,
+            'provision_state': states.ACTIVE,
+            'provision_updated_at': now,
+            'target_provision_state': None,
+            'maintenance': False,
+            'maintenance_reason': None,
+            'console_enabled': False,
+            'last_error': None,
+            'inspection_finished_at': None,
+            'inspection_started_at': None,
+            'extra': {},
+            'change_seq': i + 1,
+            'created_at': now,
+            'updated_at': now,
+        })
+    return rows
+
+
+def load_with_setters(rows):
+    nodes = []
+    for row in rows:
+        node = node_obj.Node(None)
+        for field in node.fields:
+            node[field] = row[field]
+        node.obj_reset_changes()
+        nodes.append(node)
+    return nodes
+
+
+def load_from_db(rows):
+    return [node_obj.Node._from_db_object(node_obj.Node(None), row)
+            for row in rows]
+
+
+def as_dicts(nodes):
+    return [node.as_dict() for node in nodes]
+
+
+def to_primitives(nodes):
+    return [node.obj_to_primitive() for node in nodes]
+
+
+def measure(func, arg, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = func(arg)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--nodes", dest="nodes", type="int",
+                      default=5000, help="number of nodes (default: 5000)")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int",
+                      default=5,
+                      help="number of runs, the best one is kept "
+                           "(default: 5)")
+    (options, args) = parser.parse_args()
+
+    rows = make_rows(options.nodes)
+    nodes = None
+    for name, func in [('load with setters', load_with_setters),
+                       ('load from db', load_from_db),
+                       ('as_dict', as_dicts),
+                       ('obj_to_primitive', to_primitives)]:
+        arg = rows if func in (load_with_setters, load_from_db) else nodes
+        elapsed, result = measure(func, arg, options.repeat)
+        if func is load_from_db:
+            nodes = result
+        print("%-20s %8.3f s %10.0f nodes/s" %
+              (name, elapsed, options.nodes / elapsed))
+
+
+if __name__ == '__main__':
+    main()